@@ -0,0 +1,39 @@
+"""
+全量补建日线技术指标 (MarketIndicatorDaily)
+
+指标平时由 ETL 增量写入，接口只读 (缺失时返回 null)；本脚本用于上线后一次性补齐全部资产，
+或指标参数 (INDICATOR_VERSION) 变更后批量重算。
+
+用法: python backfill_indicators.py [SYMBOL ...]
+"""
+import sys
+import time
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from database import create_db_and_tables, engine
+from indicator_store import DAILY_TABLE, update_indicators
+
+
+def main(symbols=None):
+    create_db_and_tables()
+    with Session(engine) as session:
+        pairs = session.connection().execute(text(
+            f"SELECT DISTINCT symbol, market FROM {DAILY_TABLE} ORDER BY symbol"
+        )).all()
+        if symbols:
+            pairs = [p for p in pairs if p[0] in symbols]
+
+        start = time.time()
+        total = 0
+        for i, (symbol, market) in enumerate(pairs, 1):
+            n = update_indicators(session.connection(), symbol, market)
+            session.commit()
+            total += n
+            print(f"[{i}/{len(pairs)}] {symbol} ({market}): {n} 行")
+        print(f"✅ 完成: {len(pairs)} 个资产, {total} 行, {time.time() - start:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or None)
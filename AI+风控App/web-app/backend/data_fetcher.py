@@ -61,15 +61,27 @@ class DataFetcher:
         # 3. 实时/强制获取 (API)
         return self._fetch_from_yfinance_unified(symbol, market)
 
-    def _fetch_from_yfinance_unified(self, symbol: str, market: str) -> Optional[Dict[str, Any]]:
+    def fetch_for_sync(self, symbol: str, market: str) -> Optional[Dict[str, Any]]:
+        """
+        批量同步 (MarketSyncEngine) 的抓取入口，总是请求 API
+        - 限流令牌已由引擎通过 rate_limiter.acquire 预约，这里不再等待
+        - 请求出错直接抛出，由引擎重试并计为 failed；返回 None 只表示数据源无数据 (休市等)
+        """
+        return self._fetch_from_yfinance_unified(symbol, market, rate_limit=False, raise_errors=True)
+
+    def _fetch_from_yfinance_unified(self, symbol: str, market: str, rate_limit: bool = True,
+                                     raise_errors: bool = False) -> Optional[Dict[str, Any]]:
         """
         统一从 yfinance 获取数据 (覆盖所有市场)
+        rate_limit:   是否在此处等待 RateLimiter (调用方已预约令牌时传 False)
+        raise_errors: 请求出错时抛出异常而不是返回 None
         """
         yf_symbol = self._convert_to_yfinance_symbol(symbol, market)
         logger.info(f"🔄 API Fetch: {symbol} -> {yf_symbol}")
         
         # Rate Limit check
-        self.rate_limiter.wait_if_needed(symbol, source="yfinance")
+        if rate_limit:
+            self.rate_limiter.wait_if_needed(symbol, source="yfinance")
         
         try:
             # 使用 yfinance 获取最新数据 (period='5d' 以防假期/周末)
@@ -132,6 +144,8 @@ class DataFetcher:
             
         except Exception as e:
             logger.error(f"❌ API Error {symbol}: {e}")
+            if raise_errors:
+                raise
             return None
 
     def _convert_to_yfinance_symbol(self, symbol: str, market: str) -> str:
@@ -205,25 +219,16 @@ class DataFetcher:
             if 'timestamp' in df_reset.columns:
                 df_reset['timestamp'] = df_reset['timestamp'].dt.strftime('%Y-%m-%d')
                 
-            records = df_reset.to_dict(orient='records')
-            
-            # 2. Save to Raw DB
-            import json
+            # 2. Save to Raw DB (列式压缩载荷)
             from models import RawMarketData
-            
-            payload = {
-                "symbol": symbol, "market": market, "source": "yfinance",
-                "fetch_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "data": records
-            }
+            from raw_payload import pack_payload, store_raw
             
             with Session(engine) as session:
                 raw = RawMarketData(
                     symbol=symbol, market=market, source="yfinance",
-                    period="smart", payload=json.dumps(payload), processed=False
+                    period="smart", processed=False, **pack_payload(df_reset)
                 )
-                session.add(raw)
-                session.commit()
+                raw = store_raw(session, raw)
                 # 触发 ETL
                 ETLService.process_raw_data(raw.id)
                 
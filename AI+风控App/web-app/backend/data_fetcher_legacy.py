@@ -49,6 +49,7 @@ from database import engine
 from sqlmodel import Session, select
 
 from models import MarketDataDaily
+from watchlist_cache import snapshot_cache
 
 # ✅ 使用统一的符号转换工具
 from utils.symbol_utils import normalize_symbol_db, to_akshare_us_symbol, get_market
@@ -1992,10 +1993,13 @@ class DataFetcher:
             return pd.DataFrame()
 
     
-    def save_to_db(self, symbol: str, market: str, period_data: dict) -> None:
+    def save_to_db(self, symbol: str, market: str, period_data: dict, priority: int = None) -> None:
         """
         NEW ETL PIPELINE:
         Fetch -> Raw Table -> ETL Service -> Prod Table
+
+        priority: ETL队列优先级，默认 PRIORITY_INTERACTIVE (用户触发)；定时批量同步传 PRIORITY_NORMAL
+                  (历史回填走 backfill_missing_data(priority=PRIORITY_BACKFILL))
         """
         try:
             # ⚠️ DEBUG: 打印period_data长度
@@ -2008,6 +2012,7 @@ class DataFetcher:
             
             from database import get_session
             from models import RawMarketData
+            from raw_payload import pack_payload, store_raw
             from etl_service import ETLService
             from field_normalizer import FieldNormalizer  # 导入字段标准化器
             
@@ -2037,37 +2042,33 @@ class DataFetcher:
                     if norm_report.get('warnings'):
                         self.logger.warning(f"Field normalization warnings for {symbol}: {norm_report['warnings']}")
                     
-                    # Convert DF to JSON-serializable list of dicts
-                    # Timestamps need string conversion
-                    df_json = df.copy()
-                    if 'timestamp' in df_json.columns:
-                        df_json['date'] = df_json['timestamp'].astype(str)
-                    elif 'timestamp' in df_json.columns:
-                        df_json['date'] = df_json['timestamp'].astype(str)
-                    
-                    # Serialize
-                    payload = df_json.to_json(orient='records')
+                    # 保留字符串形式的date列 (兼容只认date的下游)
+                    df_raw = df.copy()
+                    if 'timestamp' in df_raw.columns:
+                        df_raw['date'] = df_raw['timestamp'].astype(str)
                     
-                    # 1. RAW INGESTION
+                    # 1. RAW INGESTION (列式压缩载荷；相同内容复用已有Raw并重新入队)
                     raw = RawMarketData(
                         source="fetched",
                         symbol=db_symbol,
                         market=market,
                         period=period,
-                        payload=payload,
-                        processed=False
+                        processed=False,
+                        **pack_payload(df_raw)
                     )
-                    session.add(raw)
-                    session.commit()
-                    session.refresh(raw)
+                    raw = store_raw(session, raw)
                     
                     # ✅ 2. TRIGGER ETL (Async via Queue)
                     # 旧模式: 同步ETL,阻塞用户响应(150秒)
                     # ETLService.process_raw_data(raw.id)
                     
                     # ✅ 新模式: 异步ETL,立即返回(5秒)
-                    from etl_queue import etl_queue
-                    etl_queue.enqueue(raw.id)
+                    from etl_queue import etl_queue, PRIORITY_INTERACTIVE
+                    etl_queue.enqueue(
+                        raw.id,
+                        priority=PRIORITY_INTERACTIVE if priority is None else priority,
+                        symbol=db_symbol
+                    )
                     self.logger.info(f"✅ 数据已保存到Raw表 (raw_id={raw.id}), ETL任务已入队")
             
             except Exception as e:
@@ -2224,6 +2225,7 @@ class DataFetcher:
     # NOTE: Modified fetch_all_stocks to accept an optional 'markets' filter and 'specific_symbols'
     def fetch_all_stocks(self, periods, target_markets=None, specific_symbols: list = None):
         import time, random
+        from etl_queue import PRIORITY_NORMAL  # 批量同步不抢占用户触发的 ETL
         target_list = specific_symbols if specific_symbols is not None else self.symbols
         self.logger.info(f"Starting to fetch data for {len(target_list)} stocks, periods: {periods}")
         
@@ -2267,18 +2269,18 @@ class DataFetcher:
                     daily_df = self.fetch_us_daily_data(symbol_daily)
                     if daily_df is not None and not daily_df.empty:
                         period_data['1d'] = daily_df
-                        self.save_to_db(symbol, market, {'1d': daily_df}) # Save daily data
+                        self.save_to_db(symbol, market, {'1d': daily_df}, priority=PRIORITY_NORMAL) # Save daily data
                 # 分钟线
                 df_1min = self.fetch_us_min_data(symbol_min)
                 if df_1min is not None and not df_1min.empty:
                     period_data['1min'] = df_1min
-                    self.save_to_db(symbol, market, {'1min': df_1min}) # Save minute data
+                    self.save_to_db(symbol, market, {'1min': df_1min}, priority=PRIORITY_NORMAL) # Save minute data
             elif market == "CN":
                 if not skip_daily:
                     daily_df = self.fetch_cn_daily_data(symbol)
                     if daily_df is not None and not daily_df.empty:
                         period_data['1d'] = daily_df
-                        self.save_to_db(symbol, market, {'1d': daily_df}) # Save daily data
+                        self.save_to_db(symbol, market, {'1d': daily_df}, priority=PRIORITY_NORMAL) # Save daily data
                 else:
                     daily_df = None
                 # Fund flow
@@ -2288,7 +2290,7 @@ class DataFetcher:
                     daily_df = self.fetch_hk_daily_data(symbol)
                     if daily_df is not None and not daily_df.empty:
                         period_data['1d'] = daily_df
-                        self.save_to_db(symbol, market, {'1d': daily_df}) # Save daily data
+                        self.save_to_db(symbol, market, {'1d': daily_df}, priority=PRIORITY_NORMAL) # Save daily data
                 else: 
                     daily_df = None
             else:
@@ -2378,20 +2380,20 @@ class DataFetcher:
                         if df is not None and not df.empty:
                             df = self._fix_open_price(df)
                             period_data[f'{period}min'] = df
-                            self.save_to_db(symbol, market, {f'{period}min': df}) # Save minute data
+                            self.save_to_db(symbol, market, {f'{period}min': df}, priority=PRIORITY_NORMAL) # Save minute data
 
                 elif market == "HK":
                     df = self.fetch_hk_min_data(symbol, period=period)
                     if df is not None and not df.empty:
                         df = self._fix_open_price(df)
                         period_data[f'{period}min'] = df
-                        self.save_to_db(symbol, market, {f'{period}min': df}) # Save minute data
+                        self.save_to_db(symbol, market, {f'{period}min': df}, priority=PRIORITY_NORMAL) # Save minute data
                 elif market == "CN":
                     df = self.fetch_cn_min_data(symbol, period=period)
                     if df is not None and not df.empty:
                         df = self._fix_open_price(df)
                         period_data[f'{period}min'] = df
-                        self.save_to_db(symbol, market, {f'{period}min': df}) # Save minute data
+                        self.save_to_db(symbol, market, {f'{period}min': df}, priority=PRIORITY_NORMAL) # Save minute data
                 
             # Saving to Excel is now separate from DB save, and uses period_data
             if period_data:
@@ -2986,6 +2988,7 @@ class DataFetcher:
                     self.logger.info(f"✅ Inserted new MarketSnapshot for {db_symbol} (change={change:.2f}, pct={pct_change:.2f}%)")
                 
                 session.commit()
+                snapshot_cache.put_snapshot(existing or new_snapshot)
                 return True
                 
         except Exception as e:
@@ -2997,7 +3000,7 @@ class DataFetcher:
 
 
 
-    def backfill_missing_data(self, symbol: str, market: str, days: int = None) -> dict:
+    def backfill_missing_data(self, symbol: str, market: str, days: int = None, priority: int = None) -> dict:
         """
         智能回填缺失的历史数据
         
@@ -3005,6 +3008,8 @@ class DataFetcher:
             symbol: 股票代码
             market: 市场 ('CN', 'HK', 'US')
             days: 回填天数，None表示自动检测缺失范围
+            priority: 给定时 ETL 交由 etl_queue 按该优先级处理 (全量 / 批量回填传 PRIORITY_BACKFILL)；
+                      None 时在当前线程同步处理 (调用方需要立即读到数据)
         """
         try:
             # 智能检测缺失范围
@@ -3071,37 +3076,40 @@ class DataFetcher:
             from models import RawMarketData
             from database import engine
             from sqlmodel import Session
-            import json
+            from raw_payload import pack_payload, store_raw
             
             with Session(engine) as session:
-                # 转换所有日期/时间列为字符串以支持JSON序列化
-                df_json = df.copy()
-                for col in df_json.columns:
-                    if df_json[col].dtype == 'object' or 'timestamp' in col.lower() or 'date' in col.lower():
+                # 日期/时间列转为字符串 (与旧JSON载荷的解析结果一致)
+                df_raw = df.copy()
+                for col in df_raw.columns:
+                    if df_raw[col].dtype == 'object' or 'timestamp' in col.lower() or 'date' in col.lower():
                         try:
-                            df_json[col] = df_json[col].astype(str)
+                            df_raw[col] = df_raw[col].astype(str)
                         except:
                             pass
                 
-                payload = df_json.to_dict('records')
                 raw = RawMarketData(
                     source='backfill',
                     symbol=symbol,
                     market=market,
                     period='1d',
-                    payload=json.dumps(payload),
-                    processed=0
+                    processed=0,
+                    **pack_payload(df_raw)
                 )
-                session.add(raw)
-                session.commit()
-                session.refresh(raw)
+                raw = store_raw(session, raw)
                 raw_id = raw.id
             
             # 4. 触发ETL处理
-            from etl_service import ETLService
-            ETLService.process_raw_data(raw_id)
-            
-            self.logger.info(f"✅ 回填完成: {symbol}")
+            if priority is None:
+                from etl_service import ETLService
+                ETLService.process_raw_data(raw_id)
+                self.logger.info(f"✅ 回填完成: {symbol}")
+            else:
+                # 排在用户触发的 ETL 之后，由队列 worker 写库
+                from etl_queue import etl_queue
+                etl_queue.enqueue(raw_id, priority=priority, symbol=symbol)
+                self.logger.info(f"✅ 回填数据已入队: {symbol} (raw_id={raw_id})")
+
             return {
                 'success': True,
                 'symbol': symbol,
@@ -21,6 +21,12 @@ engine = create_engine(
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # 旧库补齐 RawMarketData 的列式载荷字段
+    from raw_payload import ensure_raw_columns
+    ensure_raw_columns(engine)
+    # 旧库补齐 AssetAnalysisHistory 的摘要列
+    from watchlist_cache import ensure_analysis_columns
+    ensure_analysis_columns(engine)
 
 def get_session():
     with Session(engine) as session:
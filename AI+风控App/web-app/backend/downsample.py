@@ -0,0 +1,73 @@
+"""
+Series Downsampling (图表序列降采样)
+===================================
+
+功能说明:
+长周期图表 (如 20 年 ≈ 5,000 根日线) 只需要几百个点。这里提供两种服务端降采样，
+均只返回下标 / 聚合数组，调用方只为保留下来的点构造响应行。
+
+1. **LTTB (Largest-Triangle-Three-Buckets)**: 折线图用。
+   - 首尾点保留；中间均分为 n-2 个桶，每桶选出与 "上一选中点 + 下一桶均值" 构成三角形面积最大的点
+   - 返回原始 bar 的下标，被选中的点数值完全保真，能保留尖峰 / 深谷形态
+2. **OHLC 聚合**: K 线图用。
+   - 按 bar 数均分为 n 个连续桶：Open = 首根开盘，High = 桶内最高，Low = 桶内最低，
+     Close = 末根收盘，Volume = 桶内合计
+   - 桶的日期与指标取桶内最后一根 bar
+
+作者: Antigravity
+日期: 2026-01-23
+"""
+
+import numpy as np
+
+
+def lttb_indices(y, n_out: int, x=None) -> np.ndarray:
+    """LTTB 选点，返回升序下标 (长度 min(n_out, len(y)))；x 缺省为等距序号"""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:max(n_out, 1)]
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    # 中间 n-2 个点均分为 n_out-2 个桶
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 下一桶均值 (最后一桶用末点)
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            cx, cy = x[nlo:nhi].mean(), np.nanmean(y[nlo:nhi])
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        out[i + 1] = a
+    return out
+
+
+def ohlc_buckets(open_, high, low, close, volume, n_out: int):
+    """
+    连续等长桶聚合 (NaN 忽略)
+    Returns: (last_idx, open, high, low, close, volume) — last_idx 为每桶最后一根 bar 的下标
+    """
+    n = len(close)
+    n_out = max(1, min(n_out, n))
+    starts = np.linspace(0, n, n_out + 1).astype(int)[:-1]
+    last_idx = np.append(starts[1:], n) - 1
+
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    volume = np.nan_to_num(np.asarray(volume, dtype=float))
+    return (
+        last_idx,
+        np.asarray(open_, dtype=float)[starts],
+        np.fmax.reduceat(high, starts),
+        np.fmin.reduceat(low, starts),
+        np.asarray(close, dtype=float)[last_idx],
+        np.add.reduceat(volume, starts),
+    )
@@ -2,7 +2,7 @@
 VERA Asynchronous ETL Task Queue (异步任务队列)
 ==============================================================================
 
-本模块实现了一个轻量级的 ETL 任务分发系统，旨在使用单机线程池解决长耗时数据处理问题。
+本模块实现了一个轻量级的 ETL 任务调度器，使用单机线程池处理长耗时数据加工。
 它采用“生产者-消费者”模型，确保前端 API 能够立即向用户返回响应。
 
 核心逻辑:
@@ -13,34 +13,76 @@ I. 异步解耦 (Async Decoupling)
 - **低延迟响应**: 将耗时约 150 秒的全量历史 ETL 任务推入后台。
 - **性能红利**: API 响应时间从“分钟级”优化至“毫秒级”，显著提升用户体验。
 
-II. 线程安全与单例 (Concurrency & Singleton)
+II. 优先级调度 (Priority Scheduling)
 ----------------------------------------
-- **Singleton Pattern**: 确保整个应用生命周期内只有一个任务调度器，避免资源冲突。
-- **SQLite Optimization**: 针对 SQLite 的并发限制，通过单线程 Worker 顺序执行写密集型 ETL 任务，规避 `Database is locked` 错误。
+- **Priority Heap (按 symbol)**: 堆中每个元素是一个有待处理任务的空闲 symbol，数值越小越先执行。
+  `PRIORITY_INTERACTIVE` (用户操作，如添加自选) 的 symbol 总是先于 `PRIORITY_BACKFILL` (历史回填 / 重启恢复)；
+  同优先级按入队顺序 (FIFO)。
+- **Per-Symbol FIFO**: 每个 symbol 的任务存于各自的 deque，严格按入队顺序执行；
+  symbol 的调度优先级取其排队任务中的最高优先级 (交互任务会把同 symbol 之前的回填一并提前，而不会插队)。
+- **Back-pressure**: 非交互任务超过 `maxsize` 时 `enqueue()` 阻塞等待，而不是丢弃；
+  交互任务不受容量限制，不会排在回填之后被阻塞。
+- **去重**: 同一 raw_id 已在队列中 / 执行中时不重复入队。
 
-III. 任务管理 (Task Management)
+III. 并发与单例 (Concurrency & Singleton)
 ----------------------------------------
-- **Daemon Thread**: 工作线程配置为守护线程，随主应用启动与退出。
-- **Fault Tolerance**: 单个 ETL 任务的崩溃（异常捕获）不会导致整个工作线程退出。
+- **Singleton Pattern**: 整个应用生命周期内只有一个任务调度器。
+- **Workers + Per-Symbol Serialization**: `ETL_WORKERS` 个工作线程 (默认 1)，同一 symbol 同一时刻
+  只有一个任务在执行 (执行中的 symbol 不在堆中，完成后若还有任务再放回堆)，
+  保证同一标的的 prev_close / change 计算顺序正确，也避免同一行的写冲突。
+- **SQLite 单写者**: 库同一时刻只允许一个写事务，多个 worker 的写入仍然串行，还会在锁上等待
+  (busy timeout)。因此默认单 worker；只有解析 / 指标计算占主要耗时且已开启 WAL 时，
+  才值得用环境变量 `ETL_WORKERS` 调大。
+- **Fault Tolerance**: 单个 ETL 任务的崩溃（异常捕获）不会导致工作线程退出。
+
+IV. 持久化 (Persistence)
+----------------------------------------
+- 待处理状态即 `RawMarketData.processed == False` (失败的任务带 error_log，不自动重试)。
+- `start()` 时由恢复线程把未处理的 raw 以 `PRIORITY_BACKFILL` 重新入队 (受 back-pressure 约束)，
+  进程重启不会丢任务。
+
+V. 指标 (Metrics)
+----------------------------------------
+- `get_metrics()`: 队列深度 (按优先级)、执行中数量、累计完成/失败、排队等待与处理耗时 (avg/p50/p95/max)。
 
 作者: Antigravity
 日期: 2026-01-23
 """
-import threading
-import queue
+import heapq
+import itertools
 import logging
-from typing import Optional
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
 from etl_service import ETLService
 
 logger = logging.getLogger(__name__)
 
+PRIORITY_INTERACTIVE = 0     # 用户触发 (添加自选、手动刷新)
+PRIORITY_NORMAL = 5          # 定时同步
+PRIORITY_BACKFILL = 10       # 历史回填 / 重启恢复
+
+ETL_WORKERS = int(os.environ.get("ETL_WORKERS", "1"))   # SQLite 单写者，见模块说明 III
+ETL_MAX_PENDING = 1000       # 非交互任务的排队上限 (超出时 enqueue 阻塞)
+_LATENCY_WINDOW = 500        # 延迟统计保留最近 N 个任务
+
+
+def _percentile(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
 
 class ETLQueue:
-    """ETL任务队列（单例模式）"""
-    
+    """ETL任务调度器（单例模式）"""
+
     _instance: Optional['ETLQueue'] = None
     _lock = threading.Lock()
-    
+
     def __new__(cls):
         if cls._instance is None:
             with cls._lock:
@@ -48,86 +90,267 @@ class ETLQueue:
                     cls._instance = super().__new__(cls)
                     cls._instance._initialized = False
         return cls._instance
-    
+
     def __init__(self):
         if self._initialized:
             return
-            
-        self.task_queue = queue.Queue(maxsize=1000)
+
+        self.maxsize = ETL_MAX_PENDING
+        self.num_workers = ETL_WORKERS
+        self._cond = threading.Condition()
+        self._heap: List[tuple] = []                          # (priority, seq, symbol)：可调度的空闲 symbol
+        self._scheduled: Dict[str, tuple] = {}                # symbol -> 当前有效的堆键 (priority, seq)
+        self._pending: Dict[str, deque] = {}                  # symbol -> 任务 (priority, seq, raw_id, symbol, enqueued_at)，入队顺序
+        self._seq = itertools.count()
+        self._queued_ids = set()                              # 排队中的 raw_id
+        self._running_ids = set()
+        self._active_symbols = set()
+        self._background_pending = 0                          # 非交互任务数 (容量计数)
+
+        self._stats = {"enqueued": 0, "processed": 0, "failed": 0, "duplicates": 0, "recovered": 0}
+        self._wait_ms = deque(maxlen=_LATENCY_WINDOW)
+        self._run_ms = deque(maxlen=_LATENCY_WINDOW)
+
         self.running = False
-        self.worker_thread: Optional[threading.Thread] = None
+        self.workers: List[threading.Thread] = []
+        self.recovery_thread: Optional[threading.Thread] = None
         self._initialized = True
-        
+
         logger.info("✅ ETLQueue initialized")
-    
-    def start(self):
-        """启动工作线程"""
+
+    def start(self, num_workers: Optional[int] = None, recover: bool = True):
+        """启动工作线程；recover=True 时后台恢复未处理的 RawMarketData"""
         if self.running:
             logger.warning("⚠️ ETLQueue already running")
             return
-        
+
         self.running = True
-        self.worker_thread = threading.Thread(
-            target=self._worker,
-            daemon=True,
-            name="ETLQueueWorker"
-        )
-        self.worker_thread.start()
-        logger.info("🚀 ETLQueue worker started")
-    
+        self.num_workers = num_workers or self.num_workers
+        self.workers = [
+            threading.Thread(target=self._worker, daemon=True, name=f"ETLQueueWorker-{i}")
+            for i in range(self.num_workers)
+        ]
+        for t in self.workers:
+            t.start()
+        logger.info(f"🚀 ETLQueue started with {self.num_workers} workers")
+
+        if recover:
+            self.recovery_thread = threading.Thread(
+                target=self.recover_pending, daemon=True, name="ETLQueueRecovery"
+            )
+            self.recovery_thread.start()
+
     def stop(self):
-        """停止工作线程"""
-        self.running = False
-        if self.worker_thread:
-            self.worker_thread.join(timeout=5)
-        logger.info("🛑 ETLQueue worker stopped")
-    
-    def enqueue(self, raw_id: int, priority: int = 0):
+        """停止工作线程 (未执行的任务仍为 processed=False，下次启动时恢复)"""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        for t in self.workers:
+            t.join(timeout=5)
+        self.workers = []
+        logger.info("🛑 ETLQueue workers stopped")
+
+    def enqueue(self, raw_id: int, priority: int = PRIORITY_INTERACTIVE, symbol: Optional[str] = None,
+                block: bool = True, timeout: Optional[float] = None) -> bool:
         """
         添加ETL任务到队列
-        
+
         Args:
             raw_id: RawMarketData记录ID
-            priority: 优先级（暂未使用）
+            priority: 优先级，数值越小越先执行 (PRIORITY_INTERACTIVE / PRIORITY_NORMAL / PRIORITY_BACKFILL)
+            symbol: 标的代码 (用于同 symbol 串行)；缺省时从 RawMarketData 读取
+            block/timeout: 非交互任务在队列已满时是否等待 / 最长等待秒数
+
+        Returns:
+            是否入队 (重复任务 / 等待超时返回 False；超时的任务仍是 processed=False，可稍后恢复)
         """
-        try:
-            self.task_queue.put((raw_id, priority), block=False)
-            queue_size = self.task_queue.qsize()
-            logger.info(f"📥 ETL任务入队: raw_id={raw_id}, queue_size={queue_size}")
-        except queue.Full:
-            logger.error(f"❌ ETL队列已满，丢弃任务: raw_id={raw_id}")
-    
+        if symbol is None:
+            symbol = self._lookup_symbol(raw_id)
+        symbol = self._symbol_key(symbol)
+        interactive = priority <= PRIORITY_INTERACTIVE
+
+        with self._cond:
+            if raw_id in self._queued_ids or raw_id in self._running_ids:
+                self._stats["duplicates"] += 1
+                return False
+            if not interactive:
+                # Back-pressure：等待 worker 腾出容量
+                if not self._cond.wait_for(
+                    lambda: self._background_pending < self.maxsize or not self.running,
+                    timeout=timeout if block else 0
+                ):
+                    logger.warning(f"⏳ ETL队列已满，raw_id={raw_id} 暂未入队 (保持 processed=False)")
+                    return False
+                self._background_pending += 1
+            self._pending.setdefault(symbol, deque()).append(
+                (priority, next(self._seq), raw_id, symbol, time.monotonic())
+            )
+            if symbol not in self._active_symbols:
+                self._schedule(symbol)
+            self._queued_ids.add(raw_id)
+            self._stats["enqueued"] += 1
+            self._cond.notify()
+            depth = len(self._queued_ids)
+
+        logger.info(f"📥 ETL任务入队: raw_id={raw_id}, symbol={symbol}, priority={priority}, depth={depth}")
+        return True
+
+    def recover_pending(self, batch_size: int = 500) -> int:
+        """把 processed=False 且无 error_log 的 RawMarketData 以回填优先级重新入队"""
+        from sqlmodel import Session, select
+        from database import engine
+        from models import RawMarketData
+
+        recovered, last_id = 0, 0
+        while self.running:
+            with Session(engine) as session:
+                rows = session.exec(
+                    select(RawMarketData.id, RawMarketData.symbol)
+                    .where(RawMarketData.processed == False)  # noqa: E712
+                    .where(RawMarketData.error_log == None)  # noqa: E711
+                    .where(RawMarketData.id > last_id)
+                    .order_by(RawMarketData.id)
+                    .limit(batch_size)
+                ).all()
+            if not rows:
+                break
+            for raw_id, symbol in rows:
+                if self.enqueue(raw_id, priority=PRIORITY_BACKFILL, symbol=symbol):
+                    recovered += 1
+            last_id = rows[-1][0]
+
+        with self._cond:
+            self._stats["recovered"] += recovered
+        if recovered:
+            logger.info(f"♻️ ETL恢复未处理任务: {recovered} 条")
+        return recovered
+
+    def _schedule(self, symbol: str):
+        """
+        把空闲 symbol 放入堆 (调用方持有 _cond)：键 = (排队任务中的最高优先级, 队首任务序号)
+        键变化时 (新入队了更高优先级的任务) 压入新元素，旧元素出堆时按 _scheduled 识别为过期并跳过
+        """
+        tasks = self._pending[symbol]
+        key = (min(t[0] for t in tasks), tasks[0][1])
+        if self._scheduled.get(symbol) != key:
+            self._scheduled[symbol] = key
+            heapq.heappush(self._heap, (*key, symbol))
+
+    def _next_task(self) -> Optional[tuple]:
+        """取出优先级最高的空闲 symbol 的队首任务 (调用方持有 _cond)"""
+        while self._heap:
+            priority, seq, symbol = heapq.heappop(self._heap)
+            if self._scheduled.get(symbol) != (priority, seq):
+                continue
+            del self._scheduled[symbol]
+            tasks = self._pending[symbol]
+            task = tasks.popleft()
+            if not tasks:
+                del self._pending[symbol]
+            return task
+        return None
+
     def _worker(self):
         """工作线程：持续处理队列中的任务"""
-        logger.info("🔄 ETL工作线程启动")
-        
-        while self.running:
+        logger.info(f"🔄 ETL工作线程启动: {threading.current_thread().name}")
+
+        while True:
+            with self._cond:
+                task = None
+                while self.running:
+                    task = self._next_task()
+                    if task is not None:
+                        break
+                    self._cond.wait(timeout=1)
+                if task is None:
+                    break
+                priority, _, raw_id, symbol, enqueued_at = task
+                self._queued_ids.discard(raw_id)
+                self._running_ids.add(raw_id)
+                self._active_symbols.add(symbol)
+                started = time.monotonic()
+                self._wait_ms.append((started - enqueued_at) * 1000)
+
+            logger.info(f"🔧 开始处理ETL任务: raw_id={raw_id}, symbol={symbol}")
+            ok = True
             try:
-                # 阻塞等待任务（超时1秒检查running状态）
-                raw_id, priority = self.task_queue.get(timeout=1)
-                
-                logger.info(f"🔧 开始处理ETL任务: raw_id={raw_id}")
-                
-                # 执行ETL处理
-                try:
-                    ETLService.process_raw_data(raw_id)
-                    logger.info(f"✅ ETL任务完成: raw_id={raw_id}")
-                except Exception as e:
-                    logger.error(f"❌ ETL任务失败: raw_id={raw_id}, error={e}")
-                
-                self.task_queue.task_done()
-                
-            except queue.Empty:
-                # 队列为空，继续等待
-                continue
+                ETLService.process_raw_data(raw_id)
+                logger.info(f"✅ ETL任务完成: raw_id={raw_id}")
             except Exception as e:
-                logger.error(f"❌ ETL工作线程异常: {e}")
-        
-        logger.info("🛑 ETL工作线程停止")
-    
+                ok = False
+                logger.error(f"❌ ETL任务失败: raw_id={raw_id}, error={e}")
+
+            with self._cond:
+                self._run_ms.append((time.monotonic() - started) * 1000)
+                self._stats["processed" if ok else "failed"] += 1
+                self._running_ids.discard(raw_id)
+                self._active_symbols.discard(symbol)
+                if priority > PRIORITY_INTERACTIVE:
+                    self._background_pending -= 1
+                # 该 symbol 还有排队任务时重新参与调度 (仍按入队顺序执行)
+                if symbol in self._pending:
+                    self._schedule(symbol)
+                self._cond.notify_all()
+
+        logger.info(f"🛑 ETL工作线程停止: {threading.current_thread().name}")
+
+    @staticmethod
+    def _symbol_key(symbol: Optional[str]) -> str:
+        if not symbol:
+            return ""
+        from symbols_config import get_canonical_symbol
+        return get_canonical_symbol(symbol)
+
+    @staticmethod
+    def _lookup_symbol(raw_id: int) -> Optional[str]:
+        from sqlmodel import Session
+        from database import engine
+        from models import RawMarketData
+
+        with Session(engine) as session:
+            raw = session.get(RawMarketData, raw_id)
+            return raw.symbol if raw else None
+
     def get_queue_size(self) -> int:
-        """获取当前队列大小"""
-        return self.task_queue.qsize()
+        """获取当前排队任务数 (不含执行中)"""
+        with self._cond:
+            return len(self._queued_ids)
+
+    def get_metrics(self) -> dict:
+        """队列深度与延迟指标 (毫秒)"""
+        with self._cond:
+            by_priority: Dict[int, int] = defaultdict(int)
+            for tasks in self._pending.values():
+                for task in tasks:
+                    by_priority[task[0]] += 1
+            now = time.monotonic()
+            oldest = min((tasks[0][4] for tasks in self._pending.values()), default=None)
+            wait_ms, run_ms = list(self._wait_ms), list(self._run_ms)
+            return {
+                "running": self.running,
+                "workers": len(self.workers),
+                "depth": len(self._queued_ids),
+                "depth_by_priority": dict(sorted(by_priority.items())),
+                "in_flight": len(self._running_ids),
+                "background_capacity": self.maxsize,
+                "background_pending": self._background_pending,
+                "oldest_wait_ms": round((now - oldest) * 1000, 1) if oldest is not None else None,
+                **self._stats,
+                "wait_ms": self._latency_summary(wait_ms),
+                "run_ms": self._latency_summary(run_ms),
+            }
+
+    @staticmethod
+    def _latency_summary(values) -> dict:
+        if not values:
+            return {"count": 0, "avg": None, "p50": None, "p95": None, "max": None}
+        return {
+            "count": len(values),
+            "avg": round(sum(values) / len(values), 1),
+            "p50": round(_percentile(values, 50), 1),
+            "p95": round(_percentile(values, 95), 1),
+            "max": round(max(values), 1),
+        }
 
 
 # 全局单例
@@ -13,7 +13,11 @@ ETL Service (数据清洗与入库服务)
 2. **价格指标计算**:
    - 涨跌额 (Change): `Price - Previous_Close`
    - 涨跌幅 (Pct Change): `(Change / Previous_Close) * 100`
-   - 说明: `Previous_Close` 优先选用数据源提供的字段，若缺失则从数据库查询上一交易日记录。
+   - 说明: `Previous_Close` 优先选用数据源提供的字段，若缺失则取上一交易日记录
+     (库中已有记录与本批记录合并后的上一条；整批只查一次库)。
+4. **日线写入**: 整批列运算后以 `INSERT ... ON CONFLICT(symbol, market, timestamp) DO UPDATE` 一次写入，
+   随后从本批最早的 bar 起增量更新 MarketIndicatorDaily (indicator_store.py)。
+   早期库缺唯一索引时先按键去重再补建；补建失败则本次退回 UPDATE + INSERT。
 3. **快照更新策略**:
    - 盘中时段: 更新 `MarketSnapshot` 的最新价 and 实时涨跌幅，不写入 `MarketDataDaily`。
    - 盘后时段: 待 ETL 完成后，用 `MarketDataDaily` 的标准收盘数据刷新 `MarketSnapshot`。
@@ -22,18 +26,56 @@ ETL Service (数据清洗与入库服务)
 日期: 2026-01-23
 """
 
-import json
 import pandas as pd
 import logging
 from datetime import datetime, time
+from sqlalchemy import text
 from sqlmodel import Session, select, delete
 from database import engine
 from models import RawMarketData, MarketDataDaily, MarketSnapshot
 from market_status import is_market_open
 from symbols_config import get_canonical_symbol  # ✅ 导入符号规范化
+from raw_payload import decode_payload
+from indicator_store import refresh_indicators
+from watchlist_cache import snapshot_cache
 
 logger = logging.getLogger("ETLService")
 
+# 日线无时间 (00:00:00) 时归一化到的收盘小时
+DAILY_CLOSE_HOURS = {'US': 16, 'HK': 16, 'CN': 15}
+
+DAILY_TABLE = MarketDataDaily.__tablename__
+
+# 已有记录只刷新收盘相关字段，open/high/low 保持首次写入的值
+DAILY_UPSERT_SQL = f"""
+    INSERT INTO {DAILY_TABLE}
+        (symbol, market, timestamp, open, high, low, close, volume, change, pct_change, prev_close, updated_at)
+    VALUES
+        (:symbol, :market, :timestamp, :open, :high, :low, :close, :volume, :change, :pct_change, :prev_close, :updated_at)
+    ON CONFLICT(symbol, market, timestamp) DO UPDATE SET
+        close = excluded.close,
+        volume = COALESCE(excluded.volume, {DAILY_TABLE}.volume),
+        change = excluded.change,
+        pct_change = excluded.pct_change,
+        prev_close = excluded.prev_close,
+        updated_at = excluded.updated_at
+"""
+
+# 唯一索引不可用时的退路：已有记录 UPDATE (列同上)，其余 INSERT
+DAILY_UPDATE_SQL = f"""
+    UPDATE {DAILY_TABLE} SET
+        close = :close,
+        volume = COALESCE(:volume, volume),
+        change = :change,
+        pct_change = :pct_change,
+        prev_close = :prev_close,
+        updated_at = :updated_at
+    WHERE symbol = :symbol AND market = :market AND timestamp = :timestamp
+"""
+DAILY_INSERT_SQL = DAILY_UPSERT_SQL.split("ON CONFLICT")[0]
+
+_daily_index_checked = False
+
 class ETLService:
     
     @staticmethod
@@ -60,24 +102,17 @@ class ETLService:
                 raw_record.symbol = canonical_symbol
 
             try:
-                payload_data = json.loads(raw_record.payload)
-                
-                # Handle wrapped payload (e.g. {'symbol':..., 'data': [...]})
-                if isinstance(payload_data, dict) and 'data' in payload_data:
-                    data_list = payload_data['data']
-                elif isinstance(payload_data, list):
-                    data_list = payload_data
-                else:
+                # 列式载荷直接解码为 DataFrame (旧 JSON 载荷兼容)
+                df = decode_payload(raw_record)
+                if df is None:
                     logger.error(f"Unknown payload format for {raw_id}")
                     return
 
-                if not data_list:
+                if df.empty:
                     raw_record.processed = True
                     session.add(raw_record)
                     session.commit()
                     return
-
-                df = pd.DataFrame(data_list)
                 
                 # 2. Transform & Load - 基于数据类型和市场状态判断
                 market_is_open = is_market_open(raw_record.market)
@@ -106,224 +141,211 @@ class ETLService:
                 session.commit()
 
     @staticmethod
-    def _process_daily(session: Session, df: pd.DataFrame, meta: RawMarketData):
+    def _prepare_daily_frame(df: pd.DataFrame, market: str, market_now: datetime,
+                             market_open: bool, market_close_time: time) -> pd.DataFrame:
         """
-        Clean Daily Data:
-        1. Time Normalization: 00:00:00 -> Market Close Time
-        2. Bad Data Filter: Reject 15:59 intraday snapshots
-        3. US Market Open Filter: Remove today's data (real-time price with wrong timestamp)
-        4. Indicator Calc: Fill missing Change
+        日线清洗 (纯列运算，无数据库访问):
+        1. Time Normalization: 00:00:00 -> Market Close Time (US/HK 16:00, CN 15:00)
+        2. Close Guard: 市场当日未收盘 (盘中 / 午休 / 盘前) 时丢弃当日行，WORLD 不受限
+        3. 同一 timestamp 多行时保留最后一行 (与逐行 upsert 后写覆盖一致)
+        Returns: 按 timestamp 升序，含 db_ts / close / open / high / low / volume / change / pct_change / prev_close 列
         """
-        # ✅ 统一使用timestamp作为时间字段
-        # Field normalizer将"日期"映射为"timestamp"，ETL内部也统一使用timestamp
-        # 只在保存到DB时才映射为'date'（兼容现有schema）
-        
-        # 兼容旧数据：如果只有date没有timestamp，复制过来
+        # ✅ 统一使用timestamp作为时间字段；兼容旧数据：只有date没有timestamp时复制过来
         if 'date' in df.columns and 'timestamp' not in df.columns:
-            df['timestamp'] = df['date']
-        
-        # Ensure timestamp type - 支持字符串和毫秒timestamp
-        if 'timestamp' in df.columns:
-            # 智能判断：字符串用默认解析，数值用unit='ms'
-            if df['timestamp'].dtype == 'object':  # 字符串格式 (CN/HK)
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-            else:  # 数值格式 (US毫秒timestamp)
-                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        else:
+            df = df.assign(timestamp=df['date'])
+        if 'timestamp' not in df.columns:
             raise KeyError("'timestamp' column not found in DataFrame")
-        
-        # 删除US开盘过滤（冗余逻辑）
-        # ETL不应判断市场状态，应由调用方决定
-        
-        # Sort for calculation
-        df = df.sort_values('timestamp')
-        
-        # Pre-fetch last close from DB for continuity
-        # ✅ 修复：查询小于当前批次最小日期的记录，避免查到当天已保存的记录
-        last_close = None
-        if not df.empty:
-            # 获取当前批次的最小日期
-            min_timestamp_in_batch = df['timestamp'].min()
-            if pd.notna(min_timestamp_in_batch):
-                min_date_str = min_timestamp_in_batch.strftime('%Y-%m-%d %H:%M:%S')
-                
-                stmt = select(MarketDataDaily).where(
-                    MarketDataDaily.symbol == meta.symbol,
-                    MarketDataDaily.market == meta.market,
-                    MarketDataDaily.timestamp < min_date_str
-                ).order_by(MarketDataDaily.timestamp.desc()).limit(1)
-                
-                prev_rec = session.exec(stmt).first()
-                if prev_rec:
-                    last_close = prev_rec.close
-                    logger.info(f"✅ Pre-fetched last_close={last_close} for {meta.symbol} (before {min_date_str})")
 
+        # 智能判断：字符串用默认解析 (CN/HK)，数值用unit='ms' (US毫秒timestamp)，列式载荷已是datetime
+        if pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+            ts = df['timestamp']
+        elif df['timestamp'].dtype == 'object':
+            ts = pd.to_datetime(df['timestamp'])
+        else:
+            ts = pd.to_datetime(df['timestamp'], unit='ms')
+        df = df.assign(timestamp=ts).sort_values('timestamp', kind='stable')
+
+        # --- 🛡️ GUARD: 当日未收盘 (开市中，或未到收盘时间) 不写入日线 ---
+        if market != 'WORLD' and (market_open or market_now.time() < market_close_time):
+            unfinished = df['timestamp'].dt.date == market_now.date()
+            if unfinished.any():
+                logger.info(f"⏭️ Skipping Daily storage for {int(unfinished.sum())} row(s) on {market_now.date()} (Market OPEN or PRE-CLOSE)")
+                df = df[~unfinished]
+
+        # --- TRANSFORM: Time Normalization (00:00:00 -> 收盘时间) ---
+        ts = df['timestamp']
+        close_hour = DAILY_CLOSE_HOURS.get(market)
+        if close_hour is not None:
+            day = ts.dt.normalize()
+            no_time = ts.dt.floor('s') == day
+            ts = ts.where(~no_time, day + pd.Timedelta(hours=close_hour))
 
-        record_count = 0  # ✅ 批量提交计数器
-        
-        # 🧪 获取市场当前日期用于过滤盘中未定型数据
+        def num(col):
+            if col in df.columns:
+                return pd.to_numeric(df[col], errors='coerce')
+            return pd.Series(float('nan'), index=df.index)
+
+        out = pd.DataFrame({
+            'db_ts': ts.dt.strftime('%Y-%m-%d %H:%M:%S'),
+            'close': num('close'),
+            # ✅ Trusts/Mutual Funds 只有收盘价 (Open/High/Low 为空) 时用收盘价补齐
+            'open': num('open'),
+            'high': num('high'),
+            'low': num('low'),
+            'volume': num('volume'),
+            'change': num('change'),
+            'pct_change': num('pct_change'),
+            'prev_close': num('prev_close'),
+        }, index=df.index)
+        for col in ('open', 'high', 'low'):
+            out[col] = out[col].fillna(out['close'])
+
+        bad = out['close'].isna()
+        if bad.any():
+            logger.warning(f"Dropping {int(bad.sum())} daily row(s) without close")
+            out = out[~bad]
+        return out.drop_duplicates('db_ts', keep='last').reset_index(drop=True)
+
+    @staticmethod
+    def _fill_daily_changes(out: pd.DataFrame, existing: pd.DataFrame) -> pd.DataFrame:
+        """
+        补全 prev_close / change / pct_change (列运算)
+        - prev_close 优先使用数据源字段；缺失时取 "库中已有记录 + 本批记录" 合并序列中的上一条收盘价
+          (本批覆盖库中同 timestamp 的记录，等价于逐行查询 timestamp < 当前行 的最新记录)
+        - change / pct_change 任一缺失且 prev_close 非 0 时重算；数据源显式给 0 时不重算
+        existing: 库中已有记录 (db_ts, close)
+        """
+        if out.empty:
+            return out
+        merged = pd.concat([
+            existing[~existing['db_ts'].isin(out['db_ts'])].assign(_batch=False),
+            out[['db_ts', 'close']].assign(_batch=True),
+        ], ignore_index=True).sort_values('db_ts', kind='stable')
+        merged['_prev'] = merged['close'].shift()
+        prev_from_db = merged.loc[merged['_batch'], ['db_ts', '_prev']].set_index('db_ts')['_prev']
+
+        out = out.copy()
+        out['prev_close'] = out['prev_close'].fillna(out['db_ts'].map(prev_from_db))
+
+        prev = out['prev_close']
+        recalc = (out['change'].isna() | out['pct_change'].isna()) & prev.notna() & (prev != 0)
+        change = out['close'] - prev
+        out.loc[recalc, 'change'] = change[recalc]
+        out.loc[recalc, 'pct_change'] = (change / prev * 100)[recalc]
+        return out
+
+    @staticmethod
+    def _process_daily(session: Session, df: pd.DataFrame, meta: RawMarketData):
+        """
+        Clean Daily Data (向量化):
+        1. _prepare_daily_frame: 时间归一化 / 当日未收盘过滤 / 数值列
+        2. 一次查询取出该 symbol 在本批范围内的已有记录 (及范围前最近一条)，用于 prev_close 与插入/更新统计
+        3. _fill_daily_changes: 补全 change / pct_change
+        4. INSERT ... ON CONFLICT(symbol, market, timestamp) DO UPDATE 一次 executemany 写入
+           已有记录只更新 close / volume / change / pct_change / prev_close (不覆盖 open/high/low)
+        """
         from market_status import get_market_time, is_market_open, get_market_close_time
-        market_now = get_market_time(meta.market)
-        market_today = market_now.date()
-        market_open = is_market_open(meta.market)
-        
-        market_close_time = get_market_close_time(meta.market)
-        
-        # --- ITERATE: Process Each Row ---
-        # last_close is already initialized above, no need to reset here
-        for _, row in df.iterrows():
-            orig_time = row['timestamp']
-            
-            # --- 🛡️ GUARD: Only skip "Today" if the market is NOT FINISHED ---
-            # Define "Finished": current_time >= close_time OR market is forcibly closed and passed date
-            # We are conservative: If date is TODAY, and current_time < close_time, SKIP.
-            # Even if market is technically "closed" for lunch, we shouldn't finalize daily data yet.
-            if orig_time.date() == market_today and meta.market != 'WORLD':
-                current_time = market_now.time()
-                is_unfinished_day = False
-                
-                # Check 1: Is market currently open?
-                if market_open:
-                    is_unfinished_day = True
-                
-                # Check 2: Is it before closing time? (e.g. Lunch break or Pre-market)
-                elif current_time < market_close_time:
-                    is_unfinished_day = True
-                
-                if is_unfinished_day:
-                    logger.info(f"⏭️ Skipping Daily storage for {meta.symbol} on {orig_time.date()} (Market OPEN or PRE-CLOSE)")
-                    continue
-            
-            h, m, s = orig_time.hour, orig_time.minute, orig_time.second
-                
-            # --- TRANSFORM: Time Normalization ---
-            # Rule: 00:00:00 -> Market Close Time
-            # For daily data from sources like AkShare/yfinance, they often return 00:00:00
-            # We need to normalize it to market close time
-            target_time = orig_time
-            has_time = (h != 0 or m != 0 or s != 0)
-            
-            # Normalize if time is 00:00:00 (daily data)
-            if not has_time:
-                if meta.market == 'US':
-                    # Set to 16:00 US Eastern
-                    target_time = orig_time.replace(hour=16, minute=0, second=0)
-                elif meta.market == 'HK':
-                    # Set to 16:00 HK Time
-                    target_time = orig_time.replace(hour=16, minute=0, second=0)
-                elif meta.market == 'CN':
-                    # Set to 15:00 Beijing Time
-                    target_time = orig_time.replace(hour=15, minute=0, second=0)
-            
-            # --- CALC: Indicators ---
-            close_p = float(row['close'])
-            change_p = row.get('change')
-            pct_p = row.get('pct_change')
-            prev_close_from_row = row.get('prev_close')
-            
-            # ✅ 混合方案：如果数据源没有提供prev_close，从数据库查询
-            if prev_close_from_row is None and close_p is not None:
-                try:
-                    # 准备日期字符串用于查询
-                    target_time = orig_time
-                    has_time = (orig_time.hour != 0 or orig_time.minute != 0 or orig_time.second != 0)
-                    if not has_time:
-                        if meta.market == 'US':
-                            target_time = orig_time.replace(hour=16, minute=0, second=0)
-                        elif meta.market == 'HK':
-                            target_time = orig_time.replace(hour=16, minute=0, second=0)
-                        elif meta.market == 'CN':
-                            target_time = orig_time.replace(hour=15, minute=0, second=0)
-                    
-                    current_date_str = target_time.strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    # 查询前一条记录
-                    prev_record = session.exec(
-                        select(MarketDataDaily)
-                        .where(MarketDataDaily.symbol == meta.symbol)
-                        .where(MarketDataDaily.market == meta.market)
-                        .where(MarketDataDaily.timestamp < current_date_str)
-                        .order_by(MarketDataDaily.timestamp.desc())
-                    ).first()
-                    
-                    if prev_record and prev_record.close:
-                        prev_close_from_row = prev_record.close
-                        logger.info(f"✅ 从数据库补全prev_close: {meta.symbol} {current_date_str} prev_close={prev_close_from_row}")
-                except Exception as e:
-                    logger.warning(f"查询prev_close失败: {e}")
-            
-            # Calculate if missing (None), don't recalculate if explicitly 0
-            # Use prev_close from row (original or补全from DB) or last_close from iteration
-            effective_prev_close = prev_close_from_row if prev_close_from_row is not None else last_close
-            
-            if (change_p is None or pct_p is None) and effective_prev_close:
-                 change_p = close_p - effective_prev_close
-                 pct_p = (change_p / effective_prev_close) * 100
-                 logger.info(f"ETL Calculated: change={change_p:.2f}, pct={pct_p:.2f}% (prev_close={effective_prev_close:.2f})")
-            
-            # Prepare Model
-            db_date_str = target_time.strftime('%Y-%m-%d %H:%M:%S')
-            logger.info(f"ETL Saving {meta.symbol}: target_time={target_time} -> db_date_str={db_date_str} (has_time={has_time})")
-            
-            # Check exist (Upsert logic)
-            # For simplicity in this session, we query-check. In prod, use ON CONFLICT.
-            existing = session.exec(select(MarketDataDaily).where(
-                MarketDataDaily.symbol == meta.symbol,
-                MarketDataDaily.market == meta.market,
-                MarketDataDaily.timestamp == db_date_str
-            )).first()
-            
-            if existing:
-                # Update
-                existing.close = close_p
-                existing.change = change_p
-                existing.pct_change = pct_p
-                existing.prev_close = effective_prev_close  # ✅ 修复：也要更新prev_close
-                existing.volume = row.get('volume', existing.volume)
-                session.add(existing)
-            else:
-                # Insert
-                # ✅ 修复：处理 Trusts/Mutual Funds 只有收盘价的情况 (Open/High/Low may be None/NaN)
-                def clean_val(val, fallback):
-                    if pd.isna(val) or val is None: return fallback
-                    return val
-                
-                safe_open = clean_val(row.get('open'), close_p)
-                safe_high = clean_val(row.get('high'), close_p)
-                safe_low = clean_val(row.get('low'), close_p)
 
-                # Insert
-                new_rec = MarketDataDaily(
-                    symbol=meta.symbol,
-                    market=meta.market,
-                    timestamp=db_date_str,  # ✅ 修复：使用timestamp而非date
-                    open=safe_open,
-                    high=safe_high,
-                    low=safe_low,
-                    close=close_p,
-                    volume=row.get('volume'),
-                    change=change_p,
-                    pct_change=pct_p,
-                    prev_close=effective_prev_close,
-                    updated_at=datetime.now()
-                )
-                session.add(new_rec)
-            
-            # ✅ 批量提交优化: 每100条提交一次
-            record_count += 1
-            if record_count % 100 == 0:
-                session.commit()
-                logger.info(f"💾 Batch commit: {record_count} records processed")
-            
-            # Update last_close for next iteration
-            last_close = close_p
-        
-        # ✅ 最后提交剩余记录
-        if record_count % 100 != 0:
-            session.commit()
-            logger.info(f"💾 Final commit: {record_count} total records")
-            
-        logger.info(f"Daily ETL: Parsed {len(df)} rows, Upserted {record_count} rows.")
+        out = ETLService._prepare_daily_frame(
+            df, meta.market,
+            market_now=get_market_time(meta.market),
+            market_open=is_market_open(meta.market),
+            market_close_time=get_market_close_time(meta.market),
+        )
+        if out.empty:
+            logger.info(f"Daily ETL: Parsed {len(df)} rows, nothing to upsert for {meta.symbol}")
+            return
+
+        conn = session.connection()
+        has_key = ETLService._ensure_daily_key_index(conn)
+
+        lo, hi = out['db_ts'].iloc[0], out['db_ts'].iloc[-1]
+        rows = conn.execute(text(f"""
+            SELECT timestamp, close FROM {DAILY_TABLE}
+            WHERE symbol = :symbol AND market = :market AND timestamp BETWEEN :lo AND :hi
+            UNION ALL
+            SELECT * FROM (
+                SELECT timestamp, close FROM {DAILY_TABLE}
+                WHERE symbol = :symbol AND market = :market AND timestamp < :lo
+                ORDER BY timestamp DESC LIMIT 1
+            )
+        """), {'symbol': meta.symbol, 'market': meta.market, 'lo': lo, 'hi': hi}).all()
+        existing = pd.DataFrame(rows, columns=['db_ts', 'close'])
+        existing['close'] = pd.to_numeric(existing['close'], errors='coerce')
+
+        out = ETLService._fill_daily_changes(out, existing)
+
+        now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        cols = ['db_ts', 'open', 'high', 'low', 'close', 'volume', 'change', 'pct_change', 'prev_close']
+        values = out[cols].astype(object).where(out[cols].notna(), None)
+        params = [
+            {
+                'symbol': meta.symbol, 'market': meta.market, 'timestamp': ts,
+                'open': o, 'high': h, 'low': l, 'close': c,
+                'volume': int(v) if v is not None else None,
+                'change': ch, 'pct_change': pct, 'prev_close': pc,
+                'updated_at': now_str,
+            }
+            for ts, o, h, l, c, v, ch, pct, pc in values.itertuples(index=False, name=None)
+        ]
+        if has_key:
+            conn.execute(text(DAILY_UPSERT_SQL), params)
+        else:
+            known = set(existing['db_ts'])
+            updates = [p for p in params if p['timestamp'] in known]
+            inserts = [p for p in params if p['timestamp'] not in known]
+            if updates:
+                conn.execute(text(DAILY_UPDATE_SQL), updates)
+            if inserts:
+                conn.execute(text(DAILY_INSERT_SQL), inserts)
+        session.commit()
+
+        # 从本批最早的 bar 起增量更新技术指标
+        refresh_indicators(session, meta.symbol, meta.market, since=lo)
+
+        n_update = int(out['db_ts'].isin(existing['db_ts']).sum())
+        logger.info(f"Daily ETL: Parsed {len(df)} rows, Upserted {len(params)} rows "
+                    f"({len(params) - n_update} new, {n_update} updated) for {meta.symbol}")
+
+    @staticmethod
+    def _has_daily_key_index(conn) -> bool:
+        """是否已有恰为 (symbol, market, timestamp) 的唯一索引 (含 UniqueConstraint 的自动索引)"""
+        for idx in conn.execute(text(f"PRAGMA index_list({DAILY_TABLE})")).mappings().all():
+            if not idx['unique']:
+                continue
+            cols = conn.execute(text(f"PRAGMA index_info('{idx['name']}')")).mappings().all()
+            if sorted(c['name'] for c in cols) == ['market', 'symbol', 'timestamp']:
+                return True
+        return False
+
+    @staticmethod
+    def _ensure_daily_key_index(conn) -> bool:
+        """
+        ON CONFLICT 需要 (symbol, market, timestamp) 唯一索引；
+        新库由模型的 UniqueConstraint 建出，早期建的库在这里先去重 (同键保留 id 最大即最后写入的一条) 再补建。
+        返回索引是否可用。补建成功后每个进程只检查一次；失败时不记为已检查，
+        本次由调用方走 UPDATE + INSERT，下次写入再重试
+        """
+        global _daily_index_checked
+        if _daily_index_checked:
+            return True
+        try:
+            if not ETLService._has_daily_key_index(conn):
+                removed = conn.execute(text(f"""
+                    DELETE FROM {DAILY_TABLE} WHERE id NOT IN (
+                        SELECT MAX(id) FROM {DAILY_TABLE} GROUP BY symbol, market, timestamp
+                    )
+                """)).rowcount
+                if removed:
+                    logger.warning(f"Removed {removed} duplicate rows from {DAILY_TABLE} before adding unique key")
+                conn.execute(text(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{DAILY_TABLE}_key ON {DAILY_TABLE} (symbol, market, timestamp)"
+                ))
+        except Exception as e:
+            logger.warning(f"Failed to ensure unique key on {DAILY_TABLE}, falling back to UPDATE + INSERT: {e}")
+            return False
+        _daily_index_checked = True
+        return True
 
 
     # MarketDataMinute已废弃，分钟数据处理暂时不需要
@@ -444,6 +466,7 @@ class ETLService:
                 session.add(snapshot)
             
             session.commit()
+            snapshot_cache.put_snapshot(snapshot)
             logger.info(f"✅ Snapshot updated: {meta.symbol}")
             
         except Exception as e:
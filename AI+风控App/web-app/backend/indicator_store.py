@@ -0,0 +1,224 @@
+"""
+Indicator Store (日线技术指标增量存储)
+=====================================
+
+功能说明:
+1. MACD / RSI / KDJ / 涨跌幅持久化到 MarketIndicatorDaily (与 MarketDataDaily 同键)。
+2. ETL 写入日线后调用 update_indicators()，从上一根 bar 的递推状态向前滚动，只计算新 bar。
+3. /api/market-data/{symbol} 只做一次按索引的 JOIN 读取，不再每次全历史重算。
+
+核心逻辑与公式:
+1. **MACD (12, 26, 9)**: `EMA_t = α·Close_t + (1-α)·EMA_{t-1}`，α = 2/(span+1)，首根以收盘价起算
+   - DIF = EMA12 - EMA26，DEA = EMA9(DIF)，HIST = DIF - DEA (与 pandas ewm(adjust=False) 一致)
+2. **RSI (14, Wilder)**: 前 14 个涨跌取简单平均，之后 `Avg_t = (Avg_{t-1}·13 + X_t) / 14`
+   - RSI = 100 - 100 / (1 + AvgGain / AvgLoss)；AvgLoss = 0 时为 100，无涨跌时为空
+3. **KDJ (9, 3, 3)**: RSV = (Close - LLV9) / (HHV9 - LLV9) · 100
+   - K = ⅔·K_{t-1} + ⅓·RSV，D = ⅔·D_{t-1} + ⅓·K，J = 3K - 2D；首个 RSV / K 起算
+   - 9 日区间无波动 (RSV 无定义) 时 K、D 沿用上一值
+4. **递推状态**: 每行保存 ema12 / ema26 / dea / avg_gain / avg_loss / k / d 与 bar_index；
+   新 bar 只需上一行状态与最近 8 根 bar 的高低价。
+
+一致性:
+- update_indicators(since=...) 先回退到 since 之前的最后一行再滚动 (ETL 改写了历史 bar)
+- 上一行的 bar_index / close 与日线表不一致 (更早的历史被回填、收盘价被修正) 或 version 变化时整段重算
+
+作者: Antigravity
+日期: 2026-01-23
+"""
+
+import logging
+import math
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from models import MarketDataDaily, MarketIndicatorDaily
+
+logger = logging.getLogger("IndicatorStore")
+
+INDICATOR_VERSION = 1
+
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_PERIOD = 14
+KDJ_N = 9
+KDJ_ALPHA = 1 / 3          # K/D 平滑 (pandas ewm com=2)
+
+DAILY_TABLE = MarketDataDaily.__tablename__
+INDICATOR_TABLE = MarketIndicatorDaily.__tablename__
+
+INDICATOR_COLUMNS = (
+    'symbol', 'market', 'timestamp', 'bar_index', 'close', 'pct_change',
+    'ema12', 'ema26', 'dif', 'dea', 'hist',
+    'avg_gain', 'avg_loss', 'rsi', 'k', 'd', 'j', 'version', 'updated_at',
+)
+
+_INSERT_SQL = f"""
+    INSERT OR REPLACE INTO {INDICATOR_TABLE} ({', '.join(INDICATOR_COLUMNS)})
+    VALUES ({', '.join(':' + c for c in INDICATOR_COLUMNS)})
+"""
+
+
+def _ema(prev: Optional[float], x: float, span: int) -> float:
+    if prev is None:
+        return x
+    alpha = 2 / (span + 1)
+    return alpha * x + (1 - alpha) * prev
+
+
+def compute_indicators(bars: List[tuple], state: Optional[Dict] = None, window: List[tuple] = ()) -> List[Dict]:
+    """
+    从递推状态向前计算新 bar 的指标 (纯计算，无数据库访问)
+    bars:   新 bar [(timestamp, high, low, close)]，按时间升序
+    state:  上一根 bar 的指标行 (MarketIndicatorDaily 字段 dict)；None 表示从第一根 bar 开始
+    window: 上一根 bar 及之前最多 KDJ_N-1 根 bar 的 (high, low)，升序
+    Returns: 指标行 list[dict] (不含 symbol / market / version / updated_at)
+    """
+    prev = dict(state) if state else {}
+    idx = prev.get('bar_index', -1)
+    hl = deque(window, maxlen=KDJ_N)
+    rows = []
+
+    for ts, high, low, close in bars:
+        idx += 1
+        prev_close = prev.get('close')
+        pct_change = (close / prev_close - 1) * 100 if prev_close else None
+
+        # MACD
+        ema12 = _ema(prev.get('ema12'), close, MACD_FAST)
+        ema26 = _ema(prev.get('ema26'), close, MACD_SLOW)
+        dif = ema12 - ema26
+        dea = _ema(prev.get('dea'), dif, MACD_SIGNAL)
+
+        # RSI (Wilder)：第 n 个涨跌 (n = idx)，n <= 14 为累计平均
+        avg_gain = avg_loss = rsi = None
+        if prev_close is not None:
+            delta = close - prev_close
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            n = min(idx, RSI_PERIOD)
+            avg_gain = ((prev.get('avg_gain') or 0.0) * (n - 1) + gain) / n
+            avg_loss = ((prev.get('avg_loss') or 0.0) * (n - 1) + loss) / n
+            if idx >= RSI_PERIOD:
+                if avg_loss > 0:
+                    rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+                elif avg_gain > 0:
+                    rsi = 100.0
+
+        # KDJ
+        hl.append((high, low))
+        k, d = prev.get('k'), prev.get('d')
+        if len(hl) == KDJ_N:
+            hhv = max(h for h, _ in hl)
+            llv = min(l for _, l in hl)
+            if hhv > llv:
+                rsv = (close - llv) / (hhv - llv) * 100
+                k = rsv if k is None else (1 - KDJ_ALPHA) * k + KDJ_ALPHA * rsv
+                d = k if d is None else (1 - KDJ_ALPHA) * d + KDJ_ALPHA * k
+        j = 3 * k - 2 * d if k is not None and d is not None else None
+
+        row = {
+            'timestamp': ts, 'bar_index': idx, 'close': close, 'pct_change': pct_change,
+            'ema12': ema12, 'ema26': ema26, 'dif': dif, 'dea': dea, 'hist': dif - dea,
+            'avg_gain': avg_gain, 'avg_loss': avg_loss, 'rsi': rsi, 'k': k, 'd': d, 'j': j,
+        }
+        rows.append(row)
+        prev = row
+    return rows
+
+
+def _bar(row) -> tuple:
+    ts, high, low, close = row
+    close = float(close)
+    # 只有收盘价的资产 (信托 / 基金) 高低价为空时以收盘价代替
+    high = close if high is None or math.isnan(high) else float(high)
+    low = close if low is None or math.isnan(low) else float(low)
+    return ts, high, low, close
+
+
+def _last_state(conn, symbol: str, market: str, since: Optional[str]) -> Optional[Dict]:
+    sql = f"SELECT * FROM {INDICATOR_TABLE} WHERE symbol = :symbol AND market = :market"
+    params = {'symbol': symbol, 'market': market}
+    if since:
+        sql += " AND timestamp < :since"
+        params['since'] = since
+    row = conn.execute(text(sql + " ORDER BY timestamp DESC LIMIT 1"), params).mappings().first()
+    return dict(row) if row else None
+
+
+def update_indicators(conn, symbol: str, market: str, since: Optional[str] = None) -> int:
+    """
+    增量更新 symbol/market 的日线指标 (调用方负责 commit)，返回写入行数
+    conn:  SQLAlchemy Connection (ETL 内用 session.connection())
+    since: 本次被写入 / 改写的最早日线 timestamp；其后的指标行先删除再重算
+    """
+    key = {'symbol': symbol, 'market': market}
+    state = _last_state(conn, symbol, market, since)
+    window: List[tuple] = []
+
+    if state is not None:
+        recent = conn.execute(text(f"""
+            SELECT timestamp, high, low, close FROM {DAILY_TABLE}
+            WHERE symbol = :symbol AND market = :market AND timestamp <= :ts
+            ORDER BY timestamp DESC LIMIT {KDJ_N - 1}
+        """), {**key, 'ts': state['timestamp']}).all()
+        n_before = conn.execute(text(f"""
+            SELECT COUNT(*) FROM {DAILY_TABLE}
+            WHERE symbol = :symbol AND market = :market AND timestamp <= :ts
+        """), {**key, 'ts': state['timestamp']}).scalar()
+        consistent = (
+            state['version'] == INDICATOR_VERSION
+            and recent and recent[0][0] == state['timestamp']
+            and math.isclose(float(recent[0][3]), state['close'], rel_tol=1e-12)
+            and n_before == state['bar_index'] + 1
+        )
+        if consistent:
+            window = [_bar(r)[1:3] for r in reversed(recent)]
+        else:
+            logger.info(f"Indicator state for {symbol} ({market}) is stale, recomputing full history")
+            state = None
+
+    # 删除回退点之后的指标行 (整段重算时全部删除)
+    if state is None:
+        conn.execute(text(f"DELETE FROM {INDICATOR_TABLE} WHERE symbol = :symbol AND market = :market"), key)
+        bars_sql = f"""
+            SELECT timestamp, high, low, close FROM {DAILY_TABLE}
+            WHERE symbol = :symbol AND market = :market
+            ORDER BY timestamp
+        """
+        params = key
+    else:
+        conn.execute(text(f"""
+            DELETE FROM {INDICATOR_TABLE}
+            WHERE symbol = :symbol AND market = :market AND timestamp > :ts
+        """), {**key, 'ts': state['timestamp']})
+        bars_sql = f"""
+            SELECT timestamp, high, low, close FROM {DAILY_TABLE}
+            WHERE symbol = :symbol AND market = :market AND timestamp > :ts
+            ORDER BY timestamp
+        """
+        params = {**key, 'ts': state['timestamp']}
+
+    bars = [_bar(r) for r in conn.execute(text(bars_sql), params).all()]
+    if not bars:
+        return 0
+
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+    rows = compute_indicators(bars, state, window)
+    conn.execute(text(_INSERT_SQL), [
+        {**row, **key, 'version': INDICATOR_VERSION, 'updated_at': now} for row in rows
+    ])
+    logger.info(f"Indicators updated for {symbol} ({market}): {len(rows)} bar(s) from {rows[0]['timestamp']}")
+    return len(rows)
+
+
+def refresh_indicators(session, symbol: str, market: str, since: Optional[str] = None) -> int:
+    """ETL 写入日线后调用：更新指标并提交；失败只记日志，不影响日线入库"""
+    try:
+        n = update_indicators(session.connection(), symbol, market, since)
+        session.commit()
+        return n
+    except Exception as e:
+        logger.warning(f"Indicator update failed for {symbol} ({market}): {e}")
+        session.rollback()
+        return 0
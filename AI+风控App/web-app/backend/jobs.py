@@ -2,13 +2,13 @@ import yfinance as yf
 import csv
 import os
 import logging
-import asyncio
 from sqlmodel import Session, select
 from models import Watchlist, MarketDataDaily
 from database import engine
 from datetime import datetime
 import pandas as pd
 from data_fetcher import DataFetcher
+from market_sync import MarketSyncEngine, log_report
 
 logger = logging.getLogger(__name__)
 
@@ -134,6 +134,10 @@ async def update_market_data(market: str = None):
     1. Skip on Sunday (non-trading day)
     2. Use DataFetcher for unified ETL pipeline
     3. Automatically triggers field normalization and WebSocket push
+    4. Concurrent fetch bounded by per-source rate limits (see market_sync.py)
+    
+    Returns:
+        Sync summary report (None if skipped)
     """
     logger.info(f"Starting Market Data Sync for: {market or 'ALL markets'}")
     
@@ -170,52 +174,30 @@ async def update_market_data(market: str = None):
         return
 
     # 2. Use DataFetcher for ALL symbols (unified ETL pipeline)
+    #    Bounded-parallel: per-source semaphores + RateLimiter, per-symbol timeout, retry with jitter
     logger.info("=" * 60)
     logger.info("PHASE 1: Fetching Data via Unified Pipeline")
     logger.info("=" * 60)
     
     fetcher = DataFetcher()
-    success_count = 0
-    failure_count = 0
-    
-    # Group by market for logging
-    from collections import defaultdict
-    by_market = defaultdict(list)
-    for sym, mkt in targets.items():
-        by_market[mkt].append(sym)
+    # Use DataFetcher which handles:
+    # - Field normalization (via FieldNormalizer)
+    # - Save to RawMarketData
+    # - Trigger ETL
+    # - Save to MarketDataDaily
+    # - Trigger WebSocket push
+    sync_engine = MarketSyncEngine(
+        fetcher.fetch_for_sync,
+        rate_limiter=fetcher.rate_limiter,
+    )
     
-    for mkt, symbols in by_market.items():
-        logger.info(f"Fetching {len(symbols)} symbols for {mkt} market...")
-        
-        for symbol in symbols:
-            try:
-                # Use DataFetcher which handles:
-                # - Field normalization (via FieldNormalizer)
-                # - Save to RawMarketData
-                # - Trigger ETL
-                # - Save to MarketDataDaily
-                # - Trigger WebSocket push
-                result = await asyncio.to_thread(
-                    fetcher.fetch_latest_data, 
-                    symbol, 
-                    mkt, 
-                    force_refresh=True
-                )
-                
-                if result:
-                    success_count += 1
-                    logger.info(f"✅ {symbol} ({mkt}) synced")
-                else:
-                    failure_count += 1
-                    logger.warning(f"⚠️  {symbol} ({mkt}) returned no data (likely market closed)")
-                    
-            except Exception as e:
-                failure_count += 1
-                logger.error(f"❌ {symbol} ({mkt}) failed: {e}")
+    from collections import Counter
+    for mkt, n in Counter(targets.values()).items():
+        logger.info(f"Fetching {n} symbols for {mkt} market...")
     
-    logger.info("=" * 60)
-    logger.info(f"Sync Complete: ✅ {success_count} success, ❌ {failure_count} failed/empty")
-    logger.info("=" * 60)
+    report = await sync_engine.run(targets)
+    log_report(report)
+    return report
 
 
 
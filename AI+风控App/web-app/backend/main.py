@@ -13,11 +13,11 @@ VERA Backend API Server (Core Entry Point)
 I. API 服务架构 (API Endpoints)
 ----------------------------------------
 1. **Watchlist API**:
-   - `GET /api/watchlist`: 获取自选股快照。查询逻辑优先使用 `MarketSnapshot` 缓存表以保证读性能。
+   - `GET /api/watchlist`: 获取自选股快照。一条窗口函数查询取最新分析摘要，行情读 `MarketSnapshot` 进程内缓存 (ETL 写入时同步)，支持 ETag / 304。
    - `POST /api/watchlist`: 添加新资产。具备“三步走”后台同步逻辑（30天历史 -> 实时分钟点 -> 全量历史）。
 2. **Market Data & Analysis**:
    - `GET /api/latest-analysis/{symbol}`: 获取资产的最新风险分析结果。
-   - `GET /api/market-data-history`: 获取图表用历史序列，内嵌 `calculate_indicators` 进行实时技术指标计算。
+   - `GET /api/market-data/{symbol}`: 获取图表用历史序列。技术指标由 ETL 增量写入 `MarketIndicatorDaily`，接口只做索引 JOIN 读取。
 3. **Indices API**:
    - `GET /api/market-indices`: 聚合显示全球核心指数行情。
 
@@ -60,7 +60,8 @@ import sys
 # Ensure backend directory is in python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Depends, WebSocket
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Depends, WebSocket, Header, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict
@@ -72,11 +73,12 @@ import sys # Keep this if still used
 import json # Keep this if still used
 
 from database import create_db_and_tables, get_session, engine
-from models import MacroData, StockInfo, Watchlist, AssetAnalysisHistory, MarketDataDaily, MarketSnapshot
+from models import MacroData, StockInfo, Watchlist, AssetAnalysisHistory, MarketDataDaily, MarketSnapshot, MarketIndicatorDaily
 from data_fetcher_legacy import DataFetcher  # ✅ 使用 legacy 版本，包含 backfill_missing_data 方法
 # ✅ 使用统一的符号转换工具
 from utils.symbol_utils import normalize_symbol_db
-from sqlmodel import Session, select, or_, col # Keep or_, col if still used
+from sqlmodel import Session, select, col
+from sqlalchemy import and_
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from tasks import fetch_market_data
@@ -122,6 +124,13 @@ async def lifespan(app: FastAPI):
         args=['US', scheduler]
     )
     
+    # Raw 保留策略：每日清理超过保留期的已处理 Raw (04:00 北京时间，低峰时段)
+    from raw_payload import purge_processed_raw
+    scheduler.add_job(
+        purge_processed_raw,
+        CronTrigger(hour=4, minute=0, timezone=tz_cn)
+    )
+    
     # ✅ 启动ETL异步队列（性能优化：用户等待从150秒降到5秒）
     from etl_queue import etl_queue
     etl_queue.start()
@@ -193,6 +202,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 class SyncMarketRequest(BaseModel):
@@ -392,8 +402,8 @@ async def run_job(job_name: str):
     if job_name == "sync_all":
         # Manually verify daily sync
         from jobs import update_market_data
-        await update_market_data()
-        return {"status": "triggered", "job": "daily_sync_unified"}
+        report = await update_market_data()
+        return {"status": "triggered", "job": "daily_sync_unified", "report": report}
     else:
          return {"status": "error", "message": "Unknown job"}
 
@@ -401,6 +411,8 @@ async def run_job(job_name: str):
 # Watchlist API
 from models import Watchlist, MarketDataDaily
 from data_fetcher import normalize_symbol_db
+from watchlist_cache import snapshot_cache, load_watchlist_rows, analysis_fields, compute_etag, etag_matches
+from search_index import search_index
 
 class WatchlistAddRequest(BaseModel):
     symbol: str
@@ -409,78 +421,42 @@ class WatchlistAddRequest(BaseModel):
 
 
 @app.get("/api/watchlist")
-def get_watchlist(background_tasks: BackgroundTasks, session: Session = Depends(get_session)):
+def get_watchlist(
+    background_tasks: BackgroundTasks,
+    if_none_match: Optional[str] = Header(None),
+    session: Session = Depends(get_session),
+):
     """
-    获取用户自选股 - 简化版：直接查询 MarketSnapshot 表
+    获取用户自选股：一条查询取自选股 + 最新分析摘要，行情取自快照缓存
+    响应带 ETag，列表未变化时返回 304
     """
-    from models import MarketSnapshot
-    
-    # Get user's watchlist
-    watchlist = list(session.exec(select(Watchlist)).all())
+    conn = session.connection()
+    rows = load_watchlist_rows(conn)
+    snapshots = snapshot_cache.get_all(conn)
     results = []
-    
-    for item in watchlist:
-        try:
-            # Get latest analysis
-            stmt_analysis = select(AssetAnalysisHistory).where(
-                AssetAnalysisHistory.symbol == item.symbol
-            ).order_by(AssetAnalysisHistory.analysis_date.desc()).limit(1)
-            latest_analysis = session.exec(stmt_analysis).first()
-            
-            analysis_summary = None
-            recommendation = None
-            
-            if latest_analysis:
-                try:
-                    res_json = json.loads(latest_analysis.full_result_json)
-                    analysis_summary = res_json.get('summary', '')
-                    recommendation = res_json.get('recommendation', '')
-                except:
-                    pass
-            
-            # 🔥 简化：直接查询 MarketSnapshot
-            db_symbol = normalize_symbol_db(item.symbol, item.market)
-            snapshot = session.exec(
-                select(MarketSnapshot).where(
-                    MarketSnapshot.symbol == db_symbol,
-                    MarketSnapshot.market == item.market
-                )
-            ).first()
-            
-            if snapshot:
-                results.append({
-                    "id": item.id,
-                    "symbol": item.symbol,
-                    "market": item.market,
-                    "name": item.name or item.symbol,
-                    "price": snapshot.price,
-                    "change": snapshot.change,
-                    "pct_change": snapshot.pct_change,
-                    "timestamp": snapshot.timestamp,
-                    "volume": snapshot.volume,
-                    "analysis_summary": analysis_summary,
-                    "recommendation": recommendation
-                })
-            else:
-                # 如果没有数据，返回默认值
-                results.append({
-                    "id": item.id,
-                    "symbol": item.symbol,
-                    "market": item.market,
-                    "name": item.name or item.symbol,
-                    "price": 0,
-                    "change": 0,
-                    "pct_change": 0,
-                    "timestamp": None,
-                    "volume": 0,
-                    "analysis_summary": analysis_summary,
-                    "recommendation": recommendation
-                })
-        
-        except Exception as e:
-            print(f"Error fetching watchlist item {item.symbol}: {e}")
-    
-    return results
+
+    for item in rows:
+        db_symbol = normalize_symbol_db(item['symbol'], item['market'])
+        snapshot = snapshots.get((db_symbol, item['market']))
+        results.append({
+            "id": item['id'],
+            "symbol": item['symbol'],
+            "market": item['market'],
+            "name": item['name'] or item['symbol'],
+            # 如果没有数据，返回默认值
+            "price": snapshot['price'] if snapshot else 0,
+            "change": snapshot['change'] if snapshot else 0,
+            "pct_change": snapshot['pct_change'] if snapshot else 0,
+            "timestamp": snapshot['timestamp'] if snapshot else None,
+            "volume": snapshot['volume'] if snapshot else 0,
+            "analysis_summary": item['summary'],
+            "recommendation": item['recommendation'],
+        })
+
+    etag = compute_etag(results)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(results, headers={"ETag": etag})
 
 
 
@@ -673,6 +649,7 @@ def add_to_watchlist(request: WatchlistAddRequest, background_tasks: BackgroundT
         # 后台任务：下载30天历史数据 + 开市期间获取分钟数据 + 全量历史数据
         def download_initial_history(sym: str, mkt: str):
             from data_fetcher_legacy import DataFetcher
+            from etl_queue import PRIORITY_BACKFILL
             from market_status import is_market_open
             import logging
             
@@ -723,7 +700,8 @@ def add_to_watchlist(request: WatchlistAddRequest, background_tasks: BackgroundT
                 # 步骤3: 继续下载全量历史数据（后台静默执行）
                 logger.info(f"[{sym}] 步骤3: 开始下载全量历史数据...")
                 try:
-                    full_result = fetcher.backfill_missing_data(sym, mkt, days=None)  # days=None 表示最大历史
+                    # days=None 表示最大历史；ETL 以回填优先级入队，不阻塞后续用户操作的 ETL
+                    full_result = fetcher.backfill_missing_data(sym, mkt, days=None, priority=PRIORITY_BACKFILL)
                     
                     if full_result.get('success'):
                         logger.info(
@@ -750,156 +728,128 @@ def add_to_watchlist(request: WatchlistAddRequest, background_tasks: BackgroundT
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-import pandas as pd
 import numpy as np
 
-def calculate_indicators(data_list):
-    if not data_list:
-        return []
-    
-    # For single record, return basic data without indicators
-    if len(data_list) < 2:
-        def safe_float(val):
-            if val is None: return None
-            try:
-                f = float(val)
-                return None if np.isnan(f) else f
-            except:
-                return None
-        
-        def safe_float_zero(val):
-            """For change/pct_change, return 0 instead of None"""
-            if val is None: return 0
-            try:
-                f = float(val)
-                return 0 if np.isnan(f) else f
-            except:
-                return 0
-        
-        item = data_list[0]
-        return [{
-            "date": item.date,
-            "open": item.open,
-            "high": item.high,
-            "low": item.low,
-            "close": item.close,
-            "volume": item.volume,
-            "change": safe_float_zero(item.change),
-            "pct_change": safe_float_zero(item.pct_change),
-            "macd": None,
-            "diff": None,
-            "dea": None,
-            "rsi": None,
-            "k": None,
-            "d": None,
-            "j": None,
-            "pe": safe_float(item.pe),
-            "pb": safe_float(item.pb),
-            "ps": safe_float(item.ps),
-            "dividend_yield": safe_float(item.dividend_yield),
-            "eps": safe_float(item.eps)
-        }]
-    
-    df = pd.DataFrame([
-        {'date': d.date, 'close': d.close, 'high': d.high, 'low': d.low, 'open': d.open}
-        for d in data_list
-    ])
-    
-    # Sort by date asc
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date')
-    
-    # 1. Change %
-    df['pct_change'] = df['close'].pct_change() * 100
-    
-    # 2. MACD (12, 26, 9)
-    # EMA 12
-    df['ema12'] = df['close'].ewm(span=12, adjust=False).mean()
-    # EMA 26
-    df['ema26'] = df['close'].ewm(span=26, adjust=False).mean()
-    df['macd'] = df['ema12'] - df['ema26']
-    df['signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-    df['hist'] = df['macd'] - df['signal']
-    
-    # 3. RSI (14)
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['rsi'] = 100 - (100 / (1 + rs))
+def _safe_float(val, default=None):
+    if val is None:
+        return default
+    try:
+        f = float(val)
+        return default if np.isnan(f) else f
+    except (TypeError, ValueError):
+        return default
+
+def format_history_row(bar: MarketDataDaily, ind: Optional[MarketIndicatorDaily]) -> dict:
+    """
+    日线 + 已存指标 -> API 行 (指标由 ETL 增量写入 MarketIndicatorDaily，见 indicator_store.py)
+    字段沿用前端约定: macd = DIF, dea = 信号线, diff = 柱 (DIF - DEA)
+    """
+    return {
+        "date": bar.timestamp,
+        "open": bar.open,
+        "high": bar.high,
+        "low": bar.low,
+        "close": bar.close,
+        "volume": bar.volume,
+        "change": _safe_float(bar.change, 0),  # Use DB value, fallback to 0
+        "pct_change": _safe_float(ind.pct_change if ind else None, 0),
+        "macd": _safe_float(ind.dif) if ind else None,
+        "diff": _safe_float(ind.hist) if ind else None,
+        "dea": _safe_float(ind.dea) if ind else None,
+        "rsi": _safe_float(ind.rsi) if ind else None,
+        "k": _safe_float(ind.k) if ind else None,
+        "d": _safe_float(ind.d) if ind else None,
+        "j": _safe_float(ind.j) if ind else None,
+        # Valuation Data (Native fields from bar)
+        "pe": _safe_float(bar.pe),
+        "pb": _safe_float(bar.pb),
+        "ps": _safe_float(bar.ps),
+        "dividend_yield": _safe_float(bar.dividend_yield),
+        "eps": _safe_float(bar.eps)
+    }
+
+HISTORY_FIELDS = (
+    "open", "high", "low", "close", "volume", "change", "pct_change",
+    "macd", "diff", "dea", "rsi", "k", "d", "j",
+    "pe", "pb", "ps", "dividend_yield", "eps",
+)
+
+def _read_history_with_indicators(session: Session, db_sym: str, start: str = None, end: str = None,
+                                  since: str = None, limit: int = None):
+    """日线 LEFT JOIN 指标 (均按 symbol/market/timestamp 索引)，升序；区间 / 条数过滤在 SQL 内完成"""
+    statement = (
+        select(MarketDataDaily, MarketIndicatorDaily)
+        .outerjoin(MarketIndicatorDaily, and_(
+            MarketIndicatorDaily.symbol == MarketDataDaily.symbol,
+            MarketIndicatorDaily.market == MarketDataDaily.market,
+            MarketIndicatorDaily.timestamp == MarketDataDaily.timestamp,
+        ))
+        .where(MarketDataDaily.symbol == db_sym)
+    )
+    if start:
+        statement = statement.where(MarketDataDaily.timestamp >= start)
+    if end:
+        # 'YYYY-MM-DD' 含当天收盘时间
+        statement = statement.where(MarketDataDaily.timestamp <= (end + " 23:59:59" if len(end) == 10 else end))
+    if since:
+        statement = statement.where(MarketDataDaily.timestamp > since)
+    if limit:
+        # 最近 limit 根
+        rows = session.exec(statement.order_by(MarketDataDaily.timestamp.desc()).limit(limit)).all()
+        return rows[::-1]
+    return session.exec(statement.order_by(MarketDataDaily.timestamp.asc())).all()
+
+def _downsample_history(rows, max_points: int, mode: str) -> List[dict]:
+    """rows 超过 max_points 时降采样 (见 downsample.py)，只为保留下来的点构造响应行"""
+    from downsample import lttb_indices, ohlc_buckets
     
-    # 4. KDJ (9, 3, 3)
-    low_list = df['low'].rolling(window=9, min_periods=9).min()
-    high_list = df['high'].rolling(window=9, min_periods=9).max()
-    rsv = (df['close'] - low_list) / (high_list - low_list) * 100
-    df['k'] = rsv.ewm(com=2, adjust=False).mean()
-    df['d'] = df['k'].ewm(com=2, adjust=False).mean()
-    df['j'] = 3 * df['k'] - 2 * df['d']
-
-    # Merge back to list
-    results = []
-    # Create map for quick lookup
-    indicator_map = df.set_index('date').to_dict('index')
+    bars = [bar for bar, _ in rows]
+    close = np.array([b.close for b in bars], dtype=float)
+    if mode == "lttb":
+        return [format_history_row(*rows[i]) for i in lttb_indices(close, max_points)]
     
-    for item in data_list:
-        date_key = pd.to_datetime(item.date)
-        indicators = indicator_map.get(date_key, {})
-        
-        # safely get values, handle NaN
-        def safe_float(val):
-            if val is None: return None
-            try:
-                f = float(val)
-                return None if np.isnan(f) else f
-            except:
-                return None
-        
-        def safe_float_zero(val):
-            """For change/pct_change, return 0 instead of None"""
-            if val is None: return 0
-            try:
-                f = float(val)
-                return 0 if np.isnan(f) else f
-            except:
-                return 0
-        
-        def get_val(key):
-            """Get value from indicators dict, handling NaN"""
-            val = indicators.get(key)
-            return safe_float_zero(val) if key in ['pct_change', 'change'] else safe_float(val)
-
-        results.append({
-            "date": item.date,
-            "open": item.open,
-            "high": item.high,
-            "low": item.low,
-            "close": item.close,
-            "volume": item.volume,
-            "change": safe_float_zero(item.change),  # Use DB value, fallback to 0
-            "pct_change": get_val('pct_change'),  # Use calculated value
-            "macd": get_val('macd'),
-            "diff": get_val('hist'),
-            "dea": get_val('signal'),
-            "rsi": get_val('rsi'),
-            "k": get_val('k'),
-            "d": get_val('d'),
-            "j": get_val('j'),
-            # Valuation Data (Native fields from item)
-            "pe": safe_float(item.pe),
-            "pb": safe_float(item.pb),
-            "ps": safe_float(item.ps),
-            "dividend_yield": safe_float(item.dividend_yield),
-            "eps": safe_float(item.eps)
-        })
-    return results
+    last_idx, o, h, l, c, v = ohlc_buckets(
+        [b.open for b in bars], [b.high for b in bars], [b.low for b in bars],
+        close, [b.volume or 0 for b in bars], max_points
+    )
+    out = []
+    prev_close = None
+    for i, bo, bh, bl, bc, bv in zip(last_idx, o, h, l, c, v):
+        row = format_history_row(*rows[i])
+        row.update(open=_safe_float(bo), high=_safe_float(bh), low=_safe_float(bl), volume=int(bv))
+        # 涨跌相对上一个桶的收盘 (首桶沿用末根 bar 的日涨跌)
+        if prev_close:
+            row["change"] = bc - prev_close
+            row["pct_change"] = (bc / prev_close - 1) * 100
+        prev_close = bc
+        out.append(row)
+    return out
 
 @app.get("/api/market-data/{symbol}")
 @app.get("/api/market-data/{symbol}")
 @app.get("/api/market-data/{symbol}")
-async def get_market_data_history(symbol: str, market: str = None, background_tasks: BackgroundTasks = None, session: Session = Depends(get_session)):
+async def get_market_data_history(
+    symbol: str,
+    market: str = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=3),
+    downsample: str = Query("ohlc", pattern="^(ohlc|lttb)$"),
+    background_tasks: BackgroundTasks = None,
+    session: Session = Depends(get_session)
+):
     """
     Get historical data for a symbol with calculated indicators.
     Default to '1d' period for history.
+    
+    - start / end: 日期区间 (YYYY-MM-DD，含两端)
+    - limit: 只取区间内最近 N 根
+    - since: 增量模式，只返回 timestamp 大于该值的新 bar (不降采样)；客户端传上次 meta.last_timestamp
+    - fields: 逗号分隔的返回字段 (date 总是返回)，如 fields=close,volume
+    - max_points: 超过该点数时服务端降采样；downsample=ohlc (K线聚合，默认) | lttb (折线选点)
     """
     try:
         # Infer market if not provided
@@ -911,53 +861,40 @@ async def get_market_data_history(symbol: str, market: str = None, background_ta
             else:
                 market = "US"
         
+        keep = None
+        if fields:
+            keep = [f.strip() for f in fields.split(",") if f.strip()]
+            unknown = [f for f in keep if f not in HISTORY_FIELDS and f != "date"]
+            if unknown:
+                return {"status": "error", "message": f"Unknown fields: {unknown}"}
+        
         db_sym = normalize_symbol_db(symbol, market)
 
-        statement = select(MarketDataDaily).where(
-            MarketDataDaily.symbol == db_sym
-            # MarketData.period == '1d' -> Implied by table
-        ).order_by(MarketDataDaily.date.asc())
-        data = session.exec(statement).all()
-        
-        if not data:
-             # Maybe trigger a fetch if empty? 
-             pass
-        
-        if not data:
+        rows = _read_history_with_indicators(session, db_sym, start=start, end=end, since=since, limit=limit)
+        if not rows:
+            if since:
+                return {"status": "success", "data": [], "meta": {"total": 0, "returned": 0, "downsampled": None, "last_timestamp": since}}
             return {"status": "empty", "data": []}
 
-        # Calculate Indicators
-        try:
-            formatted = calculate_indicators(data)
-        except Exception as calc_err:
-            print(f"Indicator calculation failed: {calc_err}")
-            formatted = []
-            
-            def safe_float(val):
-                if val is None: return None
-                try:
-                    f = float(val)
-                    import math
-                    return None if math.isnan(f) else f
-                except:
-                    return None
+        # 纯读取：尚无指标的 bar (指标表上线前的历史 / 非ETL写入的日线) 指标字段返回 null，
+        # 由 backfill_indicators.py 与 ETL 增量补齐，不在请求内计算
 
-            for row in data:
-                formatted.append({
-                    "date": row.date,
-                    "open": row.open,
-                    "high": row.high,
-                    "low": row.low,
-                    "close": row.close,
-                    "volume": row.volume,
-                    "change": row.change,
-                    "pct_change": row.pct_change,
-                    "pe": safe_float(row.pe),
-                    "pb": safe_float(row.pb),
-                    "ps": safe_float(row.ps),
-                    "dividend_yield": safe_float(row.dividend_yield),
-                    "eps": safe_float(row.eps)
-                })
+        data = [bar for bar, _ in rows]
+        sampled = None
+        if max_points and len(rows) > max_points and not since:
+            formatted = _downsample_history(rows, max_points, downsample)
+            sampled = downsample
+        else:
+            formatted = [format_history_row(bar, ind) for bar, ind in rows]
+        if keep is not None:
+            cols = ["date", *[f for f in keep if f != "date"]]
+            formatted = [{c: row[c] for c in cols} for row in formatted]
+        meta = {
+            "total": len(rows),
+            "returned": len(formatted),
+            "downsampled": sampled,
+            "last_timestamp": data[-1].timestamp,
+        }
         
         # --- PRIORITY: Check for Latest Minute Data (Match Watchlist Logic) ---
         # MarketDataMinute table has been removed - using only daily data now
@@ -983,7 +920,7 @@ async def get_market_data_history(symbol: str, market: str = None, background_ta
             market = latest_obj.market
             
             # Check Stale
-            last_time = latest_obj.updated_at or datetime.datetime.now() - datetime.timedelta(days=1)
+            last_time = latest_obj.updated_at or datetime.now() - timedelta(days=1)
             
             if MarketSchedule.is_stale(last_time, market):
                 def bg_sync(s, m):
@@ -996,7 +933,7 @@ async def get_market_data_history(symbol: str, market: str = None, background_ta
                 background_tasks.add_task(bg_sync, symbol, market)
                 
         # Return DB data immediately (Fast)
-        return {"status": "success", "data": formatted}
+        return {"status": "success", "data": formatted, "meta": meta}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -1231,7 +1168,8 @@ async def backfill_history(
     
     async def backfill_task(sym: str, mkt: str, day_count: int):
         """后台回填任务"""
-        from data_fetcher import DataFetcher
+        from data_fetcher_legacy import DataFetcher  # backfill_missing_data 只在 legacy 版本中
+        from etl_queue import PRIORITY_BACKFILL
         import logging
         
         logger = logging.getLogger(__name__)
@@ -1240,7 +1178,7 @@ async def backfill_history(
             fetcher = DataFetcher()
             logger.info(f"[Backfill] 开始为 {sym} ({mkt}) 回填 {day_count} 天历史数据...")
             
-            result = fetcher.backfill_missing_data(sym, mkt, days=day_count)
+            result = fetcher.backfill_missing_data(sym, mkt, days=day_count, priority=PRIORITY_BACKFILL)
             
             if result.get('success'):
                 logger.info(
@@ -1299,6 +1237,14 @@ def read_root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/api/etl/metrics")
+async def get_etl_metrics():
+    """
+    ETL队列深度与延迟指标 (排队等待 / 处理耗时，毫秒)
+    """
+    from etl_queue import etl_queue
+    return {**etl_queue.get_metrics(), "timestamp": datetime.now().isoformat()}
+
 @app.get("/api/data-source-status")
 async def get_data_source_status():
     """
@@ -1390,10 +1336,13 @@ class SaveAnalysisRequest(BaseModel):
 def save_analysis(request: SaveAnalysisRequest, session: Session = Depends(get_session)):
     try:
         # Save to DB
+        summary, recommendation = analysis_fields(request.result)
         history = AssetAnalysisHistory(
             symbol=request.symbol,
             full_result_json=json.dumps(request.result),
-            screenshot_path=request.screenshot_path
+            screenshot_path=request.screenshot_path,
+            summary=summary,
+            recommendation=recommendation
         )
         session.add(history)
         session.commit()
@@ -1565,93 +1514,87 @@ def fetch_stock_sync(request: FetchStockRequest, session: Session = Depends(get_
         "meta": {"name": saved_name, "symbol": final_symbol, "market": market}
     }
 
+def _smartbox_search(q: str, limit: int) -> list:
+    """Network Search (Tencent Smartbox)，仅在本地索引无结果时使用"""
+    import requests
+    data = []
+    try:
+        # Tencent Smartbox
+        # Returns: v_hint="600519~贵州茅台~gzmt~SH~A股";...
+        url = f"http://smartbox.gtimg.cn/s3/?q={q}&t=all"
+        resp = requests.get(url, timeout=2)
+        if resp.status_code == 200:
+            content = resp.text
+            if 'v_hint="' in content:
+                raw_data = content.split('v_hint="')[1].split('"')[0]
+                items = raw_data.split('^')
+                
+                for item in items:
+                    # Parse item: sh~601919~中远海控~zyhk~GP-A
+                    parts = item.split('~')
+                    if len(parts) >= 3:
+                        market_prefix = parts[0] # sh, sz, hk, us
+                        code = parts[1]          # 601919
+                        name = parts[2]          # 中远海控
+                        
+                        # Format Symbol
+                        final_symbol = code
+                        market = "Other"
+                        
+                        if market_prefix == "sh":
+                            final_symbol = f"{code}.sh"
+                            market = "CN"
+                        elif market_prefix == "sz":
+                            final_symbol = f"{code}.sz"
+                            market = "CN"
+                        elif market_prefix == "hk":
+                            final_symbol = f"{code}.hk"
+                            market = "HK"
+                        elif market_prefix == "us":
+                            final_symbol = code.upper()
+                            market = "US"
+                        
+                        # Decode Name if it looks like unicode escape
+                        try:
+                            if "\\u" in name:
+                                name = name.encode('utf-8').decode('unicode_escape')
+                        except:
+                            pass
+
+                        # Avoid duplicates
+                        if not any(d['symbol'] == final_symbol for d in data):
+                            data.append({
+                                "symbol": final_symbol,
+                                "name": name,
+                                "market": market
+                            })
+                            
+                        if len(data) >= limit:
+                            break
+    except Exception as net_e:
+        print(f"Network search error: {net_e}")
+    return data
+
+
 @app.get("/api/search")
 def search_stocks(q: str, limit: int = 10, session: Session = Depends(get_session)):
     """
     Search stocks by symbol or name.
-    Logic: Local DB -> If empty -> Network Search (Tencent Smartbox)
+    Logic: In-memory index (code prefix / name n-gram / pinyin initials, see search_index.py)
+           -> If no local hit -> Network Search (Tencent Smartbox)
     """
     if not q:
         return {"status": "success", "data": []}
     
     q = q.strip()
     try:
-        # 1. Local Search
-        statement = select(StockInfo).where(
-            or_(
-                col(StockInfo.symbol).contains(q.lower()), 
-                col(StockInfo.name).contains(q)
-            )
-        ).limit(limit)
-        
-        results = session.exec(statement).all()
-        
-        data = []
-        for item in results:
-            data.append({
-                "symbol": item.symbol,
-                "name": item.name,
-                "market": item.market
-            })
+        # 1. Local Search (索引按间隔从 StockInfo 增量刷新)
+        search_index.refresh(session.connection())
+        data = search_index.search(q, limit)
             
-        # 2. Fallback: Network Search (if local results are too few)
-        if len(data) < 3:
-            import requests
-            try:
-                # Tencent Smartbox
-                # Returns: v_hint="600519~贵州茅台~gzmt~SH~A股";...
-                url = f"http://smartbox.gtimg.cn/s3/?q={q}&t=all"
-                resp = requests.get(url, timeout=2)
-                if resp.status_code == 200:
-                    content = resp.text
-                    if 'v_hint="' in content:
-                        raw_data = content.split('v_hint="')[1].split('"')[0]
-                        items = raw_data.split('^')
-                        
-                        for item in items:
-                            # Parse item: sh~601919~中远海控~zyhk~GP-A
-                            parts = item.split('~')
-                            if len(parts) >= 3:
-                                market_prefix = parts[0] # sh, sz, hk, us
-                                code = parts[1]          # 601919
-                                name = parts[2]          # 中远海控
-                                
-                                # Format Symbol
-                                final_symbol = code
-                                market = "Other"
-                                
-                                if market_prefix == "sh":
-                                    final_symbol = f"{code}.sh"
-                                    market = "CN"
-                                elif market_prefix == "sz":
-                                    final_symbol = f"{code}.sz"
-                                    market = "CN"
-                                elif market_prefix == "hk":
-                                    final_symbol = f"{code}.hk"
-                                    market = "HK"
-                                elif market_prefix == "us":
-                                    final_symbol = code.upper()
-                                    market = "US"
-                                
-                                # Decode Name if it looks like unicode escape
-                                try:
-                                    if "\\u" in name:
-                                        name = name.encode('utf-8').decode('unicode_escape')
-                                except:
-                                    pass
-
-                                # Avoid duplicates with local data
-                                if not any(d['symbol'] == final_symbol for d in data):
-                                    data.append({
-                                        "symbol": final_symbol,
-                                        "name": name,
-                                        "market": market
-                                    })
-                                    
-                                if len(data) >= limit:
-                                    break
-            except Exception as net_e:
-                print(f"Network search error: {net_e}")
+        # 2. Fallback: Network Search (only if nothing found locally)
+        if not data:
+            data = _smartbox_search(q, limit)
 
         return {"status": "success", "data": data[:limit]}
     except Exception as e:
@@ -0,0 +1,175 @@
+"""
+Concurrent Market Sync (并发行情同步)
+====================================
+
+功能说明:
+jobs.update_market_data / tasks.fetch_market_data 原先逐个 await 每个 symbol 的抓取，
+300 个标的的收盘同步耗时等于全部网络延迟之和。这里把同步改为受限并发:
+总耗时由数据源限流决定，而不是串行延迟。
+
+核心逻辑:
+I. 按数据源限并发
+   - 每个数据源一个 asyncio.Semaphore，名额 = min(SYNC_CONCURRENCY[source], RateLimiter 每分钟请求数)
+   - 取得名额后用 RateLimiter.acquire 预约令牌并 (异步) 等待放行，再开始计时抓取；
+     每次抓取 (含重试) 恰好占用一个令牌，限流等待不占用线程、不计入单标的超时
+   - fetch 本身不应再经过 RateLimiter (如 DataFetcher.fetch_for_sync)，否则一个请求会被计两次
+
+II. 单标的超时
+   - 抓取在线程中执行 (asyncio.to_thread)，asyncio.wait_for 到时即记为超时并进入重试
+   - 线程无法被取消：超时后名额在线程真正结束时才归还，保证同时在跑的抓取数不超过上限
+
+III. 重试 (指数退避 + 抖动)
+   - 异常 / 超时重试 SYNC_RETRIES 次，第 n 次重试前等待 uniform(0, base·2^n) 秒 (上限 SYNC_MAX_BACKOFF)
+   - 返回空结果 (休市 / 无数据) 不重试，计为 empty；抓取失败须抛出异常，不能返回 None
+
+IV. 汇总报告
+   - {total, success, empty, failed, timeouts, retries, duration_s, by_market, failures}
+
+作者: Antigravity
+日期: 2026-01-23
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Optional
+
+from rate_limiter import get_rate_limiter
+
+logger = logging.getLogger("MarketSync")
+
+DEFAULT_SOURCE = "yfinance"
+
+# 每个数据源的最大并发抓取数 (再受 RateLimiter 每分钟请求数约束)
+SYNC_CONCURRENCY = {
+    "yfinance": int(os.getenv("SYNC_CONCURRENCY_YFINANCE", "4")),
+    "akshare": int(os.getenv("SYNC_CONCURRENCY_AKSHARE", "2")),
+}
+SYNC_SYMBOL_TIMEOUT = float(os.getenv("SYNC_SYMBOL_TIMEOUT", "60"))
+SYNC_RETRIES = int(os.getenv("SYNC_RETRIES", "2"))
+SYNC_BASE_BACKOFF = float(os.getenv("SYNC_BASE_BACKOFF", "2"))
+SYNC_MAX_BACKOFF = 30.0
+
+
+def backoff_with_jitter(retry: int, base: float = SYNC_BASE_BACKOFF, cap: float = SYNC_MAX_BACKOFF) -> float:
+    """第 retry 次重试前的等待秒数 (full jitter)"""
+    return random.uniform(0, min(cap, base * (2 ** retry)))
+
+
+class MarketSyncEngine:
+    """
+    受限并发同步器
+    fetch:     同步抓取函数 fetch(symbol, market) -> 结果 (None 表示无数据，失败须抛异常)，在线程中执行
+    source_of: (symbol, market) -> 数据源名称，决定使用哪个并发名额与限流桶
+    clock:     计时函数 (汇总报告的 duration_s；测试时与 RateLimiter 注入同一个假时钟)
+    """
+
+    def __init__(self, fetch: Callable, source_of: Optional[Callable] = None, rate_limiter=None,
+                 concurrency: Optional[Dict[str, int]] = None, timeout: float = SYNC_SYMBOL_TIMEOUT,
+                 retries: int = SYNC_RETRIES, base_backoff: float = SYNC_BASE_BACKOFF,
+                 clock: Callable = time.monotonic):
+        self.fetch = fetch
+        self.source_of = source_of or (lambda symbol, market: DEFAULT_SOURCE)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
+        self.concurrency = {**SYNC_CONCURRENCY, **(concurrency or {})}
+        self.timeout = timeout
+        self.retries = retries
+        self.base_backoff = base_backoff
+        self._clock = clock
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, source: str) -> asyncio.Semaphore:
+        if source not in self._semaphores:
+            limit = self.concurrency.get(source, 1)
+            per_minute = getattr(self.rate_limiter, 'max_requests_per_minute', None)
+            if per_minute:
+                limit = min(limit, per_minute)
+            self._semaphores[source] = asyncio.Semaphore(max(1, limit))
+        return self._semaphores[source]
+
+    async def _attempt(self, symbol: str, market: str, source: str):
+        """单次抓取：名额在抓取线程结束时归还 (超时后线程仍在跑也不提前释放)"""
+        sem = self._semaphore(source)
+        await sem.acquire()
+        try:
+            await self.rate_limiter.acquire(symbol, source)
+        except BaseException:
+            sem.release()
+            raise
+
+        task = asyncio.ensure_future(asyncio.to_thread(self.fetch, symbol, market))
+
+        def _done(t):
+            sem.release()
+            if not t.cancelled():
+                t.exception()  # 超时后被放弃的任务：取走异常，避免 "never retrieved" 告警
+
+        task.add_done_callback(_done)
+        return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+
+    async def sync_one(self, symbol: str, market: str, report: Dict):
+        source = self.source_of(symbol, market)
+        stats = report['by_market'][market]
+        error = None
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                report['retries'] += 1
+                await asyncio.sleep(backoff_with_jitter(attempt - 1, self.base_backoff))
+            try:
+                result = await self._attempt(symbol, market, source)
+            except asyncio.TimeoutError:
+                report['timeouts'] += 1
+                error = f"timeout after {self.timeout:g}s"
+                logger.warning(f"⏱️  {symbol} ({market}) {error} (attempt {attempt + 1})")
+                continue
+            except Exception as e:
+                error = str(e)
+                logger.warning(f"⚠️  {symbol} ({market}) attempt {attempt + 1} failed: {e}")
+                continue
+
+            if result:
+                report['success'] += 1
+                stats['success'] += 1
+                logger.info(f"✅ {symbol} ({market}) synced")
+            else:
+                report['empty'] += 1
+                stats['empty'] += 1
+                logger.warning(f"⚠️  {symbol} ({market}) returned no data (likely market closed)")
+            return
+
+        report['failed'] += 1
+        stats['failed'] += 1
+        report['failures'].append({'symbol': symbol, 'market': market, 'error': error})
+        logger.error(f"❌ {symbol} ({market}) failed after {self.retries + 1} attempts: {error}")
+
+    async def run(self, targets: Dict[str, str]) -> Dict:
+        """并发同步 {symbol: market}，返回汇总报告"""
+        report = {
+            'total': len(targets), 'success': 0, 'empty': 0, 'failed': 0,
+            'timeouts': 0, 'retries': 0, 'duration_s': 0.0,
+            'by_market': defaultdict(lambda: {'success': 0, 'empty': 0, 'failed': 0}),
+            'failures': [],
+        }
+        started = self._clock()
+        await asyncio.gather(*(self.sync_one(s, m, report) for s, m in targets.items()))
+        report['duration_s'] = round(self._clock() - started, 2)
+        report['by_market'] = dict(report['by_market'])
+        return report
+
+
+def log_report(report: Dict):
+    logger.info("=" * 60)
+    logger.info(
+        f"Sync Complete in {report['duration_s']:.1f}s: ✅ {report['success']} success, "
+        f"⚪ {report['empty']} empty, ❌ {report['failed']} failed "
+        f"(timeouts={report['timeouts']}, retries={report['retries']})"
+    )
+    for mkt, stats in sorted(report['by_market'].items()):
+        logger.info(f"   {mkt}: {stats}")
+    for f in report['failures']:
+        logger.info(f"   ❌ {f['symbol']} ({f['market']}): {f['error']}")
+    logger.info("=" * 60)
@@ -0,0 +1,102 @@
+"""
+RawMarketData 载荷迁移: JSON 文本 -> Arrow IPC + zstd
+=====================================================
+
+1. 补齐 payload_blob / payload_format / content_hash 列 (与服务启动时相同)
+2. 分批把 payload_format=0 的 JSON 载荷转为列式压缩载荷，payload 列置空
+3. 可选: 按保留策略清理已处理 Raw，并 VACUUM 回收空间
+
+用法:
+    python migrate_raw_payload.py                # 补列 + 转换
+    python migrate_raw_payload.py --purge        # 另外清理超过保留期的已处理 Raw
+    python migrate_raw_payload.py --purge --vacuum
+
+作者: Antigravity
+日期: 2026-01-23
+"""
+
+import argparse
+
+from sqlalchemy import text
+
+from database import engine
+from raw_payload import (
+    RAW_FORMAT_ARROW, RAW_FORMAT_JSON, RAW_RETENTION_DAYS, RAW_TABLE,
+    decode_payload, ensure_raw_columns, pack_payload, purge_processed_raw,
+)
+
+BATCH_SIZE = 200
+
+
+class _LegacyRow:
+    """decode_payload 只读 payload / payload_format 两个属性"""
+    payload_format = RAW_FORMAT_JSON
+
+    def __init__(self, payload):
+        self.payload = payload
+
+
+def convert_json_payloads(batch_size: int = BATCH_SIZE):
+    converted, kept, before, after = 0, 0, 0, 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(f"""
+                SELECT id, payload FROM {RAW_TABLE}
+                WHERE payload_format = {RAW_FORMAT_JSON} AND id > :last_id
+                ORDER BY id LIMIT :n
+            """), {"last_id": last_id, "n": batch_size}).all()
+            if not rows:
+                break
+            updates = []
+            for raw_id, payload in rows:
+                last_id = raw_id
+                try:
+                    df = decode_payload(_LegacyRow(payload))
+                except Exception as e:
+                    print(f"  ⚠️ raw_id={raw_id} 无法解析，保留 JSON: {e}")
+                    kept += 1
+                    continue
+                if df is None:
+                    kept += 1
+                    continue
+                fields = pack_payload(df)
+                if fields["payload_format"] != RAW_FORMAT_ARROW:
+                    kept += 1
+                    continue
+                before += len(payload or "")
+                after += len(fields["payload_blob"])
+                updates.append({"id": raw_id, **fields})
+            if updates:
+                conn.execute(text(f"""
+                    UPDATE {RAW_TABLE}
+                    SET payload = :payload, payload_blob = :payload_blob,
+                        payload_format = :payload_format, content_hash = :content_hash
+                    WHERE id = :id
+                """), updates)
+                converted += len(updates)
+        print(f"  已转换 {converted} 条 (保留 JSON {kept} 条)...")
+
+    ratio = (after / before) if before else 0
+    print(f"✅ 转换完成: {converted} 条, JSON {before / 2**20:.1f} MB -> Arrow {after / 2**20:.1f} MB ({ratio:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--purge", action="store_true", help=f"清理超过保留期 ({RAW_RETENTION_DAYS} 天) 的已处理 Raw")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM 回收磁盘空间")
+    args = parser.parse_args()
+
+    ensure_raw_columns(engine)
+    convert_json_payloads()
+
+    if args.purge:
+        print(f"🗑️ 已清理 {purge_processed_raw(engine)} 条已处理 Raw")
+    if args.vacuum:
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        print("✅ VACUUM 完成")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ I. Core Market Data (核心行情层)
    - 存储归一化后的历史日线数据（OHLCV + 估值指标）。
    - 具备唯一约束 `(symbol, market, timestamp)`。
    - 用途: 回测、长周期图表展示、估值历史回溯。
+   - 技术指标 (MACD/RSI/KDJ) 存于同键的 **MarketIndicatorDaily**，由 ETL 增量计算 (indicator_store.py)。
 2. **MarketSnapshot**: **生产实时快照**。
    - 每个资产仅保留最新一条记录。
    - 用途: 满足前端高频访问需求（如首页自选股列表）。
@@ -72,6 +73,9 @@ class AssetAnalysisHistory(SQLModel, table=True):
     analysis_date: datetime = Field(default_factory=datetime.utcnow)
     full_result_json: str  # Stores the entire JSON result from AI
     screenshot_path: Optional[str] = None
+    # 自选股列表直接读取的摘要列 (保存时从 full_result_json 提取)，见 watchlist_cache.py
+    summary: Optional[str] = None
+    recommendation: Optional[str] = None
 
 
 
@@ -120,6 +124,46 @@ class MarketDataDaily(SQLModel, table=True):
 
 
 
+# ============================================================
+# 📈 日线技术指标 (与 MarketDataDaily 同键)
+# ============================================================
+# 每行同时保存递推状态 (EMA / Wilder 均值 / K、D)，ETL 追加日线时
+# 只需读取上一行状态即可向前滚动计算，见 indicator_store.py
+# ============================================================
+class MarketIndicatorDaily(SQLModel, table=True):
+    __table_args__ = (
+        UniqueConstraint('symbol', 'market', 'timestamp', name='uq_indicator_symbol_market_timestamp'),
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    symbol: str = Field(index=True)
+    market: str
+    timestamp: str = Field(index=True)    # 与 MarketDataDaily.timestamp 一致
+    bar_index: int                        # 该 symbol/market 日线序号 (0 起)
+    close: float                          # 计算时使用的收盘价 (检测日线被改写)
+    pct_change: Optional[float] = None
+    
+    # MACD (12, 26, 9)
+    ema12: float
+    ema26: float
+    dif: float
+    dea: float
+    hist: float
+    
+    # RSI (14, Wilder)
+    avg_gain: Optional[float] = None
+    avg_loss: Optional[float] = None
+    rsi: Optional[float] = None
+    
+    # KDJ (9, 3, 3)
+    k: Optional[float] = None
+    d: Optional[float] = None
+    j: Optional[float] = None
+    
+    version: int = Field(default=1)       # 指标参数 / 算法版本，变化时整段重算
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+
+
 class StockInfo(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     symbol: str = Field(index=True, unique=True)
@@ -142,7 +186,10 @@ class RawMarketData(SQLModel, table=True):
     market: str
     period: str  # '1d', '1m'
     fetch_time: datetime = Field(default_factory=datetime.utcnow)
-    payload: str  # JSON serialized string
+    payload: str = ""  # JSON serialized string (payload_format=0，旧数据)
+    payload_blob: Optional[bytes] = None  # Arrow IPC + zstd (payload_format=1)，见 raw_payload.py
+    payload_format: int = Field(default=0)
+    content_hash: Optional[str] = Field(default=None, index=True)  # 数据内容 sha256，用于去重
     processed: bool = Field(default=False)
     error_log: Optional[str] = None
 
@@ -3,6 +3,7 @@ from database import engine, create_db_and_tables
 from models import StockInfo
 import akshare as ak
 import pandas as pd
+from datetime import datetime
 
 def populate_stock_info():
     create_db_and_tables()
@@ -18,11 +19,11 @@ def populate_stock_info():
         print(f"Fetched {len(df)} stocks. Saving to DB...")
         
         with Session(engine) as session:
-            # clear existing? No, maybe upsert. 
-            # For simplicity, clear first to avoid duplicates if re-run
-            # session.exec("DELETE FROM stockinfo") # unsafe
+            # 一次取出已有记录 (symbol -> StockInfo)，避免逐行查询
+            existing = {info.symbol: info for info in session.exec(select(StockInfo)).all()}
             
             count = 0
+            renamed = 0
             for _, row in df.iterrows():
                 try:
                     code = str(row['代码'])
@@ -38,20 +39,23 @@ def populate_stock_info():
                     elif code.startswith("4") or code.startswith("8"):
                         symbol = f"{code}.bj"
                     
-                    # Check existing
-                    existing = session.exec(select(StockInfo).where(StockInfo.symbol == symbol)).first()
-                    if not existing:
-                        new_info = StockInfo(symbol=symbol, name=name, market=market)
-                        session.add(new_info)
+                    info = existing.get(symbol)
+                    if info is None:
+                        info = StockInfo(symbol=symbol, name=name, market=market)
+                        session.add(info)
+                        existing[symbol] = info
                         count += 1
-                        
-                    if count % 100 == 0:
-                        session.commit()
-                        print(f"Processed {count}...")
+                    elif info.name != name:
+                        # 改名 (如 ST 摘帽) 时刷新 updated_at，搜索索引据此增量更新
+                        info.name = name
+                        info.updated_at = datetime.utcnow()
+                        session.add(info)
+                        renamed += 1
                 except:
                     continue
             session.commit()
-            print(f"Done. Added {count} new stocks to Search DB.")
+            print(f"Done. Added {count} new stocks, renamed {renamed} in Search DB.")
+            print("Running API servers pick up the changes on their next search index refresh (search_index.py).")
 
     except Exception as e:
         print(f"Error: {e}")
@@ -1,174 +1,195 @@
 """
 请求限流器 (Rate Limiter)
 防止过度请求数据源被拉黑
+
+实现要点:
+1. Source级别: 每个数据源一个令牌桶 (容量 = 每分钟请求数 N)，每个令牌在被使用 60 秒后归还；
+   记录最近 N 次放行时间，第 N+1 次请求不早于其中最早一次 + 60 秒，O(1)。
+   任意 60 秒窗口内最多 N 个请求 (桶满时允许一次突发 N 个)；同一数据源的放行时间按预约顺序单调不减
+2. Symbol级别: 同一symbol两次请求的最小间隔
+3. 预约式获取: 持锁只计算并登记本次请求的放行时间 (占用令牌与 symbol 时间槽)，在锁外等待，
+   被限流的请求不会阻塞其他 symbol / 数据源；async acquire() 用 asyncio.sleep 等待，不阻塞事件循环
+4. 时钟与 sleep 可注入，测试中用假时钟即可得到确定结果
 """
 
-import time
-from collections import defaultdict
-from datetime import datetime, timedelta
+import asyncio
 import threading
+import time
+from collections import defaultdict, deque
+
 
 class RateLimiter:
     """
     请求限流器
-    
+
     功能：
     1. Symbol级别限流：同一symbol两次请求最少间隔10秒
-    2. Source级别限流：每个数据源每分钟最多5个请求
+    2. Source级别限流：每个数据源任意60秒内最多5个请求 (令牌桶，允许突发至桶容量，令牌用后60秒归还)
     3. 指数退避：失败后延迟重试
+    4. 统计：请求数、被限流次数、累计 / 最大等待时间 (总计与按数据源)
     """
-    
-    def __init__(self, symbol_interval=10, max_requests_per_minute=5):
+
+    def __init__(self, symbol_interval=10, max_requests_per_minute=5,
+                 clock=time.monotonic, sleep=time.sleep, async_sleep=asyncio.sleep):
         """
         初始化限流器
-        
+
         Args:
             symbol_interval: 同symbol请求最小间隔（秒）
-            max_requests_per_minute: 每分钟最大请求数
+            max_requests_per_minute: 任意60秒窗口内的最大请求数 (令牌桶容量)
+            clock / sleep / async_sleep: 时钟与等待函数 (测试时注入假时钟)
         """
         self.symbol_interval = symbol_interval
         self.max_requests_per_minute = max_requests_per_minute
-        
-        # Symbol级别：记录最后请求时间
+        self._clock = clock
+        self._sleep = sleep
+        self._async_sleep = async_sleep
+
+        # 令牌归还周期 (秒)
+        self._window = 60.0
+
+        # Symbol级别：最近一次 (已预约的) 请求放行时间
         self.last_request_time = {}  # {symbol: timestamp}
-        
-        # Source级别：记录每分钟的请求次数
-        self.source_requests = defaultdict(list)  # {source: [timestamp, ...]}
-        
-        # 线程锁
+
+        # Source级别：最近 N 次 (已预约的) 放行时间，升序
+        self._source_log = {}  # {source: deque(maxlen=N)}
+
+        # 统计
+        self._stats = self._new_counters()
+        self._source_stats = defaultdict(self._new_counters)
+
+        # 线程锁 (只保护状态计算，不在持锁时等待)
         self.lock = threading.Lock()
-    
+
+    @staticmethod
+    def _new_counters() -> dict:
+        return {'requests': 0, 'throttled': 0, 'total_wait_s': 0.0, 'max_wait_s': 0.0}
+
+    def _schedule(self, symbol: str, source: str, now: float) -> float:
+        """本次请求的最早放行时间 (需持锁，不修改状态)"""
+        start = now
+        if symbol in self.last_request_time:
+            start = max(start, self.last_request_time[symbol] + self.symbol_interval)
+        log = self._source_log.get(source) if source else None
+        if log:
+            start = max(start, log[-1])
+            if len(log) == self.max_requests_per_minute:
+                start = max(start, log[0] + self._window)
+        return start
+
+    def reserve(self, symbol: str, source: str = None) -> float:
+        """
+        预约一次请求 (不等待)：登记放行时间并占用令牌，返回调用方需要等待的秒数
+        预约后应当发出请求；预约不可撤销
+        """
+        with self.lock:
+            now = self._clock()
+            start = self._schedule(symbol, source, now)
+            wait_time = start - now
+
+            self.last_request_time[symbol] = start
+            if source:
+                if source not in self._source_log:
+                    self._source_log[source] = deque(maxlen=self.max_requests_per_minute)
+                self._source_log[source].append(start)
+
+            counters = [self._stats] + ([self._source_stats[source]] if source else [])
+            for c in counters:
+                c['requests'] += 1
+                if wait_time > 0:
+                    c['throttled'] += 1
+                    c['total_wait_s'] += wait_time
+                    c['max_wait_s'] = max(c['max_wait_s'], wait_time)
+            return wait_time
+
     def wait_if_needed(self, symbol: str, source: str = None) -> float:
         """
-        检查并等待至满足限流条件
-        
+        检查并等待至满足限流条件 (在锁外等待)
+
         Args:
             symbol: 股票/指数代码
             source: 数据源名称（如'akshare', 'yfinance'）
-        
+
         Returns:
             实际等待的秒数
         """
-        with self.lock:
-            wait_time = 0
-            now = time.time()
-            
-            # 1. Symbol级别限流
-            if symbol in self.last_request_time:
-                elapsed = now - self.last_request_time[symbol]
-                if elapsed < self.symbol_interval:
-                    wait_time = self.symbol_interval - elapsed
-            
-            # 2. Source级别限流（如果指定了source）
-            if source:
-                # 清理1分钟前的记录
-                one_minute_ago = now - 60
-                self.source_requests[source] = [
-                    t for t in self.source_requests[source] 
-                    if t > one_minute_ago
-                ]
-                
-                # 检查是否超过限制
-                if len(self.source_requests[source]) >= self.max_requests_per_minute:
-                    # 计算需要等待到最早的请求过期
-                    oldest = self.source_requests[source][0]
-                    source_wait = 60 - (now - oldest) + 0.1  # 加0.1秒buffer
-                    wait_time = max(wait_time, source_wait)
-            
-            # 执行等待
-            if wait_time > 0:
-                time.sleep(wait_time)
-                now = time.time()  # 更新当前时间
-            
-            # 记录本次请求
-            self.last_request_time[symbol] = now
-            if source:
-                self.source_requests[source].append(now)
-            
-            return wait_time
-    
+        wait_time = self.reserve(symbol, source)
+        if wait_time > 0:
+            self._sleep(wait_time)
+        return max(wait_time, 0)
+
+    async def acquire(self, symbol: str, source: str = None) -> float:
+        """
+        wait_if_needed 的 asyncio 版本：用 asyncio.sleep 等待，不阻塞事件循环
+        注意：等待期间被取消时，已预约的令牌 / 时间槽不会退回
+        """
+        wait_time = self.reserve(symbol, source)
+        if wait_time > 0:
+            await self._async_sleep(wait_time)
+        return max(wait_time, 0)
+
     def can_request(self, symbol: str, source: str = None) -> tuple:
         """
-        检查是否可以请求（不等待）
-        
+        检查是否可以请求（不等待、不占用令牌）
+
         Args:
             symbol: 股票/指数代码
             source: 数据源名称
-        
+
         Returns:
             (bool, float): (是否可以请求, 需要等待的秒数)
         """
         with self.lock:
-            now = time.time()
-            wait_time = 0
-            
-            # Symbol级别检查
-            if symbol in self.last_request_time:
-                elapsed = now - self.last_request_time[symbol]
-                if elapsed < self.symbol_interval:
-                    wait_time = self.symbol_interval - elapsed
-            
-            # Source级别检查
-            if source:
-                one_minute_ago = now - 60
-                recent_requests = [
-                    t for t in self.source_requests.get(source, [])
-                    if t > one_minute_ago
-                ]
-                
-                if len(recent_requests) >= self.max_requests_per_minute:
-                    oldest = recent_requests[0]
-                    source_wait = 60 - (now - oldest)
-                    wait_time = max(wait_time, source_wait)
-            
+            now = self._clock()
+            wait_time = max(self._schedule(symbol, source, now) - now, 0)
             return (wait_time == 0, wait_time)
-    
+
     def backoff_delay(self, retry_count: int, base_delay: float = 1.0) -> float:
         """
         指数退避延迟
-        
+
         Args:
             retry_count: 重试次数（0, 1, 2, ...）
             base_delay: 基础延迟（秒）
-        
+
         Returns:
             实际延迟时间（秒），最多60秒
         """
         delay = min(base_delay * (2 ** retry_count), 60)
-        time.sleep(delay)
+        self._sleep(delay)
         return delay
-    
+
     def reset_symbol(self, symbol: str):
         """重置某个symbol的限流记录"""
         with self.lock:
             if symbol in self.last_request_time:
                 del self.last_request_time[symbol]
-    
+
     def reset_source(self, source: str):
-        """重置某个source的限流记录"""
+        """重置某个source的限流记录 (令牌桶回满)"""
         with self.lock:
-            if source in self.source_requests:
-                del self.source_requests[source]
-    
+            self._source_log.pop(source, None)
+
     def get_stats(self) -> dict:
         """获取限流统计信息"""
         with self.lock:
-            now = time.time()
-            one_minute_ago = now - 60
-            
+            now = self._clock()
+
             stats = {
                 'total_symbols_tracked': len(self.last_request_time),
+                **self._stats,
                 'sources': {}
             }
-            
-            for source, timestamps in self.source_requests.items():
-                recent = [t for t in timestamps if t > one_minute_ago]
+
+            for source in set(self._source_log) | set(self._source_stats):
+                # 桶内剩余令牌 = 容量 - 最近 60 秒内 (含已预约未到) 的放行次数
+                in_use = sum(1 for t in self._source_log.get(source, ()) if t > now - self._window)
                 stats['sources'][source] = {
-                    'requests_last_minute': len(recent),
                     'limit': self.max_requests_per_minute,
-                    'available': self.max_requests_per_minute - len(recent)
+                    'available': self.max_requests_per_minute - in_use,
+                    **self._source_stats[source],
                 }
-            
+
             return stats
 
 
@@ -0,0 +1,206 @@
+"""
+Raw Payload Codec (原始数据载荷编解码)
+=====================================
+
+功能说明:
+1. RawMarketData 的行情载荷以列式压缩二进制存储 (Arrow IPC stream + zstd)，取代 JSON 文本。
+2. ETL 直接解码为 DataFrame (Arrow -> pandas)，不经过 json.loads / list-of-dict 中间对象。
+3. 内容哈希去重与已处理 Raw 的保留策略。
+
+核心逻辑:
+I. 存储格式 (payload_format 列)
+   - 0 = JSON 文本 (payload 列，旧数据 / 无法转 Arrow 的混合类型数据)
+   - 1 = Arrow IPC + zstd (payload_blob 列，payload 置空串)
+   - 时间列统一存为无时区 datetime (带时区的转为 UTC)，与旧 JSON 毫秒时间戳解析结果一致
+
+II. 内容哈希 (content_hash 列)
+   - 对数据内容 (列名 + 逐行哈希) 求 sha256，与编码格式、抓取时间无关
+   - 同一 (symbol, market, period, content_hash) 再次入库时复用已有记录：刷新 fetch_time 并重置为未处理，
+     不重复存储；ETL 仍会按新的抓取时间重新判断收盘准入
+
+III. 保留策略
+   - purge_processed_raw(): 删除已处理且早于 RAW_RETENTION_DAYS 天的 Raw，
+     每个 (symbol, market, period) 保留最新一条以便重跑 ETL；未处理 / 失败的记录不删
+
+作者: Antigravity
+日期: 2026-01-23
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from sqlalchemy import text
+from sqlmodel import select
+
+logger = logging.getLogger("RawPayload")
+
+RAW_FORMAT_JSON = 0
+RAW_FORMAT_ARROW = 1
+
+RAW_TABLE = "rawmarketdata"
+RAW_RETENTION_DAYS = int(os.getenv("RAW_RETENTION_DAYS", "30"))
+
+_IPC_OPTIONS = ipc.IpcWriteOptions(compression="zstd")
+
+
+# ============================================================
+# I. 编码
+# ============================================================
+
+def to_frame(data) -> pd.DataFrame:
+    """DataFrame / list of dict / {'data': [...]} 包装 -> DataFrame (不含索引)"""
+    if isinstance(data, pd.DataFrame):
+        return data.reset_index(drop=True)
+    if isinstance(data, dict) and 'data' in data:
+        data = data['data']
+    return pd.DataFrame(list(data or []))
+
+
+def _arrow_ready(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=str)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.DatetimeTZDtype):
+            df[col] = df[col].dt.tz_convert('UTC').dt.tz_localize(None)
+    return df
+
+
+def content_hash(df: pd.DataFrame) -> str:
+    """数据内容哈希 (列名 + 逐行哈希)，与编码格式无关"""
+    h = hashlib.sha256()
+    h.update("\x1f".join(map(str, df.columns)).encode())
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError:
+        # 单元格含 dict / list 等不可哈希对象时退回文本
+        h.update(df.to_json(orient='records', date_format='iso').encode())
+    return h.hexdigest()
+
+
+def pack_payload(data) -> dict:
+    """
+    行情数据 -> RawMarketData 载荷字段
+    Returns: {"payload", "payload_blob", "payload_format", "content_hash"}，可直接 RawMarketData(**fields)
+    """
+    df = _arrow_ready(to_frame(data))
+    digest = content_hash(df)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with ipc.new_stream(sink, table.schema, options=_IPC_OPTIONS) as writer:
+            writer.write_table(table)
+        return {
+            "payload": "",
+            "payload_blob": sink.getvalue().to_pybytes(),
+            "payload_format": RAW_FORMAT_ARROW,
+            "content_hash": digest,
+        }
+    except (pa.ArrowException, ValueError, TypeError) as e:
+        # 混合类型列等无法转 Arrow 时保留 JSON
+        logger.warning(f"Arrow encode failed, storing JSON payload: {e}")
+        return {
+            "payload": df.to_json(orient='records', date_format='iso', force_ascii=False),
+            "payload_blob": None,
+            "payload_format": RAW_FORMAT_JSON,
+            "content_hash": digest,
+        }
+
+
+# ============================================================
+# II. 解码
+# ============================================================
+
+def decode_payload(raw) -> Optional[pd.DataFrame]:
+    """RawMarketData -> DataFrame；载荷格式无法识别时返回 None"""
+    fmt = getattr(raw, 'payload_format', RAW_FORMAT_JSON) or RAW_FORMAT_JSON
+    if fmt == RAW_FORMAT_ARROW:
+        with ipc.open_stream(pa.py_buffer(raw.payload_blob)) as reader:
+            return reader.read_all().to_pandas()
+
+    # 旧 JSON 载荷: list 或 {'symbol':..., 'data': [...]} 包装
+    payload_data = json.loads(raw.payload)
+    if isinstance(payload_data, dict) and 'data' in payload_data:
+        payload_data = payload_data['data']
+    if not isinstance(payload_data, list):
+        return None
+    return pd.DataFrame(payload_data)
+
+
+# ============================================================
+# III. 入库 / 去重
+# ============================================================
+
+def store_raw(session, raw):
+    """
+    写入一条 Raw 记录 (已 commit / refresh)，返回实际使用的记录
+    同一 (symbol, market, period, content_hash) 已存在时复用该记录：刷新 fetch_time、重置为未处理，新记录不落库
+    """
+    if raw.content_hash:
+        model = type(raw)
+        existing = session.exec(
+            select(model).where(
+                model.symbol == raw.symbol,
+                model.market == raw.market,
+                model.period == raw.period,
+                model.content_hash == raw.content_hash,
+            ).order_by(model.id.desc()).limit(1)
+        ).first()
+        if existing is not None:
+            logger.info(f"Duplicate raw payload for {raw.symbol} ({raw.period}), reusing raw_id={existing.id}")
+            existing.fetch_time = raw.fetch_time or datetime.now()
+            existing.source = raw.source
+            existing.processed = False
+            existing.error_log = None
+            raw = existing
+
+    session.add(raw)
+    session.commit()
+    session.refresh(raw)
+    return raw
+
+
+# ============================================================
+# IV. 表结构 / 保留策略
+# ============================================================
+
+def ensure_raw_columns(engine):
+    """旧库补齐 payload_blob / payload_format / content_hash 列 (create_all 不会给已有表加列)"""
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({RAW_TABLE})"))}
+        if not columns:
+            return
+        if 'payload_blob' not in columns:
+            conn.execute(text(f"ALTER TABLE {RAW_TABLE} ADD COLUMN payload_blob BLOB"))
+        if 'payload_format' not in columns:
+            conn.execute(text(f"ALTER TABLE {RAW_TABLE} ADD COLUMN payload_format INTEGER NOT NULL DEFAULT 0"))
+        if 'content_hash' not in columns:
+            conn.execute(text(f"ALTER TABLE {RAW_TABLE} ADD COLUMN content_hash VARCHAR"))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{RAW_TABLE}_content_hash ON {RAW_TABLE} (content_hash)"
+        ))
+
+
+def purge_processed_raw(engine=None, keep_days: int = None) -> int:
+    """删除已处理且超过保留期的 Raw (每个 symbol/market/period 保留最新一条)，返回删除条数"""
+    if engine is None:
+        from database import engine
+    keep_days = RAW_RETENTION_DAYS if keep_days is None else keep_days
+    cutoff = datetime.now() - timedelta(days=keep_days)
+    with engine.begin() as conn:
+        result = conn.execute(text(f"""
+            DELETE FROM {RAW_TABLE}
+            WHERE processed = 1 AND fetch_time < :cutoff
+              AND id NOT IN (
+                  SELECT MAX(id) FROM {RAW_TABLE} WHERE processed = 1
+                  GROUP BY symbol, market, period
+              )
+        """), {"cutoff": cutoff.strftime('%Y-%m-%d %H:%M:%S.%f')})
+        deleted = result.rowcount or 0
+    logger.info(f"Purged {deleted} processed raw records older than {keep_days} days")
+    return deleted
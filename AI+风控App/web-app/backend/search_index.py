@@ -0,0 +1,312 @@
+"""
+Symbol Search Index (内存代码 / 名称搜索索引)
+=============================================
+
+功能说明:
+/api/search 原先对 StockInfo 做 `symbol LIKE %q% OR name LIKE %q%` 全表扫描，
+本地结果少于 3 条时还会在请求内同步访问腾讯 smartbox。这里改为进程内索引，常见查询亚毫秒返回。
+
+核心逻辑:
+I. 数据来源
+   - StockInfo (populate_search_db.py 写入的 A 股列表等) + symbols_config.SYMBOLS_CONFIG (系统指数 / ADR)
+
+II. 索引结构
+   1. 代码前缀 Trie: 键为小写完整代码 (600519.sh) 与去后缀 / 去 ^ 的代码 (600519, dji)；
+      节点缓存按排序键排好的 id 列表，短前缀 (如 "6") 也只取前 limit 个，不必对上千候选逐一排序
+   2. 名称 n-gram: 名称 (小写) 的单字 / 二元组倒排；多字查询取各二元组集合交集后再做子串校验
+   3. 拼音首字母 Trie: 中文名称的首字母 (贵州茅台 -> gzmt)，需要可选依赖 pypinyin，未安装时跳过
+
+III. 排序
+   - (匹配质量, 市场优先级, 类型优先级, 名称长度, 代码)
+   - 匹配质量: 代码完全相等 < 代码前缀 < 名称前缀 / 首字母完全相等 < 名称包含 / 首字母前缀
+   - 市场 CN < HK < US < 其他；类型 index < stock < etf < trust / fund < 其他
+
+IV. 增量刷新
+   - 首次查询时全量加载；之后每 SEARCH_REFRESH_INTERVAL 秒按 (id, updated_at) 水位只加载新增 / 改名的行
+   - populate_search_db.py 新增或改名时写 updated_at，运行后服务端下一次刷新即可看到
+
+作者: Antigravity
+日期: 2026-01-23
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+logger = logging.getLogger("SearchIndex")
+
+STOCKINFO_TABLE = "stockinfo"
+SEARCH_REFRESH_INTERVAL = float(os.getenv("SEARCH_REFRESH_INTERVAL", "30"))
+
+MARKET_PRIORITY = {'CN': 0, 'HK': 1, 'US': 2}
+TYPE_PRIORITY = {'index': 0, 'stock': 1, 'etf': 2, 'trust': 3, 'fund': 3}
+
+MATCH_CODE_EXACT, MATCH_CODE_PREFIX, MATCH_NAME_PREFIX, MATCH_NAME_CONTAINS = range(4)
+
+
+def pinyin_initials(name: str) -> str:
+    """中文名称 -> 拼音首字母 (非汉字原样保留小写)；pypinyin 未安装时返回空串"""
+    if lazy_pinyin is None or not any('一' <= ch <= '鿿' for ch in name):
+        return ''
+    return ''.join(p[0] for p in lazy_pinyin(name, style=Style.FIRST_LETTER) if p).lower()
+
+
+def code_keys(symbol: str) -> set:
+    """代码的可搜索形式：完整代码、去 ^ / 去市场后缀的代码"""
+    s = symbol.lower()
+    keys = {s, s.lstrip('^')}
+    if '.' in s:
+        keys.add(s.split('.')[0].lstrip('^'))
+    if ':' in s:
+        keys.add(s.split(':')[-1])
+    return {k for k in keys if k}
+
+
+def _guess_type(name: str) -> str:
+    upper = name.upper()
+    if 'ETF' in upper:
+        return 'etf'
+    if 'LOF' in upper or '基金' in name:
+        return 'fund'
+    if '指数' in name:
+        return 'index'
+    return 'stock'
+
+
+class _Node:
+    __slots__ = ('children', 'ids', 'ranked', 'ranked_version')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+        self.ranked = None
+        self.ranked_version = -1
+
+
+class _Trie:
+    """前缀 Trie：每个节点保存经过它的条目 id，并缓存按排序键排好的 id 列表 (索引变更后惰性重建)"""
+    __slots__ = ('root',)
+
+    def __init__(self):
+        self.root = _Node()
+
+    def add(self, key: str, entry_id: int):
+        node = self.root
+        for ch in key:
+            node = node.children.setdefault(ch, _Node())
+            node.ids.add(entry_id)
+
+    def discard(self, key: str, entry_id: int):
+        node = self.root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return
+            node.ids.discard(entry_id)
+
+    def node(self, key: str) -> Optional[_Node]:
+        node = self.root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def prefix(self, key: str) -> set:
+        node = self.node(key)
+        return node.ids if node is not None else set()
+
+
+class SearchIndex:
+    """代码前缀 / 名称 n-gram / 拼音首字母 的内存索引 (线程安全)"""
+
+    def __init__(self, refresh_interval: float = SEARCH_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._entries: Dict[int, Dict] = {}
+        self._by_symbol: Dict[str, int] = {}
+        self._codes = _Trie()
+        self._initials = _Trie()
+        self._grams: Dict[str, set] = {}
+        self._exact_codes: Dict[str, set] = {}
+        self._version = 0
+        self._next_id = 0
+        self._max_row_id = 0
+        self._max_updated_at = ''
+        self._checked_at: Optional[float] = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------
+
+    def upsert(self, symbol: str, name: str, market: str, type_: Optional[str] = None, aliases: Iterable[str] = ()):
+        """新增或替换一条 (同 symbol 先移除旧索引键)"""
+        name = name or symbol
+        with self._lock:
+            old_id = self._by_symbol.get(symbol)
+            if old_id is not None:
+                self._remove_id(old_id)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            names = [n.lower() for n in (name, *aliases) if n]
+            entry = {
+                'symbol': symbol, 'name': name, 'market': market, 'type': type_ or _guess_type(name),
+                'codes': code_keys(symbol), 'names': names, 'initials': pinyin_initials(name),
+            }
+            entry['rank'] = (MARKET_PRIORITY.get(market, 9), TYPE_PRIORITY.get(entry['type'], 9), len(name), symbol)
+            self._entries[entry_id] = entry
+            self._by_symbol[symbol] = entry_id
+            self._version += 1
+
+            for key in entry['codes']:
+                self._codes.add(key, entry_id)
+                self._exact_codes.setdefault(key, set()).add(entry_id)
+            if entry['initials']:
+                self._initials.add(entry['initials'], entry_id)
+            for gram in self._name_grams(names):
+                self._grams.setdefault(gram, set()).add(entry_id)
+
+    def remove(self, symbol: str):
+        with self._lock:
+            entry_id = self._by_symbol.get(symbol)
+            if entry_id is not None:
+                self._remove_id(entry_id)
+
+    def _remove_id(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        del self._by_symbol[entry['symbol']]
+        self._version += 1
+        for key in entry['codes']:
+            self._codes.discard(key, entry_id)
+            self._exact_codes.get(key, set()).discard(entry_id)
+        if entry['initials']:
+            self._initials.discard(entry['initials'], entry_id)
+        for gram in self._name_grams(entry['names']):
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(entry_id)
+
+    @staticmethod
+    def _name_grams(names: List[str]) -> set:
+        grams = set()
+        for n in names:
+            grams.update(n)
+            grams.update(n[i:i + 2] for i in range(len(n) - 1))
+        return grams
+
+    # ------------------------------------------------------------
+    # 加载 / 增量刷新
+    # ------------------------------------------------------------
+
+    def load_config(self):
+        """symbols_config 中的系统指数 / 股票"""
+        from symbols_config import SYMBOLS_CONFIG
+        for symbol, cfg in SYMBOLS_CONFIG.items():
+            self.upsert(symbol, cfg.get('name') or symbol, cfg.get('market', 'US'), cfg.get('type'),
+                        aliases=[cfg['name_en']] if cfg.get('name_en') else ())
+
+    def refresh(self, conn, force: bool = False) -> int:
+        """
+        从 StockInfo 加载新增 / 更新的行 (首次为全量)，返回本次加载行数
+        未到刷新间隔且非 force 时直接返回 0
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+                return 0
+            first = self._checked_at is None
+            self._checked_at = now
+            if first:
+                self.load_config()
+
+            rows = conn.execute(text(f"""
+                SELECT id, symbol, name, market, updated_at FROM {STOCKINFO_TABLE}
+                WHERE id > :max_id OR updated_at > :since
+            """), {'max_id': self._max_row_id, 'since': self._max_updated_at}).all()
+
+            for row_id, symbol, name, market, updated_at in rows:
+                self.upsert(symbol, name, market)
+                self._max_row_id = max(self._max_row_id, row_id)
+                if updated_at is not None:
+                    self._max_updated_at = max(self._max_updated_at, str(updated_at))
+            if rows:
+                logger.info(f"Search index {'loaded' if first else 'refreshed'}: +{len(rows)} rows, {len(self)} total")
+            return len(rows)
+
+    # ------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------
+
+    def _name_quality(self, entry: Dict, q: str) -> int:
+        if any(n.startswith(q) for n in entry['names']) or entry['initials'] == q:
+            return MATCH_NAME_PREFIX
+        return MATCH_NAME_CONTAINS
+
+    def _name_candidates(self, q: str) -> set:
+        if len(q) == 1:
+            return set(self._grams.get(q, ()))
+        sets = []
+        for i in range(len(q) - 1):
+            ids = self._grams.get(q[i:i + 2])
+            if not ids:
+                return set()
+            sets.append(ids)
+        sets.sort(key=len)
+        found = set(sets[0]).intersection(*sets[1:])
+        return {i for i in found if any(q in n for n in self._entries[i]['names'])}
+
+    def _ranked_prefix(self, q: str) -> List[int]:
+        """代码前缀命中的 id，按排序键升序 (节点缓存，索引未变时直接复用)"""
+        node = self._codes.node(q)
+        if node is None:
+            return []
+        if node.ranked_version != self._version:
+            node.ranked = sorted(node.ids, key=lambda i: self._entries[i]['rank'])
+            node.ranked_version = self._version
+        return node.ranked
+
+    def search(self, q: str, limit: int = 10) -> List[Dict]:
+        """返回 [{symbol, name, market, type}]，按匹配质量与市场 / 类型优先级排序"""
+        q = (q or '').strip().lower()
+        if not q or limit <= 0:
+            return []
+        with self._lock:
+            entries = self._entries
+            quality: Dict[int, int] = {}
+
+            # 1. 代码：完全匹配 + 前缀 (已排序，只取前 limit 个)
+            for i in self._exact_codes.get(q, ()):
+                quality[i] = MATCH_CODE_EXACT
+            for i in self._ranked_prefix(q)[:limit + len(quality)]:
+                quality.setdefault(i, MATCH_CODE_PREFIX)
+
+            # 2. 名称 n-gram / 拼音首字母 (代码已命中的条目质量更高，跳过)
+            names = (self._name_candidates(q) | self._initials.prefix(q)) - quality.keys()
+            for i in heapq.nsmallest(limit, names, key=lambda i: (self._name_quality(entries[i], q), entries[i]['rank'])):
+                quality[i] = self._name_quality(entries[i], q)
+
+            best = sorted(quality, key=lambda i: (quality[i], entries[i]['rank']))[:limit]
+            return [
+                {k: entries[i][k] for k in ('symbol', 'name', 'market', 'type')}
+                for i in best
+            ]
+
+
+search_index = SearchIndex()
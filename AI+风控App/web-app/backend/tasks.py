@@ -86,17 +86,20 @@ async def fetch_market_data(market: str, force: bool = False) -> bool:
 
         logger.info(f"Fetching data for {len(specific_symbols)} symbols in {market}...")
 
-        # 4. Execute Fetch (Threaded)
-        def run_fetcher():
-            fetcher = DataFetcher()
-            # fetch_all_stocks handles the specific_symbols filtering
-            fetcher.fetch_all_stocks(
-                periods=['1', '5', '15', '30'], 
-                target_markets=[market],
-                specific_symbols=specific_symbols
-            )
-            
-        await asyncio.to_thread(run_fetcher)
+        # 4. Execute Fetch (bounded-parallel, see market_sync.py)
+        from market_sync import MarketSyncEngine, log_report
+        fetcher = DataFetcher()
+        sync_engine = MarketSyncEngine(
+            fetcher.fetch_for_sync,
+            rate_limiter=fetcher.rate_limiter,
+        )
+        report = await sync_engine.run({s: market for s in specific_symbols})
+        log_report(report)
+
+        # 全部失败 (不含休市返回空) 视为本次同步失败，由 wrapper_daily_sync 安排重试
+        if report['failed'] and not (report['success'] or report['empty']):
+            logger.error(f"Market data sync for {market} failed for all {report['failed']} symbols.")
+            return False
         logger.info(f"Market data sync for {market} completed successfully.")
         return True
 
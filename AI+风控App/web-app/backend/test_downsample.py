@@ -0,0 +1,155 @@
+"""
+测试图表序列降采样 (downsample.py)
+
+验证:
+1. LTTB 保留首尾点、返回升序原始下标，并保住单日尖峰
+2. OHLC 聚合: 每桶 High/Low 为桶内极值，Open/Close 为首/末根，Volume 合计，NaN 忽略
+3. /api/market-data/{symbol} 对 20 年日线 (5,040 根) 传 max_points=500 时响应体积下降约一个数量级
+4. /api/market-data/{symbol} 的 start / end / limit / fields / since 参数 (临时库)
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from downsample import lttb_indices, ohlc_buckets
+
+
+def _series(n=5040, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return close * 0.999, close * 1.01, close * 0.99, close, rng.integers(1e6, 1e7, n).astype(float)
+
+
+def test_lttb():
+    print("=" * 70)
+    print("测试1: LTTB")
+    print("=" * 70)
+
+    _, _, _, close, _ = _series()
+    close[2500] *= 1.5                       # 单日尖峰
+    idx = lttb_indices(close, 500)
+    assert len(idx) == 500 and idx[0] == 0 and idx[-1] == len(close) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert 2500 in idx, "尖峰应被保留"
+    assert np.array_equal(lttb_indices(close[:100], 500), np.arange(100))
+    print("✅ LTTB 选点正确")
+
+
+def test_ohlc():
+    print("\n" + "=" * 70)
+    print("测试2: OHLC 聚合")
+    print("=" * 70)
+
+    o, h, l, c, v = _series(n=1000)
+    h[10] = np.nan
+    last_idx, bo, bh, bl, bc, bv = ohlc_buckets(o, h, l, c, v, 100)
+    assert len(last_idx) == 100 and last_idx[-1] == 999
+    starts = np.append(0, last_idx[:-1] + 1)
+    for k, (s, e) in enumerate(zip(starts, last_idx + 1)):
+        assert bo[k] == o[s] and bc[k] == c[e - 1]
+        assert bh[k] == np.nanmax(h[s:e]) and bl[k] == np.min(l[s:e])
+        assert bv[k] == v[s:e].sum()
+    print("✅ 桶内极值 / 首末价 / 成交量合计正确")
+
+
+def _client(n=5040):
+    """临时内存库写入 n 根 AAPL 日线 (前一半带指标)，返回覆盖了 get_session 的 TestClient"""
+    from fastapi.testclient import TestClient
+    from sqlalchemy.pool import StaticPool
+    from sqlmodel import SQLModel, Session, create_engine
+
+    import main
+    from database import get_session
+    from models import MarketDataDaily, MarketIndicatorDaily
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+
+    o, h, l, c, v = _series(n)
+    days = pd.bdate_range("2005-01-03", periods=n).strftime("%Y-%m-%d 16:00:00")
+    symbol = main.normalize_symbol_db("AAPL", "US")
+    with Session(engine) as session:
+        for i, ts in enumerate(days):
+            # updated_at = 现在：不触发请求内的后台同步
+            session.add(MarketDataDaily(
+                symbol=symbol, market="US", timestamp=ts, open=o[i], high=h[i], low=l[i], close=c[i],
+                volume=int(v[i]), change=0.0, pe=20.0, updated_at=datetime.now()
+            ))
+            if i < n // 2:
+                session.add(MarketIndicatorDaily(
+                    symbol=symbol, market="US", timestamp=ts, bar_index=i, close=c[i],
+                    ema12=c[i], ema26=c[i], dif=0.1, dea=0.05, hist=0.05
+                ))
+        session.commit()
+
+    def _session():
+        with Session(engine) as session:
+            yield session
+
+    main.app.dependency_overrides[get_session] = _session
+    return TestClient(main.app), list(days)
+
+
+def test_downsampled_response():
+    print("\n" + "=" * 70)
+    print("测试3: 20 年日线接口响应体积")
+    print("=" * 70)
+
+    client, days = _client()
+    full = client.get("/api/market-data/AAPL", params={"market": "US"})
+    small = client.get("/api/market-data/AAPL", params={"market": "US", "max_points": 500})
+    body = small.json()
+    assert full.json()["meta"]["returned"] == 5040
+    assert body["meta"] == {"total": 5040, "returned": 500, "downsampled": "ohlc", "last_timestamp": days[-1]}
+    assert body["data"][-1]["date"] == days[-1]
+    assert body["data"][0]["macd"] == 0.1 and body["data"][-1]["macd"] is None
+
+    lttb = client.get("/api/market-data/AAPL", params={"market": "US", "max_points": 500, "downsample": "lttb"}).json()
+    assert lttb["meta"]["downsampled"] == "lttb" and len(lttb["data"]) == 500
+
+    print(f"   全量 {len(full.content) / 1024:.0f} KB -> 500 点 {len(small.content) / 1024:.0f} KB")
+    # 点数降到 1/10；桶行的 change / pct_change 按桶重算，单行略长
+    assert len(small.content) * 8 <= len(full.content)
+    print("✅ 降采样响应正确且体积下降约一个数量级")
+
+
+def test_query_params():
+    print("\n" + "=" * 70)
+    print("测试4: start / end / limit / fields / since")
+    print("=" * 70)
+
+    client, days = _client(n=60)
+
+    def get(**params):
+        return client.get("/api/market-data/AAPL", params={"market": "US", **params}).json()
+
+    # start / end 含两端，end 只给日期时包含当天收盘
+    body = get(start=days[10][:10], end=days[19][:10])
+    assert [r["date"] for r in body["data"]] == days[10:20]
+
+    # limit: 区间内最近 N 根，仍为升序
+    body = get(end=days[29][:10], limit=5)
+    assert [r["date"] for r in body["data"]] == days[25:30]
+
+    # fields: 只返回所选字段 (date 总是返回)，未知字段拒绝
+    body = get(fields="close,volume", limit=1)
+    assert list(body["data"][0]) == ["date", "close", "volume"]
+    body = get(fields="close,bogus")
+    assert body["status"] == "error" and "bogus" in body["message"]
+
+    # since: 只返回更新的 bar，不降采样；已是最新时返回空增量并回传游标
+    body = get(since=days[-5], max_points=3)
+    assert [r["date"] for r in body["data"]] == days[-4:]
+    assert body["meta"]["downsampled"] is None and body["meta"]["last_timestamp"] == days[-1]
+    body = get(since=days[-1])
+    assert body["status"] == "success" and body["data"] == [] and body["meta"]["last_timestamp"] == days[-1]
+    print("✅ 查询参数过滤正确")
+
+
+if __name__ == "__main__":
+    test_lttb()
+    test_ohlc()
+    test_downsampled_response()
+    test_query_params()
+    print("\n🎉 所有测试通过")
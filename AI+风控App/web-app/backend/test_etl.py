@@ -217,6 +217,112 @@ def test_etl_change_calculation():
     print("=" * 60)
     return True
 
+def test_etl_daily_batch_upsert():
+    """测试日线批量写入：多行payload一次upsert，缺失prev_close从库+本批补全"""
+    print("\n" + "=" * 60)
+    print("测试3: 日线批量upsert")
+    print("=" * 60)
+    
+    cleanup_test_data()
+    
+    # 库中已有一条记录 (open=7)，本批会覆盖其收盘价但保留open
+    with Session(engine) as session:
+        session.add(MarketDataDaily(
+            symbol='TEST_ETL', market='US', timestamp='2025-12-10 16:00:00',
+            open=7.0, high=7.0, low=7.0, close=95.0, volume=1
+        ))
+        session.commit()
+    
+    test_data = [
+        {'date': f'2025-12-{d:02d}', 'open': None, 'high': 101.0, 'low': 99.0, 'close': 100.0 + d, 'volume': 1000}
+        for d in (8, 9, 10, 11, 12)
+    ]
+    test_data[3].update(change=0.0, pct_change=0.0)   # 数据源显式给0时不重算
+    
+    with Session(engine) as session:
+        raw = RawMarketData(
+            source='test', symbol='TEST_ETL', market='US', period='1d',
+            payload=json.dumps(test_data), processed=False
+        )
+        session.add(raw)
+        session.commit()
+        session.refresh(raw)
+        ETLService.process_raw_data(raw.id)
+    
+    with Session(engine) as session:
+        rows = session.exec(
+            select(MarketDataDaily)
+            .where(MarketDataDaily.symbol == 'TEST_ETL')
+            .order_by(MarketDataDaily.timestamp)
+        ).all()
+    
+    got = [(r.timestamp, r.open, r.close, r.change, r.prev_close) for r in rows]
+    for g in got:
+        print(f"   {g}")
+    expected = [
+        ('2025-12-08 16:00:00', 108.0, 108.0, None, None),
+        ('2025-12-09 16:00:00', 109.0, 109.0, 1.0, 108.0),
+        ('2025-12-10 16:00:00', 7.0, 110.0, 1.0, 109.0),
+        ('2025-12-11 16:00:00', 111.0, 111.0, 0.0, 110.0),
+        ('2025-12-12 16:00:00', 112.0, 112.0, 1.0, 111.0),
+    ]
+    if got != expected:
+        print("❌ 批量upsert结果不符合预期")
+        return False
+    
+    print("\n" + "=" * 60)
+    print("✅ 测试3通过：日线批量upsert正确")
+    print("=" * 60)
+    return True
+
+def test_etl_daily_key_index_legacy_table():
+    """测试早期库 (无唯一键、有重复行)：先去重再补建唯一索引；补建失败时不记为已检查"""
+    print("\n" + "=" * 60)
+    print("测试4: 早期库补建唯一索引")
+    print("=" * 60)
+    
+    import etl_service
+    from sqlalchemy import create_engine, text
+    
+    legacy = create_engine("sqlite://")
+    with legacy.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE marketdatadaily (id INTEGER PRIMARY KEY, symbol TEXT, market TEXT, timestamp TEXT, "
+            "open REAL, high REAL, low REAL, close REAL, volume INTEGER, change REAL, pct_change REAL, "
+            "prev_close REAL, updated_at TEXT)"
+        ))
+        conn.execute(text(
+            "INSERT INTO marketdatadaily (symbol, market, timestamp, close) VALUES "
+            "('TEST_ETL', 'US', '2025-12-10 16:00:00', 1.0), ('TEST_ETL', 'US', '2025-12-10 16:00:00', 2.0), "
+            "('TEST_ETL', 'US', '2025-12-11 16:00:00', 3.0)"
+        ))
+    
+    etl_service._daily_index_checked = False
+    with legacy.begin() as conn:
+        ok = ETLService._ensure_daily_key_index(conn)
+        rows = conn.execute(text("SELECT timestamp, close FROM marketdatadaily ORDER BY timestamp")).all()
+        has_key = ETLService._has_daily_key_index(conn)
+    print(f"   ok={ok}, has_key={has_key}, rows={rows}")
+    if not (ok and has_key and etl_service._daily_index_checked
+            and [tuple(r) for r in rows] == [('2025-12-10 16:00:00', 2.0), ('2025-12-11 16:00:00', 3.0)]):
+        print("❌ 去重 / 补建唯一索引结果不符合预期")
+        return False
+    
+    # 补建失败 (如表被锁)：返回 False 且下次写入仍会重试
+    class _FailingConn:
+        def execute(self, *args, **kwargs):
+            raise RuntimeError("database is locked")
+    
+    etl_service._daily_index_checked = False
+    if ETLService._ensure_daily_key_index(_FailingConn()) or etl_service._daily_index_checked:
+        print("❌ 补建失败后不应标记为已检查")
+        return False
+    
+    print("\n" + "=" * 60)
+    print("✅ 测试4通过：早期库去重后补建唯一索引")
+    print("=" * 60)
+    return True
+
 if __name__ == "__main__":
     print("\n🧪 开始ETL功能测试\n")
     
@@ -231,6 +337,16 @@ if __name__ == "__main__":
             print("\n❌ 测试失败")
             sys.exit(1)
         
+        # 测试3: 日线批量upsert
+        if not test_etl_daily_batch_upsert():
+            print("\n❌ 测试失败")
+            sys.exit(1)
+        
+        # 测试4: 早期库补建唯一索引
+        if not test_etl_daily_key_index_legacy_table():
+            print("\n❌ 测试失败")
+            sys.exit(1)
+        
         print("\n" + "=" * 60)
         print("🎉 所有测试通过！ETL服务工作正常")
         print("=" * 60)
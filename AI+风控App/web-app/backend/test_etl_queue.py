@@ -214,6 +214,60 @@ def test_performance():
     print("=" * 70)
 
 
+def test_priority_and_serialization():
+    """测试优先级、同symbol串行与队列指标 (替换ETL执行函数，不访问数据库)"""
+    print("\n" + "=" * 70)
+    print("测试3: 优先级调度 / 同symbol串行")
+    print("=" * 70)
+
+    import threading
+    from unittest import mock
+    from etl_queue import etl_queue, PRIORITY_INTERACTIVE, PRIORITY_BACKFILL
+
+    order, active, overlaps = [], set(), []
+    lock = threading.Lock()
+
+    def fake_process(raw_id):
+        symbol = symbols[raw_id]
+        with lock:
+            if symbol in active:
+                overlaps.append(raw_id)
+            active.add(symbol)
+            order.append(raw_id)
+        time.sleep(0.02)
+        with lock:
+            active.discard(symbol)
+
+    # 9001-9006: 回填 (AAA 占多数)；9100: 交互任务最后入队；9007: AAA 的交互任务 (不插队到 AAA 的回填之前)
+    # 先入队再启动 worker，保证调度时所有任务都已在堆中
+    symbols = {9001: "AAA", 9002: "AAA", 9003: "BBB", 9004: "AAA", 9005: "CCC", 9006: "AAA", 9100: "DDD",
+               9007: "AAA"}
+    with mock.patch("etl_queue.ETLService.process_raw_data", side_effect=fake_process):
+        for raw_id in [9001, 9002, 9003, 9004, 9005, 9006]:
+            etl_queue.enqueue(raw_id, priority=PRIORITY_BACKFILL, symbol=symbols[raw_id])
+        etl_queue.enqueue(9100, priority=PRIORITY_INTERACTIVE, symbol="DDD")
+        etl_queue.enqueue(9007, priority=PRIORITY_INTERACTIVE, symbol="AAA")
+        assert not etl_queue.enqueue(9100, symbol="DDD"), "重复任务应被忽略"
+        etl_queue.start(num_workers=3, recover=False)
+
+        for _ in range(100):
+            if len(order) == len(symbols):
+                break
+            time.sleep(0.05)
+        metrics = etl_queue.get_metrics()
+        etl_queue.stop()
+
+    print(f"✓ 执行顺序: {order}")
+    print(f"✓ 指标: depth={metrics['depth']}, processed={metrics['processed']}, wait_ms={metrics['wait_ms']}")
+    assert sorted(order) == sorted(symbols), "所有任务都应执行"
+    assert order.index(9100) < 3, "交互任务应在首批调度中 (先于排队中的回填任务)"
+    assert not overlaps, f"同一symbol不应并发执行: {overlaps}"
+    assert [r for r in order if symbols[r] == "AAA"] == [9001, 9002, 9004, 9006, 9007], "同symbol保持入队顺序"
+    assert order.index(9001) < 3, "AAA 有交互任务排队：整个 symbol 提前调度"
+    assert metrics["depth"] == 0 and metrics["wait_ms"]["count"] >= len(symbols)
+    print("✅ 优先级 / 串行测试通过")
+
+
 if __name__ == "__main__":
     try:
         # 测试1: 基本功能
@@ -221,6 +275,9 @@ if __name__ == "__main__":
         
         # 测试2: 性能对比
         test_performance()
+
+        # 测试3: 优先级调度 / 同symbol串行
+        test_priority_and_serialization()
         
         print("\n" + "🎉" * 35)
         print("所有测试通过! 异步ETL队列工作正常!")
@@ -0,0 +1,80 @@
+"""
+测试日线技术指标增量计算 (indicator_store.py)
+
+验证:
+1. MACD / KDJ 与 pandas ewm(adjust=False) 全量计算一致，RSI 为标准 Wilder(14)
+2. 分两段增量计算 (携带上一行状态 + 最近 8 根高低价) 与一次全量计算结果完全相同
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from indicator_store import KDJ_N, compute_indicators
+
+
+def _bars(n=600, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    days = pd.bdate_range('2020-01-01', periods=n).strftime('%Y-%m-%d 16:00:00')
+    return list(zip(days, close * 1.01, close * 0.99, close))
+
+
+def test_against_pandas():
+    print("=" * 70)
+    print("测试1: 与 pandas 全量计算对比")
+    print("=" * 70)
+
+    bars = _bars()
+    got = pd.DataFrame(compute_indicators(bars))
+    df = pd.DataFrame(bars, columns=['timestamp', 'high', 'low', 'close'])
+
+    dif = df['close'].ewm(span=12, adjust=False).mean() - df['close'].ewm(span=26, adjust=False).mean()
+    dea = dif.ewm(span=9, adjust=False).mean()
+    rsv = (df['close'] - df['low'].rolling(9).min()) / (df['high'].rolling(9).max() - df['low'].rolling(9).min()) * 100
+    k = rsv.ewm(com=2, adjust=False).mean()
+    d = k.ewm(com=2, adjust=False).mean()
+
+    np.testing.assert_allclose(got['dif'], dif, rtol=1e-12)
+    np.testing.assert_allclose(got['dea'], dea, rtol=1e-12)
+    np.testing.assert_allclose(got['k'].astype(float), k, rtol=1e-12)
+    np.testing.assert_allclose(got['d'].astype(float), d, rtol=1e-12)
+    np.testing.assert_allclose(got['pct_change'][1:].astype(float), df['close'].pct_change()[1:] * 100, rtol=1e-9)
+
+    # Wilder RSI：第 14 根起有值
+    delta = df['close'].diff()
+    gain, loss = delta.clip(lower=0), (-delta).clip(lower=0)
+    ag, al = gain[1:15].mean(), loss[1:15].mean()
+    expected = [100 - 100 / (1 + ag / al)]
+    for i in range(15, len(df)):
+        ag, al = (ag * 13 + gain[i]) / 14, (al * 13 + loss[i]) / 14
+        expected.append(100 - 100 / (1 + ag / al))
+    assert got['rsi'][:14].isna().all()
+    np.testing.assert_allclose(got['rsi'][14:].astype(float), expected, rtol=1e-12)
+    print("✅ MACD / RSI / KDJ 一致")
+    return True
+
+
+def test_incremental_matches_full():
+    print("\n" + "=" * 70)
+    print("测试2: 增量计算 == 全量计算")
+    print("=" * 70)
+
+    bars = _bars()
+    full = compute_indicators(bars)
+    for split in (1, 5, 30, 400, 599):
+        head = compute_indicators(bars[:split])
+        window = [(h, l) for _, h, l, _ in bars[max(0, split - (KDJ_N - 1)):split]]
+        tail = compute_indicators(bars[split:], head[-1], window)
+        assert [r['bar_index'] for r in tail] == list(range(split, len(bars)))
+        for a, b in zip(full[split:], tail):
+            for key in ('ema12', 'ema26', 'dif', 'dea', 'hist', 'rsi', 'k', 'd', 'j', 'pct_change'):
+                assert a[key] == b[key], (split, key, a[key], b[key])
+    print("✅ 任意切分点增量结果与全量完全相同")
+    return True
+
+
+if __name__ == "__main__":
+    ok = all([test_against_pandas(), test_incremental_matches_full()])
+    print("\n🎉 所有测试通过" if ok else "\n❌ 测试失败")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,149 @@
+"""
+测试并发行情同步 (market_sync.py)
+
+验证:
+1. 并发受数据源名额限制 (且不超过 RateLimiter 每分钟请求数)
+2. 超时 / 异常重试，空结果不重试；汇总报告计数正确
+3. 超时后被放弃的抓取线程结束前不归还名额
+4. 每次抓取 (含重试) 恰好向真实 RateLimiter 预约一个令牌，总耗时由限流决定 (假时钟)
+"""
+import asyncio
+import threading
+import time
+
+from market_sync import MarketSyncEngine
+from rate_limiter import RateLimiter
+
+
+class _Limiter:
+    """放行所有请求的 RateLimiter 替身 (记录预约次数)"""
+
+    def __init__(self, per_minute=60):
+        self.max_requests_per_minute = per_minute
+        self.acquired = 0
+
+    async def acquire(self, symbol, source=None):
+        self.acquired += 1
+        return 0
+
+
+class _FakeClock:
+    """假时钟：sleep 直接推进时间 (RateLimiter 预约后立即 sleep，推进后的时间即该请求的放行时间)"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+class _Fetch:
+    def __init__(self, latency=0.05, behaviour=None):
+        self.latency = latency
+        self.behaviour = behaviour or {}
+        self.calls = {}
+        self.in_flight = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, symbol, market):
+        with self.lock:
+            n = self.calls[symbol] = self.calls.get(symbol, 0) + 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            action = self.behaviour.get(symbol, lambda n: None)(n)
+            time.sleep(action if isinstance(action, float) else self.latency)
+            if action == 'raise':
+                raise RuntimeError("boom")
+            return None if action == 'empty' else {'symbol': symbol}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def test_bounded_parallel():
+    print("=" * 70)
+    print("测试1: 受限并发")
+    print("=" * 70)
+
+    targets = {f"S{i}": 'US' for i in range(20)}
+    fetch = _Fetch(latency=0.1)
+    engine = MarketSyncEngine(fetch, rate_limiter=_Limiter(), concurrency={'yfinance': 4})
+    report = asyncio.run(engine.run(targets))
+    print(f"   20 × 100ms, 并发 4: 峰值并发 {fetch.peak}")
+    assert report['success'] == 20 and fetch.peak == 4
+
+    fetch = _Fetch(latency=0.02)
+    engine = MarketSyncEngine(fetch, rate_limiter=_Limiter(per_minute=2), concurrency={'yfinance': 8})
+    asyncio.run(engine.run(targets))
+    assert fetch.peak <= 2, "名额不应超过 RateLimiter 每分钟请求数"
+    print("✅ 并发上限正确")
+
+
+def test_retry_and_report():
+    print("\n" + "=" * 70)
+    print("测试2: 重试与汇总")
+    print("=" * 70)
+
+    fetch = _Fetch(behaviour={
+        'SLOW': lambda n: 0.5 if n == 1 else None,      # 首次超时，重试成功
+        'BAD': lambda n: 'raise',                         # 始终异常
+        'CLOSED': lambda n: 'empty',                      # 无数据，不重试
+    })
+    limiter = _Limiter()
+    engine = MarketSyncEngine(fetch, rate_limiter=limiter, timeout=0.2, retries=2, base_backoff=0.01)
+    report = asyncio.run(engine.run({'OK': 'US', 'SLOW': 'HK', 'BAD': 'CN', 'CLOSED': 'US'}))
+
+    assert (report['success'], report['empty'], report['failed']) == (2, 1, 1)
+    assert report['timeouts'] == 1 and report['retries'] == 3
+    assert fetch.calls == {'OK': 1, 'SLOW': 2, 'BAD': 3, 'CLOSED': 1}
+    assert report['failures'] == [{'symbol': 'BAD', 'market': 'CN', 'error': 'boom'}]
+    assert report['by_market']['US'] == {'success': 1, 'empty': 1, 'failed': 0}
+    assert limiter.acquired == sum(fetch.calls.values()), "每次抓取 (含重试) 预约一次"
+    print("✅ 超时 / 异常重试，报告正确")
+
+
+def test_timeout_holds_slot():
+    print("\n" + "=" * 70)
+    print("测试3: 超时线程占用名额")
+    print("=" * 70)
+
+    fetch = _Fetch(latency=0.01, behaviour={'HANG': lambda n: 0.4 if n == 1 else None})
+    engine = MarketSyncEngine(fetch, rate_limiter=_Limiter(), concurrency={'yfinance': 2},
+                              timeout=0.1, retries=1, base_backoff=0.0)
+    targets = {'HANG': 'US', **{f"S{i}": 'US' for i in range(10)}}
+    report = asyncio.run(engine.run(targets))
+    assert report['success'] == 11 and fetch.peak <= 2
+    print("✅ 实际并发未超过上限")
+
+
+def test_rate_limited_schedule():
+    print("\n" + "=" * 70)
+    print("测试4: 真实限流器 + 假时钟")
+    print("=" * 70)
+
+    clock = _FakeClock()
+    limiter = RateLimiter(symbol_interval=0, max_requests_per_minute=5, clock=clock, async_sleep=clock.sleep)
+    fetch = _Fetch(latency=0.0, behaviour={'S0': lambda n: 'raise' if n == 1 else None})
+    engine = MarketSyncEngine(fetch, rate_limiter=limiter, concurrency={'yfinance': 4},
+                              base_backoff=0.0, clock=clock)
+    report = asyncio.run(engine.run({f"S{i}": 'US' for i in range(10)}))
+
+    stats = limiter.get_stats()
+    print(f"   11 次抓取 (含 1 次重试), 5 次/分钟: {report['duration_s']:.0f}s (假时钟), 预约 {stats['requests']} 次")
+    assert report['success'] == 10 and report['retries'] == 1
+    assert stats['requests'] == sum(fetch.calls.values()) == 11
+    assert report['duration_s'] == 120.0, "每 60 秒最多放行 5 个: 0s ×5, 60s ×5, 120s ×1"
+    print("✅ 每次抓取只占用一个令牌，耗时由限流决定")
+
+
+if __name__ == "__main__":
+    test_bounded_parallel()
+    test_retry_and_report()
+    test_timeout_holds_slot()
+    test_rate_limited_schedule()
+    print("\n🎉 所有测试通过")
@@ -0,0 +1,124 @@
+"""
+测试令牌桶限流器 (rate_limiter.py)
+
+验证 (假时钟，结果确定):
+1. 令牌桶: 突发至容量 N，令牌用后 60 秒归还，任意 60 秒窗口不超过 N 个；不同数据源互不影响
+2. Symbol 最小间隔；can_request 不占用令牌
+3. 等待在锁外: 一个被限流的线程不阻塞其他数据源
+4. async acquire() 使用异步等待；统计计数正确
+"""
+import asyncio
+import threading
+import time
+
+from rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+
+
+def _limiter(clock, **kw):
+    return RateLimiter(clock=clock, sleep=clock.sleep, async_sleep=clock.async_sleep, **kw)
+
+
+def test_token_bucket():
+    print("=" * 70)
+    print("测试1: 令牌桶")
+    print("=" * 70)
+
+    clock = FakeClock()
+    rl = _limiter(clock, symbol_interval=0, max_requests_per_minute=5)
+    waits = [rl.reserve(f"S{i}", 'yfinance') for i in range(12)]
+    assert waits[:5] == [0, 0, 0, 0, 0], "桶满时允许突发 5 个"
+    assert waits[5:10] == [60] * 5 and waits[10:] == [120, 120], "令牌在使用 60 秒后归还"
+    assert rl.reserve("X", 'akshare') == 0, "其他数据源不受影响"
+
+    starts = sorted(clock.now + w for w in waits)
+    assert all(sum(1 for t in starts if w <= t < w + 60) <= 5 for w in starts), "任意 60 秒窗口不超过 5 个"
+
+    clock.now += 180
+    assert rl.can_request("Y", 'yfinance') == (True, 0)
+    print("✅ 突发 / 窗口上限 / 源隔离正确")
+
+
+def test_symbol_interval():
+    print("\n" + "=" * 70)
+    print("测试2: Symbol 间隔")
+    print("=" * 70)
+
+    clock = FakeClock()
+    rl = _limiter(clock, symbol_interval=10, max_requests_per_minute=100)
+    assert rl.wait_if_needed("AAPL") == 0
+    clock.now += 4
+    assert rl.can_request("AAPL") == (False, 6)
+    assert rl.can_request("AAPL") == (False, 6), "can_request 不应占用时间槽"
+    assert rl.wait_if_needed("AAPL") == 6 and clock.slept == [6]
+    assert rl.wait_if_needed("MSFT") == 0
+    rl.reset_symbol("AAPL")
+    assert rl.can_request("AAPL") == (True, 0)
+    print("✅ 间隔 / 预检 / 重置正确")
+
+
+def test_wait_outside_lock():
+    print("\n" + "=" * 70)
+    print("测试3: 锁外等待")
+    print("=" * 70)
+
+    rl = RateLimiter(symbol_interval=0, max_requests_per_minute=1)
+    rl.wait_if_needed("A", 'yfinance')
+    slow = threading.Thread(target=rl.wait_if_needed, args=("B", 'yfinance'), daemon=True)
+    slow.start()                                    # 需等待约 60 秒
+    time.sleep(0.05)
+
+    t0 = time.perf_counter()
+    assert rl.wait_if_needed("C", 'akshare') == 0
+    rl.get_stats()
+    elapsed = time.perf_counter() - t0
+    print(f"   被限流线程等待中，另一数据源请求耗时 {elapsed * 1e3:.2f} ms")
+    assert elapsed < 0.5 and slow.is_alive()
+
+
+def test_async_and_stats():
+    print("\n" + "=" * 70)
+    print("测试4: async acquire 与统计")
+    print("=" * 70)
+
+    clock = FakeClock()
+    rl = _limiter(clock, symbol_interval=0, max_requests_per_minute=2)
+
+    async def run():
+        return [await rl.acquire(f"S{i}", 'yfinance') for i in range(4)]
+
+    assert asyncio.run(run()) == [0, 0, 60, 0], "第 3 个等满 60 秒，之后两个令牌同时归还"
+    stats = rl.get_stats()
+    assert (stats['requests'], stats['throttled'], stats['total_wait_s'], stats['max_wait_s']) == (4, 1, 60, 60)
+    src = stats['sources']['yfinance']
+    assert src['throttled'] == 1 and src['limit'] == 2 and src['available'] == 0
+    clock.now += 60
+    assert rl.get_stats()['sources']['yfinance']['available'] == 2
+
+    rl.reserve("S9", 'yfinance')
+    rl.reset_source('yfinance')
+    assert rl.get_stats()['sources']['yfinance']['available'] == 2
+    print("✅ 异步等待 / 计数正确")
+
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_symbol_interval()
+    test_wait_outside_lock()
+    test_async_and_stats()
+    print("\n🎉 所有测试通过")
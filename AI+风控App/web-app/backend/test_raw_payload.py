@@ -0,0 +1,95 @@
+"""
+测试 Raw 载荷编解码 (raw_payload.py)
+
+验证:
+1. DataFrame -> Arrow IPC + zstd -> DataFrame 往返无损，时间列转为无时区 UTC
+2. 内容哈希只取决于数据内容 (DataFrame / list of dict / 包装 dict 一致)
+3. 旧 JSON 载荷 (list / {'data': [...]}) 仍可解码；无法转 Arrow 的数据回退 JSON
+4. 多年日线的压缩效果
+"""
+import json
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from raw_payload import RAW_FORMAT_ARROW, RAW_FORMAT_JSON, decode_payload, pack_payload
+
+
+def _raw(fields):
+    return SimpleNamespace(**fields)
+
+
+def test_round_trip():
+    print("=" * 70)
+    print("测试1: Arrow 往返")
+    print("=" * 70)
+
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2026-01-22 00:00', '2026-01-23 00:00']).tz_localize('America/New_York'),
+        'date': ['2026-01-22', '2026-01-23'],
+        'open': [1.5, np.nan],
+        'close': [2.0, 3.0],
+        'volume': [100, 200],
+    })
+    fields = pack_payload(df)
+    assert fields['payload_format'] == RAW_FORMAT_ARROW and fields['payload'] == ''
+    out = decode_payload(_raw(fields))
+
+    assert list(out.columns) == list(df.columns)
+    # 带时区时间 -> 无时区 UTC (与旧 JSON 毫秒时间戳的解析结果一致)
+    assert out['timestamp'].tolist() == [pd.Timestamp('2026-01-22 05:00'), pd.Timestamp('2026-01-23 05:00')]
+    assert np.isnan(out['open'][1]) and out['volume'].tolist() == [100, 200]
+    print("✅ 往返一致")
+    return True
+
+
+def test_hash_and_legacy():
+    print("\n" + "=" * 70)
+    print("测试2: 内容哈希 / 旧 JSON 兼容 / 回退")
+    print("=" * 70)
+
+    records = [{'date': '2026-01-22', 'close': 2.0}, {'date': '2026-01-23', 'close': 3.0}]
+    h1 = pack_payload(pd.DataFrame(records))['content_hash']
+    h2 = pack_payload(records)['content_hash']
+    h3 = pack_payload({'symbol': 'X', 'data': records})['content_hash']
+    assert h1 == h2 == h3, "同内容哈希应一致"
+    assert pack_payload(records[:1])['content_hash'] != h1
+
+    for payload in (json.dumps(records), json.dumps({'symbol': 'X', 'data': records})):
+        legacy = decode_payload(_raw({'payload': payload, 'payload_format': RAW_FORMAT_JSON}))
+        assert legacy['close'].tolist() == [2.0, 3.0]
+    assert decode_payload(_raw({'payload': '"oops"', 'payload_format': RAW_FORMAT_JSON})) is None
+
+    mixed = pack_payload([{'close': 1.0, 'note': 'a'}, {'close': 2.0, 'note': 5}])
+    assert mixed['payload_format'] == RAW_FORMAT_JSON and mixed['payload_blob'] is None
+    assert decode_payload(_raw(mixed))['close'].tolist() == [1.0, 2.0]
+    print("✅ 哈希 / 兼容 / 回退正常")
+    return True
+
+
+def test_compression():
+    print("\n" + "=" * 70)
+    print("测试3: 20年日线压缩")
+    print("=" * 70)
+
+    n = 20 * 252
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    df = pd.DataFrame({
+        'timestamp': pd.bdate_range(end='2025-12-31', periods=n).strftime('%Y-%m-%d'),
+        'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+        'volume': rng.integers(1e6, 1e7, n),
+    })
+    json_size = len(df.to_json(orient='records'))
+    blob_size = len(pack_payload(df)['payload_blob'])
+    print(f"   JSON {json_size / 1024:.0f} KB -> Arrow+zstd {blob_size / 1024:.0f} KB ({blob_size / json_size:.0%})")
+    assert blob_size < json_size / 2
+    return True
+
+
+if __name__ == "__main__":
+    ok = all([test_round_trip(), test_hash_and_legacy(), test_compression()])
+    print("\n🎉 所有测试通过" if ok else "\n❌ 测试失败")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,150 @@
+"""
+测试内存搜索索引 (search_index.py)
+
+验证:
+1. 代码前缀 / 名称子串 / 排序 (完全匹配优先，CN > HK > US，index > stock)
+2. 改名与删除后旧索引键失效
+3. StockInfo 增量刷新只加载新增 / 更新的行
+4. 拼音首字母 (需 pypinyin，未安装时跳过)
+5. 5,000 条规模下常见查询延迟
+"""
+import random
+import sqlite3
+import sys
+import time
+from types import SimpleNamespace
+
+import search_index as si
+from search_index import SearchIndex
+
+
+class _Conn:
+    """sqlite3 -> SQLAlchemy Connection 的最小适配 (execute(...).all())"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, params=()):
+        rows = self.db.execute(str(sql), params).fetchall()
+        return SimpleNamespace(all=lambda: rows)
+
+
+def _index():
+    idx = SearchIndex()
+    idx.upsert('600519.sh', '贵州茅台', 'CN')
+    idx.upsert('000001.sz', '平安银行', 'CN')
+    idx.upsert('000001.SS', '上证指数', 'CN', 'index')
+    idx.upsert('601318.sh', '中国平安', 'CN')
+    idx.upsert('02318.hk', '中国平安', 'HK')
+    idx.upsert('^DJI', '道琼斯', 'US', 'index', aliases=['Dow Jones Industrial Average'])
+    idx.upsert('AAPL', 'Apple Inc.', 'US')
+    idx.upsert('510300.sh', '沪深300ETF', 'CN')
+    return idx
+
+
+def test_search_and_rank():
+    print("=" * 70)
+    print("测试1: 查询与排序")
+    print("=" * 70)
+
+    idx = _index()
+    assert [r['symbol'] for r in idx.search('000001')] == ['000001.SS', '000001.sz'], "index 优先"
+    assert idx.search('6005')[0]['symbol'] == '600519.sh'
+    assert [r['symbol'] for r in idx.search('平安')] == ['000001.sz', '601318.sh', '02318.hk']
+    assert [r['market'] for r in idx.search('中国平安')] == ['CN', 'HK']
+    assert idx.search('dji')[0]['symbol'] == '^DJI' and idx.search('dow jones')[0]['symbol'] == '^DJI'
+    assert idx.search('aapl')[0] == {'symbol': 'AAPL', 'name': 'Apple Inc.', 'market': 'US', 'type': 'stock'}
+    assert idx.search('300etf')[0]['type'] == 'etf'
+    assert idx.search('茅') and not idx.search('茅台酒') and not idx.search('')
+    assert len(idx.search('0', limit=2)) == 2
+    print("✅ 查询 / 排序正确")
+    return True
+
+
+def test_update_and_remove():
+    print("\n" + "=" * 70)
+    print("测试2: 改名 / 删除")
+    print("=" * 70)
+
+    idx = _index()
+    idx.upsert('600519.sh', '茅台集团', 'CN')
+    assert not idx.search('贵州') and idx.search('茅台集团')[0]['symbol'] == '600519.sh'
+    idx.remove('AAPL')
+    assert not idx.search('aapl') and len(idx) == 7
+    print("✅ 旧键失效")
+    return True
+
+
+def test_incremental_refresh():
+    print("\n" + "=" * 70)
+    print("测试3: StockInfo 增量刷新")
+    print("=" * 70)
+
+    db = sqlite3.connect(":memory:")
+    db.executescript("""
+        CREATE TABLE stockinfo (id INTEGER PRIMARY KEY, symbol TEXT, name TEXT, market TEXT, updated_at TEXT);
+        INSERT INTO stockinfo VALUES (1, '600519.sh', '贵州茅台', 'CN', '2026-01-20 00:00:00.000000'),
+                                     (2, '000858.sz', '五粮液', 'CN', '2026-01-20 00:00:00.000000');
+    """)
+    conn = _Conn(db)
+    idx = SearchIndex(refresh_interval=3600)
+    assert idx.refresh(conn) == 2 and idx.search('五粮液')
+    assert len(idx) > 2, "应同时载入 symbols_config"
+
+    db.executescript("""
+        INSERT INTO stockinfo VALUES (3, '300750.sz', '宁德时代', 'CN', '2026-01-20 00:00:00.000000');
+        UPDATE stockinfo SET name = '茅台', updated_at = '2026-01-22 00:00:00.000000' WHERE id = 1;
+    """)
+    assert idx.refresh(conn) == 0, "未到刷新间隔"
+    assert idx.refresh(conn, force=True) == 2
+    assert idx.search('宁德')[0]['symbol'] == '300750.sz' and not idx.search('贵州')
+    assert idx.refresh(conn, force=True) == 0
+    print("✅ 只加载新增 / 改名行")
+    return True
+
+
+def test_pinyin():
+    print("\n" + "=" * 70)
+    print("测试4: 拼音首字母")
+    print("=" * 70)
+
+    if si.lazy_pinyin is None:
+        print("⚠️  pypinyin 未安装，跳过")
+        return True
+    idx = _index()
+    assert si.pinyin_initials('贵州茅台') == 'gzmt'
+    assert idx.search('gzmt')[0]['symbol'] == '600519.sh'
+    assert idx.search('zgpa')[0]['symbol'] == '601318.sh'
+    print("✅ 首字母匹配")
+    return True
+
+
+def test_latency():
+    print("\n" + "=" * 70)
+    print("测试5: 查询延迟 (5,000 条)")
+    print("=" * 70)
+
+    rng = random.Random(0)
+    chars = '中国平安银行招商工商建设农业交通浦发兴业民生光大华夏证券保险科技医药能源电力汽车'
+    idx = SearchIndex()
+    for i in range(5000):
+        code = f"{600000 + i:06d}"
+        idx.upsert(f"{code}.sh", ''.join(rng.choice(chars) for _ in range(4)), 'CN')
+
+    queries = ['600519', '6012', '平安', '招商银行', '科技', '601', 'aapl', '银行']
+    n = 200
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for q in queries:
+            idx.search(q)
+    avg_us = (time.perf_counter() - t0) / (n * len(queries)) * 1e6
+    print(f"   平均 {avg_us:.0f} µs / 查询")
+    assert avg_us < 1000
+    return True
+
+
+if __name__ == "__main__":
+    ok = all([test_search_and_rank(), test_update_and_remove(), test_incremental_refresh(),
+              test_pinyin(), test_latency()])
+    print("\n🎉 所有测试通过" if ok else "\n❌ 测试失败")
+    sys.exit(0 if ok else 1)
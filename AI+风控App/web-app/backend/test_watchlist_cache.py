@@ -0,0 +1,106 @@
+"""
+测试自选股读取路径 (watchlist_cache.py)
+
+验证:
+1. 窗口函数查询每个自选股只取最新一条分析 (同日期按 id)，无分析时为空
+2. 快照缓存: 首次读取整表加载，put_snapshot 即时生效，过期后重载
+3. summary / recommendation 提取与 ETag / If-None-Match 匹配
+"""
+import sqlite3
+from types import SimpleNamespace
+
+from watchlist_cache import (
+    WATCHLIST_SQL, SnapshotCache, analysis_fields, compute_etag, etag_matches,
+)
+
+
+class _Conn:
+    """sqlite3 -> SQLAlchemy Connection 的最小适配 (execute(...).mappings().all())"""
+
+    def __init__(self, db):
+        self.db = db
+        self.db.row_factory = sqlite3.Row
+        self.queries = 0
+
+    def execute(self, sql, params=()):
+        self.queries += 1
+        rows = [dict(r) for r in self.db.execute(str(sql), params).fetchall()]
+        return SimpleNamespace(mappings=lambda: SimpleNamespace(all=lambda: rows))
+
+
+def _db():
+    db = sqlite3.connect(":memory:")
+    db.executescript("""
+        CREATE TABLE watchlist (id INTEGER PRIMARY KEY, symbol TEXT, name TEXT, market TEXT);
+        CREATE TABLE assetanalysishistory (id INTEGER PRIMARY KEY, symbol TEXT, analysis_date TEXT,
+                                           full_result_json TEXT, summary TEXT, recommendation TEXT);
+        CREATE TABLE marketsnapshot (symbol TEXT, market TEXT, price REAL, change REAL, pct_change REAL,
+                                     timestamp TEXT, volume INTEGER);
+        INSERT INTO watchlist VALUES (1, 'AAPL', 'Apple', 'US'), (2, '00700', NULL, 'HK');
+        INSERT INTO assetanalysishistory VALUES
+            (1, 'AAPL', '2026-01-20', '{}', 'old', 'SELL'),
+            (2, 'AAPL', '2026-01-22', '{}', 'new', 'HOLD'),
+            (3, 'AAPL', '2026-01-22', '{}', 'newest', 'BUY');
+        INSERT INTO marketsnapshot VALUES ('AAPL', 'US', 250.0, 1.0, 0.4, '2026-01-22 16:00:00', 100);
+    """)
+    return db
+
+
+def test_latest_analysis():
+    print("=" * 70)
+    print("测试1: 窗口函数取最新分析")
+    print("=" * 70)
+
+    conn = _Conn(_db())
+    rows = conn.execute(WATCHLIST_SQL).mappings().all()
+    assert [r['symbol'] for r in rows] == ['AAPL', '00700']
+    assert (rows[0]['summary'], rows[0]['recommendation']) == ('newest', 'BUY')
+    assert rows[1]['summary'] is None and rows[1]['name'] is None
+    print("✅ 每个自选股一行，最新分析正确")
+
+
+def test_snapshot_cache():
+    print("\n" + "=" * 70)
+    print("测试2: 快照缓存")
+    print("=" * 70)
+
+    conn = _Conn(_db())
+    cache = SnapshotCache(ttl=3600)
+    assert cache.get_all(conn)[('AAPL', 'US')]['price'] == 250.0
+    cache.get_all(conn)
+    assert conn.queries == 1, "未过期时不应再查库"
+
+    cache.put_snapshot(SimpleNamespace(symbol='00700.HK', market='HK', price=400.0, change=-2.0,
+                                       pct_change=-0.5, timestamp='2026-01-22 16:00:00', volume=10))
+    assert cache.get_all(conn)[('00700.HK', 'HK')]['price'] == 400.0 and conn.queries == 1
+
+    cache.invalidate()
+    assert ('00700.HK', 'HK') not in cache.get_all(conn) and conn.queries == 2
+    print("✅ 加载 / 增量更新 / 重载正常")
+
+
+def test_fields_and_etag():
+    print("\n" + "=" * 70)
+    print("测试3: 摘要提取与 ETag")
+    print("=" * 70)
+
+    assert analysis_fields({'summary': 's', 'recommendation': 'BUY'}) == ('s', 'BUY')
+    assert analysis_fields('{"summary": "s"}') == ('s', '')
+    assert analysis_fields({'summary': 's', 'recommendation': {'action': '买入'}}) == ('s', '{"action": "买入"}')
+    assert analysis_fields('not json') == (None, None) and analysis_fields('[1]') == (None, None)
+
+    payload = [{'symbol': 'AAPL', 'price': 250.0}]
+    etag = compute_etag(payload)
+    assert etag == compute_etag([{'price': 250.0, 'symbol': 'AAPL'}])
+    assert etag != compute_etag([{'symbol': 'AAPL', 'price': 251.0}])
+    assert etag_matches(etag, etag) and etag_matches(f'"x", {etag}', etag)
+    assert etag_matches(etag.removeprefix('W/'), etag) and etag_matches('*', etag)
+    assert not etag_matches(None, etag) and not etag_matches('"x"', etag)
+    print("✅ 提取 / ETag 正常")
+
+
+if __name__ == "__main__":
+    test_latest_analysis()
+    test_snapshot_cache()
+    test_fields_and_etag()
+    print("\n🎉 所有测试通过")
@@ -85,7 +85,6 @@ def save_history_to_db(df: pd.DataFrame, symbol: str, market: str) -> int:
     
     from models import RawMarketData
     from etl_service import ETLService
-    import json
     
     db_symbol = normalize_symbol_db(symbol, market)
     
@@ -115,10 +114,8 @@ def save_history_to_db(df: pd.DataFrame, symbol: str, market: str) -> int:
         print(f"[Background] ⚠️ DataFrame缺少date列，跳过")
         return 0
     
-    # 将DataFrame转换为JSON payload
-    payload = df.to_dict('records')
-    
-    # 创建Raw记录
+    # 创建Raw记录 (列式压缩载荷)
+    from raw_payload import pack_payload, store_raw
     with Session(engine) as session:
         raw = RawMarketData(
             source='history_download',
@@ -126,12 +123,10 @@ def save_history_to_db(df: pd.DataFrame, symbol: str, market: str) -> int:
             market=market,
             period='1d',
             fetch_time=datetime.now(),
-            payload=json.dumps(payload, ensure_ascii=False, default=str),
-            processed=False
+            processed=False,
+            **pack_payload(df)
         )
-        session.add(raw)
-        session.commit()
-        session.refresh(raw)
+        raw = store_raw(session, raw)
         raw_id = raw.id
     
     # 通过ETL处理（应用时间标准化）
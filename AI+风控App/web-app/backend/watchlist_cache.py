@@ -0,0 +1,179 @@
+"""
+Watchlist Read Path (自选股读取与快照缓存)
+=========================================
+
+功能说明:
+1. GET /api/watchlist 原先逐个自选股查询最新分析 (再 json.loads 全量结果) 与 MarketSnapshot，N+1 查询。
+2. 现改为: 一条 SQL 取出全部自选股及各自最新一条分析的 summary / recommendation，
+   行情快照从进程内缓存读取。
+
+核心逻辑:
+I. 快照缓存 (snapshot_cache)
+   - (symbol, market) -> 列表所需字段 (price / change / pct_change / timestamp / volume)
+   - ETL 的 _update_snapshot 与实时抓取写入 MarketSnapshot 后调用 put_snapshot() 同步更新
+   - 首次读取或超过 SNAPSHOT_CACHE_TTL 秒时整表重载一次 (覆盖独立脚本直接写库的情况)
+
+II. 最新分析 (窗口函数)
+   - ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY analysis_date DESC, id DESC) = 1
+   - summary / recommendation 在保存分析时落为独立列，读取时不再解析 full_result_json
+
+III. ETag
+   - 对响应内容求哈希；请求头 If-None-Match 一致时返回 304，列表未变化时不重复传输
+
+作者: Antigravity
+日期: 2026-01-23
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+logger = logging.getLogger("WatchlistCache")
+
+SNAPSHOT_TABLE = "marketsnapshot"
+ANALYSIS_TABLE = "assetanalysishistory"
+WATCHLIST_TABLE = "watchlist"
+
+SNAPSHOT_CACHE_TTL = float(os.getenv("SNAPSHOT_CACHE_TTL", "60"))
+SNAPSHOT_FIELDS = ('price', 'change', 'pct_change', 'timestamp', 'volume')
+
+
+# ============================================================
+# I. 快照缓存
+# ============================================================
+
+class SnapshotCache:
+    """MarketSnapshot 列表字段的进程内缓存 (线程安全)"""
+
+    def __init__(self, ttl: float = SNAPSHOT_CACHE_TTL):
+        self.ttl = ttl
+        self._data: Dict[Tuple[str, str], Dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def put(self, symbol: str, market: str, fields: Dict):
+        with self._lock:
+            self._data[(symbol, market)] = {k: fields.get(k) for k in SNAPSHOT_FIELDS}
+
+    def put_snapshot(self, snapshot):
+        """MarketSnapshot 写库提交后调用"""
+        self.put(snapshot.symbol, snapshot.market, {k: getattr(snapshot, k, None) for k in SNAPSHOT_FIELDS})
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def load(self, conn):
+        """整表重载 (一条查询)"""
+        rows = conn.execute(text(
+            f"SELECT symbol, market, {', '.join(SNAPSHOT_FIELDS)} FROM {SNAPSHOT_TABLE}"
+        )).mappings().all()
+        data = {(r['symbol'], r['market']): {k: r[k] for k in SNAPSHOT_FIELDS} for r in rows}
+        with self._lock:
+            self._data = data
+            self._loaded_at = time.monotonic()
+        logger.info(f"Snapshot cache loaded: {len(data)} rows")
+
+    def get_all(self, conn) -> Dict[Tuple[str, str], Dict]:
+        """返回缓存 (过期或未加载时先从库重载)"""
+        with self._lock:
+            fresh = self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+            if fresh:
+                return self._data
+        self.load(conn)
+        return self._data
+
+
+snapshot_cache = SnapshotCache()
+
+
+# ============================================================
+# II. 自选股 + 最新分析 (单条查询)
+# ============================================================
+
+WATCHLIST_SQL = f"""
+    SELECT w.id, w.symbol, w.market, w.name, a.summary, a.recommendation
+    FROM {WATCHLIST_TABLE} w
+    LEFT JOIN (
+        SELECT symbol, summary, recommendation,
+               ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY analysis_date DESC, id DESC) AS rn
+        FROM {ANALYSIS_TABLE}
+    ) a ON a.symbol = w.symbol AND a.rn = 1
+    ORDER BY w.id
+"""
+
+
+def load_watchlist_rows(conn) -> List[Dict]:
+    """全部自选股及其最新分析摘要，按 id 升序"""
+    return [dict(r) for r in conn.execute(text(WATCHLIST_SQL)).mappings().all()]
+
+
+def analysis_fields(result) -> Tuple[Optional[str], Optional[str]]:
+    """AI 分析结果 (dict 或 JSON 文本) -> (summary, recommendation) 列值"""
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except ValueError:
+            return None, None
+    if not isinstance(result, dict):
+        return None, None
+
+    def _col(value):
+        if value is None or isinstance(value, str):
+            return value
+        return json.dumps(value, ensure_ascii=False)
+
+    return _col(result.get('summary', '')), _col(result.get('recommendation', ''))
+
+
+def compute_etag(payload) -> str:
+    """响应内容的弱 ETag"""
+    body = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return f'W/"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return '*' in tags or etag in tags or etag.removeprefix('W/') in tags
+
+
+# ============================================================
+# III. 表结构
+# ============================================================
+
+def ensure_analysis_columns(engine):
+    """旧库补齐 summary / recommendation 列并从 full_result_json 回填；建 (symbol, analysis_date) 索引"""
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({ANALYSIS_TABLE})"))}
+        if not columns:
+            return
+        added = False
+        for col in ('summary', 'recommendation'):
+            if col not in columns:
+                conn.execute(text(f"ALTER TABLE {ANALYSIS_TABLE} ADD COLUMN {col} VARCHAR"))
+                added = True
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{ANALYSIS_TABLE}_symbol_date "
+            f"ON {ANALYSIS_TABLE} (symbol, analysis_date)"
+        ))
+        if not added:
+            return
+
+        rows = conn.execute(text(f"SELECT id, full_result_json FROM {ANALYSIS_TABLE}")).all()
+        params = []
+        for row_id, raw in rows:
+            summary, recommendation = analysis_fields(raw)
+            params.append({'id': row_id, 'summary': summary, 'recommendation': recommendation})
+        if params:
+            conn.execute(text(
+                f"UPDATE {ANALYSIS_TABLE} SET summary = :summary, recommendation = :recommendation WHERE id = :id"
+            ), params)
+        logger.info(f"Backfilled summary/recommendation for {len(params)} analysis rows")
@@ -81,7 +81,6 @@ V. Dependencies
 import sys
 import os
 import time
-import json
 import logging
 from datetime import datetime
 import pandas as pd
@@ -184,28 +183,19 @@ def save_to_raw(canonical_id: str, market: str, df: pd.DataFrame, source: str =
     
     if 'timestamp' in df_reset.columns:
         df_reset['timestamp'] = pd.to_datetime(df_reset['timestamp']).dt.strftime('%Y-%m-%d')
-    records = df_reset.to_dict(orient='records')
-    
-    # Payload
-    payload = {
-        "symbol": canonical_id,
-        "market": market,
-        "source": source,
-        "fetch_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "data": records
-    }
     
     try:
         from backend.models import RawMarketData
+        from backend.raw_payload import pack_payload, store_raw
         with Session(engine) as session:
+            # 列式压缩载荷 (Arrow IPC + zstd)，相同内容复用已有 Raw
             record = RawMarketData(
                 symbol=canonical_id, market=market, source=source,
                 period="1d", fetch_time=datetime.now(),
-                payload=json.dumps(payload), processed=False
+                processed=False, **pack_payload(df_reset)
             )
-            session.add(record)
-            session.commit()
-            return len(records)
+            store_raw(session, record)
+            return len(df_reset)
     except Exception as e:
         print(f"      ❌ 保存失败: {e}")
         return 0
@@ -12,8 +12,13 @@ Optimized Raw Data Processor (高性能 ETL 处理脚本 - 组合优化版)
 
 I. Performance Optimizations (性能优化)
 ----------------------------------------
-- **预加载缓存 (Pre-fetch)**: 脚本在处理资产前，会一次性从数据库拉取该 Symbol 的所有已知历史记录并存储在内存 Map 中，消除循环内的 N 次 SQL 查询，解决 "N+1" 查询瓶颈。
-- **批量 UPSERT**: 使用 SQLite 的 `INSERT OR REPLACE` 原生 SQL，配合 batch 提交，确保大规模数据写入时的原子性与速度。
+- **列式载荷**: RAW 载荷为 Arrow IPC + zstd 时直接解码为 DataFrame (backend/raw_payload.py)，旧 JSON 载荷兼容。
+- **预加载缓存 (Pre-fetch)**: 脚本在处理资产前，会一次性从数据库拉取该 Symbol 的所有已知日线 (timestamp, close)，消除循环内的 N 次 SQL 查询，解决 "N+1" 查询瓶颈。
+- **排序数组 + searchsorted**: 前收盘价查找在合并后的有序时间数组上一次 `np.searchsorted` 完成，
+  全量重载 20 年历史时整体 O(n log n)，不再每行扫描全部已有记录 (O(n²))。
+- **列运算**: 时间解析、收盘准入、归一化、涨跌幅均为整列计算；`fetch_time` 解析、当前时间等每条 RAW 记录的不变量只算一次。
+- **批量 UPSERT**: 使用 SQLite 的 `INSERT OR REPLACE` 原生 SQL，一次 executemany 写入，确保大规模数据写入时的原子性与速度。
+- 基准测试: `python3 benchmark_process_raw.py`
 
 II. Market Close Guard (收盘准入保护)
 ----------------------------------------
@@ -54,13 +59,151 @@ sys.path.append('backend')
 from sqlmodel import Session, create_engine, select, text
 from models import RawMarketData, MarketDataDaily, MarketSnapshot
 from etl_service import ETLService
+from raw_payload import decode_payload
+from indicator_store import update_indicators
 from datetime import datetime
-import json
+import numpy as np
 import pandas as pd
 import time
 
 engine = create_engine('sqlite:///backend/database.db')
 
+# 00:00:00 的日线归一化到的收盘小时
+MARKET_CLOSE_HOURS = {'US': 16, 'HK': 16, 'CN': 15}
+# 当日数据准入：fetch_time 的小时 >= 阈值 (收盘 + 1小时缓冲) 才视为已收盘
+# US 冬/夏令时切换复杂，当日数据一律不进日线
+SAFE_CLOSE_HOURS = {'CN': 16, 'HK': 17}
+
+DAILY_UPSERT_SQL = """
+    INSERT OR REPLACE INTO marketdatadaily 
+    (symbol, market, timestamp, open, high, low, close, volume, 
+     change, pct_change, prev_close, updated_at)
+    VALUES 
+    (:symbol, :market, :timestamp, :open, :high, :low, :close, :volume,
+     :change, :pct_change, :prev_close, :updated_at)
+"""
+
+
+def parse_fetch_time(ft):
+    """fetch_time (datetime / 'YYYY-MM-DD HH:MM:SS[.ffffff]' / ISO) -> datetime，无法解析返回 None"""
+    if isinstance(ft, datetime):
+        return ft
+    if isinstance(ft, str):
+        for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'):
+            try:
+                return datetime.strptime(ft, fmt)
+            except ValueError:
+                pass
+        try:
+            return datetime.fromisoformat(ft)
+        except ValueError:
+            return None
+    return None
+
+
+def is_today_closed(market: str, fetch_time) -> bool:
+    """当日数据是否已确认收盘 (按抓取时间判断；解析失败按未收盘处理)"""
+    ft_dt = parse_fetch_time(fetch_time)
+    if ft_dt is None or market not in SAFE_CLOSE_HOURS:
+        return False
+    return ft_dt.hour >= SAFE_CLOSE_HOURS[market]
+
+
+def _parse_timestamps(df: pd.DataFrame) -> pd.Series:
+    """timestamp 列 -> datetime；字符串用默认解析，数值按毫秒，列式载荷已是 datetime (与 ETLService 一致)"""
+    if 'timestamp' not in df.columns:
+        return pd.Series(pd.NaT, index=df.index)
+    col = df['timestamp']
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col
+    if col.dtype == 'object':
+        return pd.to_datetime(col, errors='coerce')
+    return pd.to_datetime(col, unit='ms', errors='coerce')
+
+
+def lookup_prev_close(keys: np.ndarray, closes: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    keys 升序 (时间字符串)；对每个 target 取 keys 中严格小于它的最后一条的 close，没有则 NaN
+    searchsorted 一次完成：O((n + m) log n)
+    """
+    pos = np.searchsorted(keys, targets, side='left') - 1
+    found = pos >= 0
+    out = np.full(len(targets), np.nan)
+    out[found] = closes[pos[found]]
+    return out
+
+
+def build_daily_records(df: pd.DataFrame, symbol: str, market: str, fetch_time,
+                        existing_ts, existing_close, today=None, now=None):
+    """
+    纯计算 (无数据库访问)：payload DataFrame -> (日线记录列表, 快照记录)
+
+    - 按时间升序处理；timestamp / close 缺失的行跳过
+    - 历史行 (日期 < today) 或当日已收盘 (is_today_closed) 的行写入日线，并做 00:00 -> 收盘时间归一化
+    - prev_close 优先取数据源字段；缺失时取 "已有日线 + 本批写入日线" 中时间严格更早的最后一条收盘价
+    - 快照记录为最新一行 (无论是否写入日线)
+    existing_ts / existing_close: 库中该 symbol 已有日线 (任意顺序)
+    """
+    now = now or datetime.now()
+    today = pd.Timestamp(today or now.date())
+    # 每条 RAW 记录的不变量只算一次
+    today_closed = is_today_closed(market, fetch_time)
+    close_hour = MARKET_CLOSE_HOURS.get(market)
+
+    ts = _parse_timestamps(df)
+    close = pd.to_numeric(df['close'], errors='coerce') if 'close' in df.columns else pd.Series(np.nan, index=df.index)
+    keep = ts.notna() & close.notna()
+    if not keep.any():
+        return [], None
+    df = df[keep].assign(_ts=ts[keep], _close=close[keep]).sort_values('_ts', kind='stable')
+
+    ts = df['_ts']
+    writable = (ts < today) | today_closed
+    if close_hour is not None:
+        midnight = writable & (ts.dt.hour == 0) & (ts.dt.minute == 0)
+        ts = ts.where(~midnight, ts + pd.Timedelta(hours=close_hour))
+    ts_str = ts.dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy(dtype=str)
+    close = df['_close'].to_numpy(dtype=float)
+    w = writable.to_numpy()
+
+    # 已有日线与本批写入行合并 (同一时间以本批最后一行为准)，按时间排序后 searchsorted
+    merged = pd.concat([
+        pd.Series(np.asarray(existing_close, dtype=float), index=np.asarray(existing_ts, dtype=str)),
+        pd.Series(close[w], index=ts_str[w]),
+    ])
+    merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+    prev_lookup = lookup_prev_close(merged.index.to_numpy(dtype=str), merged.to_numpy(), ts_str)
+
+    def num(col, fallback):
+        if col in df.columns:
+            return pd.to_numeric(df[col], errors='coerce').fillna(fallback).to_numpy(dtype=float)
+        return np.broadcast_to(np.asarray(fallback, dtype=float), len(df))
+
+    prev = num('prev_close', pd.Series(prev_lookup, index=df.index))
+    has_prev = ~np.isnan(prev) & (prev != 0)
+    change = np.where(has_prev, close - prev, np.nan)
+    pct = np.where(has_prev, change / np.where(has_prev, prev, 1.0) * 100, np.nan)
+    # 数据源缺失开盘/最高/最低价时以收盘价填充
+    close_s = pd.Series(close, index=df.index)
+    opens, highs, lows = num('open', close_s), num('high', close_s), num('low', close_s)
+    volume = num('volume', 0.0).astype(np.int64)
+
+    def opt(x):
+        return None if np.isnan(x) else float(x)
+
+    records = [
+        {
+            'symbol': symbol, 'market': market, 'timestamp': str(t),
+            'open': float(o), 'high': float(h), 'low': float(l), 'close': float(c),
+            'volume': int(v), 'change': opt(ch), 'pct_change': opt(p), 'prev_close': opt(pc),
+            'updated_at': now,
+        }
+        for t, o, h, l, c, v, ch, p, pc in zip(ts_str, opens, highs, lows, close, volume, change, pct, prev)
+    ]
+    daily = [r for r, ok in zip(records, w) if ok]
+    return daily, records[-1]
+
+
 def process_raw_optimized(raw_id: int, session: Session):
     """优化版ETL处理 - 单个资产"""
     
@@ -71,190 +214,42 @@ def process_raw_optimized(raw_id: int, session: Session):
     
     # 2. 解析payload
     try:
-        payload_data = json.loads(raw_record.payload)
-        if isinstance(payload_data, dict) and 'data' in payload_data:
-            data_list = payload_data['data']
-        elif isinstance(payload_data, list):
-            data_list = payload_data
-        else:
+        df = decode_payload(raw_record)
+        if df is None:
             return 0
         
-        if not data_list:
+        if df.empty:
             raw_record.processed = True
             return 0
         
-        df = pd.DataFrame(data_list)
-        
-        # 3. ✅ 预加载已有数据 (一次查询)
-        existing_data = {}
-        result = session.exec(
-            select(MarketDataDaily)
+        # 3. ✅ 预加载已有日线 (一次查询，只取 timestamp / close)
+        existing = session.exec(
+            select(MarketDataDaily.timestamp, MarketDataDaily.close)
             .where(MarketDataDaily.symbol == raw_record.symbol)
             .where(MarketDataDaily.market == raw_record.market)
-            .order_by(MarketDataDaily.timestamp)
         ).all()
+        existing_ts = [r[0] for r in existing]
+        existing_close = [r[1] for r in existing]
         
-        for record in result:
-            existing_data[record.timestamp] = record.close
-        
-        # 4. 批量准备数据
-        records_to_insert = []
-        last_close = None
-        
-        for _, row in df.iterrows():
-            # 时间戳处理
-            timestamp = pd.to_datetime(row.get('timestamp'))
-            if pd.isna(timestamp):
-                continue
-            
-            # 判断是否为历史数据（非今日）
-            current_date = datetime.now().date()
-            row_date = timestamp.date()
-            is_history = row_date < current_date
-            
-            # 市场收盘时间判断
-            market_closed = False
-            
-            if is_history:
-                market_closed = True
-            else:
-                # 如果是当天数据，必须检查 fetch_time 是否已过收盘时间 + 1小时缓冲
-                # 只有 "完全收盘后1小时" 的数据才允许写入 Daily 表
-                # 如果是当天数据，必须检查 fetch_time 是否已过收盘时间 + 1小时缓冲
-                # 只有 "完全收盘后1小时" 的数据才允许写入 Daily 表
-                try:
-                     ft = raw_record.fetch_time
-                     if isinstance(ft, str):
-                         # Try parsing with and without microseconds
-                         try:
-                             ft_dt = datetime.strptime(ft, '%Y-%m-%d %H:%M:%S.%f')
-                         except ValueError:
-                             try:
-                                 ft_dt = datetime.strptime(ft, '%Y-%m-%d %H:%M:%S')
-                             except ValueError:
-                                  # Fallback for ISO format 'T'
-                                  ft_dt = datetime.fromisoformat(ft)
-                     elif isinstance(ft, datetime):
-                         ft_dt = ft
-                     else:
-                         # Unexpected type, maybe skip safety check or default closed?
-                         # Default to now() if missing? No, safer to assume open/false.
-                         raise ValueError(f"Unknown fetch_time type: {type(ft)}")
-
-                     ft_hour = ft_dt.hour
-                     
-                     if raw_record.market == 'CN':
-                         # CN Close 15:00. Safe > 16:00
-                         if ft_hour >= 16: market_closed = True
-                     
-                     elif raw_record.market == 'HK':
-                         # HK Close 16:00 (Auction ~16:10). Safe > 17:00
-                         if ft_hour >= 17: market_closed = True
-                     
-                     elif raw_record.market == 'US':
-                         # US Close varies. Default False.
-                         pass
-                         
-                except Exception as e:
-                     # Fallback if fetch_time parse fail -> Safe side: False
-                     # print(f"DEBUG: Time parse error: {e}")
-                     market_closed = False
-            
-            # 只有历史数据 或 今日已收盘 才标准化收盘时间
-            if is_history or market_closed:
-                if timestamp.hour == 0 and timestamp.minute == 0:
-                    if raw_record.market == 'US':
-                        timestamp = timestamp.replace(hour=16)
-                    elif raw_record.market == 'HK':
-                        timestamp = timestamp.replace(hour=16)
-                    elif raw_record.market == 'CN':
-                        timestamp = timestamp.replace(hour=15)
-            
-            timestamp_str = timestamp.strftime('%Y-%m-%d %H:%M:%S')
-            
-            # 获取前收盘价
-            prev_close = row.get('prev_close')
-            if prev_close is None:
-                # 从预加载数据中查找
-                prev_timestamps = [ts for ts in existing_data.keys() if ts < timestamp_str]
-                if prev_timestamps:
-                    prev_timestamp = max(prev_timestamps)
-                    prev_close = existing_data[prev_timestamp]
-                elif last_close is not None:
-                    prev_close = last_close
-            
-            # 计算涨跌幅
-            close_price = float(row['close'])
-            change = None
-            pct_change = None
-            
-            if prev_close:
-                change = close_price - prev_close
-                pct_change = (change / prev_close) * 100
-            
-            # 准备记录
-            raw_close = row.get('close')
-            if pd.isna(raw_close) or raw_close is None:
-                continue
-            
-            close_price = float(raw_close)
-            
-            def clean_val(val, fallback):
-                if pd.isna(val) or val is None: return fallback
-                return float(val)
-
-            record_dict = {
-                'symbol': raw_record.symbol,
-                'market': raw_record.market,
-                'timestamp': timestamp_str,
-                'open': clean_val(row.get('open'), close_price),
-                'high': clean_val(row.get('high'), close_price),
-                'low': clean_val(row.get('low'), close_price),
-                'close': close_price,
-                'volume': int(row.get('volume', 0)),
-                'change': change,
-                'pct_change': pct_change,
-                'prev_close': prev_close,
-                'updated_at': datetime.now()
-            }
-            
-            # 逻辑分流:
-            # 1. Daily表: 仅写入历史数据 或 今日已收盘数据
-            # 2. Snapshot表: 始终写入最新一条
-            
-            # 允许写入日线表的条件: 是历史数据，或者 (是今日数据 且 市场已收盘)
-            if is_history or market_closed:
-                records_to_insert.append(record_dict)
-                last_close = close_price
-                existing_data[timestamp_str] = close_price
-            else:
-                # 即使不写入日线表，也要更新last_close用于后续计算? 
-                # 不，日线连续性应基于已确认的收盘价
-                pass
-                
-            # 用于更新快照的始终是最新一条 (无论是否收盘)
-            last_record_for_snapshot = record_dict
+        # 4. 列运算准备数据 (收盘准入 / 时间归一化 / 涨跌幅)
+        now = datetime.now()
+        records_to_insert, last_record = build_daily_records(
+            df, raw_record.symbol, raw_record.market, raw_record.fetch_time,
+            existing_ts, existing_close, now=now
+        )
         
-        # 5. ✅ 批量插入 Daily (仅合规数据)
+        # 5. ✅ 批量插入 Daily (仅合规数据，一次 executemany)
         if records_to_insert:
-            # 使用原生SQL批量UPSERT
-            for record in records_to_insert:
-                session.exec(text("""
-                    INSERT OR REPLACE INTO marketdatadaily 
-                    (symbol, market, timestamp, open, high, low, close, volume, 
-                     change, pct_change, prev_close, updated_at)
-                    VALUES 
-                    (:symbol, :market, :timestamp, :open, :high, :low, :close, :volume,
-                     :change, :pct_change, :prev_close, :updated_at)
-                """).bindparams(**record))
+            session.connection().execute(text(DAILY_UPSERT_SQL), records_to_insert)
+            # 技术指标从本批最早的 bar 起增量更新 (与日线同一事务)
+            try:
+                update_indicators(session.connection(), raw_record.symbol, raw_record.market,
+                                  since=records_to_insert[0]['timestamp'])
+            except Exception as e:
+                print(f"  ⚠️ 指标更新失败: {e}")
         
         # 6. 更新Snapshot (始终使用最新一条解析到的数据)
-        if 'last_record_for_snapshot' in locals() and last_record_for_snapshot:
-            # 如果没有进入Daily (例如盘中)，需要确保Change/PctChange计算正确
-            # 盘中数据的prev_close应该取自昨日收盘 (Daily表中最近的一条)
-            # 上面的逻辑中，prev_close 已经尝试获取了。
-            
-            last_record = last_record_for_snapshot
+        if last_record:
             session.exec(text("""
                 INSERT OR REPLACE INTO marketsnapshot
                 (symbol, market, price, open, high, low, prev_close, change, pct_change,
@@ -274,8 +269,8 @@ def process_raw_optimized(raw_id: int, session: Session):
                 pct_change=last_record['pct_change'],
                 volume=last_record['volume'],
                 timestamp=last_record['timestamp'],
-                fetch_time=datetime.now(),
-                updated_at=datetime.now()
+                fetch_time=now,
+                updated_at=now
             ))
         
         # 7. 标记完成
@@ -0,0 +1,198 @@
+"""
+Fundamentals derivation stage
+基于 financial_history 全量数据一次性计算 YoY / 派息率 / 分红稳定性等衍生指标，
+写入 financial_derived 表，供 earnings_state / dividend_engine / quality_assessment 直接读取。
+
+All computations are grouped by asset_id (rolling / merge_asof) over the whole table;
+no per-asset Python loops.
+"""
+import numpy as np
+import pandas as pd
+
+from db.connection import get_connection
+
+# 去年同期对齐容差：财报日期可能相差数天 (e.g. 12-31 vs 12-28)
+YOY_TOLERANCE_DAYS = 20
+
+# 分红削减判定：低于上一期 99% 视为削减 (与原 snapshot_builder 口径一致)
+DIVIDEND_CUT_TOLERANCE = 0.99
+
+DERIVED_COLUMNS = [
+    "asset_id", "report_date",
+    "eps_ttm", "eps_yoy",
+    "revenue_ttm", "revenue_yoy",
+    "net_profit_ttm", "net_profit_yoy",
+    "dividends_ttm", "payout_ratio", "payout_ratio_3y",
+    "dps_5y_mean", "dps_5y_std", "cut_years_10y", "dividend_recovery_progress",
+]
+
+
+def load_financial_history(asset_ids=None, conn=None) -> pd.DataFrame:
+    """读取 financial_history (可选限定资产)，按 asset_id, report_date 升序"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        sql = """
+            SELECT asset_id, report_date, eps_ttm, revenue_ttm, net_profit_ttm, dividend_amount
+            FROM financial_history
+        """
+        params = []
+        if asset_ids:
+            sql += f" WHERE asset_id IN ({','.join('?' * len(asset_ids))})"
+            params = list(asset_ids)
+        sql += " ORDER BY asset_id, report_date"
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _prior_year_values(df: pd.DataFrame, columns) -> pd.DataFrame:
+    """
+    为每一行找到 "去年同期" 报告 (report_date - 1 年，±YOY_TOLERANCE_DAYS 内最近的一期)，
+    返回与 df 行对齐的上年数值
+    """
+    left = pd.DataFrame({
+        "asset_id": df["asset_id"].values,
+        "target_date": (df["_date"] - pd.DateOffset(years=1)).values,
+        "_row": np.arange(len(df)),
+    }).sort_values("target_date")
+    right = df[["asset_id", "_date"] + list(columns)].sort_values("_date")
+
+    matched = pd.merge_asof(
+        left, right,
+        left_on="target_date", right_on="_date", by="asset_id",
+        direction="nearest", tolerance=pd.Timedelta(days=YOY_TOLERANCE_DAYS),
+    )
+    return matched.sort_values("_row").set_index(df.index)[list(columns)]
+
+
+def _yoy(curr: pd.Series, prev: pd.Series) -> pd.Series:
+    return ((curr - prev) / prev.abs()).where(prev.notna() & (prev != 0))
+
+
+def _dividend_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    分红序列统计 (仅基于 dividend_amount 非空的报告期)：
+    - dps_5y_mean / dps_5y_std: 最近 5 期均值 / 总体标准差
+    - cut_years_10y: 最近 10 期内相邻两期削减次数
+    - dividend_recovery_progress: 当前分红 / 历史最高分红
+    """
+    d = df.loc[df["dividend_amount"].notna(), ["asset_id", "dividend_amount"]]
+    if d.empty:
+        return pd.DataFrame(index=df.index, columns=[
+            "dps_5y_mean", "dps_5y_std", "cut_years_10y", "dividend_recovery_progress"
+        ], dtype=float)
+
+    g = d.groupby("asset_id")["dividend_amount"]
+    is_cut = (d["dividend_amount"] < g.shift() * DIVIDEND_CUT_TOLERANCE).astype(float)
+    running_max = g.cummax()
+
+    stats = pd.DataFrame({
+        "dps_5y_mean": g.rolling(5, min_periods=1).mean().reset_index(level=0, drop=True),
+        "dps_5y_std": g.rolling(5, min_periods=1).std(ddof=0).reset_index(level=0, drop=True),
+        # 10 期内只有 9 组相邻对
+        "cut_years_10y": is_cut.groupby(d["asset_id"]).rolling(9, min_periods=1).sum()
+                               .reset_index(level=0, drop=True),
+        "dividend_recovery_progress": (d["dividend_amount"] / running_max).where(running_max > 0, 1.0),
+    })
+    return stats.reindex(df.index)
+
+
+def derive_fundamentals(history: pd.DataFrame) -> pd.DataFrame:
+    """
+    history: financial_history 行 (asset_id, report_date, eps_ttm, revenue_ttm, net_profit_ttm, dividend_amount)
+    Returns: DataFrame[DERIVED_COLUMNS]，每个 (asset_id, report_date) 一行
+
+    financial_history 中的 *_ttm 字段已是 TTM 口径，直接沿用；
+    dividends_ttm 为截至该报告期最近一次披露的年度分红 (组内前向填充)。
+    """
+    if history.empty:
+        return pd.DataFrame(columns=DERIVED_COLUMNS)
+
+    df = history.copy()
+    df["_date"] = pd.to_datetime(df["report_date"], errors="coerce")
+    df = df.dropna(subset=["_date"]).sort_values(["asset_id", "_date"]).reset_index(drop=True)
+    df["report_date"] = df["_date"].dt.strftime("%Y-%m-%d")
+    df = df.drop_duplicates(["asset_id", "report_date"], keep="last").reset_index(drop=True)
+
+    value_cols = ["eps_ttm", "revenue_ttm", "net_profit_ttm"]
+    for col in value_cols + ["dividend_amount"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    prev = _prior_year_values(df, value_cols)
+    df["eps_yoy"] = _yoy(df["eps_ttm"], prev["eps_ttm"])
+    df["revenue_yoy"] = _yoy(df["revenue_ttm"], prev["revenue_ttm"])
+    df["net_profit_yoy"] = _yoy(df["net_profit_ttm"], prev["net_profit_ttm"])
+
+    div_stats = _dividend_stats(df)
+    df = df.join(div_stats)
+    ffill_cols = ["dividend_amount"] + list(div_stats.columns)
+    df[ffill_cols] = df.groupby("asset_id")[ffill_cols].ffill()
+    df = df.rename(columns={"dividend_amount": "dividends_ttm"})
+
+    df["payout_ratio"] = (df["dividends_ttm"] / df["net_profit_ttm"]).where(df["net_profit_ttm"] > 0)
+    df["payout_ratio_3y"] = (
+        df.set_index("_date").groupby("asset_id")["payout_ratio"]
+          .rolling("1096D", min_periods=1).mean()
+          .values
+    )
+
+    return df.reindex(columns=DERIVED_COLUMNS)
+
+
+def annual_revenue_yoy(derived) -> pd.Series:
+    """
+    financial_derived 行 (DataFrame 或 dict 列表) -> asset_id -> 年度营收同比列表 (按年份从旧到新)
+    每个财年 (report_date 年份) 只取最后一期有值的 revenue_yoy：quality_assessment 的
+    neg_years / yoy_std 阈值按年度同比设定，季报各期的 TTM 同比不能逐期计入
+    """
+    df = pd.DataFrame(derived, columns=["asset_id", "report_date", "revenue_yoy"])
+    df["revenue_yoy"] = pd.to_numeric(df["revenue_yoy"], errors="coerce")
+    df = df.dropna(subset=["revenue_yoy"])
+    df["_year"] = df["report_date"].astype(str).str[:4]
+    df = df.sort_values(["asset_id", "report_date"]).drop_duplicates(["asset_id", "_year"], keep="last")
+    return df.groupby("asset_id")["revenue_yoy"].agg(list)
+
+
+def run_fundamentals_derivation_job(asset_ids=None, conn=None) -> int:
+    """
+    任务入口：读取 financial_history -> 向量化派生 -> 写入 financial_derived
+    asset_ids 为空时全量重算
+    Returns: 写入行数
+    """
+    from db.financial_derived import replace_financial_derived
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        history = load_financial_history(asset_ids, conn)
+        derived = derive_fundamentals(history)
+        replace_financial_derived(derived, asset_ids=asset_ids, conn=conn)
+        return len(derived)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def load_or_derive(asset_id: str, conn=None) -> pd.DataFrame:
+    """
+    读取单个资产的 financial_derived；为空 (尚未派生，或 financial_history 写入触发器已作废) 时
+    按该资产重新派生并落库后返回
+    """
+    from db.financial_derived import load_financial_derived
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        derived = load_financial_derived(asset_id, conn=conn)
+        if derived.empty:
+            run_fundamentals_derivation_job([asset_id], conn=conn)
+            derived = load_financial_derived(asset_id, conn=conn)
+        return derived
+    finally:
+        if own_conn:
+            conn.close()
@@ -1,5 +1,5 @@
 import pandas as pd
-from data.price_cache import load_price_series
+from data.price_panel import load_aligned_panel
 from metrics.risk_engine import RiskEngine
 from config import DEFAULT_MARKET_INDEX, SECONDARY_GROWTH_INDEX, SECONDARY_VALUE_INDEX
 # NEW: Import position/amplification calculators
@@ -9,26 +9,13 @@ from db.market_sector_snapshot import save_market_risk_metrics
 RS_LOOKBACK_DAYS = 63  # ~3m
 MARKET_LOOKBACK_DAYS = 900 # ~2.5y, 足够覆盖回撤结构
 
-def _to_close_series(df: pd.DataFrame) -> pd.Series:
-    df = df.copy()
-    df["trade_date"] = pd.to_datetime(df["trade_date"])
-    df = df.sort_values("trade_date")
-    df = df.set_index("trade_date")
-    return df["close"].astype(float)
-
-def _relative_strength(a: pd.Series, b: pd.Series, lookback_days: int) -> float | None:
-    x = pd.concat([a, b], axis=1).dropna()
-    if len(x) < lookback_days + 5:
-        return None
-    ratio = x.iloc[:, 0] / x.iloc[:, 1]
-    return float(ratio.iloc[-1] / ratio.iloc[-lookback_days] - 1.0)
-
 def build_market_regime(
     as_of_date: str, 
     asset_id: str = "^GSPC", 
     growth_proxy: str = SECONDARY_GROWTH_INDEX,
     value_proxy: str = SECONDARY_VALUE_INDEX,
-    snapshot_id: str = None
+    snapshot_id: str = None,
+    deferred_writes: list = None
 ) -> dict:
     """
     Build market regime overlay with NEW Position and Amplification metrics
@@ -37,38 +24,73 @@ def build_market_regime(
         as_of_date: Date string (YYYY-MM-DD)
         asset_id: Market index ID
         snapshot_id: UUID of parent snapshot (for persistence)
+        deferred_writes: If given, persistence is appended to this list instead of executed
     
     Returns:
         Dict with market metrics including new position_pct and amplification
     """
+    regime, risk_metrics = compute_market_regime(as_of_date, asset_id, growth_proxy, value_proxy)
+    if snapshot_id:
+        persist_market_regime(snapshot_id, risk_metrics, deferred_writes)
+    return regime
+
+
+def persist_market_regime(snapshot_id: str, risk_metrics: dict, deferred_writes: list = None):
+    """
+    Persist computed market metrics (from compute_market_regime) for one snapshot.
+    Split from the computation so callers caching the regime per date still link every snapshot.
+    """
+    if not risk_metrics:
+        return
+
+    def _persist():
+        try:
+            save_market_risk_metrics(snapshot_id=snapshot_id, **risk_metrics)
+        except Exception as e:
+            print(f"Warning: Failed to save market risk metrics: {e}")
+
+    if deferred_writes is not None:
+        deferred_writes.append(_persist)
+    else:
+        _persist()
+
+
+def compute_market_regime(
+    as_of_date: str,
+    asset_id: str = "^GSPC",
+    growth_proxy: str = SECONDARY_GROWTH_INDEX,
+    value_proxy: str = SECONDARY_VALUE_INDEX
+) -> tuple:
+    """
+    Compute the market regime without persisting.
+
+    Returns:
+        (regime dict, market_risk_snapshot kwargs for persist_market_regime or None if data missing)
+    """
     end = pd.to_datetime(as_of_date)
     start = (end - pd.Timedelta(days=MARKET_LOOKBACK_DAYS)).strftime("%Y-%m-%d")
     
-    # 1. Load Market Index Data
-    market_df = load_price_series(asset_id, start, as_of_date)
-    spx_df = market_df # Alias for logic below
-
-    ndx_df = load_price_series(growth_proxy, start, as_of_date) if growth_proxy else None
-    dji_df = load_price_series(value_proxy, start, as_of_date) if value_proxy else None
+    # 1. Load Market Index + growth/value proxies in one query, aligned on the index's calendar
+    panel = load_aligned_panel([asset_id, growth_proxy, value_proxy], start, as_of_date, adjusted=True)
+    spx = panel.series(asset_id)
     
-    if market_df is None or market_df.empty:
+    if spx.empty:
         return {
             "market_index_id": asset_id,
             "market_dd_state": "D0 (Data Missing)",
             "market_regime_label": "Unknown"
-        }
+        }, None
 
-    spx = _to_close_series(spx_df)
     spx_risk = RiskEngine.calculate_risk_metrics(spx)
     
     rs_g = None
     rs_v = None
     
-    if ndx_df is not None and not ndx_df.empty:
-        rs_g = _relative_strength(_to_close_series(ndx_df), spx, RS_LOOKBACK_DAYS)
+    if growth_proxy:
+        rs_g = panel.relative_strength(growth_proxy, asset_id, RS_LOOKBACK_DAYS)
         
-    if dji_df is not None and not dji_df.empty:
-        rs_v = _relative_strength(_to_close_series(dji_df), spx, RS_LOOKBACK_DAYS)
+    if value_proxy:
+        rs_v = panel.relative_strength(value_proxy, asset_id, RS_LOOKBACK_DAYS)
     
     # NEW: Calculate Market Position (10Y percentile)
     market_position_pct = calculate_position_pct(asset_id, as_of_date)
@@ -93,24 +115,19 @@ def build_market_regime(
     elif rs_g is not None and rs_v is not None and rs_g < -0.05 and rs_v < -0.05:
         label = "Systemic Compression"
     
-    # NEW: Persist to market_risk_snapshot table
-    if snapshot_id:
-        try:
-            save_market_risk_metrics(
-                snapshot_id=snapshot_id,
-                index_asset_id=asset_id,
-                as_of_date=as_of_date,
-                index_risk_state=mkt_dd or "D0",
-                drawdown=spx_risk.get("current_drawdown", 0.0),
-                volatility=volatility,
-                market_position_pct=market_position_pct,
-                market_amplification_level=amplification_level,
-                market_amplification_score=amplification_score
-            )
-        except Exception as e:
-            print(f"Warning: Failed to save market risk metrics: {e}")
+    # Persisted per snapshot by persist_market_regime (market_risk_snapshot table)
+    risk_metrics = {
+        "index_asset_id": asset_id,
+        "as_of_date": as_of_date,
+        "index_risk_state": mkt_dd or "D0",
+        "drawdown": spx_risk.get("current_drawdown", 0.0),
+        "volatility": volatility,
+        "market_position_pct": market_position_pct,
+        "market_amplification_level": amplification_level,
+        "market_amplification_score": amplification_score,
+    }
     
-    return {
+    regime = {
         "market_index_id": asset_id,
         "market_dd_state": mkt_dd,
         "market_path_risk": mkt_path,
@@ -121,3 +138,4 @@ def build_market_regime(
         "value_vs_market_rs_3m": rs_v,
         "market_regime_label": label,
     }
+    return regime, risk_metrics
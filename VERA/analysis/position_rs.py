@@ -27,6 +27,7 @@ def calculate_position_pct(asset_id: str, as_of_date: str, lookback_years: int =
         - Lookback: DEFAULT_LOOKBACK_YEARS (10Y)
         - Minimum data: 252*3 days (3 years)
         - Definition: Percentile rank of current price vs historical close distribution
+        - Price Source: Split/dividend-adjusted close (load_price_series(adjusted=True))
         - Missing data: Return None (NOT 0.0)
     """
     if lookback_years is None:
@@ -37,7 +38,7 @@ def calculate_position_pct(asset_id: str, as_of_date: str, lookback_years: int =
     start = (end - pd.Timedelta(days=lookback_years * 365)).strftime("%Y-%m-%d")
     
     # Load price series
-    df = load_price_series(asset_id, start, as_of_date)
+    df = load_price_series(asset_id, start, as_of_date, adjusted=True)
     
     if df is None or df.empty or len(df) < MIN_TRADING_DAYS:
         return None
@@ -67,7 +68,7 @@ def calculate_sector_rs_3m(sector_etf_id: str, market_index_id: str, as_of_date:
     Spec:
         - Period: RS_3M = 63 trading days (NOT natural months)
         - Return Type: Simple return (NOT log return)
-        - Price Source: Close price (unadjusted)
+        - Price Source: Split/dividend-adjusted close (load_price_series(adjusted=True))
         - Formula: RS_3M = (sector_t / sector_{t-63} - 1) - (market_t / market_{t-63} - 1)
     """
     # Load price series for both assets
@@ -75,8 +76,8 @@ def calculate_sector_rs_3m(sector_etf_id: str, market_index_id: str, as_of_date:
     # Need extra buffer for lookback
     start = (end - pd.Timedelta(days=RS_3M_DAYS * 2)).strftime("%Y-%m-%d")
     
-    sector_df = load_price_series(sector_etf_id, start, as_of_date)
-    market_df = load_price_series(market_index_id, start, as_of_date)
+    sector_df = load_price_series(sector_etf_id, start, as_of_date, adjusted=True)
+    market_df = load_price_series(market_index_id, start, as_of_date, adjusted=True)
     
     if sector_df is None or sector_df.empty or len(sector_df) < RS_3M_DAYS + 5:
         return None
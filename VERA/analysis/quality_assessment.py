@@ -25,11 +25,28 @@ def _get_str(f: Dict[str, Any], *keys: str) -> Optional[str]:
 # A. Business（业务质量）
 
 # 1）Revenue Stability: STRONG / MID / WEAK
+def _revenue_stability_from_yoy(yoy: np.ndarray, notes: List[str]) -> Tuple[str, List[str]]:
+    neg_years = int(np.sum(yoy < 0))
+    vol = float(np.std(yoy))
+
+    if neg_years >= 2 or vol >= 0.30:
+        return ("WEAK", notes + [f"yoy_std={vol:.2f}", f"neg_years={neg_years}"])
+    if neg_years == 0 and vol <= 0.15:
+        return ("STRONG", notes + [f"yoy_std={vol:.2f}"])
+    return ("MID", notes + [f"yoy_std={vol:.2f}", f"neg_years={neg_years}"])
+
+
 def revenue_stability_flag(f: Dict[str, Any]) -> Tuple[str, List[str]]:
     notes: List[str] = []
     # 允许你放入 revenue_history: list[float]，按年份从旧到新
     hist = f.get("revenue_history")
-    
+    # financial_derived 预先计算好的年度同比序列 (每个财年最后一期，去年同期对齐)，优先使用
+    yoy_hist = f.get("revenue_yoy_history")
+
+    if isinstance(yoy_hist, list) and len(yoy_hist) >= 3:
+        yoy = np.array([float(x) for x in yoy_hist if x is not None], dtype=float)
+        return _revenue_stability_from_yoy(yoy, notes)
+
     # 尝试从 fundamentals_annual 转换的 history
     if isinstance(hist, list) and len(hist) >= 4:
         try:
@@ -39,14 +56,7 @@ def revenue_stability_flag(f: Dict[str, Any]) -> Tuple[str, List[str]]:
                 return ("-", notes)
 
             yoy = (rev[1:] / np.maximum(rev[:-1], 1e-9)) - 1.0
-            neg_years = int(np.sum(yoy < 0))
-            vol = float(np.std(yoy))
-
-            if neg_years >= 2 or vol >= 0.30:
-                return ("WEAK", notes + [f"yoy_std={vol:.2f}", f"neg_years={neg_years}"])
-            if neg_years == 0 and vol <= 0.15:
-                return ("STRONG", notes + [f"yoy_std={vol:.2f}"])
-            return ("MID", notes + [f"yoy_std={vol:.2f}", f"neg_years={neg_years}"])
+            return _revenue_stability_from_yoy(yoy, notes)
         except Exception:
             notes.append("revenue_history parse failed")
             return ("-", notes)
@@ -236,6 +246,8 @@ def payout_consistency_flag(
     div_yield = _get_num(f, "dividend_yield", "dividendYield")  # 0..1
     buyback_yield = _get_num(f, "buyback_ratio", "buyback_yield", "netBuybackYield")  # 0..1
 
+    payout_3y = _get_num(f, "payout_ratio_3y")  # financial_derived 近 3 年派息率
+
     dy = div_yield or 0.0
     by = buyback_yield or 0.0
 
@@ -257,7 +269,9 @@ def payout_consistency_flag(
         )
 
     # 3) Some payout history or young company → NEUTRAL
-    if dy > 0 or by > 0:
+    if dy > 0 or by > 0 or (payout_3y or 0.0) > 0:
+        if payout_3y is not None:
+            notes.append(f"payout_3y={payout_3y:.2f}")
         return (
             "NEUTRAL",
             notes + [f"dy={dy:.3f}", f"by={by:.3f}",
@@ -393,7 +407,8 @@ def build_quality_snapshot(
     risk_context: Optional[Dict[str, Any]] = None,
     # New optional inputs
     dividend_info: Optional[Any] = None, # DividendSafetyInfo
-    earnings_info: Optional[Any] = None  # EarningsStateInfo
+    earnings_info: Optional[Any] = None,  # EarningsStateInfo
+    derived_rows: Optional[List[Dict[str, Any]]] = None  # financial_derived 行，按 report_date 升序
 ) -> QualitySnapshot:
     """
     Wrapper to adapt AssetFundamentals object to dictionary expected by build_quality_flags,
@@ -423,6 +438,17 @@ def build_quality_snapshot(
     
     val = getattr(fundamentals, 'shares_yoy', None)
     if val is not None: f_dict['shares_out_yoy_growth'] = val
+
+    # financial_derived: 预先计算的营收同比 / 派息率
+    if derived_rows:
+        from analysis.fundamentals_derivation import annual_revenue_yoy
+        yoy = annual_revenue_yoy(derived_rows)
+        f_dict['revenue_yoy_history'] = yoy.iloc[0] if len(yoy) else []
+        latest = derived_rows[-1]
+        for key in ('payout_ratio', 'payout_ratio_3y'):
+            v = latest.get(key)
+            if v is not None and v == v:
+                f_dict[key] = v
     
     # 2. Run Logic
     # Note: Our logic currently handles missing keys gracefully ("MID"/"NEUTRAL")
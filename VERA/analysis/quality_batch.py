@@ -0,0 +1,397 @@
+"""
+Columnar quality engine
+与 analysis/quality_assessment.build_quality_flags 规则完全一致，
+但一次对整个资产池的 fundamentals DataFrame 求值 (每行一个资产，列名同 fundamentals dict 的 key)。
+
+Flag 判定全部为列向量运算 (按规则先后顺序 first-match)；
+说明文案 (notes) 只对命中行格式化，输出与逐资产版本逐字一致。
+"""
+from __future__ import annotations
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+FLAG_NAMES = [
+    "revenue_stability_flag",
+    "cyclicality_flag",
+    "moat_proxy_flag",
+    "balance_sheet_flag",
+    "cashflow_coverage_flag",
+    "leverage_risk_flag",
+    "payout_consistency_flag",
+    "dilution_risk_flag",
+    "regulatory_dependence_flag",
+]
+
+_CYCL_LOW = ["consumer staples", "healthcare", "utilities", "日常消费", "医疗保健", "公用事业"]
+_CYCL_HIGH = ["energy", "materials", "industrials", "real estate", "能源", "原材料", "工业", "房地产"]
+_REG_HIGH = ["utilities", "banks", "financial", "healthcare", "insurance", "公用事业", "银行", "金融", "医疗保健", "保险"]
+_REG_MID = ["technology", "communication", "telecom", "信息技术", "通信", "科技"]
+
+
+# ⸻
+# 列读取 (对应 _get_num / _get_str 的别名回退)
+
+def _num(df: pd.DataFrame, *keys: str) -> np.ndarray:
+    out = np.full(len(df), np.nan)
+    for k in keys:
+        if k not in df.columns:
+            continue
+        v = pd.to_numeric(df[k], errors="coerce").to_numpy(dtype=float)
+        out = np.where(np.isnan(out), v, out)
+    return out
+
+
+def _str(df: pd.DataFrame, *keys: str) -> pd.Series:
+    out = pd.Series(np.nan, index=df.index, dtype=object)
+    for k in keys:
+        if k not in df.columns:
+            continue
+        s = df[k].where(df[k].map(lambda v: isinstance(v, str)))
+        s = s.str.strip().replace("", np.nan)
+        out = out.fillna(s)
+    return out
+
+
+def _contains_any(s: pd.Series, words: List[str]) -> np.ndarray:
+    mask = np.zeros(len(s), dtype=bool)
+    for w in words:
+        mask |= s.str.contains(w, regex=False).fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+def _derived_d2e(df: pd.DataFrame) -> np.ndarray:
+    """debt_to_equity 缺失时用 total_debt / (total_assets - total_liabilities) 补算 (权益需 > 0)"""
+    d2e = _num(df, "debt_to_equity", "debtToEquity")
+    equity = _num(df, "total_assets") - _num(df, "total_liabilities")
+    total_debt = _num(df, "total_debt")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fallback = np.where(equity > 0, total_debt / equity, np.nan)
+    return np.where(np.isnan(d2e), fallback, d2e)
+
+
+def _render(v, spec: Optional[str]) -> str:
+    # spec=None 对应原实现中的 f"{x}" (None 显示为 "None")
+    if spec is None:
+        return "None" if v is None or v != v else str(float(v))
+    return format(v.item() if isinstance(v, np.generic) else v, spec)
+
+
+class _FlagEval:
+    """
+    单个 flag 的列式求值：按规则顺序调用 decide()，已命中的行不再参与后续规则。
+    notes 的 part 可以是：常量字符串 / (prefix, values, spec) / 逐行字符串数组 (None 表示跳过)
+    """
+
+    def __init__(self, n: int):
+        self.level = np.full(n, "-", dtype=object)
+        self.notes: List[List[str]] = [[] for _ in range(n)]
+        self.open = np.ones(n, dtype=bool)
+
+    def note(self, mask, *parts):
+        pos = np.flatnonzero(mask)
+        for p in parts:
+            if isinstance(p, str):
+                for i in pos:
+                    self.notes[i].append(p)
+            elif isinstance(p, tuple):
+                prefix, values, spec = p
+                for i in pos:
+                    self.notes[i].append(prefix + _render(values[i], spec))
+            else:
+                for i in pos:
+                    if p[i] is not None:
+                        self.notes[i].append(p[i])
+
+    def decide(self, cond, level: str, *parts):
+        mask = self.open & cond
+        self.level[mask] = level
+        self.note(mask, *parts)
+        self.open &= ~mask
+
+    def rest(self, level: str, *parts):
+        self.decide(np.ones(len(self.level), dtype=bool), level, *parts)
+
+
+# ⸻
+# A. Business
+
+def _list_values(series: pd.Series, mask: np.ndarray) -> pd.DataFrame:
+    """把 mask 行中的列表展开为长表 (row, raw)，剔除 None"""
+    s = series[mask].explode()
+    s = s[s.notna()]
+    return pd.DataFrame({"row": s.index.to_numpy(), "raw": s.to_numpy()})
+
+
+def _revenue_stability(df: pd.DataFrame) -> _FlagEval:
+    n = len(df)
+    ev = _FlagEval(n)
+    none_list = pd.Series([None] * n, index=df.index, dtype=object)
+    yoy_col = df["revenue_yoy_history"] if "revenue_yoy_history" in df.columns else none_list
+    hist_col = df["revenue_history"] if "revenue_history" in df.columns else none_list
+
+    has_yoy = yoy_col.map(lambda v: isinstance(v, list) and len(v) >= 3).to_numpy(dtype=bool)
+    has_hist = ~has_yoy & hist_col.map(lambda v: isinstance(v, list) and len(v) >= 4).to_numpy(dtype=bool)
+
+    neg = np.zeros(n)
+    vol = np.full(n, np.nan)
+
+    # 1) 预计算同比
+    y = _list_values(yoy_col, has_yoy)
+    y["x"] = pd.to_numeric(y["raw"], errors="coerce")
+    g = y.groupby("row")["x"]
+    stats_neg = (y["x"] < 0).groupby(y["row"]).sum()
+    neg[stats_neg.index.to_numpy(dtype=int)] = stats_neg.to_numpy()
+    stats_vol = g.std(ddof=0)
+    vol[stats_vol.index.to_numpy(dtype=int)] = stats_vol.to_numpy()
+
+    # 2) 营收序列 -> 环比年增
+    h = _list_values(hist_col, has_hist)
+    h["x"] = pd.to_numeric(h["raw"], errors="coerce")
+    bad_rows = np.zeros(n, dtype=bool)
+    bad_rows[h.loc[h["x"].isna(), "row"].to_numpy(dtype=int)] = True
+    clean_count = np.zeros(n)
+    counts = h.groupby("row").size()
+    clean_count[counts.index.to_numpy(dtype=int)] = counts.to_numpy()
+
+    prev = h.groupby("row")["x"].shift()
+    h["yoy"] = h["x"] / np.maximum(prev, 1e-9) - 1.0
+    hy = h.dropna(subset=["yoy"])
+    hist_neg = (hy["yoy"] < 0).groupby(hy["row"]).sum()
+    hist_vol = hy.groupby("row")["yoy"].std(ddof=0)
+    hist_ok = has_hist & ~bad_rows & (clean_count >= 4)
+    idx = hist_neg.index.to_numpy(dtype=int)
+    neg[idx] = np.where(hist_ok[idx], hist_neg.to_numpy(), neg[idx])
+    idx = hist_vol.index.to_numpy(dtype=int)
+    vol[idx] = np.where(hist_ok[idx], hist_vol.to_numpy(), vol[idx])
+
+    ev.decide(has_hist & bad_rows, "-", "revenue_history parse failed")
+    ev.decide(has_hist & (clean_count < 4), "-", "revenue_history insufficient after cleaning")
+
+    scored = has_yoy | hist_ok
+    std_note = ("yoy_std=", vol, ".2f")
+    neg_note = ("neg_years=", neg.astype(int), "d")
+    with np.errstate(invalid="ignore"):
+        ev.decide(scored & ((neg >= 2) | (vol >= 0.30)), "WEAK", std_note, neg_note)
+        ev.decide(scored & (neg == 0) & (vol <= 0.15), "STRONG", std_note)
+    ev.decide(scored, "MID", std_note, neg_note)
+
+    rev_ttm = _num(df, "revenue_ttm", "totalRevenueTTM")
+    ev.note(ev.open, "missing revenue_history")
+    ev.note(ev.open & np.isnan(rev_ttm), "missing revenue_ttm")
+    ev.rest("-")
+    return ev
+
+
+def _cyclicality(df: pd.DataFrame) -> _FlagEval:
+    ev = _FlagEval(len(df))
+    sector = _str(df, "sector", "gics_sector", "industry").str.lower()
+    ev.decide(sector.isna().to_numpy(), "-", "missing sector/industry")
+    sector = sector.fillna("")
+    ev.decide(_contains_any(sector, _CYCL_LOW), "LOW")
+    ev.decide(_contains_any(sector, _CYCL_HIGH), "HIGH")
+    ev.rest("-")
+    return ev
+
+
+def _moat_proxy(df: pd.DataFrame) -> _FlagEval:
+    ev = _FlagEval(len(df))
+    net_margin = _num(df, "net_margin", "profitMargins")
+    roe = _num(df, "roe", "returnOnEquity")
+    ni = _num(df, "net_income_ttm", "netIncomeToCommonTTM")
+
+    rev = _num(df, "revenue_ttm", "totalRevenueTTM")
+    equity = _num(df, "total_assets") - _num(df, "total_liabilities")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        net_margin = np.where(np.isnan(net_margin) & ~np.isnan(ni) & (rev > 0), ni / rev, net_margin)
+        roe = np.where(np.isnan(roe) & ~np.isnan(ni) & (equity > 0), ni / equity, roe)
+
+    both_missing = np.isnan(net_margin) & np.isnan(roe)
+    ev.decide(both_missing & (ni < 0), "WEAK", "missing roe/net_margin", "net_income_ttm<0")
+    ev.decide(both_missing, "-", "missing roe/net_margin")
+
+    nm = np.nan_to_num(net_margin, nan=0.0)
+    r = np.nan_to_num(roe, nan=0.0)
+    parts = (("net_margin=", nm, ".2f"), ("roe=", r, ".2f"))
+    ev.decide((nm >= 0.20) | (r >= 0.20), "STRONG", *parts)
+    ev.decide((ni < 0) | ((nm < 0.10) & (r < 0.10)), "WEAK", *parts)
+    ev.rest("MID", *parts)
+    return ev
+
+
+# ⸻
+# B. Financial
+
+def _balance_sheet(df: pd.DataFrame) -> _FlagEval:
+    n = len(df)
+    ev = _FlagEval(n)
+    net_debt = _num(df, "net_debt", "netDebt")
+    d2e = _derived_d2e(df)
+    current_ratio = _num(df, "current_ratio", "currentRatio")
+
+    missing = np.full(n, "", dtype=object)
+    for name, arr in (("net_debt", net_debt), ("debt_to_equity", d2e), ("current_ratio", current_ratio)):
+        missing = np.where(np.isnan(arr), np.where(missing == "", name, missing + "/" + name), missing)
+    missing_note = np.where(missing == "", None, "missing balance_sheet_inputs:" + missing.astype(str))
+    ev.note(np.ones(n, dtype=bool), missing_note)
+
+    ev.decide(net_debt <= 0, "STRONG", "net_debt<=0")
+    ev.decide(d2e >= 2.0, "WEAK", ("d2e=", d2e, ".2f"))
+    ev.decide(current_ratio < 1.0, "WEAK", ("current_ratio=", current_ratio, ".2f"))
+    ev.decide((d2e < 0.5) & (current_ratio >= 1.5), "STRONG",
+              ("d2e=", d2e, ".2f"), ("current_ratio=", current_ratio, ".2f"))
+    ev.rest("-")
+    return ev
+
+
+def _cashflow_coverage(df: pd.DataFrame) -> _FlagEval:
+    n = len(df)
+    ev = _FlagEval(n)
+    ocf = _num(df, "operating_cashflow_ttm", "operatingCashflowTTM")
+    fcf = _num(df, "free_cashflow_ttm", "freeCashflowTTM")
+    ni = _num(df, "net_income_ttm", "netIncomeToCommonTTM")
+
+    missing = np.full(n, "", dtype=object)
+    for name, arr in (("ocf", ocf), ("fcf", fcf), ("net_income", ni)):
+        missing = np.where(np.isnan(arr), np.where(missing == "", name, missing + "/" + name), missing)
+    has_missing = missing != ""
+    missing_note = np.where(has_missing, "missing fcf/ocf/net_income:" + missing.astype(str), None)
+    ev.decide(has_missing, "-", missing_note)
+
+    ev.decide((ocf > 0) & (fcf > 0) & (ni > 0), "STRONG")
+    ev.decide((ocf <= 0) & (fcf <= 0), "WEAK", "ocf<=0 & fcf<=0")
+    ev.decide(ocf <= 0, "WEAK", "ocf<=0")
+    ev.rest("MID", ("ocf=", ocf, ".0f"), ("fcf=", fcf, ".0f"), ("ni=", ni, ".0f"))
+    return ev
+
+
+def _leverage_risk(df: pd.DataFrame) -> _FlagEval:
+    ev = _FlagEval(len(df))
+    d2e = _derived_d2e(df)
+    ic = _num(df, "interest_coverage", "interestCoverage")
+
+    ev.decide(np.isnan(d2e) & np.isnan(ic), "-", "missing debt_to_equity & interest_coverage")
+    raw = (("d2e=", d2e, None), ("ic=", ic, None))
+    ev.decide((d2e >= 2.0) | (ic < 2.0), "HIGH", *raw)
+    ev.decide((d2e < 0.8) & (ic >= 5.0), "LOW", ("d2e=", d2e, ".2f"), ("ic=", ic, ".2f"))
+    ev.rest("MID", *raw)
+    return ev
+
+
+# ⸻
+# C. Governance / Policy
+
+def _payout_consistency(df: pd.DataFrame) -> _FlagEval:
+    n = len(df)
+    ev = _FlagEval(n)
+    dy = np.nan_to_num(_num(df, "dividend_yield", "dividendYield"), nan=0.0)
+    by = np.nan_to_num(_num(df, "buyback_ratio", "buyback_yield", "netBuybackYield"), nan=0.0)
+    payout_3y = _num(df, "payout_ratio_3y")
+
+    if "no_dividend_history" in df.columns:
+        no_div_hist = df["no_dividend_history"].map(bool).to_numpy(dtype=bool)
+    else:
+        no_div_hist = np.zeros(n, dtype=bool)
+    listing_years = _num(df, "listing_years")
+
+    yields = (("dy=", dy, ".3f"), ("by=", by, ".3f"))
+    ev.decide((dy >= 0.01) | (by >= 0.03), "POSITIVE", *yields,
+              "持续通过分红或回购向股东回馈现金，对回撤阶段有一定缓冲作用")
+
+    years_str = np.array([
+        "mature_company" if (v != v or v == 0) else f"listing_years={v:.1f}" for v in listing_years
+    ], dtype=object)
+    ev.decide(no_div_hist & (np.isnan(listing_years) | (listing_years >= 5)) & (by <= 0), "NEGATIVE",
+              years_str, "公司长期未通过分红或回购向股东回馈现金，股东回报主要依赖价格表现与业务成长")
+
+    payout_note = np.array([None if v != v else f"payout_3y={v:.2f}" for v in payout_3y], dtype=object)
+    ev.decide((dy > 0) | (by > 0) | (np.nan_to_num(payout_3y, nan=0.0) > 0), "NEUTRAL",
+              payout_note, *yields, "存在一定程度的股东回馈记录，但金额或频率不稳定")
+
+    ev.rest("NEUTRAL", "当前分红与回购记录不足以形成结论，更适合作为成长型资产看待")
+    return ev
+
+
+def _dilution_risk(df: pd.DataFrame) -> _FlagEval:
+    ev = _FlagEval(len(df))
+    shares_yoy = _num(df, "shares_out_yoy_growth", "sharesYoYGrowth")
+    buyback_yield = _num(df, "buyback_ratio", "buyback_yield", "netBuybackYield")
+
+    has_shares = ~np.isnan(shares_yoy)
+    ev.decide(has_shares & (shares_yoy > 0.02), "HIGH", ("shares_yoy=", shares_yoy, ".3f"))
+    ev.decide(has_shares, "LOW", ("shares_yoy=", shares_yoy, ".3f"))
+
+    ev.note(ev.open, "missing shares_yoy_growth")
+    ev.decide(np.isnan(buyback_yield), "HIGH", "missing buyback_yield")
+    ev.decide(buyback_yield > 0, "LOW", ("buyback_yield=", buyback_yield, ".3f"))
+    ev.rest("HIGH")
+    return ev
+
+
+def _regulatory_dependence(df: pd.DataFrame) -> _FlagEval:
+    ev = _FlagEval(len(df))
+    sector = _str(df, "sector", "gics_sector", "industry").str.lower()
+    ev.decide(sector.isna().to_numpy(), "-", "missing sector/industry")
+    sector = sector.fillna("")
+    ev.decide(_contains_any(sector, _REG_HIGH), "HIGH")
+    ev.decide(_contains_any(sector, _REG_MID), "MID")
+    ev.rest("LOW")
+    return ev
+
+
+_EVALUATORS = {
+    "revenue_stability_flag": _revenue_stability,
+    "cyclicality_flag": _cyclicality,
+    "moat_proxy_flag": _moat_proxy,
+    "balance_sheet_flag": _balance_sheet,
+    "cashflow_coverage_flag": _cashflow_coverage,
+    "leverage_risk_flag": _leverage_risk,
+    "payout_consistency_flag": _payout_consistency,
+    "dilution_risk_flag": _dilution_risk,
+    "regulatory_dependence_flag": _regulatory_dependence,
+}
+
+
+# ⸻
+# 汇总
+
+def build_quality_flags_frame(fundamentals: pd.DataFrame) -> pd.DataFrame:
+    """
+    列式版 build_quality_flags
+    Input: 每行一个资产的 fundamentals (列名同 build_quality_flags 的 dict key)
+    Returns: 与输入同索引的 DataFrame，列为 9 个 flag + quality_buffer_level / quality_summary / quality_notes
+    """
+    df = fundamentals.reset_index(drop=True)
+    n = len(df)
+    out = pd.DataFrame(index=fundamentals.index)
+    if n == 0:
+        return out.reindex(columns=FLAG_NAMES + ["quality_buffer_level", "quality_summary", "quality_notes"])
+
+    results = {name: fn(df) for name, fn in _EVALUATORS.items()}
+    levels = np.column_stack([results[name].level for name in FLAG_NAMES])
+
+    strong = np.isin(levels, ["STRONG", "POSITIVE", "LOW"]).sum(axis=1)
+    weak = np.isin(levels, ["WEAK", "NEGATIVE", "HIGH"]).sum(axis=1)
+    buffer_level = np.select(
+        [weak >= 4, (strong >= 4) & (weak <= 1)],
+        ["WEAK", "STRONG"],
+        default="MODERATE",
+    )
+    summary = pd.Series(buffer_level).map({
+        "WEAK": "质量缓冲偏弱，风险阶段可能出现非线性放大。",
+        "STRONG": "质量缓冲较强，可更从容吸收回撤阶段的波动。",
+        "MODERATE": "质量缓冲中等：可承受一般波动，但在深度回撤阶段仍需谨慎。",
+    })
+
+    for name in FLAG_NAMES:
+        out[name] = results[name].level
+    out["quality_buffer_level"] = buffer_level
+    out["quality_summary"] = summary.to_numpy()
+    out["quality_notes"] = [
+        [f"{name}: {note}" for name in FLAG_NAMES for note in results[name].notes[i]]
+        for i in range(n)
+    ]
+    return out
+
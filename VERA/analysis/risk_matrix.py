@@ -247,9 +247,10 @@ class RiskMatrixEngine:
             })
         return flags
 
-def build_risk_card(snapshot_id: str, asset_id: str, current_price: float, risk_metrics: Dict[str, Any], as_of_date: str = None, market_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def build_risk_card(snapshot_id: str, asset_id: str, current_price: float, risk_metrics: Dict[str, Any], as_of_date: str = None, market_context: Optional[Dict[str, Any]] = None, deferred_writes: Optional[list] = None) -> Dict[str, Any]:
     """
     整合函数：生成并持久化 RiskCard
+    deferred_writes: 传入列表时不立即落库，持久化操作追加到该列表由调用方决定是否执行
     """
     # 🔧 NEW: 使用二值化逻辑计算 Quadrant (Core Engine)
     
@@ -363,48 +364,54 @@ def build_risk_card(snapshot_id: str, asset_id: str, current_price: float, risk_
         }
     
     # 持久化
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-        
-        # 1. 插入 RiskCard
-        cursor.execute("""
-            INSERT INTO risk_card_snapshot (
-                snapshot_id, asset_id, anchor_date,
-                price_percentile, position_zone, position_interpretation,
-                max_drawdown, drawdown_stage, volatility_percentile,
-                path_zone, path_interpretation, risk_quadrant, system_notes,
-                market_index_asset_id, market_amplification_level, alpha_headroom,
-                market_regime_label, market_regime_notes
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            card_data['snapshot_id'], card_data['asset_id'], card_data['anchor_date'],
-            card_data['price_percentile'], card_data['position_zone'], card_data['position_interpretation'],
-            card_data['max_drawdown'], card_data['drawdown_stage'], card_data['volatility_percentile'],
-            card_data['path_risk_level'], card_data['path_interpretation'], card_data['risk_quadrant'], card_data['system_notes'],
-            card_data['market_index_asset_id'], card_data['market_amplification_level'], card_data['alpha_headroom'],
-            card_data['market_regime_label'], card_data['market_regime_notes']
-        ))
-        card_id = cursor.lastrowid
+    def _persist():
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
         
-        # 2. 插入 Behavior Flags
-        for f in flags:
+            # 1. 插入 RiskCard
             cursor.execute("""
-                INSERT INTO behavior_flags (
-                    snapshot_id, risk_card_id, asset_id, anchor_date,
-                    flag_code, flag_level, flag_dimension, flag_title, flag_description, trigger_context
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO risk_card_snapshot (
+                    snapshot_id, asset_id, anchor_date,
+                    price_percentile, position_zone, position_interpretation,
+                    max_drawdown, drawdown_stage, volatility_percentile,
+                    path_zone, path_interpretation, risk_quadrant, system_notes,
+                    market_index_asset_id, market_amplification_level, alpha_headroom,
+                    market_regime_label, market_regime_notes
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
-                card_data['snapshot_id'], card_id, card_data['asset_id'], card_data['anchor_date'],
-                f['code'], f['level'], f['dimension'], f['title'], f['description'],
-                json.dumps({
-                    "quadrant": quadrant,
-                    "pos_p": pos_p,
-                    "vol": risk_metrics.get('annual_volatility')
-                })
+                card_data['snapshot_id'], card_data['asset_id'], card_data['anchor_date'],
+                card_data['price_percentile'], card_data['position_zone'], card_data['position_interpretation'],
+                card_data['max_drawdown'], card_data['drawdown_stage'], card_data['volatility_percentile'],
+                card_data['path_risk_level'], card_data['path_interpretation'], card_data['risk_quadrant'], card_data['system_notes'],
+                card_data['market_index_asset_id'], card_data['market_amplification_level'], card_data['alpha_headroom'],
+                card_data['market_regime_label'], card_data['market_regime_notes']
             ))
+            card_id = cursor.lastrowid
+        
+            # 2. 插入 Behavior Flags
+            for f in flags:
+                cursor.execute("""
+                    INSERT INTO behavior_flags (
+                        snapshot_id, risk_card_id, asset_id, anchor_date,
+                        flag_code, flag_level, flag_dimension, flag_title, flag_description, trigger_context
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    card_data['snapshot_id'], card_id, card_data['asset_id'], card_data['anchor_date'],
+                    f['code'], f['level'], f['dimension'], f['title'], f['description'],
+                    json.dumps({
+                        "quadrant": quadrant,
+                        "pos_p": pos_p,
+                        "vol": risk_metrics.get('annual_volatility')
+                    })
+                ))
             
-        conn.commit()
+            conn.commit()
+            return card_data
+        finally:
+            conn.close()
+
+    if deferred_writes is not None:
+        deferred_writes.append(_persist)
         return card_data
-    finally:
-        conn.close()
+    return _persist()
@@ -0,0 +1,166 @@
+"""
+Sector board (板块强弱榜)
+- 一次性加载 sector_proxy_map 中全部板块代理 ETF 与其市场指数 (每个市场一个对齐面板)
+- 矩阵形式计算 1M/3M/6M 相对强弱 (板块收益 - 大盘收益)、10Y 位置分位；D-state 逐列复用 RiskEngine
+- 结果写入 sector_board (按日)，快照 build_sector_context 优先读取，Dashboard 展示排名热力图
+"""
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_LOOKBACK_YEARS
+from data.price_panel import load_aligned_panel
+from db.connection import get_connection
+from db.sector_board import replace_sector_board
+from engine.asset_resolver import resolve_market_index
+from metrics.risk_engine import RiskEngine
+from utils.canonical_resolver import resolve_canonical_symbol
+from utils.market_calendar import asset_markets
+
+RS_WINDOWS = {"rs_1m": 21, "rs_3m": 63, "rs_6m": 126}  # 交易日，与 position_rs.RS_3M_DAYS 一致
+MIN_POSITION_DAYS = 126                                 # 同 position_rs.MIN_TRADING_DAYS
+STATE_LOOKBACK_DAYS = 900                               # 同 sector_overlay.SECTOR_LOOKBACK_DAYS
+
+BOARD_COLUMNS = [
+    "as_of_date", "sector_etf_id", "market", "market_index_id", "scheme", "sector_code", "sector_name",
+    "rs_1m", "rs_3m", "rs_6m", "position_pct", "dd_state", "path_risk", "rank_rs_3m",
+]
+
+
+def load_sector_proxies(conn) -> pd.DataFrame:
+    """active 板块代理 (每个 ETF 一行，取 priority 最高的映射)，补齐 canonical 与市场指数"""
+    try:
+        df = pd.read_sql_query("""
+            SELECT scheme, sector_code, sector_name, proxy_etf_id, market_index_id, priority
+            FROM sector_proxy_map WHERE is_active = 1
+        """, conn)
+    except Exception:
+        return pd.DataFrame(columns=["scheme", "sector_code", "sector_name", "sector_etf_id", "market_index_id", "market"])
+    if df.empty:
+        return df.rename(columns={"proxy_etf_id": "sector_etf_id"}).assign(market=None)
+
+    df["sector_etf_id"] = [resolve_canonical_symbol(conn, str(s).strip().upper()) for s in df["proxy_etf_id"]]
+    df = (df.sort_values(["sector_etf_id", "priority"], ascending=[True, False])
+            .drop_duplicates("sector_etf_id"))
+    markets = asset_markets(df["sector_etf_id"], conn=conn)
+    df["market"] = df["sector_etf_id"].map(markets)
+    default_index = {m: resolve_market_index(m).asset_id for m in df["market"].unique()}
+    df["market_index_id"] = [
+        resolve_canonical_symbol(conn, str(default_index[m] if pd.isna(idx) or not idx else idx).strip().upper())
+        for idx, m in zip(df["market_index_id"], df["market"])
+    ]
+    return df.reset_index(drop=True)[["scheme", "sector_code", "sector_name", "sector_etf_id", "market_index_id", "market"]]
+
+
+def _window_returns(values: np.ndarray, window: int) -> np.ndarray:
+    """每列 最新值 / 第 -window 行 - 1 (与 calculate_sector_rs_3m 的 iloc[-window] 口径一致)"""
+    if values.shape[0] < window:
+        return np.full(values.shape[1], np.nan)
+    return values[-1] / values[-window] - 1.0
+
+
+def _position_pct(values: np.ndarray, observed: np.ndarray) -> np.ndarray:
+    """
+    每列最新真实价格在全部真实价格中的分位 (scipy percentileofscore kind='rank' 的矩阵版)
+    样本不足 MIN_POSITION_DAYS 的列返回 NaN
+    """
+    v = np.where(observed, values, np.nan)
+    n = observed.sum(axis=0)
+    last_idx = np.where(observed.any(axis=0), values.shape[0] - 1 - np.argmax(observed[::-1], axis=0), 0)
+    score = v[last_idx, np.arange(v.shape[1])]
+    with np.errstate(invalid="ignore"):
+        left = (v < score).sum(axis=0)
+        right = (v <= score).sum(axis=0)
+    pct = (left + right + (left < right)) * 0.5 / np.maximum(n, 1)
+    return np.where(n >= MIN_POSITION_DAYS, pct, np.nan)
+
+
+def compute_market_board(panel, proxies: pd.DataFrame) -> pd.DataFrame:
+    """
+    单个市场：panel 含该市场全部板块 ETF 与指数列 (按该市场日历对齐)
+    榜单日期 = 面板最后一个交易日，与该市场资产快照的 as_of_date 一致
+    """
+    as_of_date = str(panel.dates[-1])
+    sec_cols = [panel.index_of(a) for a in proxies["sector_etf_id"]]
+    idx_cols = [panel.index_of(a) for a in proxies["market_index_id"]]
+    values = panel.values
+
+    out = proxies.copy()
+    out["as_of_date"] = as_of_date
+    for name, window in RS_WINDOWS.items():
+        r = _window_returns(values, window)
+        rs = r[sec_cols] - r[idx_cols]
+        out[name] = np.where(np.isfinite(rs), rs, np.nan)
+    out["position_pct"] = _position_pct(values, panel.observed)[sec_cols]
+
+    # D-state / 路径风险：状态定义在 RiskEngine 内，逐列复用 (与 build_sector_context 相同的 900 天窗口)
+    state_start = pd.Timestamp(as_of_date) - pd.Timedelta(days=STATE_LOOKBACK_DAYS)
+    states, paths = [], []
+    for etf in proxies["sector_etf_id"]:
+        s = panel.series(etf)
+        s = s[s.index >= state_start]
+        risk = RiskEngine.calculate_risk_metrics(s) if len(s) > 1 else {}
+        states.append((risk.get("risk_state") or {}).get("state"))
+        paths.append(risk.get("path_risk_level"))
+    out["dd_state"] = states
+    out["path_risk"] = paths
+    return out
+
+
+def build_sector_board(as_of_date: str, conn=None) -> pd.DataFrame:
+    """全部板块 (按市场分组，每组一次批量读取，截至 as_of_date) -> DataFrame[BOARD_COLUMNS]"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        proxies = load_sector_proxies(conn)
+        if proxies.empty:
+            return pd.DataFrame(columns=BOARD_COLUMNS)
+
+        # 与 position_rs.calculate_position_pct 相同的 10Y 窗口
+        start = (pd.Timestamp(as_of_date) - pd.Timedelta(days=DEFAULT_LOOKBACK_YEARS * 365)).strftime("%Y-%m-%d")
+        frames = []
+        for market, group in proxies.groupby("market"):
+            ids = list(dict.fromkeys([*group["sector_etf_id"], *group["market_index_id"]]))
+            panel = load_aligned_panel(ids, start, as_of_date, calendar=market, adjusted=True, conn=conn)
+            if panel.values.shape[0] == 0:
+                continue
+            frames.append(compute_market_board(panel, group))
+        if not frames:
+            return pd.DataFrame(columns=BOARD_COLUMNS)
+
+        board = pd.concat(frames, ignore_index=True)
+        board["rank_rs_3m"] = board.groupby("market")["rs_3m"].rank(ascending=False, method="min")
+        return board[BOARD_COLUMNS]
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def run_sector_board_job(as_of_date: str = None, conn=None) -> pd.DataFrame:
+    """计算并落库板块榜 (各市场截至 as_of_date 的最后一个交易日)"""
+    as_of_date = as_of_date or datetime.now().strftime("%Y-%m-%d")
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        board = build_sector_board(as_of_date, conn=conn)
+        replace_sector_board(board, conn=conn)
+        return board
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def board_row_to_context(row: Dict, market_index_id: str) -> Optional[Dict]:
+    """sector_board 行 -> build_sector_context 使用的字段；大盘基准不一致时 RS 不可复用"""
+    if not row:
+        return None
+    return {
+        "sector_dd_state": row.get("dd_state"),
+        "sector_path_risk": row.get("path_risk"),
+        "sector_position_pct": row.get("position_pct"),
+        "sector_vs_market_rs_3m": row.get("rs_3m") if row.get("market_index_id") == market_index_id else None,
+    }
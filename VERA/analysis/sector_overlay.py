@@ -5,6 +5,9 @@ from metrics.risk_engine import RiskEngine
 # NEW: Import position/RS calculators
 from analysis.position_rs import calculate_position_pct, calculate_sector_rs_3m
 from db.market_sector_snapshot import save_sector_risk_snapshot
+from data.price_panel import build_aligned_panel
+from analysis.sector_board import board_row_to_context
+from db.sector_board import load_sector_board_row
 
 RS_LOOKBACK_DAYS = 63
 SECTOR_LOOKBACK_DAYS = 900
@@ -15,12 +18,39 @@ def _to_close_series(df: pd.DataFrame) -> pd.Series:
     df = df.sort_values("trade_date").set_index("trade_date")
     return df["close"].astype(float)
 
-def _relative_strength(a: pd.Series, b: pd.Series, lookback_days: int) -> float | None:
-    x = pd.concat([a, b], axis=1).dropna()
-    if len(x) < lookback_days + 5:
+
+def build_sector_context(sector_etf_id: str, as_of_date: str, market_index_id: str = "^GSPC") -> dict | None:
+    """
+    板块层中与个股无关的部分 (同一日期、同一板块 ETF 对所有成分股相同)：
+    sector close 序列、D-state、路径风险、10Y 位置分位、板块 vs 大盘 RS。
+    sector_board 已有当日记录 (且 RS 基准一致) 时直接读取，否则现算。
+    批量/增量任务可按 (sector_etf_id, market_index_id, as_of_date) 缓存复用。
+
+    Returns: dict，或 None (板块价格缺失)
+    """
+    end = pd.to_datetime(as_of_date)
+    start = (end - pd.Timedelta(days=SECTOR_LOOKBACK_DAYS)).strftime("%Y-%m-%d")
+
+    sector_df = load_price_series(sector_etf_id, start, as_of_date, adjusted=True)
+    if sector_df is None or sector_df.empty:
         return None
-    ratio = x.iloc[:, 0] / x.iloc[:, 1]
-    return float(ratio.iloc[-1] / ratio.iloc[-lookback_days] - 1.0)
+
+    sector = _to_close_series(sector_df)
+
+    # 当日板块榜已计算时直接复用 (免去 10Y 位置与 RS 的重复读取)
+    board = board_row_to_context(load_sector_board_row(sector_etf_id, as_of_date), market_index_id)
+    if board is not None and board["sector_vs_market_rs_3m"] is not None:
+        return {"sector_close": sector, **board}
+
+    sec_risk = RiskEngine.calculate_risk_metrics(sector)
+
+    return {
+        "sector_close": sector,
+        "sector_dd_state": (sec_risk.get("risk_state") or {}).get("state"),
+        "sector_path_risk": sec_risk.get("path_risk_level"),
+        "sector_position_pct": calculate_position_pct(sector_etf_id, as_of_date),
+        "sector_vs_market_rs_3m": calculate_sector_rs_3m(sector_etf_id, market_index_id, as_of_date),
+    }
 
 
 def build_sector_overlay(
@@ -29,7 +59,9 @@ def build_sector_overlay(
     proxy_etf_id: str = None, 
     sector_name: str = None,
     market_index_id: str = "^GSPC",
-    snapshot_id: str = None
+    snapshot_id: str = None,
+    sector_context: dict = None,
+    deferred_writes: list = None
 ) -> dict:
     """
     Build sector overlay with NEW Position and RS metrics
@@ -41,6 +73,8 @@ def build_sector_overlay(
         sector_name: Sector name string
         market_index_id: Market index ID for RS calculation
         snapshot_id: UUID of parent snapshot (for persistence)
+        sector_context: Precomputed build_sector_context() result (optional, reused across assets)
+        deferred_writes: If given, persistence is appended to this list instead of executed
     
     Returns:
         Dict with sector metrics including new position_pct and sector_rs_3m
@@ -54,31 +88,27 @@ def build_sector_overlay(
     end = pd.to_datetime(as_of_date)
     start = (end - pd.Timedelta(days=SECTOR_LOOKBACK_DAYS)).strftime("%Y-%m-%d")
 
-    stock_df = load_price_series(asset_id, start, as_of_date)
-    sector_df = load_price_series(sector_etf_id, start, as_of_date)
+    stock_df = load_price_series(asset_id, start, as_of_date, adjusted=True)
 
     if stock_df is None or stock_df.empty:
         return {"sector_etf_id": sector_etf_id, "sector_name": sector_name, "reason": "stock price missing"}
+
+    if sector_context is None:
+        sector_context = build_sector_context(sector_etf_id, as_of_date, market_index_id)
         
-    if sector_df is None or sector_df.empty:
+    if sector_context is None:
         return {"sector_etf_id": sector_etf_id, "sector_name": sector_name, "reason": "sector price missing"}
 
     stock = _to_close_series(stock_df)
-    sector = _to_close_series(sector_df)
-
-    sec_risk = RiskEngine.calculate_risk_metrics(sector)
     
-    # Existing: Stock vs Sector RS
-    stock_vs_sector_rs_3m = _relative_strength(stock, sector, RS_LOOKBACK_DAYS)
+    # Existing: Stock vs Sector RS (对齐到板块 ETF 所在市场的交易日历)
+    panel = build_aligned_panel({sector_etf_id: sector_context["sector_close"], asset_id: stock})
+    stock_vs_sector_rs_3m = panel.relative_strength(asset_id, sector_etf_id, RS_LOOKBACK_DAYS)
     
-    # NEW: Sector Position (10Y percentile)
-    sector_position_pct = calculate_position_pct(sector_etf_id, as_of_date)
-    
-    # NEW: Sector RS vs Market
-    sector_vs_market_rs_3m = calculate_sector_rs_3m(sector_etf_id, market_index_id, as_of_date)
-    
-    sector_dd = (sec_risk.get("risk_state") or {}).get("state")
-    sector_path = sec_risk.get("path_risk_level")
+    sector_position_pct = sector_context["sector_position_pct"]
+    sector_vs_market_rs_3m = sector_context["sector_vs_market_rs_3m"]
+    sector_dd = sector_context["sector_dd_state"]
+    sector_path = sector_context["sector_path_risk"]
     
     # alignment 简化：跑输板块且个股更差 => negative_divergence
     alignment = "aligned"
@@ -90,17 +120,23 @@ def build_sector_overlay(
     
     # NEW: Persist to sector_risk_snapshot table
     if snapshot_id:
-        try:
-            save_sector_risk_snapshot(
-                snapshot_id=snapshot_id,
-                sector_etf_id=sector_etf_id,
-                as_of_date=as_of_date,
-                sector_dd_state=sector_dd,
-                sector_position_pct=sector_position_pct,
-                sector_rs_3m=sector_vs_market_rs_3m
-            )
-        except Exception as e:
-            print(f"Warning: Failed to save sector risk snapshot: {e}")
+        def _persist():
+            try:
+                save_sector_risk_snapshot(
+                    snapshot_id=snapshot_id,
+                    sector_etf_id=sector_etf_id,
+                    as_of_date=as_of_date,
+                    sector_dd_state=sector_dd,
+                    sector_position_pct=sector_position_pct,
+                    sector_rs_3m=sector_vs_market_rs_3m
+                )
+            except Exception as e:
+                print(f"Warning: Failed to save sector risk snapshot: {e}")
+
+        if deferred_writes is not None:
+            deferred_writes.append(_persist)
+        else:
+            _persist()
 
     return {
         "sector_etf_id": sector_etf_id,
@@ -0,0 +1,209 @@
+"""
+Empirical D-state transition statistics
+基于 drawdown_state_history / risk_events 全量历史的经验转移概率、停留时长与风险事件频率
+
+All computations are grouped/vectorized over the whole history table;
+no per-asset Python loops.
+"""
+import pandas as pd
+
+from db.connection import get_connection
+
+TRADING_DAYS_PER_YEAR = 252
+
+# 统计口径：全市场 / 按市场 / 按板块
+GROUP_ALL = "ALL"
+GROUP_MARKET = "MARKET"
+GROUP_SECTOR = "SECTOR"
+
+STAT_TRANSITION = "TRANSITION"
+STAT_DWELL = "DWELL"
+STAT_EVENT = "EVENT"
+
+STATS_COLUMNS = [
+    "group_type", "group_key", "stat_type", "from_state", "to_state",
+    "sample_count", "probability", "exit_probability",
+    "dwell_mean", "dwell_median", "dwell_p90",
+]
+
+
+def load_state_history(conn=None) -> pd.DataFrame:
+    """
+    读取全量 confirmed_state 历史，并附带 market / sector 分组字段
+    (sector 取 asset_classification 中最新一条有效分类)
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        return pd.read_sql_query(
+            """
+            SELECT h.asset_id, h.trade_date, h.confirmed_state,
+                   a.market, ac.sector_name
+            FROM drawdown_state_history h
+            LEFT JOIN assets a ON a.asset_id = h.asset_id
+            LEFT JOIN (
+                SELECT c.asset_id, c.sector_name
+                FROM asset_classification c
+                JOIN (
+                    SELECT asset_id, MAX(as_of_date) AS as_of_date
+                    FROM asset_classification
+                    WHERE is_active = 1
+                    GROUP BY asset_id
+                ) latest ON latest.asset_id = c.asset_id AND latest.as_of_date = c.as_of_date
+                WHERE c.is_active = 1
+                GROUP BY c.asset_id
+            ) ac ON ac.asset_id = h.asset_id
+            ORDER BY h.asset_id, h.trade_date
+            """,
+            conn,
+        )
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def load_risk_events(conn=None) -> pd.DataFrame:
+    """读取 risk_events 全表 (asset_id, event_type, state_from, state_to)"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        return pd.read_sql_query(
+            "SELECT asset_id, event_type, state_from, state_to FROM risk_events",
+            conn,
+        )
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _expand_groups(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    把每一行复制到 ALL / MARKET / SECTOR 三个统计口径，
+    之后只需一次 groupby 即可得到所有分组结果
+    """
+    frames = [df.assign(group_type=GROUP_ALL, group_key=GROUP_ALL)]
+    if "market" in df.columns:
+        frames.append(df.assign(group_type=GROUP_MARKET, group_key=df["market"].fillna("Unknown")))
+    if "sector_name" in df.columns:
+        frames.append(df.assign(group_type=GROUP_SECTOR, group_key=df["sector_name"].fillna("Unknown")))
+    return pd.concat(frames, ignore_index=True)
+
+
+def compute_transition_stats(history: pd.DataFrame) -> pd.DataFrame:
+    """
+    经验转移概率 (日频一步)：
+    - probability: P(to | from)，包含停留 (from == to)
+    - exit_probability: P(to | from, 已离开 from)，即 "D4→D5 的历史胜率"
+    """
+    if history.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+
+    h = history.sort_values(["asset_id", "trade_date"])
+    h = h.assign(from_state=h.groupby("asset_id")["confirmed_state"].shift(), to_state=h["confirmed_state"])
+    steps = _expand_groups(h.dropna(subset=["from_state"]))
+
+    keys = ["group_type", "group_key", "from_state"]
+    counts = steps.groupby(keys + ["to_state"]).size().rename("sample_count").reset_index()
+    counts["probability"] = counts["sample_count"] / counts.groupby(keys)["sample_count"].transform("sum")
+
+    is_exit = counts["from_state"] != counts["to_state"]
+    exit_totals = counts["sample_count"].where(is_exit, 0).groupby([counts[k] for k in keys]).transform("sum")
+    counts["exit_probability"] = (counts["sample_count"] / exit_totals).where(is_exit & (exit_totals > 0))
+
+    counts["stat_type"] = STAT_TRANSITION
+    return counts.reindex(columns=STATS_COLUMNS)
+
+
+def compute_dwell_stats(history: pd.DataFrame) -> pd.DataFrame:
+    """
+    停留时长分布 (交易日)：按资产切分 confirmed_state 连续区段。
+    仍在进行中的最后一段 (未结束) 不计入，避免低估停留时长。
+    """
+    if history.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+
+    h = history.sort_values(["asset_id", "trade_date"]).reset_index(drop=True)
+    new_spell = (h["confirmed_state"] != h.groupby("asset_id")["confirmed_state"].shift()) | \
+                (h["asset_id"] != h["asset_id"].shift())
+    h["spell_id"] = new_spell.cumsum()
+
+    spells = h.groupby("spell_id").agg(
+        asset_id=("asset_id", "first"),
+        from_state=("confirmed_state", "first"),
+        market=("market", "first"),
+        sector_name=("sector_name", "first"),
+        dwell=("trade_date", "size"),
+    )
+    last_spell = spells.groupby("asset_id").cumcount(ascending=False) == 0
+    spells = _expand_groups(spells[~last_spell])
+    if spells.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+
+    grouped = spells.groupby(["group_type", "group_key", "from_state"])["dwell"]
+    stats = pd.DataFrame({
+        "sample_count": grouped.size(),
+        "dwell_mean": grouped.mean(),
+        "dwell_median": grouped.median(),
+        "dwell_p90": grouped.quantile(0.9),
+    }).reset_index()
+    stats["to_state"] = ""
+    stats["stat_type"] = STAT_DWELL
+    return stats.reindex(columns=STATS_COLUMNS)
+
+
+def compute_event_stats(events: pd.DataFrame, history: pd.DataFrame) -> pd.DataFrame:
+    """
+    风险事件频率：sample_count 为事件次数，probability 为每资产年发生率
+    (资产年 = 该分组 drawdown_state_history 行数 / 252)
+    """
+    if events.empty or history.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+
+    groups = history.drop_duplicates("asset_id")[["asset_id", "market", "sector_name"]]
+    ev = _expand_groups(events.merge(groups, on="asset_id", how="left"))
+    counts = ev.groupby(["group_type", "group_key", "event_type"]).size().rename("sample_count").reset_index()
+
+    exposure = _expand_groups(history).groupby(["group_type", "group_key"]).size() / TRADING_DAYS_PER_YEAR
+    counts = counts.merge(exposure.rename("asset_years").reset_index(), on=["group_type", "group_key"], how="left")
+    counts["probability"] = counts["sample_count"] / counts["asset_years"]
+
+    counts = counts.rename(columns={"event_type": "from_state"})
+    counts["to_state"] = ""
+    counts["stat_type"] = STAT_EVENT
+    return counts.reindex(columns=STATS_COLUMNS)
+
+
+def build_state_transition_stats(history: pd.DataFrame, events: pd.DataFrame) -> pd.DataFrame:
+    """合并三类统计为一张长表 (对应 state_transition_stats 表结构)"""
+    parts = [
+        compute_transition_stats(history),
+        compute_dwell_stats(history),
+        compute_event_stats(events, history),
+    ]
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def run_state_transition_job(conn=None) -> int:
+    """
+    分析任务入口：读取全量历史 -> 计算 -> 整表替换 state_transition_stats
+    Returns: 写入行数
+    """
+    from db.state_transition_stats import replace_state_transition_stats
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        history = load_state_history(conn)
+        events = load_risk_events(conn)
+        stats = build_state_transition_stats(history, events)
+        replace_state_transition_stats(stats, conn=conn)
+        return len(stats)
+    finally:
+        if own_conn:
+            conn.close()
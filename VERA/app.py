@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import streamlit as st
 # Asset Sorting Rules (Reflected in database ORDER BY):
 # 1. Market Priority: HK (0) > US (1) > CN (2) > Other (3)
@@ -8,16 +10,18 @@ import streamlit as st
 #    代码顺序：按字符/数字顺序排列
 
 import textwrap
-import pandas as pd
 from typing import Optional
 from datetime import datetime
-from engine.snapshot_builder import run_snapshot
-from analysis.dashboard import DashboardData, get_asset_name
 from engine.universe_manager import get_universe_assets_v2, add_to_universe
 from db.connection import get_connection
 from analysis.risk_profile import get_current_profile, save_user_profile, reset_profile, RiskProfile
 from utils.i18n import translate, get_translation, get_legend_text
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, TYPE_CHECKING
+
+# 冷启动优化：pandas / 快照引擎 (scipy, yaml, 全部 analysis 模块) / OCR 均按页面延迟导入，
+# 顶层只保留轻量依赖 (见 tests/test_import_budget.py)
+if TYPE_CHECKING:
+    from analysis.dashboard import DashboardData
 
 def normalize_position_display(
     *,
@@ -573,6 +577,7 @@ def get_cached_symbols():
 
 def get_asset_evaluation_history(asset_id: str):
     """获取指定资产的所有历史评估记录"""
+    import pandas as pd
     try:
         from utils.canonical_resolver import resolve_canonical_symbol
         
@@ -616,6 +621,7 @@ def get_asset_evaluation_history(asset_id: str):
 
 def get_evaluation_history(show_all=False):
     """获取评估记录。show_all=True 时返回所有记录，False 时返回每资产最新记录"""
+    import pandas as pd
     try:
         conn = get_connection()
         if show_all:
@@ -746,6 +752,7 @@ def delete_snapshot(snapshot_id: str):
 
 def get_snapshot_details(snapshot_id: str):
     """获取单个快照的完整详情"""
+    import pandas as pd
     try:
         conn = get_connection()
         
@@ -1395,6 +1402,7 @@ def render_risk_overlay(data: DashboardData):
         sec_name = sec.get("sector_name") or "Unknown"
         sec_etf = sec.get("sector_etf_id") or ""
         # Resolve ETF Name
+        from analysis.dashboard import get_asset_name
         sec_etf_name = get_asset_name(sec_etf) if sec_etf else ""
         etf_display = f"{sec_etf_name}" if sec_etf_name and sec_etf_name != sec_etf else sec_etf
         
@@ -1486,6 +1494,7 @@ def render_risk_overlay(data: DashboardData):
 
 
 def render_deep_dive(data: DashboardData):
+    import pandas as pd
     section_title("2. 深度风险细节 (Deep Dive)")
     c1, c2, c3 = st.columns(3)
     
@@ -1599,6 +1608,7 @@ def render_deep_dive(data: DashboardData):
              render_inline_metric("年化波动率 (Volatility)", "N/A")
 
 def render_valuation(data: DashboardData, chart_start_date=None, chart_end_date=None):
+    import pandas as pd
     section_title("3. 价值评估 (Valuation)")
     v = data.value or {}
     
@@ -1910,6 +1920,7 @@ def render_page(data: DashboardData, profile: Optional[RiskProfile] = None, char
 
 
 def render_asset_management():
+    import pandas as pd
     st.title("⚙️ 资产管理 (Asset Universe Management)")
     st.markdown("---")
     
@@ -2793,6 +2804,72 @@ def render_data_import_page():
             del st.session_state['import_result']
             st.rerun()
 
+    render_ocr_upload_section()
+
+
+def render_ocr_upload_section():
+    """📷 券商截图 OCR：上传后入队后台进程池识别，页面轮询结果，不阻塞 UI"""
+    from utils.ocr_pipeline import submit_ocr_job, poll_ocr_job, forget_ocr_job, OCR_POLL_INTERVAL
+    import pandas as pd
+
+    st.markdown("---")
+    st.markdown("#### 📷 截图识别 (OCR)")
+    st.caption("上传券商行情截图，后台并行识别；相同图片直接复用历史识别结果。")
+
+    images = st.file_uploader(
+        "选择截图", type=["png", "jpg", "jpeg"], accept_multiple_files=True, key="ocr_images"
+    )
+    if st.button("提交识别 (Run OCR)"):
+        if images:
+            st.session_state['ocr_jobs'] = st.session_state.get('ocr_jobs', []) + [
+                submit_ocr_job(img.getvalue(), img.name) for img in images
+            ]
+        else:
+            st.warning("请先选择截图文件")
+
+    job_ids = st.session_state.get('ocr_jobs', [])
+    if not job_ids:
+        return
+
+    any_pending = any(poll_ocr_job(job_id)["status"] == "pending" for job_id in job_ids)
+
+    # 只有状态表按间隔局部重跑 (st.fragment)，不在脚本线程里 sleep，也不整页重跑
+    @st.fragment(run_every=OCR_POLL_INTERVAL if any_pending else None)
+    def _ocr_status_table():
+        statuses = [poll_ocr_job(job_id) for job_id in job_ids]
+        pending = sum(1 for s in statuses if s["status"] == "pending")
+
+        rows = []
+        for s in statuses:
+            r = s["result"] or {}
+            rows.append({
+                "文件": s["source_name"],
+                "状态": {"pending": "⏳ 识别中", "done": "✅ 完成", "error": "❌ 失败",
+                         "unknown": "⌛ 已过期"}.get(s["status"], s["status"]),
+                "缓存": "✓" if s["cached"] else "",
+                "代码": r.get("symbol"),
+                "日期": r.get("date"),
+                "价格": r.get("price"),
+                "PE(TTM)": r.get("pe_ttm"),
+                "PB": r.get("pb"),
+                "备注": r.get("error", ""),
+            })
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+        if pending:
+            st.info(f"⏳ 还有 {pending} 张截图在识别中...")
+        elif any_pending:
+            # 全部完成：整页重跑一次以停止定时刷新
+            st.rerun()
+
+    _ocr_status_table()
+
+    if st.button("清除识别结果"):
+        for job_id in job_ids:
+            forget_ocr_job(job_id)
+        del st.session_state['ocr_jobs']
+        st.rerun()
+
 
 def reconstruct_dashboard_data_from_snapshot(details):
     """
@@ -2801,7 +2878,8 @@ def reconstruct_dashboard_data_from_snapshot(details):
     structure expected by render_page().
     """
     from analysis.dashboard import DashboardData
-    
+    import pandas as pd
+
     if not details or details['snapshot'].empty:
         return None
         
@@ -3001,6 +3079,7 @@ def render_snapshot_detail(snapshot_id: str):
 
 def render_history_dashboard(asset_id: str = None):
     """📊 Main Page Evaluation History / 主页面评估历史"""
+    import pandas as pd
     # 检查URL参数是否需要显示详情页面
     # 优先级: URL参数 > Session State
     qp_snapshot_id = st.query_params.get("view_snapshot_id", None)
@@ -3168,6 +3247,50 @@ def render_history_dashboard(asset_id: str = None):
     else:
         st.warning("暂无历史记录。 / No records found.")
 
+def render_sector_board_page():
+    """🧭 板块强弱榜：读取 sector_board (每日任务预计算)，按市场展示 RS 排名热力图"""
+    import altair as alt
+    from db.sector_board import load_sector_board
+
+    st.title("🧭 板块强弱 (Sector Board)")
+    board = load_sector_board()
+    if board.empty:
+        st.info("暂无板块榜数据，请先运行 `python scripts/update_sector_board.py`。")
+        return
+
+    markets = sorted(board["market"].dropna().unique())
+    market = st.radio("市场", markets, horizontal=True, key="sector_board_market")
+    df = board[board["market"] == market].sort_values("rank_rs_3m")
+    st.caption(f"数据日期: {df['as_of_date'].iloc[0]} · 基准: {df['market_index_id'].iloc[0]} · RS = 板块收益 - 大盘收益")
+
+    df["label"] = df["sector_name"].fillna(df["sector_etf_id"]) + " (" + df["sector_etf_id"].str.split(":").str[-1] + ")"
+    heat = df.melt(id_vars=["label", "rank_rs_3m"], value_vars=["rs_1m", "rs_3m", "rs_6m"],
+                   var_name="window", value_name="rs")
+    heat["window"] = heat["window"].map({"rs_1m": "1M", "rs_3m": "3M", "rs_6m": "6M"})
+
+    base = alt.Chart(heat).encode(
+        x=alt.X("window:N", sort=["1M", "3M", "6M"], title=None, axis=alt.Axis(orient="top", labelAngle=0)),
+        y=alt.Y("label:N", sort=df["label"].tolist(), title=None),
+    )
+    rect = base.mark_rect().encode(
+        color=alt.Color("rs:Q", scale=alt.Scale(scheme="redyellowgreen", domainMid=0), legend=alt.Legend(format="%", title="RS")),
+        tooltip=[alt.Tooltip("label:N", title="板块"), alt.Tooltip("window:N", title="窗口"), alt.Tooltip("rs:Q", title="RS", format="+.2%")],
+    )
+    text = base.mark_text(fontSize=11).encode(text=alt.Text("rs:Q", format="+.1%"))
+    st.altair_chart((rect + text).properties(height=max(200, 28 * len(df))), use_container_width=True)
+
+    table = df[["rank_rs_3m", "label", "rs_3m", "position_pct", "dd_state", "path_risk"]].rename(columns={
+        "rank_rs_3m": "排名", "label": "板块", "rs_3m": "3M RS", "position_pct": "10Y 位置",
+        "dd_state": "D-State", "path_risk": "路径风险",
+    })
+    st.dataframe(
+        table, use_container_width=True, hide_index=True,
+        column_config={
+            "3M RS": st.column_config.NumberColumn(format="%.2f"),
+            "10Y 位置": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="%.2f"),
+        },
+    )
+
 def main():
     # --- Sidebar: Header ---
     st.sidebar.markdown(
@@ -3297,10 +3420,11 @@ def main():
             st.session_state.analysis_sub_mode = st.session_state.analysis_sub_mode_radio
 
         # 显示子菜单
+        sub_modes = ["📈 资产评估", "📜 历史记录", "🧭 板块强弱"]
         analysis_sub_mode = st.sidebar.radio(
             "分析模式",
-            ["📈 资产评估", "📜 历史记录"],
-            index=0 if st.session_state.analysis_sub_mode == "📈 资产评估" else 1,
+            sub_modes,
+            index=sub_modes.index(st.session_state.analysis_sub_mode) if st.session_state.analysis_sub_mode in sub_modes else 0,
             key="analysis_sub_mode_radio",
             label_visibility="collapsed",
             on_change=on_sub_mode_change
@@ -3312,6 +3436,10 @@ def main():
             # 历史记录页面
             render_history_dashboard()
             return
+
+        if analysis_sub_mode == "🧭 板块强弱":
+            render_sector_board_page()
+            return
         
         # 否则继续资产评估流程（原有逻辑）
 
@@ -3662,8 +3790,53 @@ def main():
             st.session_state.analysis_active = False
             return
             
+        # 快照在后台线程计算 (engine.snapshot_jobs)，页面轮询阶段进度；
+        # 同一 (资产, 日期) 复用进行中 / 已完成的任务，保存记录直接使用该结果
+        from engine.snapshot_jobs import (
+            submit_snapshot_job, poll_snapshot_job, save_snapshot_job, forget_snapshot_job,
+            SNAPSHOT_POLL_INTERVAL, SNAPSHOT_RESULT_TTL
+        )
+
+        job_key = (symbol, eval_date.strftime('%Y-%m-%d'))
+        job_id = st.session_state.get('snapshot_job_id')
+        if run_btn or job_id is None or st.session_state.get('snapshot_job_key') != job_key:
+            # 点击「运行分析」强制重算 (max_age=0 只复用进行中的任务)；页面重跑 / 切换回来时复用近期结果
+            job_id = submit_snapshot_job(symbol, as_of_date=eval_date, max_age=0 if run_btn else SNAPSHOT_RESULT_TTL)
+            st.session_state.snapshot_job_id = job_id
+            st.session_state.snapshot_job_key = job_key
+
+        job = poll_snapshot_job(job_id)
+        if job["status"] == "unknown":
+            # 任务已被淘汰 (或进程重启)：重新提交
+            st.session_state.snapshot_job_id = None
+            st.rerun()
+        if job["status"] in ("queued", "running"):
+            stage_labels = {
+                None: "排队中", "resolve": "识别资产", "prices": "加载价格", "risk": "风险计算",
+                "market": "市场环境", "valuation": "估值分析", "fundamentals": "分红与盈利",
+                "overlay": "板块与市场叠加", "dashboard": "生成仪表盘", "done": "完成",
+            }
+
+            # 只有进度条按间隔局部重跑 (st.fragment)，不在脚本线程里 sleep；结束后整页重跑一次渲染结果
+            @st.fragment(run_every=SNAPSHOT_POLL_INTERVAL)
+            def _snapshot_progress():
+                current = poll_snapshot_job(job_id)
+                if current["status"] not in ("queued", "running"):
+                    st.rerun()
+                st.progress(current["progress"] or 0.0,
+                            text=f"⏳ 正在分析 {symbol}：{stage_labels.get(current['stage'], current['stage'])}...")
+
+            _snapshot_progress()
+            return
+        if job["status"] == "error":
+            st.error(f"分析异常: {job['error']}")
+            forget_snapshot_job(job_id)
+            st.session_state.snapshot_job_id = None
+            st.session_state.analysis_active = False
+            return
+
         try:
-            data: DashboardData = run_snapshot(symbol, as_of_date=eval_date)
+            data: DashboardData = job["data"]
             
             if not data:
                 st.error(f"无法获取 {symbol} 在 {eval_date.strftime('%Y-%m-%d')} 之前的数据。")
@@ -3682,10 +3855,10 @@ def main():
                     st.query_params["code"] = data.asset.asset_id
                     st.rerun()
             with col_b2:
-                if st.button("💾 保存记录", type="primary"):
+                if st.button("💾 保存记录", type="primary", disabled=job["saved"]):
                     try:
-                        # 重新运行并显式保存到数据库
-                        run_snapshot(symbol, as_of_date=eval_date, save_to_db=True)
+                        # 保存本次已计算的结果 (不重新计算)
+                        save_snapshot_job(job_id)
                         st.success(f"✅ 已成功保存 {symbol} 的分析记录！")
                         st.balloons()
                     except Exception as e:
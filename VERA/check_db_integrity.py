@@ -3,6 +3,8 @@ import pandas as pd
 import os
 from datetime import datetime
 
+from data.price_ingest import check_price_cache_integrity, describe_integrity
+
 DB_PATH = "vera.db"
 
 def check_integrity():
@@ -72,6 +74,9 @@ def check_integrity():
         print(f"\n📅 Oldest Data Date found     : {sorted_dates[0][1]} (Symbol: {sorted_dates[0][0]})")
         print(f"📅 Newest Data Date found     : {sorted_dates[-1][1]}")
 
+        # 主键 / 日期格式 / 价格合法性 / canonical 白名单 (一次扫描)
+        print("\n" + describe_integrity(check_price_cache_integrity(conn)))
+
     # C. Financials
     fin_symbols = set()
     if 'financial_history' in tables:
@@ -0,0 +1,394 @@
+"""
+Alert rule engine
+- 规则来源：vera_rules.yaml 的 alerts 段，加载时一次性编译为查找表
+- 增量评估：只扫描上次游标之后新增的状态行 / 风险事件 / 估值分位；
+  估值分位与 alert_valuation_state 中各资产上一次的分位比较，不回扫历史
+- 去重：alert_log UNIQUE(asset_id, rule_code, alert_date)，同一资产同一规则每天至多一条
+- 投递：可插拔 Sink (日志文件 / 本地 webhook)；全部 Sink 成功后写 delivered_at，
+  失败的告警在之后的运行中补发 (至少一次，ALERT_RESEND_DAYS 天内)
+"""
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterable, Tuple
+
+from core.rules_compiler import get_compiled_rules
+from db.connection import get_connection
+
+D_STATES = ["D0", "D1", "D2", "D3", "D4", "D5", "D6"]
+
+RULE_STATE_TRANSITION = "state_transition"
+RULE_VALUATION_BAND = "valuation_band_cross"
+RULE_RISK_EVENT = "risk_event"
+
+# 游标来源 (alert_cursor.source)
+SOURCE_STATE = "drawdown_state_history"
+SOURCE_EVENT = "risk_events"
+SOURCE_VALUATION = "metric_details"
+
+# 投递失败的告警在该天数内 (按 created_at) 随后续运行补发
+ALERT_RESEND_DAYS = 7
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    code: str
+    rule_type: str
+    level: str
+    title_zh: str
+
+
+@dataclass
+class Alert:
+    asset_id: str
+    rule_code: str
+    alert_date: str
+    level: str
+    title: str
+    detail: str
+    context: Dict[str, Any]
+
+
+@dataclass
+class StateChange:
+    """一条待评估的变更记录 (由 collect_changes 从各源表增量读取)"""
+    kind: str              # state_transition / valuation_band_cross / risk_event
+    asset_id: str
+    trade_date: str
+    from_value: str | None
+    to_value: str | None
+    extra: Dict[str, Any]
+
+
+class CompiledAlertRules:
+    """
+    把 alerts.rules 编译为按变更 key 直接索引的查找表：
+    - 状态转移: (from_state, to_state) -> [rule]
+    - 估值分档: (from_band, to_band) -> [rule]
+    - 风险事件: event_type -> [rule]
+    评估时每条变更只做一次 dict 查找，与规则数量无关。
+    """
+    def __init__(self, rules_cfg: Dict[str, Any]):
+        self.valuation = get_compiled_rules(rules_cfg).valuation
+        self.band_keys = [b["key"] for b in rules_cfg["valuation"]["bands"]]
+        self.by_transition: Dict[Tuple[str, str], List[AlertRule]] = {}
+        self.by_band_cross: Dict[Tuple[str, str], List[AlertRule]] = {}
+        self.by_event: Dict[str, List[AlertRule]] = {}
+
+        for r in rules_cfg.get("alerts", {}).get("rules", []):
+            rule = AlertRule(
+                code=r["code"],
+                rule_type=r["type"],
+                level=r.get("level", "INFO"),
+                title_zh=r.get("title_zh", r["code"]),
+            )
+            if rule.rule_type == RULE_STATE_TRANSITION:
+                for f in r.get("from_states") or D_STATES:
+                    for t in r.get("to_states") or D_STATES:
+                        if f != t:
+                            self.by_transition.setdefault((f, t), []).append(rule)
+            elif rule.rule_type == RULE_VALUATION_BAND:
+                for f in r.get("from_bands") or self.band_keys:
+                    for t in r.get("to_bands") or self.band_keys:
+                        if f != t:
+                            self.by_band_cross.setdefault((f, t), []).append(rule)
+            elif rule.rule_type == RULE_RISK_EVENT:
+                for e in r.get("event_types", []):
+                    self.by_event.setdefault(e, []).append(rule)
+            else:
+                raise ValueError(f"Unknown alert rule type: {rule.rule_type}")
+
+    def band_of(self, pctile_0_100: float) -> str:
+        return self.valuation.band_for(pctile_0_100).key
+
+    def match(self, change: StateChange) -> List[AlertRule]:
+        if change.kind == RULE_STATE_TRANSITION:
+            return self.by_transition.get((change.from_value, change.to_value), [])
+        if change.kind == RULE_VALUATION_BAND:
+            return self.by_band_cross.get((change.from_value, change.to_value), [])
+        if change.kind == RULE_RISK_EVENT:
+            return self.by_event.get(change.to_value, [])
+        return []
+
+
+_COMPILED: Tuple[str, CompiledAlertRules] | None = None
+
+
+def get_compiled_alert_rules() -> CompiledAlertRules:
+    """编译结果按规则文件内容哈希复用 (与 rules_compiler 共享同一份解析结果)"""
+    global _COMPILED
+    compiled = get_compiled_rules()
+    if _COMPILED is None or _COMPILED[0] != compiled.digest:
+        _COMPILED = (compiled.digest, CompiledAlertRules(compiled.rules))
+    return _COMPILED[1]
+
+
+# ---------------------------------------------------------------------------
+# 增量读取变更
+# ---------------------------------------------------------------------------
+
+def _get_cursor(conn, source: str) -> int:
+    row = conn.execute("SELECT last_id FROM alert_cursor WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else 0
+
+
+def _set_cursor(conn, source: str, last_id: int):
+    conn.execute("""
+        INSERT INTO alert_cursor (source, last_id, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT(source) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+    """, (source, last_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def _load_valuation_baselines(conn, asset_ids: List[str], before_id: int) -> Dict[str, float]:
+    """
+    各资产上一次评估的 pe_ttm 分位：取自 alert_valuation_state；
+    表中没有的资产 (首次运行 / 升级前的库) 回退到游标之前该资产的最后一条 metric_details
+    """
+    baselines = {}
+    for i in range(0, len(asset_ids), 500):
+        chunk = asset_ids[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        baselines.update(conn.execute(
+            f"SELECT asset_id, percentile FROM alert_valuation_state WHERE asset_id IN ({marks})", chunk
+        ).fetchall())
+
+        missing = [a for a in chunk if a not in baselines]
+        if missing and before_id > 0:
+            marks = ",".join("?" * len(missing))
+            baselines.update(conn.execute(f"""
+                SELECT s.asset_id, md.percentile
+                FROM metric_details md
+                JOIN analysis_snapshot s ON s.snapshot_id = md.snapshot_id
+                WHERE md.id IN (
+                    SELECT MAX(md.id)
+                    FROM metric_details md
+                    JOIN analysis_snapshot s ON s.snapshot_id = md.snapshot_id
+                    WHERE s.asset_id IN ({marks}) AND md.id <= ?
+                      AND md.metric_key = 'pe_ttm' AND md.percentile IS NOT NULL
+                    GROUP BY s.asset_id
+                )
+            """, (*missing, before_id)).fetchall())
+    return baselines
+
+
+def _save_valuation_baselines(conn, baselines: Dict[str, Tuple[int, float]]):
+    conn.executemany("""
+        INSERT INTO alert_valuation_state (asset_id, metric_id, percentile) VALUES (?, ?, ?)
+        ON CONFLICT(asset_id) DO UPDATE SET metric_id = excluded.metric_id, percentile = excluded.percentile
+    """, [(a, mid, pct) for a, (mid, pct) in baselines.items()])
+
+
+def collect_changes(conn, compiled: CompiledAlertRules
+                    ) -> Tuple[List[StateChange], Dict[str, int], Dict[str, Tuple[int, float]]]:
+    """
+    从上次游标之后读取新增行：
+    - drawdown_state_history: 仅 is_transition = 1 的确认转移
+    - risk_events: 新事件
+    - metric_details(pe_ttm): 与同一资产上一条分位 (alert_valuation_state) 比较，分档变化即为穿越
+    Returns: (changes, new_cursors, valuation_baselines)
+        valuation_baselines: asset_id -> (metric_details.id, percentile)，由调用方与游标同一事务写回
+    """
+    changes: List[StateChange] = []
+    cursors = {}
+
+    last = _get_cursor(conn, SOURCE_STATE)
+    max_id = conn.execute("SELECT MAX(id) FROM drawdown_state_history").fetchone()[0]
+    if max_id is not None and max_id > last:
+        cursors[SOURCE_STATE] = max_id
+        rows = conn.execute("""
+            SELECT asset_id, trade_date, prev_state, confirmed_state
+            FROM drawdown_state_history
+            WHERE id > ? AND id <= ? AND is_transition = 1
+            ORDER BY id
+        """, (last, max_id)).fetchall()
+        changes += [StateChange(RULE_STATE_TRANSITION, r[0], r[1], r[2], r[3], {}) for r in rows]
+
+    last = _get_cursor(conn, SOURCE_EVENT)
+    rows = conn.execute("""
+        SELECT event_id, asset_id, event_start_date, state_from, state_to, event_type, severity_level
+        FROM risk_events
+        WHERE event_id > ?
+        ORDER BY event_id
+    """, (last,)).fetchall()
+    if rows:
+        cursors[SOURCE_EVENT] = rows[-1][0]
+    for r in rows:
+        changes.append(StateChange(
+            RULE_RISK_EVENT, r[1], r[2], r[3], r[5],
+            {"state_from": r[3], "state_to": r[4], "severity": r[6]}
+        ))
+
+    last = _get_cursor(conn, SOURCE_VALUATION)
+    rows = conn.execute("""
+        SELECT md.id, s.asset_id, s.as_of_date, md.percentile
+        FROM metric_details md
+        JOIN analysis_snapshot s ON s.snapshot_id = md.snapshot_id
+        WHERE md.id > ? AND md.metric_key = 'pe_ttm' AND md.percentile IS NOT NULL
+        ORDER BY md.id
+    """, (last,)).fetchall()
+    valuation = {}
+    if rows:
+        cursors[SOURCE_VALUATION] = rows[-1][0]
+        prev = _load_valuation_baselines(conn, list(dict.fromkeys(r[1] for r in rows)), last)
+        for metric_id, asset_id, as_of_date, pct in rows:
+            prev_pct = prev.get(asset_id)
+            prev[asset_id] = pct
+            valuation[asset_id] = (metric_id, pct)
+            if prev_pct is None:
+                continue
+            # metric_details.percentile 为 0–1，估值分档按 0–100 配置
+            from_band, to_band = compiled.band_of(prev_pct * 100), compiled.band_of(pct * 100)
+            if from_band != to_band:
+                changes.append(StateChange(
+                    RULE_VALUATION_BAND, asset_id, as_of_date, from_band, to_band,
+                    {"prev_percentile": prev_pct, "percentile": pct}
+                ))
+
+    return changes, cursors, valuation
+
+
+# ---------------------------------------------------------------------------
+# 评估 / 去重 / 投递
+# ---------------------------------------------------------------------------
+
+def _build_alert(rule: AlertRule, change: StateChange) -> Alert:
+    if change.kind == RULE_STATE_TRANSITION:
+        from metrics.state_machine import TRANSITION_RULES
+        key = f"{change.from_value}→{change.to_value}"
+        sem = TRANSITION_RULES.get(change.from_value, {}).get("semantics", {}).get(key, {})
+        detail = f"{change.asset_id} 确认状态转移 {key}" + (f"：{sem['desc']}" if sem.get("desc") else "")
+    elif change.kind == RULE_VALUATION_BAND:
+        detail = f"{change.asset_id} 估值分档变化 {change.from_value} → {change.to_value}"
+    else:
+        detail = f"{change.asset_id} 触发风险事件 {change.to_value} ({change.from_value}→{change.extra.get('state_to')})"
+
+    return Alert(
+        asset_id=change.asset_id,
+        rule_code=rule.code,
+        alert_date=change.trade_date,
+        level=rule.level,
+        title=rule.title_zh,
+        detail=detail,
+        context={"kind": change.kind, "from": change.from_value, "to": change.to_value, **change.extra},
+    )
+
+
+def evaluate_changes(changes: Iterable[StateChange], compiled: CompiledAlertRules) -> List[Alert]:
+    """纯函数：变更 -> 告警 (批内已按 (asset, rule, day) 去重)"""
+    seen = set()
+    alerts = []
+    for change in changes:
+        for rule in compiled.match(change):
+            key = (change.asset_id, rule.code, change.trade_date)
+            if key in seen:
+                continue
+            seen.add(key)
+            alerts.append(_build_alert(rule, change))
+    return alerts
+
+
+def _persist_new_alerts(conn, alerts: List[Alert]) -> List[Alert]:
+    """写入 alert_log；已存在 (asset, rule, day) 的告警被 UNIQUE 约束忽略，不再投递"""
+    fresh = []
+    created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for a in alerts:
+        cur = conn.execute("""
+            INSERT OR IGNORE INTO alert_log
+            (asset_id, rule_code, alert_date, level, title, detail, context, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (a.asset_id, a.rule_code, a.alert_date, a.level, a.title, a.detail,
+              json.dumps(a.context, ensure_ascii=False), created_at))
+        if cur.rowcount == 1:
+            fresh.append(a)
+    return fresh
+
+
+class AlertSink(ABC):
+    """投递接口：子类实现 send(alerts)"""
+    @abstractmethod
+    def send(self, alerts: List[Alert]):
+        ...
+
+
+class LogFileSink(AlertSink):
+    """追加写入 JSON Lines 日志文件"""
+    def __init__(self, path: str = "alerts.log"):
+        self.path = path
+
+    def send(self, alerts: List[Alert]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for a in alerts:
+                f.write(json.dumps(asdict(a), ensure_ascii=False) + "\n")
+
+
+class WebhookSink(AlertSink):
+    """POST 到本地 webhook (一次请求一个批次)"""
+    def __init__(self, url: str = "http://127.0.0.1:8765/vera-alerts", timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts: List[Alert]):
+        import requests
+        resp = requests.post(self.url, json={"alerts": [asdict(a) for a in alerts]}, timeout=self.timeout)
+        resp.raise_for_status()
+
+
+def _load_undelivered(conn) -> List[Tuple[int, Alert]]:
+    """alert_log 中 ALERT_RESEND_DAYS 天内尚未全部投递成功的告警 (含本次新写入的)，按 id 升序"""
+    since = (datetime.now() - timedelta(days=ALERT_RESEND_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    rows = conn.execute("""
+        SELECT id, asset_id, rule_code, alert_date, level, title, detail, context
+        FROM alert_log
+        WHERE delivered_at IS NULL AND created_at >= ?
+        ORDER BY id
+    """, (since,)).fetchall()
+    return [(r[0], Alert(r[1], r[2], r[3], r[4], r[5], r[6], json.loads(r[7]) if r[7] else {})) for r in rows]
+
+
+def _deliver(sinks: List[AlertSink], alerts: List[Alert]) -> bool:
+    """投递到全部 Sink；任一失败返回 False (整批下次补发，已成功的 Sink 可能收到重复告警)"""
+    ok = True
+    for sink in sinks:
+        try:
+            sink.send(alerts)
+        except Exception as e:
+            ok = False
+            print(f"[Alerts] Sink {type(sink).__name__} failed: {e}")
+    return ok
+
+
+def run_alerts(sinks: List[AlertSink] | None = None, conn=None) -> List[Alert]:
+    """
+    增量告警入口：读取新变更 -> 匹配编译规则 -> 去重落库 -> 推进游标 -> 投递
+    投递失败不影响游标：alert_log.delivered_at 保持 NULL，之后的运行连同新告警一起补发。
+    Returns: 本次新产生的告警 (不含补发的)
+    """
+    if sinks is None:
+        sinks = [LogFileSink()]
+    compiled = get_compiled_alert_rules()
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        changes, cursors, valuation = collect_changes(conn, compiled)
+        fresh = _persist_new_alerts(conn, evaluate_changes(changes, compiled))
+        for source, last_id in cursors.items():
+            _set_cursor(conn, source, last_id)
+        _save_valuation_baselines(conn, valuation)
+        conn.commit()
+
+        pending = _load_undelivered(conn)
+        if pending and _deliver(sinks, [a for _, a in pending]):
+            delivered_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            conn.executemany("UPDATE alert_log SET delivered_at = ? WHERE id = ?",
+                             [(delivered_at, alert_id) for alert_id, _ in pending])
+            conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+    resent = len(pending) - len(fresh)
+    print(f"[Alerts] changes={len(changes)} new_alerts={len(fresh)}" + (f" resent={resent}" if resent else ""))
+    return fresh
@@ -1,30 +1,57 @@
+import hashlib
 from functools import lru_cache
 import yaml
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 
-@lru_cache()
-def load_vera_rules() -> Dict[str, Any]:
+
+def vera_rules_path() -> Path:
     """
-    加载 VERA 规则配置：
-    - 来源：config/vera_rules.yaml
-    - 使用 lru_cache 避免重复 IO
+    config/vera_rules.yaml 的位置：
+    - 优先相对本文件 (core/ -> ../config/vera_rules.yaml)
+    - 回退到当前工作目录 (从项目根目录运行)
     """
-    # Assuming config/vera_rules.yaml is relative to the project root or we can find it relative to this file
-    # This file is in core/, so config/ is one level up and then in config/
-    
-    # Try absolute path based on known structure or relative path
-    # Using relative path from this file's directory: ../config/vera_rules.yaml
-    
     base_dir = Path(__file__).resolve().parent.parent
     cfg_path = base_dir / "config" / "vera_rules.yaml"
-    
+
     if not cfg_path.exists():
         # Fallback to verify if running from root
         cfg_path = Path("config/vera_rules.yaml")
-    
+
     if not cfg_path.exists():
         raise FileNotFoundError(f"VERA rules config not found: {cfg_path}")
-        
-    with cfg_path.open("r", encoding="utf-8") as f:
+    return cfg_path
+
+
+_DIGEST: Tuple[Tuple[str, int, int], str] | None = None
+
+
+def vera_rules_digest() -> str:
+    """
+    规则文件内容哈希 (sha1)：仅在 (path, mtime, size) 变化时重新读取计算，
+    平时每次调用只有一次 stat
+    """
+    global _DIGEST
+    cfg_path = vera_rules_path()
+    st = cfg_path.stat()
+    sig = (str(cfg_path), st.st_mtime_ns, st.st_size)
+    if _DIGEST is None or _DIGEST[0] != sig:
+        _DIGEST = (sig, hashlib.sha1(cfg_path.read_bytes()).hexdigest())
+    return _DIGEST[1]
+
+
+@lru_cache(maxsize=4)
+def load_vera_rules_for_digest(digest: str) -> Dict[str, Any]:
+    """按内容哈希解析一次 (同一份内容在进程内只 parse 一次)"""
+    with vera_rules_path().open("r", encoding="utf-8") as f:
         return yaml.safe_load(f)
+
+
+def load_vera_rules() -> Dict[str, Any]:
+    """
+    加载 VERA 规则配置：
+    - 来源：config/vera_rules.yaml
+    - 按文件内容哈希缓存，避免重复 IO；文件修改后自动读到新版本
+    - 返回的 dict 在进程内共享，调用方不得修改
+    """
+    return load_vera_rules_for_digest(vera_rules_digest())
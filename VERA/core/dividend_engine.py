@@ -20,6 +20,33 @@ class DividendFacts:
     dividend_recovery_progress: Optional[float]
 
 
+def dividend_facts_from_derived(asset_id: str, row: Dict[str, Any]) -> Optional[DividendFacts]:
+    """
+    由 financial_derived 最新一行构造 DividendFacts；无分红记录时返回 None
+    """
+    def _num(key):
+        v = row.get(key)
+        if v is None or v != v:  # None / NaN
+            return None
+        return float(v)
+
+    dividends = _num("dividends_ttm")
+    if dividends is None:
+        return None
+
+    cuts = _num("cut_years_10y")
+    recovery = _num("dividend_recovery_progress")
+    return DividendFacts(
+        asset_id=asset_id,
+        dividends_ttm=dividends,
+        net_income_ttm=_num("net_profit_ttm"),
+        dps_5y_mean=_num("dps_5y_mean"),
+        dps_5y_std=_num("dps_5y_std") or 0.0,
+        cut_years_10y=int(cuts) if cuts is not None else 0,
+        dividend_recovery_progress=recovery if recovery is not None else 1.0,
+    )
+
+
 def _safe_div(num: Optional[float], den: Optional[float]) -> Optional[float]:
     # 简单防御性除法，0 或 None 返回 None
     if num is None or den is None or den == 0:
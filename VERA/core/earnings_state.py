@@ -56,15 +56,31 @@ def compute_eps_yoy(eps_series: List[Tuple[str, float]]) -> List[Tuple[str, floa
             
     return yoy_list
 
+
+def earnings_inputs_from_derived(derived_rows: List[Dict[str, Any]]) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]:
+    """
+    将 financial_derived 行 (按 report_date 升序) 转换为 determine_earnings_state 的输入
+    Returns: (eps_series, yoy_series)
+    """
+    def _valid(v):
+        return v is not None and v == v  # 排除 None / NaN
+
+    eps_series = [(r["report_date"], float(r["eps_ttm"])) for r in derived_rows if _valid(r.get("eps_ttm"))]
+    yoy_series = [(r["report_date"], float(r["eps_yoy"])) for r in derived_rows if _valid(r.get("eps_yoy"))]
+    return eps_series, yoy_series
+
 def determine_earnings_state(
     eps_series: List[Tuple[str, float]],
-    rules: Dict[str, Any] | None = None
+    rules: Dict[str, Any] | None = None,
+    yoy_series: Optional[List[Tuple[str, float]]] = None
 ) -> EarningsStateInfo:
     """
     根据 EPS 序列和 earnigns_state 配置，判断盈利周期 E0–E6。
     - 若有效财报期数 < 4，直接返回 E0（无结构）。
     
     Input: eps_series: list of (report_date, eps_value), sorted by date ascending.
+           yoy_series: 预先计算好的 (report_date, yoy) 序列 (financial_derived.eps_yoy)，
+                       为空时回退到 compute_eps_yoy 逐期计算。
     """
     if rules is None:
         rules = load_vera_rules()
@@ -88,7 +104,8 @@ def determine_earnings_state(
         return _return_state("E0")
 
     # 1) 计算 YoY 序列
-    yoy_series = compute_eps_yoy(eps_series)
+    if yoy_series is None:
+        yoy_series = compute_eps_yoy(eps_series)
     
     # 如果 YoY 数据点太少，也无法判断
     if len(yoy_series) < 3:
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from typing import Literal, Dict, Any
-from core.config_loader import load_vera_rules
+from core.rules_compiler import get_compiled_rules
 
 @dataclass
 class QuadrantInfo:
@@ -20,11 +20,7 @@ def compute_position_bin(
     - 输入 position_pct 必须是 0–100（不是 0–1）
     - 阈值来自 rules["quadrant"]["position_bin"]["high_gte"]
     """
-    if rules is None:
-        rules = load_vera_rules()
-    qrules = rules["quadrant"]
-    high_gte = qrules["position_bin"]["high_gte"]
-    return "HIGH" if position_pct >= high_gte else "LOW"
+    return "HIGH" if position_pct >= get_compiled_rules(rules).quadrant.high_gte else "LOW"
 
 def compute_path_bin(
     d_state: str,
@@ -34,10 +30,7 @@ def compute_path_bin(
     D-State → STABLE / FRAGILE
     脆弱状态集合来自 rules["quadrant"]["path_bin"]["fragile_states"]
     """
-    if rules is None:
-        rules = load_vera_rules()
-    fragile = set(rules["quadrant"]["path_bin"]["fragile_states"])
-    return "FRAGILE" if d_state in fragile else "STABLE"
+    return "FRAGILE" if d_state in get_compiled_rules(rules).quadrant.fragile_states else "STABLE"
 
 def map_quadrant(
     position_bin: str,
@@ -46,21 +39,18 @@ def map_quadrant(
 ) -> QuadrantInfo:
     """
     (position_bin, path_bin) 查表得到 Q1..Q4 及文案
-    配置来源：rules["quadrant"]["matrix"]
+    配置来源：rules["quadrant"]["matrix"] (预编译为 dict)
     """
-    if rules is None:
-        rules = load_vera_rules()
-    matrix = rules["quadrant"]["matrix"]
-    for item in matrix:
-        if item["position"] == position_bin and item["path"] == path_bin:
-            return QuadrantInfo(
-                quadrant=item["quadrant"],
-                label_zh=item.get("label_zh", item["quadrant"]),
-                label_en=item.get("label_en", item["quadrant"]),
-                desc_zh=item.get("desc_zh", ""),
-                desc_en=item.get("desc_en", ""),
-                color=item.get("color"),
-            )
+    item = get_compiled_rules(rules).quadrant.matrix.get((position_bin, path_bin))
+    if item is not None:
+        return QuadrantInfo(
+            quadrant=item["quadrant"],
+            label_zh=item.get("label_zh", item["quadrant"]),
+            label_en=item.get("label_en", item["quadrant"]),
+            desc_zh=item.get("desc_zh", ""),
+            desc_en=item.get("desc_en", ""),
+            color=item.get("color"),
+        )
 
     # fallback：未命中任何配置
     return QuadrantInfo(
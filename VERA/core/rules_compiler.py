@@ -0,0 +1,166 @@
+"""
+Rules compiler (vera_rules.yaml -> 预编译查找结构)
+- valuation: 分位区间按下沿排序，bisect 定位 band；band -> bucket 直接查表
+- quadrant : (position_bin, path_bin) -> 矩阵项；脆弱状态 frozenset
+- behavior : d_state -> 分组、质量标签 -> bucket 两张 dict；
+             (d_group, quadrant, valuation_bucket, quality_bucket) -> 命中规则 (按 priority 展开，先到先得)
+- 每份规则文件内容 (sha1) 只编译一次，由各评估器共享；批量打分时不再解释配置
+各段在首次访问时编译，缺少某段配置不影响其他段
+"""
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from itertools import product
+from typing import Any, Dict, Optional, Tuple
+
+from core.config_loader import load_vera_rules_for_digest, vera_rules_digest
+
+
+@dataclass(frozen=True)
+class ValuationBand:
+    key: str
+    lo: float
+    hi: float
+    label_zh: str
+    label_en: str
+    color: Optional[str]
+    bucket: Optional[str]       # None: 未映射到任何 bucket (调用时报错，与逐条匹配一致)
+
+
+class CompiledValuation:
+    def __init__(self, vrules: Dict[str, Any]):
+        band_bucket: Dict[str, str] = {}
+        for bucket_name, cfg in vrules["buckets"].items():
+            for key in cfg["bands"]:
+                band_bucket.setdefault(key, bucket_name)
+
+        bands = [
+            ValuationBand(
+                key=b["key"], lo=b["range"][0], hi=b["range"][1],
+                label_zh=b.get("label_zh", b["key"]), label_en=b.get("label_en", b["key"]),
+                color=b.get("color"), bucket=band_bucket.get(b["key"]),
+            )
+            for b in vrules["bands"]
+        ]
+        bands.sort(key=lambda b: b.lo)
+        for prev, cur in zip(bands, bands[1:]):
+            if cur.lo < prev.hi:
+                raise ValueError(f"Valuation bands overlap: {prev.key} {prev.lo, prev.hi} / {cur.key} {cur.lo, cur.hi}")
+        self.bands: Tuple[ValuationBand, ...] = tuple(bands)
+        self._los = [b.lo for b in bands]
+        self.special: Dict[str, Dict[str, Any]] = dict(vrules.get("special_states", {}))
+        self.min_history_points: int = vrules.get("min_history_points", 0)
+
+    def band_for(self, pct: float) -> ValuationBand:
+        """区间约定 [lo, hi)，最高一档允许 hi==100 且 pct==100 命中；不在任何区间 -> ValueError"""
+        i = bisect_right(self._los, pct) - 1
+        if i >= 0:
+            band = self.bands[i]
+            if pct < band.hi or (band.hi == 100 and pct == 100):
+                return band
+        raise ValueError(f"Valuation pctile {pct} not in any band")
+
+
+class CompiledQuadrant:
+    def __init__(self, qrules: Dict[str, Any]):
+        self.high_gte = qrules["position_bin"]["high_gte"]
+        self.fragile_states = frozenset(qrules["path_bin"]["fragile_states"])
+        self.matrix: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for item in qrules["matrix"]:
+            self.matrix.setdefault((item["position"], item["path"]), item)
+
+
+@dataclass(frozen=True)
+class BehaviorRule:
+    name: str
+    priority: int
+    action_code: str
+    action_label_zh: str
+    action_label_en: str
+    note_zh: str
+    note_en: str
+
+
+class CompiledBehavior:
+    def __init__(self, brules: Dict[str, Any]):
+        self.d_state_group: Dict[str, str] = {}
+        for group_name, states in brules["d_state_groups"].items():
+            for s in states:
+                self.d_state_group.setdefault(s, group_name)
+
+        self.quality_bucket: Dict[str, str] = {}
+        for bucket_name, variants in brules["quality_buckets"].items():
+            for v in variants:
+                self.quality_bucket.setdefault(v, bucket_name)
+
+        # 按 priority 降序 (同优先级保持 YAML 顺序) 展开 when 的笛卡尔积，先写入者即首个命中规则
+        self.matrix: Dict[Tuple[str, str, str, str], BehaviorRule] = {}
+        for rule in sorted(brules["rules"], key=lambda x: x.get("priority", 0), reverse=True):
+            when, action = rule["when"], rule["action"]
+            compiled = BehaviorRule(
+                name=rule["name"], priority=rule.get("priority", 0),
+                action_code=action["code"], action_label_zh=action["label_zh"], action_label_en=action["label_en"],
+                note_zh=action["note_zh"], note_en=action["note_en"],
+            )
+            for key in product(when.get("d_state_group", []), when.get("quadrant", []),
+                               when.get("valuation_bucket", []), when.get("quality_bucket", [])):
+                self.matrix.setdefault(key, compiled)
+
+    def group_of(self, d_state: str) -> str:
+        return self.d_state_group.get(d_state, "UNKNOWN")
+
+    def bucket_of(self, quality_level: str) -> str:
+        # 空值 / 未配置的质量标签一律按 WEAK (保守)
+        if not quality_level:
+            return "WEAK"
+        return self.quality_bucket.get(quality_level.upper(), "WEAK")
+
+    def match(self, d_state: str, quadrant: str, valuation_bucket: str, quality_level: str) -> Optional[BehaviorRule]:
+        return self.matrix.get((self.group_of(d_state), quadrant, valuation_bucket, self.bucket_of(quality_level)))
+
+
+class CompiledRules:
+    """一份规则配置的编译结果；rules dict 视为不可变"""
+    def __init__(self, rules: Dict[str, Any], digest: Optional[str] = None):
+        self.rules = rules
+        self.digest = digest
+
+    @cached_property
+    def valuation(self) -> CompiledValuation:
+        return CompiledValuation(self.rules["valuation"])
+
+    @cached_property
+    def quadrant(self) -> CompiledQuadrant:
+        return CompiledQuadrant(self.rules["quadrant"])
+
+    @cached_property
+    def behavior(self) -> CompiledBehavior:
+        return CompiledBehavior(self.rules["behavior"])
+
+
+@lru_cache(maxsize=4)
+def _compiled_for_digest(digest: str) -> CompiledRules:
+    return CompiledRules(load_vera_rules_for_digest(digest), digest)
+
+
+_EXPLICIT: "OrderedDict[int, Tuple[Dict[str, Any], CompiledRules]]" = OrderedDict()
+_EXPLICIT_MAX = 8
+
+
+def get_compiled_rules(rules: Optional[Dict[str, Any]] = None) -> CompiledRules:
+    """
+    - rules=None：当前 vera_rules.yaml，按文件内容哈希编译一次并共享
+    - 显式传入的 rules dict (测试 / 调用方覆盖)：按对象身份缓存最近几份
+    """
+    if rules is None:
+        return _compiled_for_digest(vera_rules_digest())
+    hit = _EXPLICIT.get(id(rules))
+    if hit is not None and hit[0] is rules:
+        _EXPLICIT.move_to_end(id(rules))
+        return hit[1]
+    compiled = CompiledRules(rules)
+    _EXPLICIT[id(rules)] = (rules, compiled)
+    while len(_EXPLICIT) > _EXPLICIT_MAX:
+        _EXPLICIT.popitem(last=False)
+    return compiled
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from typing import Dict, Any, Sequence
-from core.config_loader import load_vera_rules
+from core.rules_compiler import get_compiled_rules
 
 @dataclass
 class ValuationStatusInfo:
@@ -21,11 +21,9 @@ def compute_valuation_status(
     - 历史样本不足 → INSUFFICIENT_HISTORY
     - 其余情况 → 按分位数映射估值状态
     """
-    if rules is None:
-        rules = load_vera_rules()
-    vrules = rules["valuation"]
-    special = vrules.get("special_states", {})
-    min_pts = vrules.get("min_history_points", 0)
+    compiled = get_compiled_rules(rules).valuation
+    special = compiled.special
+    min_pts = compiled.min_history_points
 
     # 1) 没有当前 PE
     if vera_pe_ttm is None:
@@ -64,43 +62,18 @@ def map_valuation_status_from_pctile(
 ) -> ValuationStatusInfo:
     """
     根据 VERA_PE TTM 分位数 (0-100) 映射估值状态。
-    配置来源：rules["valuation"]["bands"] & rules["valuation"]["buckets"]。
+    配置来源：rules["valuation"]["bands"] & rules["valuation"]["buckets"]，
+    经 rules_compiler 预编译 (区间下沿 bisect 定位，band -> bucket 查表)。
     要求：pct 必须是 0–100 标度。
     """
-    if rules is None:
-        rules = load_vera_rules()
-    vrules = rules["valuation"]
-    bands = vrules["bands"]
-    buckets = vrules["buckets"]
-
-    matched_band_key = None
-    matched_band = None
-
-    for band in bands:
-        lo, hi = band["range"]
-        # 区间约定：[lo, hi)，最高一档允许 hi==100 且 pct==100 命中
-        # Ensure we handle floating point comparison robustly if needed, but usually direct is fine.
-        if pct >= lo and (pct < hi or (hi == 100 and pct == 100)):
-            matched_band_key = band["key"]
-            matched_band = band
-            break
-
-    if matched_band_key is None:
-        raise ValueError(f"Valuation pctile {pct} not in any band")
-
-    bucket = None
-    for bucket_name, cfg in buckets.items():
-        if matched_band_key in cfg["bands"]:
-            bucket = bucket_name
-            break
-
-    if bucket is None:
-        raise ValueError(f"Valuation band {matched_band_key} not mapped to any bucket")
+    band = get_compiled_rules(rules).valuation.band_for(pct)
+    if band.bucket is None:
+        raise ValueError(f"Valuation band {band.key} not mapped to any bucket")
 
     return ValuationStatusInfo(
-        key=matched_band_key,
-        label_zh=matched_band.get("label_zh", matched_band_key),
-        label_en=matched_band.get("label_en", matched_band_key),
-        bucket=bucket,
-        color=matched_band.get("color"),
+        key=band.key,
+        label_zh=band.label_zh,
+        label_en=band.label_en,
+        bucket=band.bucket,
+        color=band.color,
     )
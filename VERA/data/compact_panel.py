@@ -0,0 +1,205 @@
+"""
+Compact price panel (全市场 / 大批量资产分析用)
+- 一次 SQL 读取全部资产，日期 / 代码 / 数值在加载时一次性转换，之后只做 NumPy 切片
+- days    : int32 日序号 (自 1970-01-01 的天数)，(T,) 升序
+- assets  : pd.Categorical 资产 ID (categories = 列顺序)，codes 为最小整数类型 (5,000 资产 -> int16)
+- fields  : {field: (T, N) C 连续二维数组}，价格默认 float32，volume 固定 float64；NaN = 当日无 bar
+- observed: bool (T, N)，当日是否有真实 bar
+行 = 各资产观测日的并集 (剔除周末脏数据，与交易日历一致)，不做前向填充；
+需要按市场日历对齐 / ffill 时用 CompactPanel.from_aligned(load_aligned_panel(...))
+
+精度约定:
+- 日期: int32 日序号精确无损 (可表示 ±580 万年)
+- float32 价格: 24 位有效尾数，单值相对误差 ≤ 2^-24 ≈ 6.0e-8 (约 7 位有效数字)；
+  价格 < 100,000 时绝对误差 < 0.004。由 float32 价格算得的日收益率绝对误差约 1e-7 量级，
+  对相关性 / 筛选 / bootstrap 可忽略；长序列复利累乘、需要对账的精确价格请用 dtype=np.float64
+- volume: 恒为 float64 (整数精确到 2^53)；float32 只能精确表示 ≤ 2^24 ≈ 1677 万的整数
+容量: 10 年 (≈2,520 交易日) × 5,000 资产 = 1,260 万格 -> float32 每字段 ≈ 50 MB
+      (float64 ≈ 100 MB)，observed ≈ 13 MB；见 estimate_nbytes()
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from db.connection import get_connection
+from utils.canonical_resolver import resolve_canonical_symbol
+from utils.market_calendar import weekday_mask
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+CHUNK_SIZE = 500
+
+
+def day_ordinal(dates) -> np.ndarray:
+    """日期 (字符串 'YYYY-MM-DD' / datetime64 / DatetimeIndex) -> int32 日序号"""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64).astype(np.int32)
+
+
+def estimate_nbytes(n_days: int, n_assets: int, n_fields: int = 1, dtype=np.float32) -> int:
+    """CompactPanel 主体内存 (数值 + observed + days)，不含 Categorical 的少量开销"""
+    cells = n_days * n_assets
+    return cells * n_fields * np.dtype(dtype).itemsize + cells + n_days * 4
+
+
+def _field_dtype(name: str, dtype) -> np.dtype:
+    return np.dtype(np.float64) if name == "volume" else np.dtype(dtype)
+
+
+@dataclass
+class CompactPanel:
+    days: np.ndarray                    # int32, (T,)
+    assets: pd.Categorical              # (N,)
+    fields: Dict[str, np.ndarray]       # field -> (T, N) C-contiguous
+    observed: np.ndarray                # bool, (T, N)
+    _col: Dict[str, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._col = {a: j for j, a in enumerate(self.assets.categories)}
+
+    @property
+    def asset_ids(self) -> List[str]:
+        return list(self.assets.categories)
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.days.astype("datetime64[D]")
+
+    @property
+    def shape(self):
+        return self.observed.shape
+
+    @property
+    def nbytes(self) -> int:
+        return (sum(v.nbytes for v in self.fields.values()) + self.observed.nbytes
+                + self.days.nbytes + self.assets.codes.nbytes)
+
+    def index_of(self, asset_id: str) -> int:
+        return self._col[asset_id]
+
+    def values(self, name: str = "close") -> np.ndarray:
+        return self.fields[name]
+
+    def col(self, asset_id: str, name: str = "close") -> np.ndarray:
+        return self.fields[name][:, self._col[asset_id]]
+
+    def window(self, start=None, end=None) -> "CompactPanel":
+        """[start, end] 日期区间的行切片 (共享底层数组，不复制)"""
+        lo = 0 if start is None else int(np.searchsorted(self.days, day_ordinal(start)))
+        hi = len(self.days) if end is None else int(np.searchsorted(self.days, day_ordinal(end), side="right"))
+        return CompactPanel(self.days[lo:hi], self.assets,
+                            {k: v[lo:hi] for k, v in self.fields.items()}, self.observed[lo:hi])
+
+    def to_frame(self, name: str = "close") -> pd.DataFrame:
+        """宽表 (DatetimeIndex × asset_id)，直接包装底层数组"""
+        return pd.DataFrame(
+            self.fields[name],
+            index=pd.DatetimeIndex(self.dates, name="trade_date"),
+            columns=pd.CategoricalIndex(self.assets, name="asset_id"),
+            copy=False,
+        )
+
+    def to_long(self, name: str = "close") -> pd.DataFrame:
+        """长表 (仅真实 bar)：day(int32) / asset_id(categorical) / value"""
+        rows, cols = np.nonzero(self.observed)
+        return pd.DataFrame({
+            "day": self.days[rows],
+            "asset_id": pd.Categorical.from_codes(self.assets.codes[cols], self.assets.categories),
+            "value": self.fields[name][rows, cols],
+        })
+
+    @classmethod
+    def from_aligned(cls, panel, dtype=np.float32, name: str = "close") -> "CompactPanel":
+        """AlignedPanel (日历对齐 / 已填充) -> CompactPanel"""
+        return cls(
+            day_ordinal(panel.dates),
+            pd.Categorical(panel.asset_ids, categories=panel.asset_ids),
+            {name: np.ascontiguousarray(panel.values, dtype=_field_dtype(name, dtype))},
+            np.ascontiguousarray(panel.observed),
+        )
+
+
+def load_compact_panel(
+    asset_ids: Optional[Sequence[str]] = None,
+    start_date: str = None,
+    end_date: str = None,
+    fields: Iterable[str] = ("close",),
+    dtype=np.float32,
+    adjusted: bool = False,
+    conn=None,
+) -> CompactPanel:
+    """
+    读取 [start_date, end_date] 的价格到 CompactPanel
+    - asset_ids=None：价格表中的全部资产 (按 ID 排序)；否则列顺序 / 列名与传入一致 (raw 或 canonical)
+    - dtype：价格字段精度 (np.float32 / np.float64)，volume 恒为 float64
+    - adjusted=True 时读取复权视图 vera_price_adjusted
+    """
+    fields = tuple(dict.fromkeys(fields))
+    bad = [f for f in fields if f not in PRICE_FIELDS]
+    if bad or not fields:
+        raise ValueError(f"Unsupported fields: {bad or fields}")
+    table = "vera_price_adjusted" if adjusted else "vera_price_cache"
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        where, params = ["1 = 1"], []
+        if start_date:
+            where.append("trade_date >= ?")
+            params.append(start_date)
+        if end_date:
+            # trade_date 已统一为 YYYY-MM-DD (init_db 迁移)，直接比较以使用 (symbol, trade_date) 主键索引
+            where.append("trade_date <= ?")
+            params.append(str(end_date)[:10])
+        sql = (f"SELECT symbol, trade_date AS d, {', '.join(fields)} FROM {table} "
+               f"WHERE {' AND '.join(where)}")
+
+        if asset_ids is None:
+            df = pd.read_sql_query(sql, conn, params=params)
+            columns = sorted(df["symbol"].unique())
+            canonical = {a: a for a in columns}
+        else:
+            columns = [a for a in dict.fromkeys(asset_ids) if a]
+            canonical = {a: resolve_canonical_symbol(conn, a.strip().upper()) for a in columns}
+            symbols = list(dict.fromkeys(canonical.values()))
+            frames = [
+                pd.read_sql_query(f"{sql} AND symbol IN ({','.join('?' * len(chunk))})", conn,
+                                  params=[*params, *chunk])
+                for chunk in (symbols[i:i + CHUNK_SIZE] for i in range(0, len(symbols), CHUNK_SIZE))
+            ]
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["symbol", "d", *fields])
+    finally:
+        if own_conn:
+            conn.close()
+
+    # 一次性转换：日期 -> int32 序号，代码 -> 类别编码；剔除周末与全空行
+    df = df.dropna(subset=list(fields), how="all")
+    day = day_ordinal(df["d"].to_numpy(dtype=str)) if len(df) else np.empty(0, dtype=np.int32)
+    keep = weekday_mask(day)
+    df, day = df[keep], day[keep]
+
+    symbols = list(dict.fromkeys(canonical.values()))
+    sym_code = pd.Categorical(df["symbol"], categories=symbols).codes
+    known = sym_code >= 0
+    df, day, sym_code = df[known], day[known], sym_code[known]
+    days = np.unique(day)
+    rows = np.searchsorted(days, day)
+
+    shape = (len(days), len(symbols))
+    observed = np.zeros(shape, dtype=bool)
+    observed[rows, sym_code] = True
+    values = {}
+    for f in fields:
+        arr = np.full(shape, np.nan, dtype=_field_dtype(f, dtype))
+        arr[rows, sym_code] = pd.to_numeric(df[f], errors="coerce").to_numpy(dtype=np.float64)
+        values[f] = arr
+
+    # 列按调用方 ID 展开 (别名指向同一 canonical 时复制该列)
+    pos = {sym: k for k, sym in enumerate(symbols)}
+    take = np.array([pos[canonical[a]] for a in columns], dtype=np.intp)
+    if not np.array_equal(take, np.arange(len(symbols))):
+        observed = np.ascontiguousarray(observed[:, take])
+        values = {f: np.ascontiguousarray(v[:, take]) for f, v in values.items()}
+
+    return CompactPanel(days.astype(np.int32), pd.Categorical(columns, categories=columns), values, observed)
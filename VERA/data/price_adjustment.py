@@ -0,0 +1,242 @@
+"""
+Split / dividend adjustment layer for vera_price_cache
+- corporate_actions: 拆股 (split_factor, 如 5 表示 1 拆 5) 与现金分红 (cash_dividend, 每股)
+- price_adjustment_factor: 每资产分段常数的累计后复权因子 [valid_from, valid_to) -> cum_factor
+  尾端对齐 (最新价格 = 原始价格)，历史价格乘以 cum_factor，成交量乘以 cum_split (仅拆股)
+- vera_price_adjusted (VIEW): 原始价格 LEFT JOIN 因子表，复权读取与原始读取同为一次索引查询
+- 新公司行为写入后立即重算受影响资产的因子 (缓存失效)；refresh_adjustment_factors() 补算过期资产
+- 除权日前缺少收盘价的分红记为 dividend_pending，价格补齐后 (ingest_prices / refresh) 重算
+"""
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from db.connection import get_connection
+
+FACTOR_COLUMNS = ["asset_id", "valid_from", "valid_to", "cum_factor", "cum_split", "dividend_pending"]
+MIN_DATE = "0000-01-01"
+
+# 与 db/schema.sql 中的视图定义一致；旧库由 ensure_factor_columns 重建
+ADJUSTED_VIEW_SQL = """
+CREATE VIEW vera_price_adjusted AS
+SELECT
+    p.symbol,
+    p.trade_date,
+    p.open  * COALESCE(f.cum_factor, 1.0) AS open,
+    p.high  * COALESCE(f.cum_factor, 1.0) AS high,
+    p.low   * COALESCE(f.cum_factor, 1.0) AS low,
+    p.close * COALESCE(f.cum_factor, 1.0) AS close,
+    p.volume * COALESCE(f.cum_split, 1.0) AS volume,
+    COALESCE(f.cum_factor, 1.0) AS adj_factor
+FROM vera_price_cache p
+LEFT JOIN price_adjustment_factor f
+    ON f.asset_id = p.symbol AND p.trade_date >= f.valid_from AND p.trade_date < f.valid_to
+"""
+
+
+def ensure_factor_columns(conn):
+    """旧库补齐 cum_split / dividend_pending 列并重建视图 (schema.sql 的 IF NOT EXISTS 不会改旧表 / 旧视图)"""
+    existing = {r[1] for r in conn.execute("PRAGMA table_info(price_adjustment_factor)").fetchall()}
+    if {"cum_split", "dividend_pending"} <= existing:
+        return
+    with conn:
+        if "cum_split" not in existing:
+            conn.execute("ALTER TABLE price_adjustment_factor ADD COLUMN cum_split REAL NOT NULL DEFAULT 1.0")
+        if "dividend_pending" not in existing:
+            conn.execute("ALTER TABLE price_adjustment_factor ADD COLUMN dividend_pending INTEGER NOT NULL DEFAULT 0")
+        conn.execute("DROP VIEW IF EXISTS vera_price_adjusted")
+        conn.execute(ADJUSTED_VIEW_SQL)
+    # 旧因子行没有拆股 / 待补分红信息，全量重算一次
+    rebuild_adjustment_factors(conn=conn)
+
+
+def compute_adjustment_factors(actions: pd.DataFrame, prev_closes: pd.DataFrame) -> pd.DataFrame:
+    """
+    actions: asset_id, ex_date, split_factor, cash_dividend (同日多条会合并)
+    prev_closes: asset_id, ex_date, prev_close (除权日前最后一个收盘价，缺失时分红不计入)
+
+    单事件因子: f = (1 / split) * (1 - dividend / (prev_close / split))
+    除权日 ex_k 之前的累计因子 = 该资产 ex_k 及之后全部事件因子之积 (逆序 cumprod)
+    成交量只按拆股调整: cum_split = ex_k 及之后全部 split 之积
+    dividend_pending: 该除权日有分红但缺少除权前收盘价 (暂未调整，价格补齐后重算)
+
+    Returns: DataFrame[FACTOR_COLUMNS]，每个除权日一段
+    """
+    if actions.empty:
+        return pd.DataFrame(columns=FACTOR_COLUMNS)
+
+    df = actions.copy()
+    df["split_factor"] = pd.to_numeric(df["split_factor"], errors="coerce")
+    df["cash_dividend"] = pd.to_numeric(df["cash_dividend"], errors="coerce").fillna(0.0)
+    df.loc[~(df["split_factor"] > 0), "split_factor"] = 1.0
+    df = df.groupby(["asset_id", "ex_date"], as_index=False).agg(
+        split_factor=("split_factor", "prod"), cash_dividend=("cash_dividend", "sum")
+    )
+    df = df.merge(prev_closes, on=["asset_id", "ex_date"], how="left")
+
+    split = df["split_factor"].to_numpy(float)
+    basis = df["prev_close"].to_numpy(float) / split
+    div_factor = 1.0 - df["cash_dividend"].to_numpy(float) / basis
+    # 缺少除权前收盘价，或分红不小于股价 (脏数据) 时不做分红调整
+    div_factor = np.where(np.isfinite(div_factor) & (div_factor > 0), div_factor, 1.0)
+    df["event_factor"] = div_factor / split
+    df["dividend_pending"] = ((df["cash_dividend"] > 0) & df["prev_close"].isna()).astype(int)
+
+    df = df.sort_values(["asset_id", "ex_date"], ascending=[True, False])
+    df["cum_factor"] = df.groupby("asset_id")["event_factor"].cumprod()
+    df["cum_split"] = df.groupby("asset_id")["split_factor"].cumprod()
+    df = df.sort_values(["asset_id", "ex_date"]).reset_index(drop=True)
+    df["valid_to"] = df["ex_date"]
+    df["valid_from"] = df.groupby("asset_id")["ex_date"].shift(1).fillna(MIN_DATE)
+    return df[FACTOR_COLUMNS]
+
+
+def _load_actions(conn, asset_ids: List[str] = None) -> pd.DataFrame:
+    sql = "SELECT asset_id, ex_date, split_factor, cash_dividend FROM corporate_actions"
+    params: list = []
+    if asset_ids:
+        sql += f" WHERE asset_id IN ({','.join('?' * len(asset_ids))})"
+        params = list(asset_ids)
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def _load_prev_closes(conn, actions: pd.DataFrame) -> pd.DataFrame:
+    """除权日前最后一个原始收盘价 (每个事件一次索引查询)"""
+    keys = actions[["asset_id", "ex_date"]].drop_duplicates()
+    rows = []
+    for asset_id, ex_date in keys.itertuples(index=False, name=None):
+        r = conn.execute(
+            "SELECT close FROM vera_price_cache WHERE symbol = ? AND trade_date < ? "
+            "ORDER BY trade_date DESC LIMIT 1",
+            (asset_id, ex_date)
+        ).fetchone()
+        rows.append((asset_id, ex_date, r[0] if r else None))
+    return pd.DataFrame(rows, columns=["asset_id", "ex_date", "prev_close"])
+
+
+def rebuild_adjustment_factors(asset_ids: Iterable[str] = None, conn=None) -> int:
+    """
+    重算复权因子：asset_ids 为空时全量，否则只重算这些资产
+    Returns: 写入的分段数
+    """
+    asset_ids = list(dict.fromkeys(asset_ids)) if asset_ids else None
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        ensure_factor_columns(conn)
+        actions = _load_actions(conn, asset_ids)
+        factors = compute_adjustment_factors(actions, _load_prev_closes(conn, actions))
+
+        with conn:
+            if asset_ids:
+                conn.executemany("DELETE FROM price_adjustment_factor WHERE asset_id = ?", [(a,) for a in asset_ids])
+            else:
+                conn.execute("DELETE FROM price_adjustment_factor")
+            conn.executemany(
+                "INSERT INTO price_adjustment_factor "
+                "(asset_id, valid_from, valid_to, cum_factor, cum_split, dividend_pending, computed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, datetime('now'))",
+                factors.itertuples(index=False, name=None)
+            )
+        return len(factors)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def save_corporate_actions(actions, conn=None) -> int:
+    """
+    写入公司行为 (list of dict 或 DataFrame: asset_id, ex_date, split_factor, cash_dividend, source)，
+    同一 (asset_id, ex_date, action_type) 覆盖；随后重算受影响资产的复权因子 (缓存失效)
+    Returns: 写入条数
+    """
+    df = pd.DataFrame(actions)
+    if df.empty:
+        return 0
+    for col in ("split_factor", "cash_dividend", "source"):
+        if col not in df.columns:
+            df[col] = None
+    df["action_type"] = np.where(pd.to_numeric(df["split_factor"], errors="coerce").notna(), "SPLIT", "DIVIDEND")
+    df["ex_date"] = pd.to_datetime(df["ex_date"]).dt.strftime("%Y-%m-%d")
+    df = df.astype(object).where(df.notna(), None)
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        with conn:
+            conn.executemany("""
+                INSERT INTO corporate_actions (asset_id, ex_date, action_type, split_factor, cash_dividend, source, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
+                ON CONFLICT(asset_id, ex_date, action_type) DO UPDATE SET
+                    split_factor  = excluded.split_factor,
+                    cash_dividend = excluded.cash_dividend,
+                    source        = excluded.source,
+                    updated_at    = excluded.updated_at
+            """, df[["asset_id", "ex_date", "action_type", "split_factor", "cash_dividend", "source"]]
+                .itertuples(index=False, name=None))
+        rebuild_adjustment_factors(df["asset_id"].unique().tolist(), conn=conn)
+        return len(df)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def refresh_adjustment_factors(conn=None) -> List[str]:
+    """
+    补算过期资产：公司行为更新时间晚于因子计算时间 (或尚无因子)，
+    因子表中存在已删除公司行为的资产，
+    或待补分红 (dividend_pending) 的除权日前已有收盘价 (价格后补写入)
+    Returns: 重算的 asset_id 列表
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        ensure_factor_columns(conn)
+        stale = [r[0] for r in conn.execute("""
+            SELECT a.asset_id FROM (
+                SELECT asset_id, MAX(updated_at) AS updated_at FROM corporate_actions GROUP BY asset_id
+            ) a
+            LEFT JOIN (
+                SELECT asset_id, MIN(computed_at) AS computed_at FROM price_adjustment_factor GROUP BY asset_id
+            ) f ON f.asset_id = a.asset_id
+            WHERE f.computed_at IS NULL OR a.updated_at > f.computed_at
+            UNION
+            SELECT DISTINCT asset_id FROM price_adjustment_factor
+            WHERE asset_id NOT IN (SELECT asset_id FROM corporate_actions)
+            UNION
+            SELECT DISTINCT f.asset_id FROM price_adjustment_factor f
+            WHERE f.dividend_pending = 1 AND EXISTS (
+                SELECT 1 FROM vera_price_cache p WHERE p.symbol = f.asset_id AND p.trade_date < f.valid_to
+            )
+        """).fetchall()]
+        if stale:
+            rebuild_adjustment_factors(stale, conn=conn)
+        return stale
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def refresh_after_price_write(min_dates: Dict[str, str], conn) -> List[str]:
+    """
+    价格写入后调用：{asset_id: 本次写入的最早 trade_date}
+    写入日期早于某个除权日时，该除权日的除权前收盘价可能改变 (含缺价的待补分红)，重算这些资产
+    只追加最新行情 (晚于全部除权日) 时不触发
+    Returns: 重算的 asset_id 列表
+    """
+    if not min_dates:
+        return []
+    ensure_factor_columns(conn)
+    affected = [
+        asset_id for asset_id, min_date in min_dates.items()
+        if conn.execute(
+            "SELECT 1 FROM corporate_actions WHERE asset_id = ? AND ex_date > ? LIMIT 1", (asset_id, min_date)
+        ).fetchone()
+    ]
+    if affected:
+        rebuild_adjustment_factors(affected, conn=conn)
+    return affected
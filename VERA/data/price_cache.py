@@ -1,108 +1,42 @@
 import warnings
 import pandas as pd
 from db.connection import get_connection
+from data.price_ingest import ingest_prices
 from utils.canonical_resolver import resolve_canonical_symbol
 
 
 def save_daily_price(row: dict, *, auto_register_asset: bool = True):
     """
-    写入 vera_price_cache 的唯一入口：
+    单行写入 vera_price_cache (OCR / 手工补录)，经 data.price_ingest.ingest_prices：
     - 先 resolve raw -> canonical
     - 再确保 canonical 存在于 assets（canonical 宇宙）
-    - 最后写入 price_cache(symbol=canonical)
+    - 最后写入 price_cache(symbol=canonical)，source 保留 raw 审计信息
     
     ❗ RED LINE: DO NOT write raw symbols into vera_price_cache.symbol
     All symbols MUST be resolved to canonical_id via resolve_canonical_symbol()
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
     raw_symbol = (row.get("symbol") or "").strip().upper()
     if not raw_symbol:
         raise ValueError("row['symbol'] is required")
 
-    # ❗ RED LINE: Resolve to canonical
-    canonical_symbol = resolve_canonical_symbol(conn, raw_symbol)
-
-    # ✅ Canonical whitelist: assets.asset_id
-    exists = cursor.execute(
-        "SELECT 1 FROM assets WHERE asset_id = ? LIMIT 1",
-        (canonical_symbol,)
-    ).fetchone()
-
-    if not exists:
-        if auto_register_asset:
-            # Auto-register minimal asset record (補充 market/industry/roles later)
-            cursor.execute(
-                """
-                INSERT OR IGNORE INTO assets (asset_id, symbol_name, market, industry, asset_type, index_role, asset_role, updated_at)
-                VALUES (?, ?, 'Unknown', 'Unknown', 'Unknown', NULL, NULL, datetime('now'))
-                """,
-                (canonical_symbol, canonical_symbol)
-            )
-        else:
-            raise ValueError(
-                f"Canonical '{canonical_symbol}' not found in assets. "
-                f"Please INSERT it into assets first."
-            )
-
-    # Source field: preserve raw audit trail
-    source_name = row.get("source", "unknown")
-    note = row.get("source_note")
-
-    if raw_symbol != canonical_symbol:
-        source = f"{source_name}|raw:{raw_symbol}"
-        if note:
-            source += f"|note:{note}"
-    else:
-        source = f"{source_name}|note:{note}" if note else source_name
-
-    cursor.execute(
-        """
-        INSERT INTO vera_price_cache
-        (symbol, trade_date, open, high, low, close, volume, source, pe, pe_ttm, pb, ps, eps)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(symbol, trade_date) DO UPDATE SET
-            open   = excluded.open,
-            high   = excluded.high,
-            low    = excluded.low,
-            close  = excluded.close,
-            volume = excluded.volume,
-            source = excluded.source,
-            pe     = excluded.pe,
-            pe_ttm = excluded.pe_ttm,
-            pb     = excluded.pb,
-            ps     = excluded.ps,
-            eps    = excluded.eps
-        """,
-        (
-            canonical_symbol,
-            row["trade_date"],
-            row.get("open"),
-            row.get("high"),
-            row.get("low"),
-            row["close"],
-            int(row.get("volume") or 0),
-            source,
-            row.get("pe"),
-            row.get("pe_ttm"),
-            row.get("pb"),
-            row.get("ps"),
-            row.get("eps")
-        )
+    return ingest_prices(
+        [{**row, "symbol": raw_symbol}],
+        row.get("source", "unknown"),
+        auto_register_asset=auto_register_asset,
     )
 
-    conn.commit()
-    conn.close()
 
-
-def load_price_series(symbol: str, start_date: str, end_date: str):
+def load_price_series(symbol: str, start_date: str, end_date: str, adjusted: bool = False):
     """
     唯一历史数据入口：
     - 输入 symbol 允许是 raw 或 canonical
     - 内部统一 resolve 成 canonical
     - 通过 asset_symbol_map 找到 price cache 中的实际 symbol
     - 从 vera_price_cache 读取
+    - adjusted=True：读取 vera_price_adjusted 视图 (拆股/分红后复权，最新价格与原始一致)，
+      因子表预计算，单次查询，成本与原始读取相当
+    - 不再逐次去重/排序：写入统一经 data.price_ingest，完整性由 check_price_cache_integrity 校验
+      (旧库中 '2024-01-02' / '2024-01-02 00:00:00' 并存的日期由 init_db 一次性迁移合并，见 normalize_price_cache_dates)
     """
     conn = get_connection()
     try:
@@ -112,9 +46,9 @@ def load_price_series(symbol: str, start_date: str, end_date: str):
         price_symbol = canonical
 
         df = pd.read_sql_query(
-            """
+            f"""
             SELECT trade_date, open, high, low, close, volume
-            FROM vera_price_cache
+            FROM {"vera_price_adjusted" if adjusted else "vera_price_cache"}
             WHERE symbol = ? AND trade_date BETWEEN ? AND ?
             ORDER BY trade_date
             """,
@@ -124,7 +58,5 @@ def load_price_series(symbol: str, start_date: str, end_date: str):
     finally:
         conn.close()
 
-    if not df.empty:
-        df = df.drop_duplicates(subset=["trade_date"], keep="last").sort_values("trade_date")
-
+    # (symbol, trade_date) 主键 + ingest_prices 统一日期格式：结果唯一且已按日期排序
     return df
@@ -0,0 +1,332 @@
+"""
+Price ingestion gateway (vera_price_cache 唯一写入口)
+- CSV / 回填 / 迁移 / OCR 全部经由 ingest_prices 写入：raw -> canonical 一次性解析 (按唯一代码)，
+  批内按 canonical 主键 (symbol, trade_date) 去重，trade_date 统一为 YYYY-MM-DD，executemany 批量 upsert
+- 行级 source 仅保留 "来源|raw:原始代码" (raw 与 canonical 相同时只有来源)，批次统计写入 price_ingest_batch
+- check_price_cache_integrity：一次按主键索引顺序扫描全表，校验重复键 / 日期格式 / 收盘价 / 高低价 / 资产白名单
+读取端 (load_price_series) 依赖此处保证的唯一与有序，不再逐次去重排序
+- 写入早于某个除权日的价格后重算该资产复权因子 (data.price_adjustment.refresh_after_price_write)
+"""
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from data.price_adjustment import refresh_after_price_write
+from db.connection import get_connection
+from utils.canonical_resolver import resolve_canonical_symbol
+
+MODES = ("upsert", "ignore", "fail", "replace")
+INGEST_CHUNK = 500
+
+_KEY = ["symbol", "trade_date"]
+
+
+def _price_columns(conn) -> list:
+    """vera_price_cache 实际列 (估值列 pe/pb/... 由历史迁移追加，不同库可能不同)"""
+    return [r[1] for r in conn.execute("PRAGMA table_info(vera_price_cache)").fetchall()]
+
+
+def _insert_sql(columns: list, mode: str) -> str:
+    col_names = ", ".join(columns)
+    placeholders = ", ".join("?" * len(columns))
+    if mode == "ignore":
+        return f"INSERT OR IGNORE INTO vera_price_cache ({col_names}) VALUES ({placeholders})"
+    if mode == "replace":
+        return f"INSERT OR REPLACE INTO vera_price_cache ({col_names}) VALUES ({placeholders})"
+    if mode == "fail":
+        return f"INSERT INTO vera_price_cache ({col_names}) VALUES ({placeholders})"
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c not in _KEY)
+    return f"""
+        INSERT INTO vera_price_cache ({col_names}) VALUES ({placeholders})
+        ON CONFLICT(symbol, trade_date) DO UPDATE SET {updates}
+    """
+
+
+def _provenance(label: str, raw: str, canonical: str, note=None) -> str:
+    source = label if raw == canonical else f"{label}|raw:{raw}"
+    if note is not None and not pd.isna(note) and str(note):
+        source += f"|note:{note}"
+    return source
+
+
+def _ensure_assets(conn, canonical_ids, auto_register_asset: bool):
+    """canonical 白名单 (assets.asset_id)：缺失时自动登记最小记录或拒绝写入"""
+    ids = list(canonical_ids)
+    existing = set()
+    for i in range(0, len(ids), INGEST_CHUNK):
+        chunk = ids[i:i + INGEST_CHUNK]
+        rows = conn.execute(
+            f"SELECT asset_id FROM assets WHERE asset_id IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall()
+        existing.update(r[0] for r in rows)
+    missing = [a for a in ids if a not in existing]
+    if not missing:
+        return
+    if not auto_register_asset:
+        raise ValueError(
+            f"Canonical {missing[:5]} not found in assets. Please INSERT them into assets first."
+        )
+    # 最小登记 (補充 market/industry/roles later)；asset_type 等列由历史迁移追加，按实际列写入
+    defaults = {"symbol_name": None, "market": "'Unknown'", "industry": "'Unknown'", "asset_type": "'Unknown'",
+                "index_role": "NULL", "asset_role": "NULL", "updated_at": "datetime('now')"}
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(assets)").fetchall()]
+    extra = [c for c in defaults if c in cols and c != "symbol_name"]
+    conn.executemany(f"""
+        INSERT OR IGNORE INTO assets (asset_id, symbol_name{''.join(', ' + c for c in extra)})
+        VALUES (?, ?{''.join(', ' + defaults[c] for c in extra)})
+    """, [(a, a) for a in missing])
+
+
+def normalize_price_rows(
+    rows: Union[pd.DataFrame, Iterable[Dict]],
+    source: str,
+    conn,
+    *,
+    resolve: bool = True,
+    keep: str = "last",
+    **resolve_kwargs,
+) -> pd.DataFrame:
+    """
+    清洗为可写入的 DataFrame：symbol 为 canonical，trade_date 为 YYYY-MM-DD，批内主键唯一
+    - rows 的 symbol 为原始代码 (resolve=True)；resolve=False 时视为已是 canonical，可另带 raw_symbol 作审计
+    - 缺 symbol / trade_date / close 的行丢弃；同一主键保留 keep (last / first)
+    """
+    df = rows.copy() if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+    if df.empty:
+        return pd.DataFrame(columns=_KEY + ["close", "source"])
+    for col in ("symbol", "trade_date", "close"):
+        if col not in df.columns:
+            raise ValueError(f"rows['{col}'] is required")
+
+    df["symbol"] = df["symbol"].where(df["symbol"].notna(), "").astype(str).str.strip().str.upper()
+    df["trade_date"] = pd.to_datetime(df["trade_date"], errors="coerce", format="mixed").dt.strftime("%Y-%m-%d")
+    df["close"] = pd.to_numeric(df["close"], errors="coerce")
+    df = df[(df["symbol"] != "") & df["trade_date"].notna() & df["close"].notna()]
+    if df.empty:
+        return pd.DataFrame(columns=_KEY + ["close", "source"])
+
+    if resolve:
+        df["raw_symbol"] = df["symbol"]
+        mapping = {raw: resolve_canonical_symbol(conn, raw, **resolve_kwargs) for raw in df["symbol"].unique()}
+        df["symbol"] = df["symbol"].map(mapping)
+    elif "raw_symbol" not in df.columns:
+        df["raw_symbol"] = df["symbol"]
+    else:
+        df["raw_symbol"] = df["raw_symbol"].fillna(df["symbol"]).astype(str).str.strip().str.upper()
+
+    notes = df["source_note"] if "source_note" in df.columns else [None] * len(df)
+    labels = df["source"].fillna(source) if "source" in df.columns else [source] * len(df)
+    df["source"] = [
+        _provenance(label, raw, canon, note)
+        for label, raw, canon, note in zip(labels, df["raw_symbol"], df["symbol"], notes)
+    ]
+    if "volume" in df.columns:
+        df["volume"] = pd.to_numeric(df["volume"], errors="coerce").fillna(0).astype(np.int64)
+
+    return df.drop_duplicates(subset=_KEY, keep=keep).drop(columns=["raw_symbol", "source_note"], errors="ignore")
+
+
+def ingest_prices(
+    rows: Union[pd.DataFrame, Iterable[Dict]],
+    source: str,
+    *,
+    mode: str = "upsert",
+    keep: str = "last",
+    resolve: bool = True,
+    auto_register_asset: bool = True,
+    conn=None,
+    **resolve_kwargs,
+) -> Dict:
+    """
+    vera_price_cache 的唯一写入口 (批量)
+
+    mode:
+      - upsert  : 冲突时覆盖本次提供的列 (默认)
+      - ignore  : 已存在的 (symbol, trade_date) 跳过
+      - fail    : 冲突即 IntegrityError，整批回滚
+      - replace : 整行替换 (未提供的列清空)
+    resolve_kwargs 透传给 resolve_canonical_symbol (asset_type_hint / strict_ambiguous / ...)
+
+    ❗ RED LINE: vera_price_cache.symbol 只写 canonical_id
+    返回 {"batch_id", "rows", "written", "dropped" (无效或批内重复), "symbols": {canonical: written}}
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        if not isinstance(rows, pd.DataFrame):
+            rows = pd.DataFrame(list(rows))
+        n_input = len(rows)
+        df = normalize_price_rows(rows, source, conn, resolve=resolve, keep=keep, **resolve_kwargs)
+
+        table_cols = _price_columns(conn)
+        columns = [c for c in table_cols if c in df.columns]
+        df = df[columns].astype(object).where(df[columns].notna(), None)
+
+        result = {"batch_id": None, "rows": len(df), "written": 0,
+                  "dropped": n_input - len(df), "symbols": {}}
+        if df.empty:
+            return result
+
+        sql = _insert_sql(columns, mode)
+        with conn:
+            _ensure_assets(conn, df["symbol"].unique(), auto_register_asset)
+            for canonical, group in df.groupby("symbol", sort=False):
+                cur = conn.executemany(sql, group.itertuples(index=False, name=None))
+                result["symbols"][canonical] = max(cur.rowcount, 0)
+            result["written"] = sum(result["symbols"].values())
+            cur = conn.execute("""
+                INSERT INTO price_ingest_batch
+                (source, mode, n_input, n_rows, n_written, n_symbols, min_date, max_date, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+            """, (source, mode, n_input, len(df), result["written"], len(result["symbols"]),
+                  df["trade_date"].min(), df["trade_date"].max()))
+            result["batch_id"] = cur.lastrowid
+
+        # 写在除权日之前的价格可能补齐 / 改变除权前收盘价 -> 重算这些资产的复权因子
+        written = [sym for sym, n in result["symbols"].items() if n]
+        if written:
+            min_dates = df[df["symbol"].isin(written)].groupby("symbol")["trade_date"].min().to_dict()
+            refresh_after_price_write(min_dates, conn)
+        return result
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def merge_symbol_prices(old_symbol: str, new_symbol: str, *, mode: str = "upsert", conn=None) -> int:
+    """
+    迁移：把 old_symbol (历史 raw 代码) 的全部行并入 canonical new_symbol 后删除 old_symbol
+    集合式 INSERT ... SELECT，冲突按 mode 处理 (upsert: 旧行覆盖；ignore: 保留已有 canonical 行)
+    返回迁移的行数
+    """
+    if mode not in ("upsert", "ignore"):
+        raise ValueError("merge mode must be 'upsert' or 'ignore'")
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        cols = [c for c in _price_columns(conn) if c != "symbol"]
+        col_names = ", ".join(cols)
+        conflict = (
+            "DO NOTHING" if mode == "ignore"
+            else "DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in cols if c != "trade_date")
+        )
+        with conn:
+            n = conn.execute("SELECT COUNT(*) FROM vera_price_cache WHERE symbol = ?", (old_symbol,)).fetchone()[0]
+            if n == 0 or old_symbol == new_symbol:
+                return 0
+            _ensure_assets(conn, [new_symbol], True)
+            # WHERE 1 避免 INSERT ... SELECT ... ON CONFLICT 的解析歧义
+            conn.execute(f"""
+                INSERT INTO vera_price_cache (symbol, {col_names})
+                SELECT ?, {col_names} FROM vera_price_cache WHERE symbol = ? AND 1
+                ON CONFLICT(symbol, trade_date) {conflict}
+            """, (new_symbol, old_symbol))
+            conn.execute("DELETE FROM vera_price_cache WHERE symbol = ?", (old_symbol,))
+            conn.execute("""
+                INSERT INTO price_ingest_batch
+                (source, mode, n_input, n_rows, n_written, n_symbols, min_date, max_date, created_at)
+                VALUES (?, ?, ?, ?, ?, 1, NULL, NULL, datetime('now'))
+            """, (f"merge|raw:{old_symbol}", mode, n, n, n))
+        return n
+    finally:
+        if own_conn:
+            conn.close()
+
+
+INTEGRITY_CHECKS = ["dup_dates", "bad_dates", "bad_close", "bad_range", "unknown_asset"]
+
+
+def normalize_price_cache_dates(conn=None) -> int:
+    """
+    一次性迁移 (由 db.connection.init_db 执行)：ingest_prices 之前写入的 'YYYY-MM-DD HH:MM:SS' 等日期
+    统一截为 YYYY-MM-DD；与已有规范日期 (或同日其他格式) 冲突的行保留先到者，其余删除
+    Returns: 改写或删除的行数
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        with conn:
+            irregular = "trade_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]?*'"
+            updated = conn.execute(
+                f"UPDATE OR IGNORE vera_price_cache SET trade_date = substr(trade_date, 1, 10) WHERE {irregular}"
+            ).rowcount
+            deleted = conn.execute(f"DELETE FROM vera_price_cache WHERE {irregular}").rowcount
+        return updated + deleted
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def check_price_cache_integrity(conn=None) -> Dict:
+    """
+    全表一致性校验 (一次扫描：窗口函数按 (symbol, trade_date) 主键索引顺序遍历，按资产汇总)
+    - dup_dates    : 同一资产同一天多行 (含 '2024-01-02' / '2024-01-02 00:00:00' 这类格式不一致)
+    - bad_dates    : trade_date 不是 YYYY-MM-DD
+    - bad_close    : close 为空或 <= 0
+    - bad_range    : high < low
+    - unknown_asset: symbol 不在 assets.asset_id 白名单 (raw 代码泄漏)
+    返回 {"rows", "symbols", "ok", "issues": DataFrame[symbol, n_rows, first_date, last_date, *INTEGRITY_CHECKS]}
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        per_symbol = pd.read_sql_query("""
+            SELECT s.symbol, s.n_rows, s.first_date, s.last_date,
+                   s.dup_dates, s.bad_dates, s.bad_close, s.bad_range,
+                   CASE WHEN a.asset_id IS NULL THEN 1 ELSE 0 END AS unknown_asset
+            FROM (
+                SELECT symbol,
+                       COUNT(*)                                                  AS n_rows,
+                       MIN(trade_date)                                           AS first_date,
+                       MAX(trade_date)                                           AS last_date,
+                       SUM(substr(trade_date, 1, 10) = substr(prev_date, 1, 10)) AS dup_dates,
+                       SUM(trade_date IS NULL OR length(trade_date) != 10
+                           OR trade_date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]') AS bad_dates,
+                       SUM(close IS NULL OR close <= 0)                          AS bad_close,
+                       SUM(COALESCE(high < low, 0))                              AS bad_range
+                FROM (
+                    SELECT symbol, trade_date, close, high, low,
+                           LAG(trade_date) OVER (PARTITION BY symbol ORDER BY trade_date) AS prev_date
+                    FROM vera_price_cache
+                )
+                GROUP BY symbol
+            ) s
+            LEFT JOIN assets a ON a.asset_id = s.symbol
+            ORDER BY s.symbol
+        """, conn)
+    finally:
+        if own_conn:
+            conn.close()
+
+    per_symbol[INTEGRITY_CHECKS] = per_symbol[INTEGRITY_CHECKS].fillna(0).astype(int)
+    issues = per_symbol[(per_symbol[INTEGRITY_CHECKS] > 0).any(axis=1)].reset_index(drop=True)
+    return {
+        "rows": int(per_symbol["n_rows"].sum()),
+        "symbols": len(per_symbol),
+        "ok": issues.empty,
+        "issues": issues,
+    }
+
+
+def describe_integrity(report: Dict, limit: Optional[int] = 20) -> str:
+    """check_price_cache_integrity 结果的文本摘要"""
+    lines = [f"vera_price_cache: {report['rows']} rows / {report['symbols']} symbols"]
+    if report["ok"]:
+        lines.append("✅ No integrity issues.")
+        return "\n".join(lines)
+    issues = report["issues"]
+    for check in INTEGRITY_CHECKS:
+        bad = issues[issues[check] > 0]
+        if bad.empty:
+            continue
+        n_rows = bad["n_rows"].sum() if check == "unknown_asset" else bad[check].sum()
+        sample = ", ".join(bad["symbol"].head(limit))
+        lines.append(f"❌ {check:<14}: {len(bad)} symbols ({int(n_rows)} rows) e.g. {sample}")
+    return "\n".join(lines)
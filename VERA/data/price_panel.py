@@ -0,0 +1,169 @@
+"""
+Aligned price panel
+- 一次 SQL 批量读取 N 个资产，对齐到共享交易日历 (utils.market_calendar)
+- 缺失 bar 前向填充：在全部观测日上填充后再截取日历行，最多 ffill_limit 个交易日，
+  首个有效值之前保持 NaN；ffill_limit=0 表示不填充
+- values 为 (T, N) float64 数组，跨资产计算 (RS 等) 直接在 NumPy 上完成
+"""
+from dataclasses import dataclass
+from functools import reduce
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from db.connection import get_connection
+from utils.canonical_resolver import resolve_canonical_symbol
+from utils.market_calendar import asset_markets, get_sessions, weekday_mask
+
+FFILL_LIMIT = 5  # 最多沿用 5 个交易日前的价格 (跨市场假期错位足够)
+
+
+@dataclass
+class AlignedPanel:
+    dates: np.ndarray           # datetime64[D], (T,)
+    asset_ids: List[str]        # (N,)
+    values: np.ndarray          # float64, (T, N)，NaN = 无可用价格
+    observed: np.ndarray        # bool, (T, N)，当日是否有真实 bar (False = 填充/缺失)
+
+    def index_of(self, asset_id: str) -> int:
+        return self.asset_ids.index(asset_id)
+
+    def col(self, asset_id: str) -> np.ndarray:
+        return self.values[:, self.index_of(asset_id)]
+
+    def series(self, asset_id: str, observed_only: bool = True) -> pd.Series:
+        """单资产序列 (DatetimeIndex)，默认只保留真实 bar"""
+        j = self.index_of(asset_id)
+        mask = self.observed[:, j] if observed_only else ~np.isnan(self.values[:, j])
+        return pd.Series(
+            self.values[mask, j],
+            index=pd.DatetimeIndex(self.dates[mask], name="trade_date"),
+            name=asset_id,
+        )
+
+    def relative_strength(self, asset_id: str, benchmark_id: str, lookback_days: int) -> Optional[float]:
+        """asset / benchmark 比值在 lookback_days 个共同有效交易日上的变化"""
+        a, b = self.col(asset_id), self.col(benchmark_id)
+        valid = ~(np.isnan(a) | np.isnan(b))
+        if valid.sum() < lookback_days + 5:
+            return None
+        ratio = a[valid] / b[valid]
+        return float(ratio[-1] / ratio[-lookback_days] - 1.0)
+
+
+def _ffill(values: np.ndarray, observed: np.ndarray, limit: int) -> np.ndarray:
+    """按列前向填充，最多 limit 行"""
+    if limit <= 0:
+        return values
+    rows = np.arange(values.shape[0])[:, None]
+    last = np.maximum.accumulate(np.where(observed, rows, -1), axis=0)
+    fill = ~observed & (last >= 0) & (rows - last <= limit)
+    out = values.copy()
+    cols = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    out[fill] = values[last[fill], cols[fill]]
+    return out
+
+
+def build_aligned_panel(
+    series: Dict[str, pd.Series],
+    calendar: Union[str, Iterable[str], None] = None,
+    how: str = "union",
+    ffill_limit: int = FFILL_LIMIT,
+    markets: Dict[str, str] = None,
+    conn=None,
+) -> AlignedPanel:
+    """
+    已加载的序列 {asset_id: Series(DatetimeIndex)} -> AlignedPanel
+
+    calendar: 市场代码 (如 "US")、市场列表 (按 how 合并)，默认取第一个资产 (基准) 所在市场
+    markets: 可选的 asset_id -> market 映射，缺省时查询 assets
+    """
+    asset_ids = list(series)
+    if markets is None:
+        markets = asset_markets(asset_ids, conn=conn)
+    if calendar is None:
+        calendar = [markets[asset_ids[0]]] if asset_ids else []
+    elif isinstance(calendar, str):
+        calendar = [calendar]
+    calendar = [m.upper() for m in calendar]
+
+    cleaned = {}
+    for a in asset_ids:
+        s = series[a].dropna()
+        s = s[~s.index.duplicated(keep="last")]
+        cleaned[a] = (s.index.values.astype("datetime64[D]"), s.values.astype(float))
+    all_dates = np.unique(np.concatenate([d for d, _ in cleaned.values()] or [np.array([], dtype="datetime64[D]")]))
+
+    if all_dates.size == 0:
+        empty = np.empty((0, len(asset_ids)))
+        return AlignedPanel(all_dates, asset_ids, empty, empty.astype(bool))
+
+    # 各市场日历 = 预计算交易日 ∪ 该市场资产的工作日 bar (日历未重建时仍覆盖最新数据)，再按 how 合并
+    per_market = []
+    for m in calendar:
+        own = np.concatenate([cleaned[a][0] for a in asset_ids if markets.get(a) == m] or [all_dates[:0]])
+        per_market.append(np.union1d(get_sessions(m, all_dates[0], all_dates[-1], conn=conn), own[weekday_mask(own)]))
+    sessions = reduce(np.union1d if how == "union" else np.intersect1d, per_market)
+
+    grid = np.union1d(all_dates, sessions)
+    values = np.full((len(grid), len(asset_ids)), np.nan)
+    for j, a in enumerate(asset_ids):
+        dates, vals = cleaned[a]
+        values[np.searchsorted(grid, dates), j] = vals
+    observed = ~np.isnan(values)
+    values = _ffill(values, observed, ffill_limit)
+
+    rows = np.isin(grid, sessions)
+    return AlignedPanel(grid[rows], asset_ids, values[rows], observed[rows])
+
+
+def load_aligned_panel(
+    asset_ids: List[str],
+    start_date: str,
+    end_date: str,
+    field: str = "close",
+    calendar: Union[str, Iterable[str], None] = None,
+    how: str = "union",
+    ffill_limit: int = FFILL_LIMIT,
+    adjusted: bool = False,
+    conn=None,
+) -> AlignedPanel:
+    """
+    一次查询读取 asset_ids 在 [start_date, end_date] 的 field 列并对齐
+    asset_ids 可为 raw 或 canonical，面板列名保持调用方传入的 ID
+    adjusted=True 时读取复权视图 vera_price_adjusted
+    """
+    if field not in ("open", "high", "low", "close", "volume"):
+        raise ValueError(f"Unsupported field: {field}")
+    asset_ids = [a for a in dict.fromkeys(asset_ids) if a]
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        canonical = {a: resolve_canonical_symbol(conn, a.strip().upper()) for a in asset_ids}
+        symbols = list(set(canonical.values()))
+        df = pd.read_sql_query(
+            f"""
+            SELECT symbol, trade_date, {field} AS value
+            FROM {"vera_price_adjusted" if adjusted else "vera_price_cache"}
+            WHERE symbol IN ({','.join('?' * len(symbols))}) AND trade_date BETWEEN ? AND ?
+            """,
+            conn,
+            params=[*symbols, start_date, end_date]
+        ) if symbols else pd.DataFrame(columns=["symbol", "trade_date", "value"])
+        canonical_markets = asset_markets(symbols, conn=conn)
+
+        df["trade_date"] = pd.to_datetime(df["trade_date"])
+        by_symbol = {sym: g.set_index("trade_date")["value"].astype(float).sort_index()
+                     for sym, g in df.groupby("symbol")}
+        empty = pd.Series(dtype=float, index=pd.DatetimeIndex([], name="trade_date"))
+        series = {a: by_symbol.get(canonical[a], empty) for a in asset_ids}
+        markets = {a: canonical_markets[canonical[a]] for a in asset_ids}
+
+        return build_aligned_panel(series, calendar=calendar, how=how, ffill_limit=ffill_limit,
+                                   markets=markets, conn=conn)
+    finally:
+        if own_conn:
+            conn.close()
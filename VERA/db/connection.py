@@ -7,10 +7,37 @@ def get_connection():
     conn.row_factory = sqlite3.Row
     return conn
 
+def _migrate_price_dates(conn):
+    from data.price_ingest import normalize_price_cache_dates
+    normalize_price_cache_dates(conn)
+
+
+def _migrate_ocr_parser_version(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ocr_result_cache)")}
+    if "parser_version" not in columns:
+        conn.execute("ALTER TABLE ocr_result_cache ADD COLUMN parser_version INTEGER NOT NULL DEFAULT 0")
+
+
+def _migrate_alert_delivery(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(alert_log)")}
+    if "delivered_at" not in columns:
+        conn.execute("ALTER TABLE alert_log ADD COLUMN delivered_at DATETIME")
+        # 升级前的告警视为已投递，不补发
+        conn.execute("UPDATE alert_log SET delivered_at = created_at")
+
+
+# 一次性数据迁移，按顺序执行；PRAGMA user_version 记录已执行的个数
+MIGRATIONS = [_migrate_price_dates, _migrate_ocr_parser_version, _migrate_alert_delivery]
+
+
 def init_db():
     """初始化数据库"""
     conn = get_connection()
     with open("db/schema.sql", "r") as f:
         conn.executescript(f.read())
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for i, migrate in enumerate(MIGRATIONS[version:], start=version + 1):
+        migrate(conn)
+        conn.execute(f"PRAGMA user_version = {i}")
     conn.commit()
     conn.close()
@@ -0,0 +1,66 @@
+"""
+Persistence for derived fundamentals (financial_derived)
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from db.connection import get_connection
+from db.sql_utils import none_if_nan
+
+_VALUE_COLUMNS = [
+    "eps_ttm", "eps_yoy",
+    "revenue_ttm", "revenue_yoy",
+    "net_profit_ttm", "net_profit_yoy",
+    "dividends_ttm", "payout_ratio", "payout_ratio_3y",
+    "dps_5y_mean", "dps_5y_std", "cut_years_10y", "dividend_recovery_progress",
+]
+
+
+def replace_financial_derived(derived, asset_ids=None, conn=None):
+    """
+    替换衍生指标：asset_ids 为空时整表替换，否则只替换这些资产
+    derived: DataFrame (columns 对应 analysis.fundamentals_derivation.DERIVED_COLUMNS)
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        computed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            (r["asset_id"], r["report_date"])
+            + tuple(none_if_nan(r[c]) for c in _VALUE_COLUMNS)
+            + (computed_at,)
+            for r in derived.to_dict("records")
+        ]
+        if asset_ids:
+            conn.executemany("DELETE FROM financial_derived WHERE asset_id = ?", [(a,) for a in asset_ids])
+        else:
+            conn.execute("DELETE FROM financial_derived")
+        conn.executemany(f"""
+            INSERT INTO financial_derived (
+                asset_id, report_date, {', '.join(_VALUE_COLUMNS)}, computed_at
+            ) VALUES ({', '.join('?' * (len(_VALUE_COLUMNS) + 3))})
+        """, rows)
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def load_financial_derived(asset_id: str, as_of_date: str = None, conn=None) -> pd.DataFrame:
+    """读取单个资产的衍生指标序列 (按 report_date 升序)，可选截止 as_of_date"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        sql = "SELECT * FROM financial_derived WHERE asset_id = ?"
+        params = [asset_id]
+        if as_of_date:
+            sql += " AND report_date <= ?"
+            params.append(str(as_of_date)[:10])
+        sql += " ORDER BY report_date"
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        if own_conn:
+            conn.close()
@@ -109,3 +109,64 @@ def save_quality_snapshot(
     finally:
         if conn:
             conn.close()
+
+
+_BULK_COLUMNS = [
+    ("revenue_stability_flag", BQ_FLAG),
+    ("cyclicality_flag", CYCL_FLAG),
+    ("moat_proxy_flag", BQ_FLAG),
+    ("balance_sheet_flag", BQ_FLAG),
+    ("cashflow_coverage_flag", BQ_FLAG),
+    ("leverage_risk_flag", CYCL_FLAG),
+    ("payout_consistency_flag", GOV_FLAG),
+    ("dilution_risk_flag", DIL_FLAG),
+    ("regulatory_dependence_flag", CYCL_FLAG),
+    ("quality_buffer_level", BUFFER_LEVEL),
+]
+
+
+def save_quality_snapshots_bulk(records, conn=None) -> int:
+    """
+    批量写入 quality_snapshot (单事务 executemany)
+    records: iterable of dict，字段同 save_quality_snapshot 的参数 (snapshot_id, asset_id, 各 flag, quality_summary, notes)
+    Returns: 写入行数
+    """
+    rows = []
+    for r in records:
+        flags = [_assert_enum(name, r[name], allowed) for name, allowed in _BULK_COLUMNS]
+        rows.append(
+            (r["snapshot_id"], r["asset_id"], *flags, r["quality_summary"],
+             json.dumps(r.get("notes") or {}, ensure_ascii=False))
+        )
+    if not rows:
+        return 0
+
+    flag_cols = ", ".join(name for name, _ in _BULK_COLUMNS)
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        try:
+            conn.executemany(
+                f"""
+                INSERT OR REPLACE INTO quality_snapshot (
+                    snapshot_id, asset_id, {flag_cols}, quality_summary, quality_notes
+                ) VALUES ({', '.join('?' * (len(_BULK_COLUMNS) + 4))})
+                """,
+                rows
+            )
+        except Exception:
+            # 回退：不含 quality_notes 的 schema
+            conn.executemany(
+                f"""
+                INSERT OR REPLACE INTO quality_snapshot (
+                    snapshot_id, asset_id, {flag_cols}, quality_summary
+                ) VALUES ({', '.join('?' * (len(_BULK_COLUMNS) + 3))})
+                """,
+                [row[:-1] for row in rows]
+            )
+        conn.commit()
+        return len(rows)
+    finally:
+        if own_conn:
+            conn.close()
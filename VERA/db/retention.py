@@ -0,0 +1,318 @@
+"""
+Retention manager for snapshot tables
+- 分层保留：近期全部保留 -> 每周一条 -> 每月一条 -> 移出主库 (策略见 vera_rules.yaml retention)
+- drawdown_state_history.raw_metrics_snapshot JSON 拆为类型化列
+- 移出主库的行按月分区导出为压缩 Parquet (archive_dir/<table>/<YYYY-MM>.parquet)，
+  可通过 load_archive / attach_archive 重新挂载审计
+"""
+import json
+import os
+from datetime import date, timedelta
+from typing import Dict, List
+
+import pandas as pd
+
+from db.connection import get_connection
+
+DEFAULT_POLICY = {
+    "archive_dir": "archives",
+    "snapshots": {
+        "keep_all_days": 90,
+        "keep_weekly_days": 365,
+        "archive_after_days": 1095,
+    },
+    "state_history": {
+        "compact_after_days": 30,
+        "archive_after_days": None,
+    },
+}
+
+# 依附 analysis_snapshot 的子表 (均以 snapshot_id 关联)
+SNAPSHOT_CHILD_TABLES = [
+    "metric_details",
+    "behavior_flags",
+    "risk_card_snapshot",
+    "quality_snapshot",
+    "risk_overlay_snapshot",
+    "sector_risk_snapshot",
+]
+
+TYPED_METRIC_COLUMNS = ["peak_10y", "trough_10y", "current_dd", "max_dd_cycle", "recovery"]
+
+PARQUET_COMPRESSION = "zstd"
+
+TIER_ALL = "ALL"
+TIER_WEEKLY = "WEEKLY"
+TIER_MONTHLY = "MONTHLY"
+TIER_ARCHIVE = "ARCHIVE"
+
+
+def load_retention_policy(rules: Dict = None) -> Dict:
+    """读取 vera_rules.yaml 的 retention 段，缺省项用 DEFAULT_POLICY 补齐"""
+    if rules is None:
+        from core.config_loader import load_vera_rules
+        rules = load_vera_rules()
+    cfg = rules.get("retention", {}) or {}
+    return {
+        "archive_dir": cfg.get("archive_dir", DEFAULT_POLICY["archive_dir"]),
+        "snapshots": {**DEFAULT_POLICY["snapshots"], **(cfg.get("snapshots") or {})},
+        "state_history": {**DEFAULT_POLICY["state_history"], **(cfg.get("state_history") or {})},
+    }
+
+
+def _table_exists(conn, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def _columns(conn, table: str) -> List[str]:
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _chunks(items, size=500):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ---------------------------
+# 1. Snapshot thinning
+# ---------------------------
+
+def select_snapshots_to_prune(snapshots: pd.DataFrame, today: date, policy: Dict) -> pd.DataFrame:
+    """
+    纯计算：根据分层策略挑出需要移出主库的快照
+    snapshots: columns [snapshot_id, asset_id, as_of_date, created_at, has_decision]
+    Returns: snapshots 子集 + tier 列
+    """
+    if snapshots.empty:
+        return snapshots.assign(tier=pd.Series(dtype=object))
+
+    p = policy["snapshots"]
+    df = snapshots.copy()
+    df["_date"] = pd.to_datetime(df["as_of_date"], errors="coerce")
+    df = df.dropna(subset=["_date"])
+    age = (pd.Timestamp(today) - df["_date"]).dt.days
+
+    df["tier"] = TIER_ALL
+    df.loc[age > p["keep_all_days"], "tier"] = TIER_WEEKLY
+    df.loc[age > p["keep_weekly_days"], "tier"] = TIER_MONTHLY
+    if p.get("archive_after_days") is not None:
+        df.loc[age > p["archive_after_days"], "tier"] = TIER_ARCHIVE
+
+    # 每资产每周期保留最后一条 (同日多条取最后创建的)
+    week = df["_date"].dt.to_period("W").astype(str)
+    month = df["_date"].dt.to_period("M").astype(str)
+    df["_bucket"] = week.where(df["tier"] == TIER_WEEKLY, month)
+    df = df.sort_values(["asset_id", "_date", "created_at"], na_position="first")
+    is_last = ~df.duplicated(["asset_id", "tier", "_bucket"], keep="last")
+
+    prune = (
+        ((df["tier"].isin([TIER_WEEKLY, TIER_MONTHLY])) & ~is_last)
+        | (df["tier"] == TIER_ARCHIVE)
+    ) & ~df["has_decision"].astype(bool)
+
+    return df.loc[prune, list(snapshots.columns) + ["tier"]]
+
+
+def _load_snapshot_index(conn) -> pd.DataFrame:
+    return pd.read_sql_query("""
+        SELECT s.snapshot_id, s.asset_id, s.as_of_date, s.created_at,
+               CASE WHEN d.snapshot_id IS NULL THEN 0 ELSE 1 END AS has_decision
+        FROM analysis_snapshot s
+        LEFT JOIN (SELECT DISTINCT snapshot_id FROM decision_log) d ON d.snapshot_id = s.snapshot_id
+    """, conn)
+
+
+# ---------------------------
+# 2. JSON compaction
+# ---------------------------
+
+def ensure_typed_metric_columns(conn):
+    """旧库补齐 drawdown_state_history 的类型化列 (schema.sql 的 CREATE IF NOT EXISTS 不会改旧表)"""
+    existing = set(_columns(conn, "drawdown_state_history"))
+    for col in TYPED_METRIC_COLUMNS:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE drawdown_state_history ADD COLUMN {col} REAL")
+    conn.commit()
+
+
+def compact_state_history(conn, before_date: str, dry_run: bool = False) -> int:
+    """
+    trade_date < before_date 的行：raw_metrics_snapshot JSON -> 类型化列，并清空 JSON
+    Returns: 压缩行数
+    """
+    rows = pd.read_sql_query("""
+        SELECT id, raw_metrics_snapshot FROM drawdown_state_history
+        WHERE raw_metrics_snapshot IS NOT NULL AND trade_date < ?
+    """, conn, params=[before_date])
+    if rows.empty or dry_run:
+        return len(rows)
+    ensure_typed_metric_columns(conn)
+
+    def _parse(text):
+        try:
+            return json.loads(text) or {}
+        except (TypeError, ValueError):
+            return {}
+
+    metrics = pd.DataFrame(rows["raw_metrics_snapshot"].map(_parse).tolist(), index=rows.index)
+    metrics = metrics.reindex(columns=TYPED_METRIC_COLUMNS).apply(pd.to_numeric, errors="coerce")
+    metrics = metrics.astype(object).where(metrics.notna(), None)
+
+    params = [
+        tuple(m) + (int(i),)
+        for m, i in zip(metrics.itertuples(index=False, name=None), rows["id"])
+    ]
+    with conn:
+        conn.executemany(f"""
+            UPDATE drawdown_state_history
+            SET {', '.join(f'{c} = ?' for c in TYPED_METRIC_COLUMNS)}, raw_metrics_snapshot = NULL
+            WHERE id = ?
+        """, params)
+    return len(params)
+
+
+# ---------------------------
+# 3. Parquet archive
+# ---------------------------
+
+def _archive_path(archive_dir: str, table: str, partition: str) -> str:
+    return os.path.join(archive_dir, table, f"{partition}.parquet")
+
+
+def write_archive(df: pd.DataFrame, table: str, partition_col: str, archive_dir: str, key_cols=None) -> int:
+    """
+    按 partition_col (YYYY-MM) 分区写 Parquet；分区已存在则合并去重后重写
+    Returns: 写入行数
+    """
+    if df.empty:
+        return 0
+    os.makedirs(os.path.join(archive_dir, table), exist_ok=True)
+    for partition, part in df.groupby(partition_col):
+        path = _archive_path(archive_dir, table, partition)
+        if os.path.exists(path):
+            part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+            part = part.drop_duplicates(subset=key_cols, keep="last")
+        tmp = path + ".tmp"
+        part.to_parquet(tmp, index=False, compression=PARQUET_COMPRESSION)
+        os.replace(tmp, path)
+    return len(df)
+
+
+def load_archive(table: str, start: str = None, end: str = None, archive_dir: str = None) -> pd.DataFrame:
+    """读取某表的归档分区 (start / end 为 YYYY-MM，闭区间)"""
+    if archive_dir is None:
+        archive_dir = load_retention_policy()["archive_dir"]
+    folder = os.path.join(archive_dir, table)
+    if not os.path.isdir(folder):
+        return pd.DataFrame()
+    partitions = sorted(f[:-len(".parquet")] for f in os.listdir(folder) if f.endswith(".parquet"))
+    partitions = [p for p in partitions if (start is None or p >= start) and (end is None or p <= end)]
+    if not partitions:
+        return pd.DataFrame()
+    return pd.concat(
+        [pd.read_parquet(_archive_path(archive_dir, table, p)) for p in partitions],
+        ignore_index=True,
+    )
+
+
+def attach_archive(conn, table: str, start: str = None, end: str = None, archive_dir: str = None) -> int:
+    """
+    把归档重新挂载为当前连接上的临时表 archive_<table>，便于与主库联查审计
+    Returns: 挂载行数
+    """
+    df = load_archive(table, start, end, archive_dir)
+    name = f"archive_{table}"
+    conn.execute(f"DROP TABLE IF EXISTS temp.{name}")
+    if df.empty:
+        return 0
+    df.to_sql(name, conn, schema="temp", index=False)
+    return len(df)
+
+
+# ---------------------------
+# 4. Orchestration
+# ---------------------------
+
+def _archive_and_delete_snapshots(conn, prune: pd.DataFrame, archive_dir: str) -> Dict[str, int]:
+    counts = {}
+    if prune.empty:
+        return counts
+
+    ids = prune["snapshot_id"].tolist()
+    partition_of = dict(zip(prune["snapshot_id"], pd.to_datetime(prune["as_of_date"]).dt.strftime("%Y-%m")))
+
+    def _fetch(table):
+        frames = [
+            pd.read_sql_query(
+                f"SELECT * FROM {table} WHERE snapshot_id IN ({','.join('?' * len(chunk))})", conn, params=chunk
+            )
+            for chunk in _chunks(ids)
+        ]
+        df = pd.concat(frames, ignore_index=True)
+        df["_partition"] = df["snapshot_id"].map(partition_of)
+        return df
+
+    # 先全部导出成功，再在单事务中删除
+    tables = [t for t in SNAPSHOT_CHILD_TABLES if _table_exists(conn, t)] + ["analysis_snapshot"]
+    for table in tables:
+        df = _fetch(table)
+        key_cols = ["id"] if "id" in df.columns else ["snapshot_id"]
+        counts[table] = write_archive(df, table, "_partition", archive_dir, key_cols=key_cols)
+
+    with conn:
+        for table in tables:
+            for chunk in _chunks(ids):
+                conn.execute(f"DELETE FROM {table} WHERE snapshot_id IN ({','.join('?' * len(chunk))})", chunk)
+    return counts
+
+
+def _archive_state_history(conn, before_date: str, archive_dir: str) -> int:
+    df = pd.read_sql_query("SELECT * FROM drawdown_state_history WHERE trade_date < ?", conn, params=[before_date])
+    if df.empty:
+        return 0
+    df["_partition"] = pd.to_datetime(df["trade_date"]).dt.strftime("%Y-%m")
+    n = write_archive(df, "drawdown_state_history", "_partition", archive_dir, key_cols=["asset_id", "trade_date"])
+    with conn:
+        conn.execute("DELETE FROM drawdown_state_history WHERE trade_date < ?", (before_date,))
+    return n
+
+
+def run_retention(today: date = None, dry_run: bool = False, policy: Dict = None,
+                  vacuum: bool = False, conn=None) -> Dict:
+    """
+    入口：快照分层瘦身 + 归档、状态历史 JSON 压缩 (+ 可选归档)
+    dry_run=True 时只统计，不写归档也不改库
+    Returns: 汇总 dict
+    """
+    today = today or date.today()
+    policy = policy or load_retention_policy()
+    archive_dir = policy["archive_dir"]
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        summary = {"dry_run": dry_run, "as_of": str(today)}
+
+        prune = select_snapshots_to_prune(_load_snapshot_index(conn), today, policy)
+        summary["snapshots_pruned"] = prune["tier"].value_counts().to_dict()
+        if not dry_run:
+            summary["archived_rows"] = _archive_and_delete_snapshots(conn, prune, archive_dir)
+
+        sh = policy["state_history"]
+        if sh.get("compact_after_days") is not None:
+            cutoff = (today - timedelta(days=sh["compact_after_days"])).isoformat()
+            summary["state_history_compacted"] = compact_state_history(conn, cutoff, dry_run=dry_run)
+        if sh.get("archive_after_days") is not None and not dry_run:
+            cutoff = (today - timedelta(days=sh["archive_after_days"])).isoformat()
+            summary["state_history_archived"] = _archive_state_history(conn, cutoff, archive_dir)
+
+        if vacuum and not dry_run:
+            conn.execute("VACUUM")
+        return summary
+    finally:
+        if own_conn:
+            conn.close()
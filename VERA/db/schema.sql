@@ -92,6 +92,9 @@ CREATE TABLE IF NOT EXISTS metric_details (
     FOREIGN KEY (snapshot_id) REFERENCES analysis_snapshot(snapshot_id) ON DELETE CASCADE
 );
 
+CREATE INDEX IF NOT EXISTS idx_analysis_snapshot_asset_date ON analysis_snapshot(asset_id, as_of_date DESC);
+CREATE INDEX IF NOT EXISTS idx_metric_details_snapshot ON metric_details(snapshot_id);
+
 -- 6. 决策日志表 (decision_log)
 CREATE TABLE IF NOT EXISTS decision_log (
     decision_id        INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -109,7 +112,14 @@ CREATE TABLE IF NOT EXISTS drawdown_state_history (
     
     -- 原始计算状态（未经转移规则验证）
     raw_state               TEXT NOT NULL,      -- D0-D6
-    raw_metrics_snapshot    TEXT,               -- JSON: {peak, trough, recovery, current_dd}
+    raw_metrics_snapshot    TEXT,               -- JSON: {peak, trough, recovery, current_dd}；压缩后为 NULL
+    
+    -- raw_metrics 类型化列 (db/retention.compact_state_history 由 JSON 拆出)
+    peak_10y                REAL,
+    trough_10y              REAL,
+    current_dd              REAL,
+    max_dd_cycle            REAL,
+    recovery                REAL,
     
     -- 确认后的状态（经过转移规则和确认期验证）
     confirmed_state         TEXT NOT NULL,      -- D0-D6
@@ -247,3 +257,205 @@ CREATE TABLE IF NOT EXISTS fundamentals_facts (
     created_at          DATETIME DEFAULT CURRENT_TIMESTAMP,
     PRIMARY KEY (asset_id, as_of_date)
 );
+
+-- 14. D-state 经验转移统计表 (state_transition_stats) - 全量重算，整表替换
+CREATE TABLE IF NOT EXISTS state_transition_stats (
+    group_type          TEXT NOT NULL,      -- ALL / MARKET / SECTOR
+    group_key           TEXT NOT NULL,      -- ALL / US / HK / CN / sector_name
+    stat_type           TEXT NOT NULL,      -- TRANSITION / DWELL / EVENT
+    from_state          TEXT NOT NULL,      -- D0-D6；EVENT 时为 event_type
+    to_state            TEXT NOT NULL DEFAULT '',  -- TRANSITION 目标状态，其余为空串
+
+    sample_count        INTEGER NOT NULL,   -- 样本数 (步数 / 区段数 / 事件数)
+    probability         REAL,               -- TRANSITION: P(to|from)；EVENT: 每资产年发生率
+    exit_probability    REAL,               -- TRANSITION: P(to|from, 离开 from)
+    dwell_mean          REAL,               -- DWELL: 停留交易日均值
+    dwell_median        REAL,
+    dwell_p90           REAL,
+
+    computed_at         DATETIME,
+    PRIMARY KEY (group_type, group_key, stat_type, from_state, to_state)
+);
+
+-- 15. 增量更新高水位表 (vera_update_watermark)
+CREATE TABLE IF NOT EXISTS vera_update_watermark (
+    asset_id            TEXT PRIMARY KEY,
+    last_trade_date     DATE NOT NULL,      -- 已处理到的最新 vera_price_cache.trade_date
+    updated_at          DATETIME
+);
+
+-- 16. 告警日志表 (alert_log) - 同一资产/规则/日期只保留一条
+CREATE TABLE IF NOT EXISTS alert_log (
+    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id            TEXT NOT NULL,
+    rule_code           TEXT NOT NULL,      -- vera_rules.yaml alerts.rules[].code
+    alert_date          DATE NOT NULL,      -- 触发的交易日
+    level               TEXT NOT NULL,      -- INFO / WARN / ALERT
+    title               TEXT,
+    detail              TEXT,
+    context             TEXT,               -- JSON
+    created_at          DATETIME DEFAULT CURRENT_TIMESTAMP,
+    delivered_at        DATETIME,           -- 全部 Sink 投递成功的时间；NULL 表示待补发
+    UNIQUE(asset_id, rule_code, alert_date)
+);
+
+-- 17. 告警增量游标 (alert_cursor) - 各源表已评估到的最大行 id
+CREATE TABLE IF NOT EXISTS alert_cursor (
+    source              TEXT PRIMARY KEY,   -- drawdown_state_history / risk_events / metric_details
+    last_id             INTEGER NOT NULL DEFAULT 0,
+    updated_at          DATETIME
+);
+
+-- 估值分档告警基线 (alert_valuation_state) - 每个资产最近一次评估的 pe_ttm 分位，新行只与之比较，不回扫历史
+CREATE TABLE IF NOT EXISTS alert_valuation_state (
+    asset_id            TEXT PRIMARY KEY,
+    metric_id           INTEGER NOT NULL,   -- metric_details.id
+    percentile          REAL NOT NULL       -- 0–1
+);
+
+-- 18. 财务衍生指标表 (financial_derived) - 由 financial_history 向量化派生，全量/按资产重算
+CREATE TABLE IF NOT EXISTS financial_derived (
+    asset_id                    TEXT NOT NULL,
+    report_date                 DATE NOT NULL,
+    eps_ttm                     REAL,
+    eps_yoy                     REAL,       -- 对比去年同期 (±20 天对齐)
+    revenue_ttm                 REAL,
+    revenue_yoy                 REAL,
+    net_profit_ttm              REAL,
+    net_profit_yoy              REAL,
+    dividends_ttm               REAL,       -- 截至该期最近一次披露的年度分红
+    payout_ratio                REAL,       -- dividends_ttm / net_profit_ttm
+    payout_ratio_3y             REAL,       -- 近 3 年派息率均值
+    dps_5y_mean                 REAL,
+    dps_5y_std                  REAL,
+    cut_years_10y               INTEGER,
+    dividend_recovery_progress  REAL,       -- 当前分红 / 历史最高分红
+    computed_at                 DATETIME,
+    PRIMARY KEY (asset_id, report_date)
+);
+
+-- financial_history 任一写入 (CSV / 导入脚本 / OCR) 在同一事务内作废该资产的衍生行，
+-- 读取方发现为空时按资产重新派生 (analysis.fundamentals_derivation.load_or_derive)
+CREATE TRIGGER IF NOT EXISTS trg_financial_history_insert_invalidate
+AFTER INSERT ON financial_history
+BEGIN
+    DELETE FROM financial_derived WHERE asset_id = NEW.asset_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_financial_history_update_invalidate
+AFTER UPDATE ON financial_history
+BEGIN
+    DELETE FROM financial_derived WHERE asset_id IN (OLD.asset_id, NEW.asset_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_financial_history_delete_invalidate
+AFTER DELETE ON financial_history
+BEGIN
+    DELETE FROM financial_derived WHERE asset_id = OLD.asset_id;
+END;
+
+-- 19. OCR 结果缓存 (ocr_result_cache) - 以图片内容 SHA-256 为键，同一截图不重复识别
+CREATE TABLE IF NOT EXISTS ocr_result_cache (
+    content_hash        TEXT PRIMARY KEY,
+    source_name         TEXT,               -- 首次识别时的文件名
+    result_json         TEXT NOT NULL,      -- extract_stock_data 结构化结果
+    parser_version      INTEGER NOT NULL DEFAULT 0, -- 写入时的 OCR_PARSER_VERSION，不一致的行视为未缓存
+    created_at          DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 20. 市场交易日历 (market_trading_calendar) - 由 vera_price_cache 按市场汇总的工作日交易日，跨市场对齐用
+CREATE TABLE IF NOT EXISTS market_trading_calendar (
+    market              TEXT NOT NULL,      -- US / HK / CN
+    trade_date          DATE NOT NULL,
+    n_assets            INTEGER,            -- 当日有 bar 的资产数
+    PRIMARY KEY (market, trade_date)
+);
+
+-- 21. 公司行为 (corporate_actions) - 拆股/现金分红，用于价格复权
+CREATE TABLE IF NOT EXISTS corporate_actions (
+    asset_id            TEXT NOT NULL,      -- canonical_id
+    ex_date             DATE NOT NULL,      -- 除权/生效日 (当日起为新价格)
+    action_type         TEXT NOT NULL,      -- SPLIT / DIVIDEND
+    split_factor        REAL,               -- 1 拆 5 = 5.0；5 合 1 = 0.2
+    cash_dividend       REAL,               -- 每股现金分红 (除权后股本口径)
+    source              TEXT,
+    updated_at          DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (asset_id, ex_date, action_type)
+);
+
+-- 22. 复权因子 (price_adjustment_factor) - 分段常数累计后复权因子，由 corporate_actions 派生
+CREATE TABLE IF NOT EXISTS price_adjustment_factor (
+    asset_id            TEXT NOT NULL,
+    valid_from          DATE NOT NULL,      -- 含
+    valid_to            DATE NOT NULL,      -- 不含 (= 除权日)
+    cum_factor          REAL NOT NULL,      -- 该区间原始价格 × cum_factor = 复权价格
+    cum_split           REAL NOT NULL DEFAULT 1.0,  -- 该区间原始成交量 × cum_split = 复权成交量 (仅拆股)
+    dividend_pending    INTEGER NOT NULL DEFAULT 0, -- 1 = 除权日 (valid_to) 有分红但缺除权前收盘价，暂未调整
+    computed_at         DATETIME,
+    PRIMARY KEY (asset_id, valid_from)
+);
+
+-- 复权价格视图：最新价格与原始一致，无公司行为的资产 factor = 1；成交量按拆股比例调整
+CREATE VIEW IF NOT EXISTS vera_price_adjusted AS
+SELECT
+    p.symbol,
+    p.trade_date,
+    p.open  * COALESCE(f.cum_factor, 1.0) AS open,
+    p.high  * COALESCE(f.cum_factor, 1.0) AS high,
+    p.low   * COALESCE(f.cum_factor, 1.0) AS low,
+    p.close * COALESCE(f.cum_factor, 1.0) AS close,
+    p.volume * COALESCE(f.cum_split, 1.0) AS volume,
+    COALESCE(f.cum_factor, 1.0) AS adj_factor
+FROM vera_price_cache p
+LEFT JOIN price_adjustment_factor f
+    ON f.asset_id = p.symbol AND p.trade_date >= f.valid_from AND p.trade_date < f.valid_to;
+
+-- 23. 板块强弱榜 (sector_board) - 每日全部板块代理 ETF 的相对强弱/位置/D-state，快照与 Dashboard 读取
+CREATE TABLE IF NOT EXISTS sector_board (
+    as_of_date          DATE NOT NULL,
+    sector_etf_id       TEXT NOT NULL,
+    market              TEXT,
+    market_index_id     TEXT,               -- RS 基准
+    scheme              TEXT,
+    sector_code         TEXT,
+    sector_name         TEXT,
+    rs_1m               REAL,               -- 21 交易日 板块收益 - 大盘收益
+    rs_3m               REAL,               -- 63 交易日
+    rs_6m               REAL,               -- 126 交易日
+    position_pct        REAL,               -- 10Y 位置分位 [0, 1]
+    dd_state            TEXT,
+    path_risk           TEXT,
+    rank_rs_3m          INTEGER,            -- 市场内 3M RS 排名 (1 = 最强)
+    computed_at         DATETIME,
+    PRIMARY KEY (as_of_date, sector_etf_id)
+);
+
+-- 24. 价格写入批次 (price_ingest_batch) - vera_price_cache 经 data.price_ingest 写入的来源记录 (行级 source 只保留 "来源|raw:代码")
+CREATE TABLE IF NOT EXISTS price_ingest_batch (
+    batch_id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    source              TEXT NOT NULL,      -- manual_csv / OCR / merge|raw:00005.HK ...
+    mode                TEXT NOT NULL,      -- upsert / ignore / fail / replace
+    n_input             INTEGER,            -- 输入行数
+    n_rows              INTEGER,            -- 清洗去重后行数
+    n_written           INTEGER,            -- 实际写入 (插入 + 更新)
+    n_symbols           INTEGER,
+    min_date            DATE,
+    max_date            DATE,
+    created_at          DATETIME
+);
+
+-- 25. 快照任务 (snapshot_job) - engine.snapshot_jobs 后台计算的状态记录；同一 (asset_id, as_of_date) 同时只跑一个任务
+CREATE TABLE IF NOT EXISTS snapshot_job (
+    job_id              TEXT PRIMARY KEY,
+    asset_id            TEXT NOT NULL,      -- 典范 ID
+    as_of_date          DATE NOT NULL,      -- 评估基准日 (请求值，非数据日)
+    status              TEXT NOT NULL,      -- queued / running / done / empty / error
+    stage               TEXT,               -- engine.snapshot_builder.SNAPSHOT_STAGES
+    progress            REAL,               -- [0, 1]
+    error               TEXT,
+    snapshot_id         TEXT,               -- 计算时分配；保存后 analysis_snapshot 使用同一 ID
+    saved_at            DATETIME,           -- 已保存记录的时间 (未保存为 NULL)
+    created_at          DATETIME,
+    updated_at          DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_snapshot_job_key ON snapshot_job(asset_id, as_of_date);
@@ -0,0 +1,74 @@
+"""
+Persistence for the daily sector board (sector_board)
+"""
+import pandas as pd
+
+from db.connection import get_connection
+from db.sql_utils import none_if_nan
+
+_COLUMNS = [
+    "sector_etf_id", "market", "market_index_id", "scheme", "sector_code", "sector_name",
+    "rs_1m", "rs_3m", "rs_6m", "position_pct", "dd_state", "path_risk", "rank_rs_3m",
+]
+
+
+def replace_sector_board(board: pd.DataFrame, conn=None):
+    """按 (as_of_date, market) 整组替换：同一市场同一日期重跑覆盖"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        rows = [
+            (r["as_of_date"],) + tuple(none_if_nan(r[c]) for c in _COLUMNS)
+            for r in board.to_dict("records")
+        ]
+        groups = board[["as_of_date", "market"]].drop_duplicates().itertuples(index=False, name=None)
+        with conn:
+            conn.executemany("DELETE FROM sector_board WHERE as_of_date = ? AND market = ?", list(groups))
+            conn.executemany(f"""
+                INSERT INTO sector_board (as_of_date, {', '.join(_COLUMNS)}, computed_at)
+                VALUES ({', '.join('?' * (len(_COLUMNS) + 1))}, datetime('now'))
+            """, rows)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def load_sector_board(as_of_date: str = None, conn=None) -> pd.DataFrame:
+    """
+    板块榜：每个市场取 as_of_date (默认今天) 及之前最近一日的记录，按市场、3M RS 排名排序
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        return pd.read_sql_query("""
+            SELECT b.* FROM sector_board b
+            JOIN (
+                SELECT market, MAX(as_of_date) AS as_of_date FROM sector_board
+                WHERE as_of_date <= COALESCE(?, date('now')) GROUP BY market
+            ) m ON m.market = b.market AND m.as_of_date = b.as_of_date
+            ORDER BY b.market, b.rank_rs_3m
+        """, conn, params=(as_of_date,))
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def load_sector_board_row(sector_etf_id: str, as_of_date: str, conn=None):
+    """单个板块在 as_of_date 的榜单行 (dict)，不存在返回 None"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        cur = conn.execute(
+            "SELECT * FROM sector_board WHERE as_of_date = ? AND sector_etf_id = ?",
+            (as_of_date, sector_etf_id)
+        )
+        row = cur.fetchone()
+        if row is None:
+            return None
+        return dict(zip([d[0] for d in cur.description], row))
+    finally:
+        if own_conn:
+            conn.close()
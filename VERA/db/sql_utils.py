@@ -0,0 +1,14 @@
+"""
+Shared helpers for binding values to SQLite parameters
+"""
+import math
+
+
+def none_if_nan(v):
+    """NaN -> None (写入 NULL)；数值转 float，其他类型原样返回"""
+    if v is None:
+        return None
+    try:
+        return None if math.isnan(v) else float(v)
+    except TypeError:
+        return v
@@ -0,0 +1,98 @@
+"""
+Persistence for empirical D-state transition statistics (state_transition_stats)
+"""
+from datetime import datetime
+from db.connection import get_connection
+from db.sql_utils import none_if_nan
+
+
+def _scope_candidates(market, sector_name):
+    candidates = []
+    if sector_name:
+        candidates.append(("SECTOR", sector_name))
+    if market:
+        candidates.append(("MARKET", market))
+    candidates.append(("ALL", "ALL"))
+    return candidates
+
+
+def replace_state_transition_stats(stats, conn=None):
+    """
+    整表替换：统计结果为全量重算，旧数据直接清空
+    stats: DataFrame (columns 对应 analysis.state_transitions.STATS_COLUMNS)
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        computed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            (
+                r.group_type, r.group_key, r.stat_type, r.from_state, r.to_state,
+                int(r.sample_count),
+                none_if_nan(r.probability), none_if_nan(r.exit_probability),
+                none_if_nan(r.dwell_mean), none_if_nan(r.dwell_median), none_if_nan(r.dwell_p90),
+                computed_at,
+            )
+            for r in stats.itertuples(index=False)
+        ]
+        conn.execute("DELETE FROM state_transition_stats")
+        conn.executemany("""
+            INSERT INTO state_transition_stats (
+                group_type, group_key, stat_type, from_state, to_state,
+                sample_count, probability, exit_probability,
+                dwell_mean, dwell_median, dwell_p90, computed_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def get_transition_odds(from_state: str, to_state: str, market: str = None, sector_name: str = None, conn=None):
+    """
+    查询 "from→to" 的历史概率，按 SECTOR -> MARKET -> ALL 逐级回退
+    Returns: dict(group_type, group_key, sample_count, probability, exit_probability) 或 None
+    """
+    candidates = _scope_candidates(market, sector_name)
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        for group_type, group_key in candidates:
+            row = conn.execute("""
+                SELECT group_type, group_key, sample_count, probability, exit_probability
+                FROM state_transition_stats
+                WHERE group_type = ? AND group_key = ? AND stat_type = 'TRANSITION'
+                  AND from_state = ? AND to_state = ?
+            """, (group_type, group_key, from_state, to_state)).fetchone()
+            if row:
+                return dict(row)
+        return None
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def get_dwell_stats(state: str, market: str = None, sector_name: str = None, conn=None):
+    """查询某状态的历史停留时长分布 (交易日)，回退顺序同 get_transition_odds"""
+    candidates = _scope_candidates(market, sector_name)
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        for group_type, group_key in candidates:
+            row = conn.execute("""
+                SELECT group_type, group_key, sample_count, dwell_mean, dwell_median, dwell_p90
+                FROM state_transition_stats
+                WHERE group_type = ? AND group_key = ? AND stat_type = 'DWELL' AND from_state = ?
+            """, (group_type, group_key, state)).fetchone()
+            if row:
+                return dict(row)
+        return None
+    finally:
+        if own_conn:
+            conn.close()
@@ -0,0 +1,387 @@
+"""
+Incremental daily updater
+新日线写入 vera_price_cache 后，只推进受影响资产的状态：
+- 状态机逐日步进 (drawdown_state_history)
+- 估值分位 (analysis_snapshot / metric_details)
+- RiskCard (risk_card_snapshot)
+- 三层 Overlay (risk_overlay_snapshot)
+
+每个资产的进度由 vera_update_watermark.last_trade_date (高水位) 记录；
+板块 / 指数上下文按日期缓存，同一日期只计算一次。
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from db.connection import get_connection, init_db
+from data.price_cache import load_price_series
+from metrics.risk_engine import RiskEngine
+from metrics.state_machine import StateMachine
+from engine.asset_resolver import resolve_asset, resolve_sector_context
+from market.index_risk import get_or_compute_index_risk
+from analysis.risk_matrix import build_risk_card
+from analysis.sector_overlay import build_sector_overlay, build_sector_context
+from analysis.market_regime import compute_market_regime, persist_market_regime
+from analysis.overlay_rules import run_overlay_rules, flags_to_json
+from db.overlay import save_risk_overlay_snapshot
+from db.market_context_repo import save_market_context
+from core.valuation_engine import compute_valuation_status
+
+LOOKBACK_DAYS = 10 * 365
+MAX_CATCHUP_DAYS = 200   # 与 StateMachine.run_backfill 默认回填窗口一致
+MIN_STATE_HISTORY = 10   # 与 run_snapshot 的回填阈值一致
+
+
+def find_assets_with_new_rows(conn=None) -> list[dict]:
+    """
+    找出自上次运行以来有新日线的资产。
+    高水位优先取 vera_update_watermark；首次运行时回退到 drawdown_state_history 的最新日期，
+    避免把全部历史当成"新数据"。
+
+    Returns: [{asset_id, prev_hwm, new_hwm}]，prev_hwm 为 None 表示从未处理过
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        rows = conn.execute("""
+            SELECT p.symbol,
+                   COALESCE(w.last_trade_date,
+                            (SELECT MAX(h.trade_date) FROM drawdown_state_history h WHERE h.asset_id = p.symbol)
+                   ) AS prev_hwm,
+                   p.new_hwm
+            FROM (
+                SELECT symbol, MAX(trade_date) AS new_hwm
+                FROM vera_price_cache
+                GROUP BY symbol
+            ) p
+            LEFT JOIN vera_update_watermark w ON w.asset_id = p.symbol
+            ORDER BY p.new_hwm, p.symbol
+        """).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+
+    return [
+        {"asset_id": r[0], "prev_hwm": r[1], "new_hwm": r[2]}
+        for r in rows
+        if r[1] is None or r[2] > r[1]
+    ]
+
+
+def save_watermark(asset_id: str, last_trade_date: str, conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        conn.execute("""
+            INSERT INTO vera_update_watermark (asset_id, last_trade_date, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(asset_id) DO UPDATE SET
+                last_trade_date = excluded.last_trade_date,
+                updated_at = excluded.updated_at
+        """, (asset_id, last_trade_date, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+
+class ContextCache:
+    """
+    单次运行内的日期级缓存：板块上下文、指数风险、市场 regime。
+    key 中都包含 as_of_date，因此同一日期、同一指数/板块只计算一次。
+    """
+    def __init__(self):
+        self.sector = {}
+        self.index_risk = {}
+        self.market_regime = {}
+
+    def get_sector_context(self, sector_etf_id: str, market_index_id: str, as_of_date: str):
+        key = (sector_etf_id, market_index_id, as_of_date)
+        if key not in self.sector:
+            self.sector[key] = build_sector_context(sector_etf_id, as_of_date, market_index_id)
+        return self.sector[key]
+
+    def get_index_risk(self, index_symbol: str, as_of_date: str):
+        key = (index_symbol, as_of_date)
+        if key not in self.index_risk:
+            self.index_risk[key] = get_or_compute_index_risk(
+                index_symbol=index_symbol,
+                as_of_date=datetime.strptime(as_of_date, "%Y-%m-%d"),
+                price_loader=load_price_series,
+                method_profile_id="default"
+            )
+        return self.index_risk[key]
+
+    def get_market_regime(self, market_index_id: str, growth_proxy: str, value_proxy: str, as_of_date: str, snapshot_id: str):
+        key = (market_index_id, growth_proxy, value_proxy, as_of_date)
+        if key not in self.market_regime:
+            self.market_regime[key] = compute_market_regime(
+                as_of_date=as_of_date,
+                asset_id=market_index_id,
+                growth_proxy=growth_proxy,
+                value_proxy=value_proxy
+            )
+        regime, risk_metrics = self.market_regime[key]
+        # 计算按日期复用，落库按快照执行：每个 snapshot 都写入自己的 market_risk_snapshot 关联
+        if snapshot_id:
+            persist_market_regime(snapshot_id, risk_metrics)
+        return regime
+
+
+def _load_closes(asset_id: str, end_date: str) -> pd.Series:
+    start = (datetime.strptime(end_date, "%Y-%m-%d") - timedelta(days=LOOKBACK_DAYS)).strftime("%Y-%m-%d")
+    df = load_price_series(asset_id, start, end_date, adjusted=True)
+    if df.empty:
+        return pd.Series(dtype=float)
+    closes = pd.to_numeric(df["close"], errors="coerce")
+    closes.index = pd.to_datetime(df["trade_date"])
+    return closes.dropna()
+
+
+def step_state_machine(asset_id: str, closes: pd.Series, prev_hwm: str | None):
+    """
+    状态机只推进 prev_hwm 之后的新交易日 (最多 MAX_CATCHUP_DAYS 天)。
+    无历史的资产先回填，再对最新日期做一次常规更新 (与 run_snapshot 一致)。
+
+    Returns: (raw_info, confirmed_state_info) of the latest date
+    """
+    sm = StateMachine(asset_id)
+
+    if prev_hwm is None:
+        conn = get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM drawdown_state_history WHERE asset_id = ?", (asset_id,)).fetchone()[0]
+        conn.close()
+        if count < MIN_STATE_HISTORY:
+            sm.run_backfill(closes, lookback_days=MAX_CATCHUP_DAYS)
+        new_dates = closes.index[-1:]
+    else:
+        new_dates = closes.index[closes.index > pd.Timestamp(prev_hwm)][-MAX_CATCHUP_DAYS:]
+
+    raw_info, confirmed = None, None
+    conn = get_connection()
+    try:
+        for d in new_dates:
+            sub = closes[:d]
+            raw_info = RiskEngine.calculate_path_risk_state(sub)
+            confirmed = sm.update_state(
+                trade_date=d.strftime("%Y-%m-%d"),
+                raw_state=raw_info["state"],
+                raw_metrics=raw_info["raw_metrics"],
+                prices=sub,
+                commit=False,
+                _conn=conn
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+    return raw_info, confirmed
+
+
+def _confirmed_risk_metrics(risk_results: dict, raw_info: dict, confirmed: dict, as_of_date: str) -> dict:
+    """与 run_snapshot 相同：用确认后的状态覆盖 risk_state"""
+    rec_val = raw_info["raw_metrics"].get("recovery", 1.0)
+    risk_metrics = risk_results.copy()
+    risk_metrics["risk_state"] = {
+        "state": confirmed["state"],
+        "desc": raw_info["desc"],
+        "confirmed": True,
+        "days": confirmed["days"],
+        "transition_progress": confirmed.get("confirm_progress"),
+        "progress": 1.0 - rec_val if rec_val is not None else 0.0
+    }
+    risk_metrics["report_date"] = as_of_date
+    return risk_metrics
+
+
+def compute_valuation_percentile(asset_id: str, as_of_date: str, conn=None) -> dict:
+    """
+    估值分位：当前 PE 取 as_of_date 当日 (或之前最近一日) 的 pe_ttm/pe，
+    历史样本与 run_snapshot 相同 (vera_price_cache 中 pe > 0 的全部记录)。
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        rows = conn.execute("""
+            SELECT trade_date, COALESCE(pe_ttm, pe) AS pe_val
+            FROM vera_price_cache
+            WHERE symbol = ? AND (pe > 0 OR pe_ttm > 0) AND trade_date <= ?
+            ORDER BY trade_date ASC
+        """, (asset_id, as_of_date)).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+
+    hist_pes = [r[1] for r in rows if r[1] and r[1] > 0]
+    current_pe = hist_pes[-1] if hist_pes else None
+
+    val_info = compute_valuation_status(current_pe, hist_pes)
+    pe_percentile = None
+    if val_info.key not in ["NO_PE", "INSUFFICIENT_HISTORY"] and hist_pes and current_pe:
+        pe_percentile = int(sum(1 for p in hist_pes if p < current_pe) / len(hist_pes) * 100)
+
+    return {"pe_ttm": current_pe, "pe_percentile": pe_percentile, "status": val_info}
+
+
+def _save_incremental_snapshot(snapshot_id: str, asset_id: str, as_of_date: str, risk_metrics: dict,
+                               valuation: dict | None, current_price: float):
+    """写入 analysis_snapshot + metric_details (增量模式下不重新拉取基本面)"""
+    risk_level = RiskEngine.summary_risk_level(risk_metrics)
+    mdd = risk_metrics.get("max_drawdown")
+    vol = risk_metrics.get("annual_volatility")
+
+    conn = get_connection()
+    try:
+        conn.execute("""
+            INSERT INTO analysis_snapshot
+            (snapshot_id, asset_id, as_of_date, risk_level, valuation_status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (snapshot_id, asset_id, as_of_date, risk_level,
+              valuation["status"].label_en if valuation else None,
+              datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+        details = [
+            ("max_drawdown", mdd, None),
+            ("annual_volatility", vol, None),
+            ("current_price", current_price, None),
+        ]
+        if valuation and valuation["pe_ttm"] is not None:
+            pct = valuation["pe_percentile"]
+            details.append(("pe_ttm", valuation["pe_ttm"], pct / 100.0 if pct is not None else None))
+
+        conn.executemany("""
+            INSERT INTO metric_details (snapshot_id, metric_key, value, percentile)
+            VALUES (?, ?, ?, ?)
+        """, [(snapshot_id, k, float(v), p) for k, v, p in details if v is not None])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def update_asset(item: dict, cache: ContextCache) -> dict | None:
+    """推进单个资产到 new_hwm，返回摘要；无价格时返回 None"""
+    asset_id, prev_hwm, as_of = item["asset_id"], item["prev_hwm"], item["new_hwm"]
+
+    closes = _load_closes(asset_id, as_of)
+    if closes.empty:
+        return None
+    as_of = closes.index[-1].strftime("%Y-%m-%d")
+
+    # 1. 状态机步进
+    raw_info, confirmed = step_state_machine(asset_id, closes, prev_hwm)
+    if confirmed is None:
+        return None
+
+    asset = resolve_asset(asset_id)
+    snapshot_id = str(uuid.uuid4())
+    current_price = float(closes.iloc[-1])
+    risk_metrics = _confirmed_risk_metrics(RiskEngine.calculate_risk_metrics(closes), raw_info, confirmed, as_of)
+
+    # INDEX：只更新状态机 + RiskCard (与 _build_market_risk_card 一致)
+    if asset.asset_type == "INDEX":
+        build_risk_card(snapshot_id, asset_id, current_price, risk_metrics, as_of_date=as_of, market_context=None)
+        _save_incremental_snapshot(snapshot_id, asset_id, as_of, risk_metrics, None, current_price)
+        return {"asset_id": asset_id, "as_of_date": as_of, "state": confirmed["state"]}
+
+    # 2. 估值分位
+    valuation = compute_valuation_percentile(asset_id, as_of)
+
+    # 3. RiskCard (市场上下文按日期缓存)
+    from engine.snapshot_builder import build_market_context
+
+    sector_ctx = resolve_sector_context(asset_id, as_of_date=as_of)
+    market_index_id = sector_ctx.market_index_id or "^GSPC"
+    market_context = build_market_context(
+        stock_state=confirmed["state"],
+        index_symbol=market_index_id,
+        index_risk=cache.get_index_risk(market_index_id, as_of)
+    )
+    risk_card = build_risk_card(snapshot_id, asset_id, current_price, risk_metrics,
+                                as_of_date=as_of, market_context=market_context)
+    _save_incremental_snapshot(snapshot_id, asset_id, as_of, risk_metrics, valuation, current_price)
+    save_market_context(
+        snapshot_id=snapshot_id,
+        symbol=asset_id,
+        market_index_symbol=market_index_id,
+        amplifier=market_context["market_amplifier"],
+        alpha=market_context["alpha_headroom"],
+        regime_label=market_context["regime_label"]
+    )
+
+    # 4. Overlays (板块 / 市场部分按日期复用)
+    individual = {
+        "ind_dd_state": risk_card.get("d_state"),
+        "ind_path_risk": risk_card.get("path_risk_level"),
+        "ind_vol_regime": None,
+        "ind_position_pct": risk_card.get("price_percentile"),
+    }
+    sector_context = None
+    if sector_ctx.proxy_etf_id:
+        sector_context = cache.get_sector_context(sector_ctx.proxy_etf_id, market_index_id, as_of)
+    sector_overlay = build_sector_overlay(
+        asset_id=asset_id,
+        as_of_date=as_of,
+        proxy_etf_id=sector_ctx.proxy_etf_id,
+        sector_name=sector_ctx.sector_name,
+        market_index_id=market_index_id,
+        snapshot_id=snapshot_id,
+        sector_context=sector_context
+    )
+    market_overlay = cache.get_market_regime(
+        market_index_id, sector_ctx.growth_proxy, sector_ctx.value_proxy, as_of, snapshot_id
+    )
+    summary, flags = run_overlay_rules(individual, sector_overlay, market_overlay)
+    save_risk_overlay_snapshot(
+        snapshot_id=snapshot_id,
+        asset_id=asset_id,
+        as_of_date=as_of,
+        ind=individual,
+        sec=sector_overlay,
+        mkt=market_overlay,
+        summary=summary,
+        flags_json=flags_to_json(flags)
+    )
+
+    return {
+        "asset_id": asset_id,
+        "as_of_date": as_of,
+        "state": confirmed["state"],
+        "is_transition": confirmed["is_transition"],
+        "pe_percentile": valuation["pe_percentile"],
+        "risk_quadrant": risk_card.get("risk_quadrant"),
+    }
+
+
+def run_incremental_update(asset_ids: list[str] | None = None) -> dict:
+    """
+    增量更新入口：检测新数据 -> 逐资产推进 -> 写回高水位
+    asset_ids: 可选，仅处理指定资产
+    """
+    init_db()
+    pending = find_assets_with_new_rows()
+    if asset_ids is not None:
+        wanted = set(asset_ids)
+        pending = [p for p in pending if p["asset_id"] in wanted]
+
+    print(f"[Incremental] {len(pending)} assets with new price rows")
+
+    cache = ContextCache()
+    updated, failed = [], {}
+    for item in pending:
+        try:
+            res = update_asset(item, cache)
+            if res:
+                updated.append(res)
+            save_watermark(item["asset_id"], item["new_hwm"])
+        except Exception as e:
+            # 失败的资产不推进高水位，下次运行重试
+            print(f"[Incremental] {item['asset_id']} failed: {e}")
+            failed[item["asset_id"]] = str(e)
+
+    print(f"[Incremental] updated={len(updated)} failed={len(failed)} "
+          f"sector_ctx={len(cache.sector)} market_ctx={len(cache.market_regime)}")
+    return {"pending": len(pending), "updated": updated, "failed": failed}
@@ -1,5 +1,8 @@
 import uuid
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Callable, List, Optional
 from db.connection import get_connection, init_db
 # from data.fetch_marketdata import fetch_and_cache  # Disabled in formal code
 from data.fetch_fundamentals import fetch_fundamentals
@@ -33,7 +36,73 @@ from analysis.market_regime import build_market_regime
 from analysis.overlay_rules import run_overlay_rules, flags_to_json
 from db.overlay import save_risk_overlay_snapshot
 
-def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
+def build_market_context(stock_state: str, index_symbol: str, index_risk: dict) -> dict:
+    """
+    Index I-state -> Amplifier -> Alpha Headroom -> Regime Label
+    (index_risk 与个股无关，可按 (index, date) 复用；放大器取决于个股 D-state)
+    """
+    amp = compute_market_amplifier(
+        stock_state=stock_state,
+        index_state=index_risk["index_risk_state"],
+        index_symbol=index_symbol
+    )
+
+    alpha = compute_alpha_headroom(
+        index_state=index_risk["index_risk_state"],
+        amplification_level=amp["amplification_level"]
+    )
+
+    # Simplified regime label v1.0 (no dispersion yet)
+    if index_risk["index_risk_state"] == "I5":
+        regime_label = "危机模式"
+    elif amp["amplification_level"] in ("High","Extreme") and alpha["alpha_headroom"] in ("Low","None"):
+        regime_label = "系统性压缩"
+    elif amp["amplification_level"] in ("Medium","High") and alpha["alpha_headroom"] in ("Medium","Low"):
+        regime_label = "结构性行情"
+    else:
+        regime_label = "良性分化"
+
+    return {
+        "market_index_symbol": index_symbol,
+        "index_risk_state": index_risk["index_risk_state"],
+        "market_amplifier": amp,
+        "alpha_headroom": alpha,
+        "regime_label": regime_label
+    }
+
+# 快照各阶段及完成进度 (UI 进度条使用)
+SNAPSHOT_STAGES = {
+    "resolve": 0.05,
+    "prices": 0.15,
+    "risk": 0.30,
+    "market": 0.45,
+    "valuation": 0.55,
+    "fundamentals": 0.65,
+    "overlay": 0.80,
+    "dashboard": 0.90,
+    "done": 1.0,
+}
+
+
+@dataclass
+class SnapshotResult:
+    """
+    一次快照计算的结果：展示数据 + 延迟执行的落库操作
+    - data: DashboardData (个股) / MarketRiskCard dict (指数)
+    - writes: 保存记录时按顺序执行；计算本身不写快照表，查看与保存共用同一次计算
+    """
+    snapshot_id: str
+    asset_id: str
+    data_date: str
+    data: Any
+    writes: List[Callable[[], Any]] = field(default_factory=list)
+
+    def commit(self):
+        for write in self.writes:
+            write()
+
+
+def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False, progress=None):
     """
     执行一次完整的分析快照生成流程
     
@@ -41,10 +110,51 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
         symbol: 资产代码（典范ID或原始代码）
         as_of_date: 评估基准日期
         save_to_db: 是否保存到数据库（默认False，由用户决定）
+        progress: 可选回调 progress(stage, pct)，见 SNAPSHOT_STAGES
+    """
+    result = build_snapshot(symbol, as_of_date=as_of_date, progress=progress)
+    if result is None:
+        return None
+    if save_to_db:
+        result.commit()
+    return result.data
+
+
+def _save_behavior_flags(snapshot_id: str, flags: list):
+    _conn = None
+    try:
+        _conn = get_connection()
+        _conn.executemany("""
+            INSERT INTO behavior_flags (snapshot_id, flag_code, flag_level, flag_dimension, flag_title, flag_description)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [
+            (snapshot_id, f['flag_code'], f['flag_level'], f['flag_dimension'], f['flag_title'], f['flag_description'])
+            for f in flags
+        ])
+        _conn.commit()
+    except Exception as e:
+        print(f"Warning: Failed to save behavior flags: {e}")
+    finally:
+        if _conn:
+            _conn.close()
+
+
+def build_snapshot(symbol: str, as_of_date=None, progress: Optional[Callable[[str, float], Any]] = None) -> Optional[SnapshotResult]:
+    """
+    计算快照但不写快照表 (quality / behavior_flags / overlay / analysis_snapshot / market context)；
+    这些写入收集在 SnapshotResult.writes 中，由调用方决定是否 commit()。
+    资产表、D-state 状态机等运行状态仍即时更新 (与保存与否无关)。
+    无价格数据时返回 None。
     """
+    def _stage(name):
+        if progress is not None:
+            progress(name, SNAPSHOT_STAGES[name])
+
     # 初始化数据库
     init_db()
     snapshot_id = str(uuid.uuid4())
+    writes: List[Callable[[], Any]] = []
+    _stage("resolve")
     
     # 0. Get Stock Name (New Step)
     # Check if this asset is a known Sector Proxy (e.g. 3033.HK -> HK Tech Leaders)
@@ -94,8 +204,10 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
     # FIX: Use 10-year lookback from the EVALUATION DATE
     start_date = end_date - timedelta(days=10 * 365)
     
+    _stage("prices")
     print(f"[{effective_id}] Loading local price data...")
-    prices = load_price_series(effective_id, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+    # 风险/回撤基于复权价格 (拆股不再表现为假回撤)；尾端对齐，最新价与原始一致
+    prices = load_price_series(effective_id, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), adjusted=True)
     
     # 加载价格序列
     if prices.empty:
@@ -126,7 +238,8 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
     if asset.asset_type == "INDEX":
         # 📊 MarketRiskCard Path (Index-specific)
         print(f"[{effective_id}] Detected as INDEX (role: {asset.index_role}) - Building MarketRiskCard")
-        return _build_market_risk_card(
+        _stage("risk")
+        card = _build_market_risk_card(
             symbol=effective_id,
             stock_name=stock_name,
             asset=asset,
@@ -134,10 +247,13 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
             data_date=data_date,
             snapshot_id=snapshot_id
         )
+        _stage("done")
+        return SnapshotResult(snapshot_id, effective_id, data_date.strftime("%Y-%m-%d"), card)
     
     # 📈 Standard EquityRiskCard Path (continues below)
     print(f"[{effective_id}] Detected as {asset.asset_type or 'EQUITY'} - Building standard RiskCard")
     # 2. 获取基本面 (TTM + 历史)
+    _stage("risk")
     fundamentals, bank_metrics = fetch_fundamentals(effective_id, as_of_date=end_date)
 
     # 3. 陷阱与分红 (Trap Detection)
@@ -208,6 +324,7 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
         print(f"[{symbol}] Refined Market Index to: {market_index.symbol} (based on Sector: {sector_ctx.sector_code})")
 
     # --- Market Context: Index I-state -> Amplifier -> Alpha Headroom ---
+    _stage("market")
     index_risk = get_or_compute_index_risk(
         index_symbol=market_index.symbol,
         as_of_date=data_date,
@@ -215,36 +332,17 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
         method_profile_id="default"
     )
 
-    amp = compute_market_amplifier(
+    market_context = build_market_context(
         stock_state=risk_metrics["risk_state"]["state"],
-        index_state=index_risk["index_risk_state"],
-        index_symbol=market_index.symbol
-    )
-
-    alpha = compute_alpha_headroom(
-        index_state=index_risk["index_risk_state"],
-        amplification_level=amp["amplification_level"]
+        index_symbol=market_index.symbol,
+        index_risk=index_risk
     )
-
-    # Simplified regime label v1.0 (no dispersion yet)
-    if index_risk["index_risk_state"] == "I5":
-        regime_label = "危机模式"
-    elif amp["amplification_level"] in ("High","Extreme") and alpha["alpha_headroom"] in ("Low","None"):
-        regime_label = "系统性压缩"
-    elif amp["amplification_level"] in ("Medium","High") and alpha["alpha_headroom"] in ("Medium","Low"):
-        regime_label = "结构性行情"
-    else:
-        regime_label = "良性分化"
-
-    market_context = {
-        "market_index_symbol": market_index.symbol,
-        "index_risk_state": index_risk["index_risk_state"],
-        "market_amplifier": amp,
-        "alpha_headroom": alpha,
-        "regime_label": regime_label
-    }
+    amp = market_context["market_amplifier"]
+    alpha = market_context["alpha_headroom"]
+    regime_label = market_context["regime_label"]
     
     # 3. 估值锚选择 (Module 2)
+    _stage("valuation")
     anchor = choose_valuation_anchor(fundamentals)
     # Note: fundamentals.npl_deviation passed from fetcher
     
@@ -330,89 +428,30 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
         bank_score = calc_bank_quality_score(bank_metrics)
     
     # 5.4 Prepare Dividend & Earnings Inputs (NEW)
-    from core.dividend_engine import evaluate_dividend_safety, DividendFacts
-    from core.earnings_state import determine_earnings_state
+    _stage("fundamentals")
+    # 读取 financial_derived (analysis/fundamentals_derivation 向量化派生)；
+    # 尚未派生或 financial_history 有新写入 (触发器已作废) 时，按该资产重新派生并落库
+    from core.dividend_engine import evaluate_dividend_safety, dividend_facts_from_derived
+    from core.earnings_state import determine_earnings_state, earnings_inputs_from_derived
+    from analysis.fundamentals_derivation import load_or_derive
     
     div_info = None
     earnings_info = None
+    derived_rows = []
     
     try:
-        _conn = get_connection()
-        # Fetch financial history (Annual/TTM)
-        # Assuming financial_history stores report_date, eps_ttm, net_profit_ttm, dividend_amount
-        # Order by date ASC
-        fin_rows = _conn.execute("""
-            SELECT report_date, eps_ttm, net_profit_ttm, dividend_amount 
-            FROM financial_history 
-            WHERE asset_id = ? 
-            ORDER BY report_date ASC
-        """, (asset.asset_id,)).fetchall()
-        _conn.close()
+        derived = load_or_derive(asset.asset_id)
+        derived_rows = derived.to_dict("records")
         
-        if fin_rows:
-            import numpy as np
-            
-            # --- Earnings State Prep ---
-            # eps_series: list of (date_str, eps_val)
-            # Filter valid EPS
-            eps_series = []
-            for r in fin_rows:
-                rd = r[0] if isinstance(r[0], str) else r[0].strftime("%Y-%m-%d")
-                val = r[1] # eps_ttm
-                if val is not None:
-                    eps_series.append((rd, float(val)))
-            
+        if derived_rows:
+            # --- Earnings State ---
+            eps_series, yoy_series = earnings_inputs_from_derived(derived_rows)
             if eps_series:
-                earnings_info = determine_earnings_state(eps_series)
-                
-            # --- Dividend Safety Prep ---
-            # Need: dps_5y_mean, dps_5y_std, cut_years, recovery
-            # Filter rows with valid dividend_amount
-            # Use last 10 years max
-            div_history = []
-            for r in fin_rows:
-                 val = r[3] # dividend_amount
-                 if val is not None:
-                     div_history.append(float(val))
-            
-            if div_history:
-                # Basic Metrics
-                # Use last entry as TTM/Current (assuming data is up to date annual/TTM)
-                current_div = div_history[-1]
-                
-                # Calc 5y stats
-                hist_5y = div_history[-5:]
-                mean_5y = np.mean(hist_5y) if hist_5y else None
-                std_5y = np.std(hist_5y) if len(hist_5y) > 1 else 0.0
-                
-                # Calc cuts in last 10y
-                hist_10y = div_history[-10:]
-                cut_count = 0
-                if len(hist_10y) > 1:
-                    for i in range(1, len(hist_10y)):
-                        if hist_10y[i] < hist_10y[i-1] * 0.99: # 1% tolerance
-                            cut_count += 1
-                            
-                # Calc Recovery
-                # Max in history (or last 10-15y)
-                max_div = np.max(div_history)
-                rec_progress = current_div / max_div if max_div and max_div > 0 else 1.0
-                
-                # Net Income TTM (Latest)
-                ni_ttm = None
-                if fin_rows[-1][2]: # net_profit_ttm
-                    ni_ttm = float(fin_rows[-1][2])
-                    
-                facts = DividendFacts(
-                    asset_id=asset.asset_id,
-                    dividends_ttm=current_div,
-                    net_income_ttm=ni_ttm,
-                    dps_5y_mean=mean_5y,
-                    dps_5y_std=std_5y,
-                    cut_years_10y=cut_count,
-                    dividend_recovery_progress=rec_progress
-                )
+                earnings_info = determine_earnings_state(eps_series, yoy_series=yoy_series)
                 
+            # --- Dividend Safety ---
+            facts = dividend_facts_from_derived(asset.asset_id, derived_rows[-1])
+            if facts:
                 div_info = evaluate_dividend_safety(facts)
                 
     except Exception as e:
@@ -428,26 +467,27 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
         bank_metrics=bank_metrics,
         risk_context={'risk_state': risk_metrics['risk_state']['state']},
         dividend_info=div_info,
-        earnings_info=earnings_info
+        earnings_info=earnings_info,
+        derived_rows=derived_rows
     )
     
-    if save_to_db:
-        save_quality_snapshot(
-            snapshot_id=snapshot_id,
-            asset_id=symbol,
-            revenue_stability_flag=quality.revenue_stability_flag,
-            cyclicality_flag=quality.cyclicality_flag,
-            moat_proxy_flag=quality.moat_proxy_flag,
-            balance_sheet_flag=quality.balance_sheet_flag,
-            cashflow_coverage_flag=quality.cashflow_coverage_flag,
-            leverage_risk_flag=quality.leverage_risk_flag,
-            payout_consistency_flag=quality.payout_consistency_flag,
-            dilution_risk_flag=quality.dilution_risk_flag,
-            regulatory_dependence_flag=quality.regulatory_dependence_flag,
-            quality_buffer_level=quality.quality_buffer_level,
-            quality_summary=quality.quality_summary,
-            notes=quality.notes
-        )
+    writes.append(partial(
+        save_quality_snapshot,
+        snapshot_id=snapshot_id,
+        asset_id=symbol,
+        revenue_stability_flag=quality.revenue_stability_flag,
+        cyclicality_flag=quality.cyclicality_flag,
+        moat_proxy_flag=quality.moat_proxy_flag,
+        balance_sheet_flag=quality.balance_sheet_flag,
+        cashflow_coverage_flag=quality.cashflow_coverage_flag,
+        leverage_risk_flag=quality.leverage_risk_flag,
+        payout_consistency_flag=quality.payout_consistency_flag,
+        dilution_risk_flag=quality.dilution_risk_flag,
+        regulatory_dependence_flag=quality.regulatory_dependence_flag,
+        quality_buffer_level=quality.quality_buffer_level,
+        quality_summary=quality.quality_summary,
+        notes=quality.notes
+    ))
         
     # 6. 统一结论生成 (Module 4)
     conclusion_input = ConclusionInput(
@@ -470,7 +510,8 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
         prices["close"].iloc[-1], 
         risk_metrics, 
         as_of_date=data_date.strftime("%Y-%m-%d"),
-        market_context=market_context
+        market_context=market_context,
+        deferred_writes=writes
     )
     
     # 7.5 Risk × Quality 联动（NEW - Generate Quality Risk Interaction Flag）
@@ -493,48 +534,12 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
     if quality_risk_flag: new_flags.append(quality_risk_flag)
     if val_quality_flag: new_flags.append(val_quality_flag)
     
-    if new_flags and save_to_db:
-        _conn = None
-        try:
-            _conn = get_connection()
-            _cursor = _conn.cursor()
-            
-            for f in new_flags:
-                _cursor.execute("""
-                    INSERT INTO behavior_flags (snapshot_id, flag_code, flag_level, flag_dimension, flag_title, flag_description)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    snapshot_id,
-                    f['flag_code'],
-                    f['flag_level'],
-                    f['flag_dimension'],
-                    f['flag_title'],
-                    f['flag_description']
-                ))
-            _conn.commit()
-        except Exception as e:
-            print(f"Warning: Failed to save behavior flags: {e}")
-        finally:
-            if _conn:
-                _conn.close()
-    
-    # 获取刚生成的行为护栏
-    behavior_flags = []
-    try:
-        _conn = get_connection()
-        _cursor = _conn.cursor()
-        _cursor.execute("""
-            SELECT flag_code, flag_level, flag_dimension, flag_title, flag_description
-            FROM behavior_flags
-            WHERE snapshot_id = ?
-        """, (snapshot_id,))
-        behavior_flags = [dict(row) for row in _cursor.fetchall()]
-        _conn.close()
-    except Exception as e:
-        print(f"Error fetching behavior flags: {e}")
-
-    except Exception as e:
-        print(f"Error fetching behavior flags: {e}")
+    if new_flags:
+        writes.append(partial(_save_behavior_flags, snapshot_id, list(new_flags)))
+    
+    # 本次生成的行为护栏 (与保存后 behavior_flags 表中该 snapshot 的记录一致)
+    flag_keys = ("flag_code", "flag_level", "flag_dimension", "flag_title", "flag_description")
+    behavior_flags = [{k: f[k] for k in flag_keys} for f in new_flags]
 
     # --- Three-layer overlay (NEW) ---
     # Individual layer input from PROCESSED risk_card (not raw risk_metrics)
@@ -551,6 +556,7 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
     }
     
     # --- Overlay Context Resolution ---
+    _stage("overlay")
     # Use canonical asset_id for resolution
     sector_ctx = resolve_sector_context(asset.asset_id, as_of_date=data_date.strftime("%Y-%m-%d"))
     
@@ -560,31 +566,33 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
         proxy_etf_id=sector_ctx.proxy_etf_id,
         sector_name=sector_ctx.sector_name,
         market_index_id=sector_ctx.market_index_id or "^GSPC",  # NEW: For Sector RS calculation
-        snapshot_id=snapshot_id  # NEW: For persistence
+        snapshot_id=snapshot_id,  # NEW: For persistence
+        deferred_writes=writes
     )
     market_regime_overlay = build_market_regime(
         as_of_date=data_date.strftime("%Y-%m-%d"),
         asset_id=sector_ctx.market_index_id or "^GSPC",
         growth_proxy=sector_ctx.growth_proxy,
         value_proxy=sector_ctx.value_proxy,
-        snapshot_id=snapshot_id  # NEW: For persistence
+        snapshot_id=snapshot_id,  # NEW: For persistence
+        deferred_writes=writes
     )
     
     overlay_summary, overlay_flags = run_overlay_rules(individual, sector_overlay, market_regime_overlay)
     overlay_flags_json = flags_to_json(overlay_flags)
     
     # Save Overlay Snapshot
-    if save_to_db:
-        save_risk_overlay_snapshot(
-            snapshot_id=snapshot_id,
-            asset_id=symbol,
-            as_of_date=data_date.strftime("%Y-%m-%d"),
-            ind=individual,
-            sec=sector_overlay,
-            mkt=market_regime_overlay,
-            summary=overlay_summary,
-            flags_json=overlay_flags_json
-        )
+    writes.append(partial(
+        save_risk_overlay_snapshot,
+        snapshot_id=snapshot_id,
+        asset_id=symbol,
+        as_of_date=data_date.strftime("%Y-%m-%d"),
+        ind=individual,
+        sec=sector_overlay,
+        mkt=market_regime_overlay,
+        summary=overlay_summary,
+        flags_json=overlay_flags_json
+    ))
 
     overlay = {
         "individual": individual,
@@ -600,6 +608,7 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
         risk_card["ind_position_pct"] = individual["ind_position_pct"]
 
     # 8. 仪表盘数据生成 (Module 6)
+    _stage("dashboard")
     dashboard_data = generate_dashboard_data(
         symbol=asset.asset_id, # Use canonical ID
         current_price=prices["close"].iloc[-1],
@@ -652,25 +661,28 @@ def run_snapshot(symbol: str, as_of_date=None, save_to_db: bool = False):
         except Exception as be_err:
              print(f"[{symbol}] Behavior Engine Error: {be_err}")
     
-    save_full_snapshot(snapshot_id, asset.asset_id, data_date.strftime("%Y-%m-%d"), 
-                       risk_metrics, fundamentals, conclusion, 
-                       anchor, is_trap, 0, bank_score, 
-                       current_price=prices["close"].iloc[-1], # Pass current price
-                       save_to_db=save_to_db)
+    writes.append(partial(
+        save_full_snapshot, snapshot_id, asset.asset_id, data_date.strftime("%Y-%m-%d"),
+        risk_metrics, fundamentals, conclusion,
+        anchor, is_trap, 0, bank_score,
+        current_price=prices["close"].iloc[-1], # Pass current price
+        save_to_db=True
+    ))
                        
     # persist market context into risk_card_snapshot (best-effort)
-    if save_to_db:
-        save_market_context(
-            snapshot_id=snapshot_id,
-            symbol=symbol,
-            market_index_symbol=market_index.symbol,
-            amplifier=amp,
-            alpha=alpha,
-            regime_label=regime_label
-        )
+    writes.append(partial(
+        save_market_context,
+        snapshot_id=snapshot_id,
+        symbol=symbol,
+        market_index_symbol=market_index.symbol,
+        amplifier=amp,
+        alpha=alpha,
+        regime_label=regime_label
+    ))
                        
     print(f"[{symbol}] Analysis Complete. Conclusion: {conclusion}")
-    return dashboard_data
+    _stage("done")
+    return SnapshotResult(snapshot_id, asset.asset_id, data_date.strftime("%Y-%m-%d"), dashboard_data, writes)
 
 def save_full_snapshot(snapshot_id, symbol, as_of_date, risk_metrics, 
                        fundamentals, conclusion, anchor, is_trap, payout_score, bank_score, 
@@ -681,13 +693,7 @@ def save_full_snapshot(snapshot_id, symbol, as_of_date, risk_metrics,
     
     # A. 插入 analysis_snapshot (Phase 3 Core Table)
     # Determine basic risk level string for DB (high/med/low) - simplified
-    risk_level = "Medium"
-    if (risk_metrics.get('max_drawdown') is not None and risk_metrics['max_drawdown'] < -0.40) or \
-       (risk_metrics.get('annual_volatility') is not None and risk_metrics['annual_volatility'] >= 0.35):
-        risk_level = "High"
-    elif (risk_metrics.get('max_drawdown') is not None and risk_metrics['max_drawdown'] > -0.25) and \
-         (risk_metrics.get('annual_volatility') is not None and risk_metrics['annual_volatility'] <= 0.18):
-        risk_level = "Low"
+    risk_level = RiskEngine.summary_risk_level(risk_metrics)
     
     # 只有用户明确选择保存时才写入数据库
     if save_to_db:
@@ -0,0 +1,228 @@
+"""
+Background snapshot jobs (Streamlit)
+- submit_snapshot_job() 入队后立即返回 job_id，后台线程执行 engine.snapshot_builder.build_snapshot
+- 同一 (典范 asset_id, as_of_date) 进行中 / 近期完成的任务直接复用，不重复计算
+- 计算结果常驻内存：save_snapshot_job() 只执行已收集的落库操作，不再重算；重复保存为幂等
+- 任务状态 / 阶段进度同步写入 snapshot_job 表，poll_snapshot_job() 非阻塞读取
+
+用线程而不是进程：结果中的延迟写入是闭包 (不可 pickle)，且需要留在本进程供保存复用；
+计算主要耗在 SQLite / pandas，线程足够让 UI 不被阻塞。
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from db.connection import get_connection, init_db
+from utils.canonical_resolver import resolve_canonical_symbol
+
+SNAPSHOT_MAX_WORKERS = 2
+# 完成的结果在此时间内按 (asset, date) 复用 (页面重跑 / 切换资产后返回)；点击运行分析时传 max_age=0 强制重算
+SNAPSHOT_RESULT_TTL = 600
+# 页面轮询任务进度的间隔 (秒)
+SNAPSHOT_POLL_INTERVAL = 0.5
+# 内存中最多保留的已结束任务数 (超出按完成时间淘汰)
+SNAPSHOT_MAX_JOBS = 32
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("done", "empty", "error")
+
+_EXECUTOR = None
+_JOBS: Dict[str, dict] = {}
+_BY_KEY: Dict[Tuple[str, str], str] = {}
+_LOCK = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=SNAPSHOT_MAX_WORKERS, thread_name_prefix="snapshot")
+        return _EXECUTOR
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _date_key(as_of_date) -> str:
+    if as_of_date is None:
+        return date.today().strftime("%Y-%m-%d")
+    if isinstance(as_of_date, (date, datetime)):
+        return as_of_date.strftime("%Y-%m-%d")
+    return str(as_of_date)[:10]
+
+
+def _reusable(job: dict, max_age: float) -> bool:
+    if job["status"] in ACTIVE_STATUSES:
+        return True
+    return job["status"] in ("done", "empty") and time.monotonic() - job["finished"] < max_age
+
+
+def _evict_finished():
+    """调用方持有 _LOCK"""
+    finished = sorted(
+        (j for j in _JOBS.values() if j["status"] in FINISHED_STATUSES),
+        key=lambda j: j["finished"]
+    )
+    for job in finished[:max(0, len(finished) - SNAPSHOT_MAX_JOBS)]:
+        _JOBS.pop(job["job_id"], None)
+        if _BY_KEY.get(job["key"]) == job["job_id"]:
+            del _BY_KEY[job["key"]]
+
+
+def _record(job: dict):
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute("""
+                INSERT INTO snapshot_job (job_id, asset_id, as_of_date, status, stage, progress, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job["job_id"], job["key"][0], job["key"][1], job["status"], job["stage"], job["progress"],
+                  _now(), _now()))
+    finally:
+        conn.close()
+
+
+def _update(job: dict, **fields):
+    """更新内存状态并同步到 snapshot_job 表 (表写入失败不影响任务本身)"""
+    with _LOCK:
+        job.update(fields)
+        if fields.get("status") in FINISHED_STATUSES:
+            job["finished"] = time.monotonic()
+    cols = [c for c in ("status", "stage", "progress", "error", "snapshot_id", "saved_at") if c in fields]
+    conn = None
+    try:
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                f"UPDATE snapshot_job SET {', '.join(f'{c} = ?' for c in cols)}, updated_at = ? WHERE job_id = ?",
+                [fields[c] for c in cols] + [_now(), job["job_id"]]
+            )
+    except Exception as e:
+        print(f"Warning: Failed to update snapshot job {job['job_id']}: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def _run_job(job: dict, symbol: str, as_of_date):
+    # 快照引擎较重，仅在首次执行任务时加载
+    from engine.snapshot_builder import build_snapshot
+
+    _update(job, status="running")
+    try:
+        result = build_snapshot(
+            symbol, as_of_date=as_of_date,
+            progress=lambda stage, pct: _update(job, stage=stage, progress=pct)
+        )
+    except Exception as e:
+        print(f"[{symbol}] Snapshot job failed: {e}")
+        _update(job, status="error", error=str(e))
+        return
+    job["result"] = result
+    if result is None:
+        _update(job, status="empty", stage="done", progress=1.0)
+    else:
+        _update(job, status="done", stage="done", progress=1.0, snapshot_id=result.snapshot_id)
+
+
+def submit_snapshot_job(symbol: str, as_of_date=None, max_age: float = SNAPSHOT_RESULT_TTL) -> str:
+    """
+    入队一次快照计算，立即返回 job_id
+    同一 (典范 asset_id, as_of_date) 已有进行中的任务、或 max_age 秒内完成的任务时，返回该任务
+    (失败的任务不复用，重新提交即重算)
+    """
+    conn = get_connection()
+    try:
+        asset_id = resolve_canonical_symbol(conn, symbol)
+    except Exception:
+        asset_id = symbol.upper()        # 与 resolve_asset 的回退一致
+    finally:
+        conn.close()
+    key = (asset_id, _date_key(as_of_date))
+
+    with _LOCK:
+        existing = _JOBS.get(_BY_KEY.get(key))
+        if existing is not None and _reusable(existing, max_age):
+            return existing["job_id"]
+        job = {
+            "job_id": uuid.uuid4().hex, "key": key, "symbol": symbol,
+            "status": "queued", "stage": None, "progress": 0.0, "error": None,
+            "result": None, "snapshot_id": None, "saved_at": None, "finished": None,
+            "save_lock": threading.Lock(),
+        }
+        _JOBS[job["job_id"]] = job
+        _BY_KEY[key] = job["job_id"]
+        _evict_finished()
+
+    init_db()
+    _record(job)
+    _get_executor().submit(_run_job, job, symbol, as_of_date)
+    return job["job_id"]
+
+
+def poll_snapshot_job(job_id: str) -> dict:
+    """
+    查询任务状态 (非阻塞)
+    Returns: {"status": "queued" | "running" | "done" | "empty" | "error" | "unknown",
+              "stage", "progress", "error", "data", "snapshot_id", "saved", "asset_id", "as_of_date"}
+    data 仅在 status == "done" 时有值 (DashboardData / 指数 MarketRiskCard dict)
+    """
+    with _LOCK:
+        job = _JOBS.get(job_id)
+        if job is None:
+            return {"status": "unknown", "stage": None, "progress": 0.0, "error": None, "data": None,
+                    "snapshot_id": None, "saved": False, "asset_id": None, "as_of_date": None}
+        result = job["result"]
+        return {
+            "status": job["status"],
+            "stage": job["stage"],
+            "progress": job["progress"],
+            "error": job["error"],
+            "data": result.data if result is not None and job["status"] == "done" else None,
+            "snapshot_id": job["snapshot_id"],
+            "saved": job["saved_at"] is not None,
+            "asset_id": job["key"][0],
+            "as_of_date": job["key"][1],
+        }
+
+
+def save_snapshot_job(job_id: str) -> str:
+    """
+    保存已完成任务的计算结果 (执行其延迟落库操作)，返回 snapshot_id
+    同一任务只写一次；任务未完成 / 不存在时 ValueError
+    """
+    with _LOCK:
+        job = _JOBS.get(job_id)
+    if job is None:
+        raise ValueError(f"Unknown snapshot job: {job_id}")
+    if job["status"] != "done":
+        raise ValueError(f"Snapshot job {job_id} is not finished (status: {job['status']})")
+
+    with job["save_lock"]:
+        if job["saved_at"] is None:
+            job["result"].commit()
+            _update(job, saved_at=_now())
+    return job["snapshot_id"]
+
+
+def wait_snapshot_job(job_id: str, timeout: Optional[float] = None) -> dict:
+    """阻塞等待任务结束 (脚本 / 测试使用)，返回 poll_snapshot_job() 结果"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        status = poll_snapshot_job(job_id)
+        if status["status"] not in ACTIVE_STATUSES:
+            return status
+        if deadline is not None and time.monotonic() > deadline:
+            return status
+        time.sleep(0.05)
+
+
+def forget_snapshot_job(job_id: str):
+    with _LOCK:
+        job = _JOBS.pop(job_id, None)
+        if job is not None and _BY_KEY.get(job["key"]) == job_id:
+            del _BY_KEY[job["key"]]
@@ -2,7 +2,6 @@ import sqlite3
 from typing import List, Dict, Optional
 from db.connection import get_connection
 from utils.canonical_resolver import resolve_canonical_symbol
-from utils.stock_name_fetcher import get_stock_name
 from engine.asset_resolver import resolve_asset
 
 def get_universe_assets_v2(conn=None) -> List[Dict]:
@@ -119,6 +118,8 @@ def add_to_universe(
         
         # 2. Heuristics for missing info
         if not name:
+            # 延迟导入：stock_name_fetcher 依赖 requests，仅新增资产时需要
+            from utils.stock_name_fetcher import get_stock_name
             name = get_stock_name(raw_symbol)
         
         asset_info = resolve_asset(canonical_id)
@@ -61,6 +61,20 @@ class RiskEngine:
         
         return metrics
 
+    @staticmethod
+    def summary_risk_level(risk_metrics: dict) -> str:
+        """
+        analysis_snapshot.risk_level 的粗分级 (High / Medium / Low)
+        High: MDD < -40% 或 波动率 >= 35%；Low: MDD > -25% 且 波动率 <= 18%
+        """
+        mdd = risk_metrics.get('max_drawdown')
+        vol = risk_metrics.get('annual_volatility')
+        if (mdd is not None and mdd < -0.40) or (vol is not None and vol >= 0.35):
+            return "High"
+        if (mdd is not None and mdd > -0.25) and (vol is not None and vol <= 0.18):
+            return "Low"
+        return "Medium"
+
     @staticmethod
     def calculate_path_risk_state(prices: pd.Series):
         """
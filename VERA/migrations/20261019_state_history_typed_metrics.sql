@@ -0,0 +1,10 @@
+-- drawdown_state_history: raw_metrics_snapshot JSON -> 类型化列
+-- (db/retention.ensure_typed_metric_columns 会在运行时自动补齐，此脚本供手工迁移)
+ALTER TABLE drawdown_state_history ADD COLUMN peak_10y REAL;
+ALTER TABLE drawdown_state_history ADD COLUMN trough_10y REAL;
+ALTER TABLE drawdown_state_history ADD COLUMN current_dd REAL;
+ALTER TABLE drawdown_state_history ADD COLUMN max_dd_cycle REAL;
+ALTER TABLE drawdown_state_history ADD COLUMN recovery REAL;
+
+CREATE INDEX IF NOT EXISTS idx_analysis_snapshot_asset_date ON analysis_snapshot(asset_id, as_of_date DESC);
+CREATE INDEX IF NOT EXISTS idx_metric_details_snapshot ON metric_details(snapshot_id);
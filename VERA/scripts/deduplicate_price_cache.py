@@ -6,6 +6,7 @@
 
 import sqlite3
 from db.connection import get_connection
+from data.price_ingest import merge_symbol_prices, check_price_cache_integrity, describe_integrity
 from utils.canonical_resolver import resolve_canonical_symbol
 
 def deduplicate_price_cache():
@@ -92,17 +93,8 @@ def deduplicate_price_cache():
         
         print(f"\n迁移 {raw_symbol} → {canonical_id} ({count_old} 条记录)")
         
-        # 更新symbol为典范ID（INSERT OR REPLACE会自动处理重复）
-        cursor.execute("""
-            INSERT OR REPLACE INTO vera_price_cache 
-            (symbol, trade_date, open, high, low, close, volume, source)
-            SELECT ?, trade_date, open, high, low, close, volume, source
-            FROM vera_price_cache
-            WHERE symbol = ?
-        """, (canonical_id, raw_symbol))
-        
-        # 删除旧记录
-        cursor.execute("DELETE FROM vera_price_cache WHERE symbol = ?", (raw_symbol,))
+        # 经 ingest gateway 集合式并入典范ID (冲突时旧记录覆盖) 并删除旧记录
+        merge_symbol_prices(raw_symbol, canonical_id, conn=conn)
         
         print(f"  ✅ 完成")
     
@@ -115,6 +107,7 @@ def deduplicate_price_cache():
         print(f"   - 无法解析: {len(failed_resolution)} 个symbol")
         for sym, err in failed_resolution:
             print(f"     * {sym}: {err}")
+    print(describe_integrity(check_price_cache_integrity(conn)))
     
     conn.close()
 
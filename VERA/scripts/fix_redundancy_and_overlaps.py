@@ -1,5 +1,10 @@
 import sqlite3
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.price_ingest import merge_symbol_prices
 
 DB_PATH = "/Users/zhangzy/My Docs/Privates/22-AI编程/VERA/vera.db"
 
@@ -43,15 +48,9 @@ def run_cleanup():
     cur.execute("UPDATE asset_symbol_map SET canonical_id = ? WHERE canonical_id = 'US:STOCK:BTC' OR symbol = 'BTC'", (target_id,))
     # B. Consolidate Price Cache
     # First, move all raw 'BTC-USD' and 'US:STOCK:BTC' to 'US:STOCK:BTC-USD'
-    # Use INSERT OR IGNORE to avoid primary key conflicts
-    cur.execute("""
-        INSERT OR IGNORE INTO vera_price_cache (symbol, trade_date, open, high, low, close, volume, source)
-        SELECT ?, trade_date, open, high, low, close, volume, source
-        FROM vera_price_cache
-        WHERE symbol IN ('BTC-USD', 'US:STOCK:BTC')
-    """, (target_id,))
-    # Delete the old ones
-    cur.execute("DELETE FROM vera_price_cache WHERE symbol IN ('BTC-USD', 'US:STOCK:BTC')")
+    # 经 ingest gateway 并入，已有的 BTC-USD 行优先 (ignore)
+    for old_sym in ('BTC-USD', 'US:STOCK:BTC'):
+        merge_symbol_prices(old_sym, target_id, mode="ignore", conn=conn)
     # C. Cleanup assets
     cur.execute("DELETE FROM assets WHERE asset_id = 'US:STOCK:BTC'")
     cur.execute("UPDATE assets SET symbol_name = 'BTC (Bitcoin)' WHERE asset_id = ?", (target_id,))
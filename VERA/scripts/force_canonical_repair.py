@@ -2,6 +2,7 @@ import sqlite3
 import os
 import sys
 from db.connection import get_connection
+from data.price_ingest import merge_symbol_prices
 from utils.canonical_resolver import resolve_canonical_symbol
 
 def smart_migrate():
@@ -24,26 +25,9 @@ def smart_migrate():
             if canonical != raw:
                 print(f"🔄 Migrating: {raw} -> {canonical}")
                 
-                # Check for existing records in target to avoid UPSERT conflicts here
-                # We do it row by row for safety in this repair script
-                cursor.execute("SELECT trade_date, close FROM vera_price_cache WHERE symbol = ?", (raw,))
-                rows = cursor.fetchall()
-                
-                for trade_date, close in rows:
-                    # Update or Ignore (prefer existing canonical data if exists)
-                    cursor.execute("""
-                        INSERT INTO vera_price_cache (symbol, trade_date, close, open, high, low, volume, source)
-                        SELECT ?, trade_date, close, open, high, low, volume, source || '|migrated_from:' || ?
-                        FROM vera_price_cache WHERE symbol = ? AND trade_date = ?
-                        ON CONFLICT(symbol, trade_date) DO UPDATE SET
-                           close = excluded.close,
-                           source = excluded.source
-                    """, (canonical, raw, raw, trade_date))
-                
-                # Delete old after migration
-                cursor.execute("DELETE FROM vera_price_cache WHERE symbol = ?", (raw,))
-                conn.commit()
-                print(f"   Done: {len(rows)} records moved.")
+                # 经 ingest gateway 集合式并入 canonical 并删除旧代码 (来源记入 price_ingest_batch)
+                n = merge_symbol_prices(raw, canonical, conn=conn)
+                print(f"   Done: {n} records moved.")
             else:
                 print(f"   Skipping: {raw} (no clear resolution)")
         except Exception as e:
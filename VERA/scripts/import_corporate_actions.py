@@ -0,0 +1,51 @@
+"""
+Import split / dividend events and refresh price adjustment factors.
+
+CSV columns: symbol, ex_date, split_factor, cash_dividend  (split_factor / cash_dividend 二选一可空)
+  - split_factor: 1 拆 5 = 5；5 合 1 = 0.2
+  - cash_dividend: 每股现金分红
+
+Usage (from VERA root):
+    python scripts/import_corporate_actions.py actions.csv [--source NAME]
+    python scripts/import_corporate_actions.py --refresh      # 仅补算过期因子
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import get_connection, init_db
+from data.price_adjustment import save_corporate_actions, refresh_adjustment_factors
+from utils.canonical_resolver import resolve_canonical_symbol
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", help="公司行为 CSV")
+    parser.add_argument("--source", default="manual_csv")
+    parser.add_argument("--refresh", action="store_true", help="只重算过期的复权因子")
+    args = parser.parse_args()
+
+    init_db()
+    if args.refresh or not args.csv:
+        stale = refresh_adjustment_factors()
+        print(f"✅ Refreshed adjustment factors for {len(stale)} assets")
+        return
+
+    df = pd.read_csv(args.csv)
+    df.columns = [c.strip().lower() for c in df.columns]
+    conn = get_connection()
+    try:
+        df["asset_id"] = [resolve_canonical_symbol(conn, str(s).strip().upper()) for s in df["symbol"]]
+        df["source"] = args.source
+        n = save_corporate_actions(df.drop(columns=["symbol"]), conn=conn)
+    finally:
+        conn.close()
+    print(f"✅ Imported {n} corporate actions for {df['asset_id'].nunique()} assets; factors rebuilt.")
+
+
+if __name__ == "__main__":
+    main()
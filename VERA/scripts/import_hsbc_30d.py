@@ -1,6 +1,12 @@
 
+import os
+import sys
+
 import pandas as pd
-import sqlite3
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.price_ingest import ingest_prices
 from datetime import datetime
 
 DB_PATH = "vera.db"
@@ -26,27 +32,10 @@ def import_hsbc_data():
     
     print(f"Found {len(symbol_df)} days for {SYMBOL}. Importing...")
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    for _, row in symbol_df.iterrows():
-        cursor.execute("""
-            INSERT OR IGNORE INTO vera_price_cache 
-            (symbol, trade_date, open, high, low, close, volume, source)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            SYMBOL,
-            row['trade_date'],
-            row['open'],
-            row['high'],
-            row['low'],
-            row['close'],
-            int(row['volume']) if not pd.isna(row['volume']) else 0,
-            'CSV_IMPORT'
-        ))
-    
-    conn.commit()
-    conn.close()
+    # 经 ingest gateway 写入 (00005.HK -> canonical，已存在的交易日跳过)
+    result = ingest_prices(symbol_df[['symbol', 'trade_date', 'open', 'high', 'low', 'close', 'volume']],
+                           'CSV_IMPORT', mode="ignore")
+    print(f"Written {result['written']} rows.")
     print("Import complete.")
 
 if __name__ == "__main__":
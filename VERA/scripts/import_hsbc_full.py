@@ -1,7 +1,12 @@
 
-import pandas as pd
-import sqlite3
 import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.price_ingest import ingest_prices
 
 DB_PATH = "vera.db"
 CSV_PATH = "import/marketdatadaily_2025-12-21.csv"
@@ -16,38 +21,18 @@ def import_full_hsbc():
     # Read CSV
     chunks = pd.read_csv(CSV_PATH, chunksize=100000)
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     total_imported = 0
     for chunk in chunks:
         # Filter for symbol
         mask = chunk['symbol'] == SYMBOL
         if mask.any():
             symbol_df = chunk[mask].copy()
-            # Convert timestamp to date (assuming format 'YYYY-MM-DD HH:MM:SS')
-            symbol_df['trade_date'] = pd.to_datetime(symbol_df['timestamp']).dt.strftime('%Y-%m-%d')
-            
-            for _, row in symbol_df.iterrows():
-                cursor.execute("""
-                    INSERT OR IGNORE INTO vera_price_cache 
-                    (symbol, trade_date, open, high, low, close, volume, source)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    SYMBOL,
-                    row['trade_date'],
-                    row['open'],
-                    row['high'],
-                    row['low'],
-                    row['close'],
-                    int(row['volume']) if not pd.isna(row['volume']) else 0,
-                    'CSV_FULL_IMPORT'
-                ))
-                if cursor.rowcount > 0:
-                    total_imported += 1
+            symbol_df['trade_date'] = symbol_df['timestamp']
+            # 经 ingest gateway 写入 (00005.HK -> canonical，已存在的交易日跳过)
+            result = ingest_prices(symbol_df[['symbol', 'trade_date', 'open', 'high', 'low', 'close', 'volume']],
+                                   'CSV_FULL_IMPORT', mode="ignore")
+            total_imported += result["written"]
     
-    conn.commit()
-    conn.close()
     print(f"Success: Imported {total_imported} new records for {SYMBOL}.")
 
 if __name__ == "__main__":
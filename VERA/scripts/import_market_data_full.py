@@ -11,6 +11,12 @@ import sqlite3
 import pandas as pd
 from datetime import datetime
 import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.price_ingest import ingest_prices
+from utils.canonical_resolver import resolve_canonical_symbol
 
 DB_PATH = "vera.db"
 CSV_PATH = "imports/market_data_daily_full.csv"
@@ -44,7 +50,14 @@ def import_market_data():
         "errors": 0
     }
     
-    print("\n[2] 开始导入数据...")
+    # === Part 1: OHLCV 经 ingest gateway 批量写入 vera_price_cache (已存在的 (symbol, trade_date) 跳过) ===
+    print("\n[2] 导入价格数据...")
+    prices = df.assign(trade_date=df['timestamp'])[['symbol', 'trade_date', 'open', 'high', 'low', 'close', 'volume']]
+    result = ingest_prices(prices, 'import_csv', mode="ignore", conn=conn)
+    stats["price_inserted"] = result["written"]
+    stats["price_skipped"] = result["rows"] - result["written"]
+    
+    print("\n[3] 导入基本面数据...")
     
     for idx, row in df.iterrows():
         if idx % 1000 == 0:
@@ -58,35 +71,6 @@ def import_market_data():
                 stats["errors"] += 1
                 continue
             
-            # Resolve to Canonical ID
-            from utils.canonical_resolver import resolve_canonical_symbol
-            canonical_id = resolve_canonical_symbol(symbol) or symbol
-            
-            # === Part 1: 导入 OHLCV 到 vera_price_cache ===
-            cursor.execute("""
-                SELECT 1 FROM vera_price_cache 
-                WHERE symbol = ? AND trade_date = ?
-            """, (canonical_id, trade_date))
-            
-            if cursor.fetchone() is None:
-                # 插入新记录
-                cursor.execute("""
-                    INSERT INTO vera_price_cache 
-                    (symbol, trade_date, open, high, low, close, volume, source)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    canonical_id, trade_date,
-                    float(row['open']) if pd.notna(row['open']) else None,
-                    float(row['high']) if pd.notna(row['high']) else None,
-                    float(row['low']) if pd.notna(row['low']) else None,
-                    float(row['close']) if pd.notna(row['close']) else None,
-                    int(row['volume']) if pd.notna(row['volume']) else None,
-                    'import_csv'
-                ))
-                stats["price_inserted"] += 1
-            else:
-                stats["price_skipped"] += 1
-            
             # === Part 2: 导入/更新基本面到 financial_history ===
             close_price = float(row['close']) if pd.notna(row['close']) else None
             pe = float(row['pe']) if pd.notna(row['pe']) else None
@@ -103,8 +87,7 @@ def import_market_data():
                 bps = (close_price / pb) if (pb and pb > 0) else None
                 
                 # Use Canonical ID for storage
-                from utils.canonical_resolver import resolve_canonical_symbol
-                canonical_id = resolve_canonical_symbol(symbol) or symbol
+                canonical_id = resolve_canonical_symbol(conn, symbol) or symbol
                 
                 # 检查是否已存在
                 cursor.execute("""
@@ -164,7 +147,7 @@ def import_market_data():
     conn.commit()
     conn.close()
     
-    print("\n[3] 导入完成!")
+    print("\n[4] 导入完成!")
     print(f"   - 价格数据插入: {stats['price_inserted']}")
     print(f"   - 价格数据跳过(已存在): {stats['price_skipped']}")
     print(f"   - 基本面插入: {stats['fundamental_inserted']}")
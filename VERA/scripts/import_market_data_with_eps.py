@@ -8,6 +8,7 @@ from datetime import datetime
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from db.connection import get_connection
+from data.price_ingest import ingest_prices
 
 CSV_PATH = "imports/market_data_daily_with_eps.csv"
 
@@ -26,13 +27,15 @@ def import_market_data_with_eps():
     conn = get_connection()
     cursor = conn.cursor()
     
-    price_inserted = 0
-    price_updated = 0
     eps_inserted = 0
     eps_updated = 0
     skipped = 0
     errors = 0
     
+    # 价格经 ingest gateway 批量 upsert (canonical 解析 + 批内去重)
+    prices = df.assign(trade_date=df['timestamp'])[['symbol', 'trade_date', 'open', 'high', 'low', 'close', 'volume']]
+    result = ingest_prices(prices, 'market_data_with_eps', conn=conn)
+    
     for _, row in df.iterrows():
         try:
             symbol = str(row['symbol']).strip()
@@ -48,46 +51,8 @@ def import_market_data_with_eps():
             except:
                 trade_date = timestamp.split()[0]  # Take date part
             
-            # Extract price data
-            open_price = row.get('open')
-            high = row.get('high')
-            low = row.get('low')
-            close = row.get('close')
-            volume = row.get('volume')
-            
-            # Clean values
-            def clean_value(val):
-                return None if pd.isna(val) else float(val)
-            
-            open_price = clean_value(open_price)
-            high = clean_value(high)
-            low = clean_value(low)
-            close = clean_value(close)
-            volume = clean_value(volume)
-            
-            # Update price cache
-            if close is not None:
-                cursor.execute("""
-                    SELECT 1 FROM vera_price_cache 
-                    WHERE symbol = ? AND trade_date = ?
-                """, (symbol, trade_date))
-                
-                if cursor.fetchone():
-                    cursor.execute("""
-                        UPDATE vera_price_cache
-                        SET open = ?, high = ?, low = ?, close = ?, volume = ?
-                        WHERE symbol = ? AND trade_date = ?
-                    """, (open_price, high, low, close, volume, symbol, trade_date))
-                    price_updated += 1
-                else:
-                    cursor.execute("""
-                        INSERT INTO vera_price_cache (symbol, trade_date, open, high, low, close, volume)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (symbol, trade_date, open_price, high, low, close, volume))
-                    price_inserted += 1
-            
             # Extract and update EPS data
-            eps = clean_value(row.get('eps'))
+            eps = None if pd.isna(row.get('eps')) else float(row.get('eps'))
             
             if eps is not None:
                 # Use trade_date as as_of_date for EPS
@@ -118,7 +83,7 @@ def import_market_data_with_eps():
     conn.close()
     
     print(f"\nImport Complete:")
-    print(f"  Price Cache - Inserted: {price_inserted}, Updated: {price_updated}")
+    print(f"  Price Cache - Written: {result['written']} (batch {result['batch_id']})")
     print(f"  EPS Data - Inserted: {eps_inserted}, Updated: {eps_updated}")
     print(f"  Skipped: {skipped}")
     print(f"  Errors: {errors}")
@@ -3,6 +3,11 @@ import sqlite3
 import argparse
 import os
 import glob
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.price_ingest import ingest_prices
 
 DB_PATH = "vera.db"
 
@@ -12,18 +17,6 @@ def get_connection():
 def _norm(s: str) -> str:
     return (s or "").strip().upper()
 
-def _dedupe_df(df: pd.DataFrame, policy: str) -> pd.DataFrame:
-    """
-    DataFrame 内部去重：同一 (symbol, trade_date) 多行时如何处理
-    """
-    if df.empty:
-        return df
-
-    if policy == "keep_first":
-        return df.drop_duplicates(subset=["symbol", "trade_date"], keep="first")
-    # default keep_last
-    return df.drop_duplicates(subset=["symbol", "trade_date"], keep="last")
-
 def _precheck_ambiguity(conn, raw_symbols, asset_type_hint=None):
     """
     歧义预检查：在真正写库前先扫一遍 unique raw symbols。
@@ -53,75 +46,6 @@ def _precheck_ambiguity(conn, raw_symbols, asset_type_hint=None):
         lines.append("  2) Add unique mapping(s) in asset_symbol_map for the raw symbol(s)")
         raise SystemExit("\n".join(lines))
 
-def _resolve_canonical_series(conn, raw_series: pd.Series, asset_type_hint=None) -> pd.Series:
-    from utils.canonical_resolver import resolve_canonical_symbol
-    hint = _norm(asset_type_hint) if asset_type_hint else None
-    return raw_series.apply(lambda s: resolve_canonical_symbol(
-        conn, s,
-        asset_type_hint=hint,
-        strict_ambiguous=True,
-        strict_unknown=False,
-        cn_namespace=True,
-    ))
-
-def _delete_existing_rows(conn, df: pd.DataFrame):
-    """
-    delete_then_insert：先删除即将写入的 (symbol, trade_date) 组合，再插入。
-    """
-    if df.empty:
-        return
-    cur = conn.cursor()
-
-    # 批量删除：分批避免 SQLite 参数过多
-    keys = list(df[["symbol", "trade_date"]].itertuples(index=False, name=None))
-    chunk = 500
-    for i in range(0, len(keys), chunk):
-        sub = keys[i:i+chunk]
-        # 构造 (symbol=? AND trade_date=?) OR (...) ...
-        where = " OR ".join(["(symbol=? AND trade_date=?)"] * len(sub))
-        params = []
-        for sym, dt in sub:
-            params.extend([sym, dt])
-        cur.execute(f"DELETE FROM vera_price_cache WHERE {where}", params)
-
-def _insert_rows(conn, df: pd.DataFrame, mode: str):
-    cur = conn.cursor()
-
-    if mode == "ignore":
-        sql = """
-            INSERT OR IGNORE INTO vera_price_cache
-            (symbol, trade_date, open, high, low, close, volume, source)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
-    elif mode == "fail":
-        sql = """
-            INSERT INTO vera_price_cache
-            (symbol, trade_date, open, high, low, close, volume, source)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
-    else:
-        sql = """
-            INSERT INTO vera_price_cache
-            (symbol, trade_date, open, high, low, close, volume, source)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(symbol, trade_date) DO UPDATE SET
-                open   = excluded.open,
-                high   = excluded.high,
-                low    = excluded.low,
-                close  = excluded.close,
-                volume = excluded.volume,
-                source = excluded.source
-        """
-
-    total = len(df)
-    for i, r in enumerate(df.itertuples(index=False, name=None), start=1):
-        # 0: symbol, 1: trade_date, 2: open, 3: high, 4: low, 5: close, 6: volume, 7: source
-        cur.execute(sql, (
-            r[0], r[1], r[2], r[3], r[4], r[5], int(r[6]), r[7]
-        ))
-        if i % 2000 == 0:
-            print(f" ... processed {i}/{total}")
-
 def parse_and_import(
     file_path: str,
     *,
@@ -184,27 +108,22 @@ def parse_and_import(
         unique_raw = sorted(clean["raw_symbol"].unique().tolist())
         _precheck_ambiguity(conn, unique_raw, asset_type_hint=asset_type_hint)
 
-        # 2) 映射到 canonical（写库只用 canonical）
-        clean["symbol"] = _resolve_canonical_series(conn, clean["raw_symbol"], asset_type_hint=asset_type_hint)
-
-        # 3) source 字段保留 raw 审计信息
-        clean["source"] = clean["raw_symbol"].apply(lambda rs: f"{source_label}|raw:{rs}")
-
-        # 4) DF 内部去重（避免同一文件内部重复行）
-        clean = _dedupe_df(clean, policy=("keep_last" if dedupe == "delete_then_insert" else dedupe))
-
-        # 5) 可选：写库前先删除将写入的键（彻底去重清洁）
-        if dedupe == "delete_then_insert":
-            _delete_existing_rows(conn, clean[["symbol", "trade_date"]])
-
-        # 6) 写入 DB（按 mode 控制冲突行为）
-        # Adjusting column order to match SQL placement and avoiding 'df.itertuples(name=None)' issue if columns changed
-        # Explicitly select columns for insertion
-        to_insert = clean[["symbol", "trade_date", "open", "high", "low", "close", "volume", "source"]]
-        _insert_rows(conn, to_insert, mode=mode)
-
-        conn.commit()
-        print(f"[SUCCESS] Imported rows: {len(clean)} | canonical symbols: {sorted(clean['symbol'].unique().tolist())[:10]} ...")
+        # 2) 写库统一经 ingest gateway：canonical 解析、source 保留 raw 审计、
+        #    DF 内部去重（同一文件内部重复行）、按 mode 控制冲突行为
+        #    delete_then_insert = 整行替换 (INSERT OR REPLACE)
+        result = ingest_prices(
+            clean.rename(columns={"raw_symbol": "symbol"}),
+            source_label,
+            mode=("replace" if dedupe == "delete_then_insert" else mode),
+            keep=("first" if dedupe == "keep_first" else "last"),
+            conn=conn,
+            asset_type_hint=(_norm(asset_type_hint) if asset_type_hint else None),
+            strict_ambiguous=True,
+            strict_unknown=False,
+            cn_namespace=True,
+        )
+        print(f"[SUCCESS] Imported rows: {result['rows']} (written {result['written']}, batch {result['batch_id']}) "
+              f"| canonical symbols: {sorted(result['symbols'])[:10]} ...")
 
     finally:
         conn.close()
@@ -1,4 +1,10 @@
+import os
 import sqlite3
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.price_ingest import merge_symbol_prices, check_price_cache_integrity, describe_integrity
 
 DB_PATH = "vera.db"
 
@@ -82,23 +88,9 @@ def migrate_database():
         else:
             new_id = row[0]
         
-        # Merge records: If new_id already has trade_date, DELETE the legacy one or let OR REPLACE handle it?
-        # ON CONFLICT in vera_price_cache is (symbol, trade_date).
-        # We need to handle potential conflicts during update.
-        
-        # Strategy: Select legacy records, INSERT OR REPLACE into new_id, then DELETE legacy.
-        cursor.execute("SELECT trade_date, open, high, low, close, volume, source FROM vera_price_cache WHERE symbol = ?", (sym,))
-        rows = cursor.fetchall()
-        for r in rows:
-            cursor.execute("""
-                INSERT INTO vera_price_cache (symbol, trade_date, open, high, low, close, volume, source)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(symbol, trade_date) DO UPDATE SET
-                    open=excluded.open, high=excluded.high, low=excluded.low, close=excluded.close, volume=excluded.volume, source=excluded.source
-            """, (new_id, *r))
-        
-        cursor.execute("DELETE FROM vera_price_cache WHERE symbol = ?", (sym,))
-        print(f"PriceCache: Migrated {sym} -> {new_id} ({len(rows)} rows)")
+        # 经 ingest gateway 集合式并入 canonical (冲突时旧行覆盖)，再删除旧代码
+        n = merge_symbol_prices(sym, new_id, conn=conn)
+        print(f"PriceCache: Migrated {sym} -> {new_id} ({n} rows)")
 
     # Step 2: HK Stocks
     cursor.execute("SELECT DISTINCT symbol FROM vera_price_cache WHERE symbol LIKE '%.HK'")
@@ -107,18 +99,9 @@ def migrate_database():
         code = sym.split('.')[0]
         new_id = f"HK:STOCK:{code.zfill(5)}"
         
-        cursor.execute("SELECT trade_date, open, high, low, close, volume, source FROM vera_price_cache WHERE symbol = ?", (sym,))
-        rows = cursor.fetchall()
-        for r in rows:
-            cursor.execute("""
-                INSERT INTO vera_price_cache (symbol, trade_date, open, high, low, close, volume, source)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(symbol, trade_date) DO UPDATE SET
-                    open=excluded.open, high=excluded.high, low=excluded.low, close=excluded.close, volume=excluded.volume, source=excluded.source
-            """, (new_id, *r))
-            
-        cursor.execute("DELETE FROM vera_price_cache WHERE symbol = ?", (sym,))
-        print(f"PriceCache: Migrated {sym} -> {new_id} ({len(rows)} rows)")
+        # 经 ingest gateway 集合式并入 canonical (冲突时旧行覆盖)，再删除旧代码
+        n = merge_symbol_prices(sym, new_id, conn=conn)
+        print(f"PriceCache: Migrated {sym} -> {new_id} ({n} rows)")
 
     # Step 3: US Indices (^GSPC, ^NDX, ^DJI, etc)
     cursor.execute("SELECT DISTINCT symbol FROM vera_price_cache WHERE symbol LIKE '^%'")
@@ -133,23 +116,12 @@ def migrate_database():
     for (old_sym,) in symbols:
         new_id = mappings.get(old_sym, old_sym.replace('^', ''))
         
-        cursor.execute("SELECT trade_date, open, high, low, close, volume, source FROM vera_price_cache WHERE symbol = ?", (old_sym,))
-        rows = cursor.fetchall()
-        for r in rows:
-            cursor.execute("""
-                INSERT INTO vera_price_cache (symbol, trade_date, open, high, low, close, volume, source)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(symbol, trade_date) DO UPDATE SET
-                    open=excluded.open, high=excluded.high, low=excluded.low, close=excluded.close, volume=excluded.volume, source=excluded.source
-            """, (new_id, *r))
-            
-        cursor.execute("DELETE FROM vera_price_cache WHERE symbol = ?", (old_sym,))
-        print(f"PriceCache: Migrated {old_sym} -> {new_id} ({len(rows)} rows)")
+        # 经 ingest gateway 集合式并入 canonical (冲突时旧行覆盖)，再删除旧代码
+        n = merge_symbol_prices(old_sym, new_id, conn=conn)
+        print(f"PriceCache: Migrated {old_sym} -> {new_id} ({n} rows)")
 
-    print("\n--- Cleaning up duplicates in Price Cache (if any) ---")
-    # This is tricky without a temporary table if trade_date constraint is violated.
-    # Actually ON CONFLICT during update isn't possible in SQLite UPDATE.
-    # Let's just do a simple deduplication if needed.
+    print("\n--- Price Cache integrity ---")
+    print(describe_integrity(check_price_cache_integrity(conn)))
     
     print("\n--- Updating asset_classification ---")
     cursor.execute("SELECT DISTINCT asset_id FROM asset_classification")
@@ -1,57 +1,68 @@
+"""
+Batch OCR for a directory of broker screenshots (parallel, content-hash cached).
 
-from utils.ocr_engine import extract_stock_data
-import os
+Usage (from VERA root):
+    python scripts/process_ocr_backend.py <screenshot_dir> [--workers N]
+
+Results are written to scripts/ocr_pending.json for the confirmation step
+(scripts/write_ocr_data.py).
+"""
+import argparse
 import json
-from db.connection import get_connection
-
-# Uploaded images paths (from previous context)
-image_paths = [
-    "/Users/zhangzy/.gemini/antigravity/brain/ca60efe7-715d-4bb1-afe9-0449a6767128/uploaded_image_0_1766467836881.png",
-    "/Users/zhangzy/.gemini/antigravity/brain/ca60efe7-715d-4bb1-afe9-0449a6767128/uploaded_image_1_1766467836881.png",
-    "/Users/zhangzy/.gemini/antigravity/brain/ca60efe7-715d-4bb1-afe9-0449a6767128/uploaded_image_2_1766467836881.png"
-]
-
-print("--- STARTING BATCH OCR ---")
-
-results = []
-
-for path in image_paths:
-    print(f"\nProcessing: {os.path.basename(path)}")
-    if not os.path.exists(path):
-        print(f"File not found: {path}")
-        continue
-        
-    try:
-        with open(path, "rb") as f:
-            data = extract_stock_data(f.read())
-            
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import init_db
+from utils.ocr_pipeline import list_images, run_ocr_batch
+
+PENDING_FILE = "scripts/ocr_pending.json"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", help="截图目录")
+    parser.add_argument("--workers", type=int, default=None, help="OCR 进程数 (默认 CPU 核数)")
+    args = parser.parse_args()
+
+    image_paths = list_images(args.directory)
+    print(f"--- STARTING BATCH OCR ({len(image_paths)} images) ---")
+
+    init_db()
+    items = run_ocr_batch(image_paths, max_workers=args.workers)
+
+    results = []
+    for item in items:
+        data = item["result"]
+        tag = "cache" if item["cached"] else "ocr"
+        print(f"\nProcessed [{tag}]: {os.path.basename(item['path'])}")
         if "error" in data:
             print(f"Error: {data['error']}")
-        else:
-            # Fix symbol if OCR confused it (e.g. .SPX) - handled in engine now
-            # Fix source
-            data['source'] = 'OCR_BACKEND_CONFIRM'
-            results.append(data)
-            
-            print(f"Symbol: {data.get('symbol')}")
-            print(f"Date:   {data.get('date')}")
-            print(f"Price:  {data.get('price')}")
-            print(f"Open:   {data.get('open')}")
-            print(f"High:   {data.get('high')}")
-            print(f"Low:    {data.get('low')}")
-            print(f"Prev:   {data.get('prev_close')}")
-            # print(json.dumps(data, indent=2, ensure_ascii=False))
-            
-    except Exception as e:
-        print(f"Exception: {e}")
-
-print("\n--- BATCH OCR COMPLETE ---")
-print(f"Successfully extracted {len(results)} records.")
-
-# Save results to a temp file for confirmation step
-if results:
-    with open("scripts/ocr_pending.json", "w") as f:
-        json.dump(results, f, indent=2)
-    print("Results saved to scripts/ocr_pending.json. Waiting for confirmation to write to DB.")
-else:
-    print("No valid results to save.")
+            continue
+
+        data = {**data, "source": "OCR_BACKEND_CONFIRM"}
+        results.append(data)
+        print(f"Symbol: {data.get('symbol')}")
+        print(f"Date:   {data.get('date')}")
+        print(f"Price:  {data.get('price')}")
+        print(f"Open:   {data.get('open')}")
+        print(f"High:   {data.get('high')}")
+        print(f"Low:    {data.get('low')}")
+        print(f"Prev:   {data.get('prev_close')}")
+
+    print("\n--- BATCH OCR COMPLETE ---")
+    print(f"Successfully extracted {len(results)} records "
+          f"({sum(1 for i in items if i['cached'])} from cache).")
+
+    # Save results to a temp file for confirmation step
+    if results:
+        with open(PENDING_FILE, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Results saved to {PENDING_FILE}. Waiting for confirmation to write to DB.")
+    else:
+        print("No valid results to save.")
+
+
+if __name__ == "__main__":
+    main()
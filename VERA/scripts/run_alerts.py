@@ -0,0 +1,34 @@
+"""
+Evaluate vera_rules.yaml alert rules against state rows written since the last run.
+
+Usage (from VERA root):
+    python scripts/run_alerts.py                      # append to alerts.log
+    python scripts/run_alerts.py --webhook http://127.0.0.1:8765/vera-alerts
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import init_db
+from core.alert_engine import run_alerts, LogFileSink, WebhookSink
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", default="alerts.log", help="JSON Lines alert log path")
+    parser.add_argument("--webhook", default=None, help="Local webhook URL (optional)")
+    args = parser.parse_args()
+
+    sinks = [LogFileSink(args.log)]
+    if args.webhook:
+        sinks.append(WebhookSink(args.webhook))
+
+    init_db()
+    alerts = run_alerts(sinks)
+    print(f"✅ {len(alerts)} new alerts delivered")
+
+
+if __name__ == "__main__":
+    main()
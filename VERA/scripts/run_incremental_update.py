@@ -0,0 +1,44 @@
+"""
+Advance VERA state for assets that received new rows in vera_price_cache
+since the last run (per-asset high-water mark in vera_update_watermark),
+then evaluate alert rules against the newly written state rows. The
+per-market trading calendar and the sector board are refreshed first so
+snapshots can reuse them.
+
+Usage (from VERA root):
+    python scripts/run_incremental_update.py            # all assets with new rows
+    python scripts/run_incremental_update.py AAPL TSLA  # restrict to given canonical IDs
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import init_db
+from engine.incremental_updater import run_incremental_update
+from core.alert_engine import run_alerts
+from utils.market_calendar import rebuild_trading_calendar
+from analysis.sector_board import run_sector_board_job
+
+
+def main():
+    asset_ids = sys.argv[1:] or None
+    init_db()
+
+    # 日历与板块榜先行：资产快照的板块层直接读取当日 sector_board
+    sessions = rebuild_trading_calendar()
+    print("📅 Trading calendar: " + ", ".join(f"{m}={n}" for m, n in sessions.items()))
+    board = run_sector_board_job()
+    print(f"🧭 Sector board: {len(board)} sectors")
+
+    result = run_incremental_update(asset_ids)
+    print(f"✅ Incremental update: {len(result['updated'])}/{result['pending']} assets updated")
+    for asset_id, err in result["failed"].items():
+        print(f"  ❌ {asset_id}: {err}")
+
+    # 新状态行落库后立即做增量告警评估
+    run_alerts()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Apply the snapshot retention policy (vera_rules.yaml -> retention):
+thin old snapshots, compact state-history JSON, archive removed rows to Parquet.
+
+Usage (from VERA root):
+    python scripts/run_retention.py --dry-run
+    python scripts/run_retention.py [--vacuum]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import init_db
+from db.retention import run_retention
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不修改数据库")
+    parser.add_argument("--vacuum", action="store_true", help="完成后 VACUUM 回收空间")
+    args = parser.parse_args()
+
+    init_db()
+    summary = run_retention(dry_run=args.dry_run, vacuum=args.vacuum)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Recompute derived fundamentals (YoY, payout ratios, dividend stability inputs)
+from financial_history into financial_derived.
+
+Usage (from VERA root):
+    python scripts/update_fundamentals_derived.py            # all assets
+    python scripts/update_fundamentals_derived.py AAPL 00700 # selected assets
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import init_db
+from analysis.fundamentals_derivation import run_fundamentals_derivation_job
+
+
+def main():
+    init_db()
+    asset_ids = sys.argv[1:] or None
+    n = run_fundamentals_derivation_job(asset_ids)
+    print(f"✅ financial_derived refreshed: {n} rows")
+
+
+if __name__ == "__main__":
+    main()
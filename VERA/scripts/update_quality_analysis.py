@@ -1,156 +1,122 @@
 import sqlite3
 import uuid
 import datetime
-from analysis.quality_assessment import build_quality_flags
-from db.quality_snapshot import save_quality_snapshot
+import pandas as pd
+from analysis.quality_batch import build_quality_flags_frame
+from analysis.fundamentals_derivation import annual_revenue_yoy, run_fundamentals_derivation_job
+from db.quality_snapshot import save_quality_snapshots_bulk
 
 DB_PATH = "data/stock_analyzer.db"
 
 def get_connection():
     return sqlite3.connect(DB_PATH)
 
-def fetch_fundamentals(asset_id: str, conn):
+def load_fundamentals_frame(conn) -> pd.DataFrame:
     """
     Combine data from financial_history (TTM) and fundamentals_annual (History)
-    and assets (Sector/Industry)
+    and assets (Sector/Industry) for ALL assets at once -> one row per asset
     """
-    cursor = conn.cursor()
-    
-    # 1. Fetch TTM data (financial_history) - Get latest
-    # Note: table PK is (asset_id, report_date). We want the most recent one.
-    cursor.execute("""
-        SELECT * FROM financial_history 
-        WHERE asset_id = ? 
-        ORDER BY report_date DESC LIMIT 1
-    """, (asset_id,))
-    ttm_row = cursor.fetchone()
-    
-    # Get column names
-    ttm_cols = [description[0] for description in cursor.description] if ttm_row else []
-    ttm_data = dict(zip(ttm_cols, ttm_row)) if ttm_row else {}
-    
-    # 2. Fetch History (fundamentals_annual) - Get all years sorted
-    cursor.execute("""
-        SELECT * FROM fundamentals_annual 
-        WHERE asset_id = ? 
-        ORDER BY fiscal_year ASC
-    """, (asset_id,))
-    hist_rows = cursor.fetchall()
-    hist_cols = [description[0] for description in cursor.description] if hist_rows else []
-    
-    revenue_history = []
-    
-    for r in hist_rows:
-        row_dict = dict(zip(hist_cols, r))
-        # Collect revenue history for stability calc
-        revenue_history.append(row_dict.get('revenue'))
-        
-    # 3. Fetch Sector Info (assets)
-    cursor.execute("SELECT sector FROM assets WHERE asset_id = ?", (asset_id,))
-    res = cursor.fetchone()
-    sector = res[0] if res else None
-    
-    # Combine into a single dict for analysis
-    # Map DB columns to analysis keys if needed (analysis often uses same keys or aliases)
-    combined = ttm_data.copy()
-    combined['revenue_history'] = revenue_history
-    combined['sector'] = sector
-    
-    # Ensure specific keys expected by assessment are present (DB cols match mostly)
-    # Mapping check:
-    # DB: revenue_ttm -> Analysis: revenue_ttm (Matches)
-    # DB: net_income_ttm -> Analysis: net_income_ttm (Matches)
-    # DB: operating_cashflow_ttm -> Analysis: operating_cashflow_ttm (Matches)
-    # ...
-    
-    return combined
+    # 1. Latest TTM row per asset (financial_history PK is (asset_id, report_date))
+    ttm = pd.read_sql_query("""
+        SELECT fh.* FROM financial_history fh
+        JOIN (
+            SELECT asset_id, MAX(report_date) AS report_date
+            FROM financial_history GROUP BY asset_id
+        ) latest ON latest.asset_id = fh.asset_id AND latest.report_date = fh.report_date
+    """, conn)
+    if ttm.empty:
+        return ttm
+    ttm = ttm.drop_duplicates("asset_id", keep="last").set_index("asset_id")
+
+    # 2. History (fundamentals_annual) -> revenue_history list, oldest to newest
+    try:
+        hist = pd.read_sql_query("SELECT * FROM fundamentals_annual ORDER BY asset_id, fiscal_year ASC", conn)
+    except Exception:
+        hist = pd.DataFrame(columns=["asset_id"])
+    if "revenue" not in hist.columns:
+        hist["revenue"] = None
+    revenue_history = hist.groupby("asset_id")["revenue"].agg(list)
+    ttm["revenue_history"] = revenue_history.reindex(ttm.index)
+    ttm["revenue_history"] = ttm["revenue_history"].map(lambda v: v if isinstance(v, list) else [])
+
+    # 3. financial_derived -> revenue_yoy_history / payout_ratio / payout_ratio_3y (same inputs as the snapshot path)
+    #    资产的衍生行缺失 (尚未派生或已被 financial_history 写入作废) 时先按资产重新派生
+    derived_assets = set(pd.read_sql_query("SELECT DISTINCT asset_id FROM financial_derived", conn)["asset_id"])
+    stale = [a for a in ttm.index if a not in derived_assets]
+    if stale:
+        run_fundamentals_derivation_job(stale, conn=conn)
+    derived = pd.read_sql_query("""
+        SELECT asset_id, report_date, revenue_yoy, payout_ratio, payout_ratio_3y
+        FROM financial_derived ORDER BY asset_id, report_date
+    """, conn)
+    yoy_history = annual_revenue_yoy(derived)
+    ttm["revenue_yoy_history"] = yoy_history.reindex(ttm.index)
+    ttm["revenue_yoy_history"] = ttm["revenue_yoy_history"].map(lambda v: v if isinstance(v, list) else None)
+    latest = derived.groupby("asset_id").tail(1).set_index("asset_id")
+    for col in ("payout_ratio", "payout_ratio_3y"):
+        ttm[col] = latest[col].reindex(ttm.index)
+
+    # 4. Sector Info (assets)
+    sectors = pd.read_sql_query("SELECT asset_id, sector FROM assets", conn).drop_duplicates("asset_id")
+    ttm["sector"] = sectors.set_index("asset_id")["sector"].reindex(ttm.index)
+
+    return ttm
+
+def resolve_snapshot_ids(conn, asset_ids) -> dict:
+    """
+    quality_snapshot.snapshot_id 需关联 analysis_snapshot：
+    取每个资产最新的 snapshot，没有的批量创建占位 snapshot (今日)
+    """
+    latest = pd.read_sql_query("""
+        SELECT s.asset_id, s.snapshot_id FROM analysis_snapshot s
+        JOIN (
+            SELECT asset_id, MAX(as_of_date) AS as_of_date
+            FROM analysis_snapshot GROUP BY asset_id
+        ) m ON m.asset_id = s.asset_id AND m.as_of_date = s.as_of_date
+    """, conn).drop_duplicates("asset_id", keep="last")
+    snap_ids = dict(zip(latest["asset_id"], latest["snapshot_id"]))
+
+    missing = [a for a in asset_ids if a not in snap_ids]
+    if missing:
+        print(f"  Warning: No Analysis Snapshot found for {len(missing)} assets. Creating temporary ones.")
+        today = datetime.date.today().isoformat()
+        placeholders = [(str(uuid.uuid4()), a, today) for a in missing]
+        conn.executemany("""
+            INSERT INTO analysis_snapshot (snapshot_id, asset_id, as_of_date, risk_level, valuation_status)
+            VALUES (?, ?, ?, 'UNKNOWN', 'UNKNOWN')
+        """, placeholders)
+        conn.commit()  # Commit snapshot first
+        snap_ids.update({a: sid for sid, a, _ in placeholders})
+    return snap_ids
 
 def main():
     conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Get list of assets to process
+
     # Just process those that exist in financial_history (active subset)
-    cursor.execute("SELECT DISTINCT asset_id FROM financial_history")
-    assets = [r[0] for r in cursor.fetchall()]
-    
-    print(f"Found {len(assets)} assets to analyze.")
-    
-    for asset_id in assets:
-        print(f"Analyzing {asset_id}...")
-        try:
-            fund_data = fetch_fundamentals(asset_id, conn)
-            if not fund_data:
-                print(f"  Skipping {asset_id}: No fundamental data found.")
-                continue
-                
-            # Run analysis
-            result = build_quality_flags(fund_data)
-            
-            # Prepare snapshot ID (Mock or link to latest analysis snapshot if exists)
-            # For MVP, we generate a new UUID for the quality record linking.
-            # Ideally this should link to the latest main AnalysisSnapshot.
-            # But quality_snapshot table treats snapshot_id as a key which usually refers to AnalysisSnapshot.
-            # If AnalysisSnapshot doesn't exist for today, we might have an issue linking FK if enforced.
-            # Let's check schema: FOREIGN KEY (snapshot_id) REFERENCES analysis_snapshot(snapshot_id)
-            # So we MUST have a valid snapshot_id.
-            
-            # Fetch latest snapshot_id for asset
-            cursor.execute("""
-                SELECT snapshot_id FROM analysis_snapshot 
-                WHERE asset_id = ? 
-                ORDER BY as_of_date DESC LIMIT 1
-            """, (asset_id,))
-            snap_res = cursor.fetchone()
-            
-            if not snap_res:
-                # If no snapshot exists (maybe user never ran 'analyze' in dashboard), we can't save quality.
-                # Or we insert a dummy snapshot.
-                # Let's see if we can create one or just skip.
-                # For imports/MVP, user usually refreshes dashboard which triggers snapshot.
-                # BUT here we are running standalone.
-                # OPTION: Create a placeholder snapshot if needed.
-                # For now, let's try to reuse latest. If None, warn.
-                print(f"  Warning: No Analysis Snapshot found for {asset_id}. Creating temporary one.")
-                
-                # Create dummy snapshot for today
-                snap_id = str(uuid.uuid4())
-                today = datetime.date.today().isoformat()
-                cursor.execute("""
-                    INSERT INTO analysis_snapshot (snapshot_id, asset_id, as_of_date, risk_level, valuation_status)
-                    VALUES (?, ?, ?, 'UNKNOWN', 'UNKNOWN')
-                """, (snap_id, asset_id, today))
-                conn.commit() # Commit snapshot first
-                
-            else:
-                snap_id = snap_res[0]
-
-            # Save
-            save_quality_snapshot(
-                snapshot_id=snap_id,
-                asset_id=asset_id,
-                revenue_stability_flag=result["revenue_stability_flag"],
-                cyclicality_flag=result["cyclicality_flag"],
-                moat_proxy_flag=result["moat_proxy_flag"],
-                balance_sheet_flag=result["balance_sheet_flag"],
-                cashflow_coverage_flag=result["cashflow_coverage_flag"],
-                leverage_risk_flag=result["leverage_risk_flag"],
-                payout_consistency_flag=result["payout_consistency_flag"],
-                dilution_risk_flag=result["dilution_risk_flag"],
-                regulatory_dependence_flag=result["regulatory_dependence_flag"],
-                quality_buffer_level=result["quality_buffer_level"],
-                quality_summary=result["quality_summary"],
-                notes={"details": result["quality_notes"]}
-            )
-            print(f"  Saved quality buffer: {result['quality_buffer_level']}")
-            
-        except Exception as e:
-            print(f"  Error analyzing {asset_id}: {e}")
-            import traceback
-            traceback.print_exc()
+    fundamentals = load_fundamentals_frame(conn)
+    print(f"Found {len(fundamentals)} assets to analyze.")
+    if fundamentals.empty:
+        conn.close()
+        return
+
+    # Run analysis (columnar, whole universe in one pass)
+    results = build_quality_flags_frame(fundamentals)
+    snap_ids = resolve_snapshot_ids(conn, list(results.index))
+
+    records = []
+    for asset_id, r in zip(results.index, results.to_dict("records")):
+        records.append({
+            **r,
+            "snapshot_id": snap_ids[asset_id],
+            "asset_id": asset_id,
+            "notes": {"details": r["quality_notes"]},
+        })
+
+    n = save_quality_snapshots_bulk(records, conn=conn)
+    print(results["quality_buffer_level"].value_counts().to_string())
 
     conn.close()
-    print("Done.")
+    print(f"Done. Saved {n} quality snapshots.")
 
 if __name__ == "__main__":
     main()
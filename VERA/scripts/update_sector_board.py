@@ -0,0 +1,29 @@
+"""
+Compute the daily sector board (1M/3M/6M RS vs market, 10Y position, D-state)
+for every active sector proxy in sector_proxy_map.
+
+Usage (from VERA root):
+    python scripts/update_sector_board.py              # 截至今天
+    python scripts/update_sector_board.py 2026-06-30   # 指定日期
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import init_db
+from analysis.sector_board import run_sector_board_job
+
+
+def main():
+    init_db()
+    as_of_date = sys.argv[1] if len(sys.argv) > 1 else None
+    board = run_sector_board_job(as_of_date)
+    print(f"✅ sector_board refreshed: {len(board)} sectors")
+    if not board.empty:
+        cols = ["as_of_date", "market", "rank_rs_3m", "sector_etf_id", "sector_name", "rs_3m", "position_pct", "dd_state"]
+        print(board.sort_values(["market", "rank_rs_3m"])[cols].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Recompute empirical D-state transition / dwell / risk-event statistics
+over the whole drawdown_state_history table.
+
+Usage (from VERA root):
+    python scripts/update_state_transition_stats.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import init_db
+from analysis.state_transitions import run_state_transition_job
+
+
+def main():
+    init_db()
+    n = run_state_transition_job()
+    print(f"✅ state_transition_stats refreshed: {n} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Shared fixture: point db.connection at a throwaway SQLite file initialised from db/schema.sql
+"""
+import os
+import tempfile
+import unittest
+
+import db.connection
+
+
+def use_temp_db(test: unittest.TestCase, symbol_map: bool = False) -> str:
+    """
+    创建临时库并改写 db.connection.DB_PATH，执行 init_db()；测试结束时 (addCleanup) 恢复路径并删除文件
+    symbol_map: 额外创建 asset_symbol_map (不在 schema.sql 中，canonical 解析会查询)
+    Returns: 临时库路径
+    """
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    orig = db.connection.DB_PATH
+    db.connection.DB_PATH = path
+    test.addCleanup(os.remove, path)
+    test.addCleanup(setattr, db.connection, "DB_PATH", orig)
+
+    db.connection.init_db()
+    if symbol_map:
+        conn = db.connection.get_connection()
+        conn.execute("CREATE TABLE asset_symbol_map (canonical_id TEXT, symbol TEXT, priority INTEGER, is_active INTEGER)")
+        conn.commit()
+        conn.close()
+    return path
@@ -0,0 +1,137 @@
+import sqlite3
+import unittest
+from core.alert_engine import (
+    CompiledAlertRules, StateChange, evaluate_changes, run_alerts, AlertSink,
+    RULE_STATE_TRANSITION, RULE_RISK_EVENT
+)
+from core.config_loader import load_vera_rules
+
+
+class _ListSink(AlertSink):
+    def __init__(self):
+        self.received = []
+
+    def send(self, alerts):
+        self.received.extend(alerts)
+
+
+class _FailingSink(AlertSink):
+    def send(self, alerts):
+        raise ConnectionError("webhook down")
+
+
+def _memory_db():
+    conn = sqlite3.connect(":memory:")
+    with open("db/schema.sql", "r") as f:
+        conn.executescript(f.read())
+    return conn
+
+
+def _add_pe(conn, snap, asset, date, pct):
+    conn.execute("INSERT INTO analysis_snapshot (snapshot_id, asset_id, as_of_date) VALUES (?, ?, ?)", (snap, asset, date))
+    conn.execute("INSERT INTO metric_details (snapshot_id, metric_key, value, percentile) VALUES (?, 'pe_ttm', 10, ?)", (snap, pct))
+
+
+class TestAlertEngine(unittest.TestCase):
+    def setUp(self):
+        self.compiled = CompiledAlertRules(load_vera_rules())
+
+    def test_compiled_lookup(self):
+        codes = {r.code for r in self.compiled.by_transition[("D4", "D5")]}
+        self.assertEqual(codes, {"DSTATE_RECOVERY_CONFIRMED", "DSTATE_ANY_TRANSITION"})
+        self.assertEqual([r.code for r in self.compiled.by_event["FAILED_RECOVERY"]], ["EVENT_FAILED_RECOVERY"])
+        self.assertEqual(self.compiled.band_of(5), "DEEP_UNDERVALUE")
+        self.assertNotIn(("D3", "D3"), self.compiled.by_transition)
+
+    def test_evaluate_dedupes_per_asset_rule_day(self):
+        changes = [
+            StateChange(RULE_STATE_TRANSITION, "AAPL", "2026-01-05", "D1", "D2", {}),
+            StateChange(RULE_STATE_TRANSITION, "AAPL", "2026-01-05", "D1", "D2", {}),
+            StateChange(RULE_RISK_EVENT, "AAPL", "2026-01-05", "D4", "SECONDARY_DRAWDOWN", {"state_to": "D3"}),
+        ]
+        alerts = evaluate_changes(changes, self.compiled)
+        self.assertEqual(
+            sorted(a.rule_code for a in alerts),
+            ["DSTATE_ANY_TRANSITION", "DSTATE_DETERIORATION", "EVENT_SECONDARY_DRAWDOWN"]
+        )
+
+    def test_run_alerts_incremental(self):
+        conn = _memory_db()
+
+        def add_state(asset, date, prev, state, is_transition):
+            conn.execute("""
+                INSERT INTO drawdown_state_history
+                (asset_id, trade_date, raw_state, confirmed_state, prev_state, is_transition)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (asset, date, state, state, prev, is_transition))
+
+        add_state("AAPL", "2026-01-05", "D1", "D1", 0)
+        add_state("AAPL", "2026-01-06", "D1", "D2", 1)
+        _add_pe(conn, "s1", "AAPL", "2026-01-05", 0.50)
+        _add_pe(conn, "s2", "AAPL", "2026-01-06", 0.80)
+        conn.execute("""
+            INSERT INTO risk_events (asset_id, event_type, event_start_date, state_from, state_to, severity_level)
+            VALUES ('TSLA', 'FAILED_RECOVERY', '2026-01-06', 'D5', 'D2', '极危险')
+        """)
+        conn.commit()
+
+        sink = _ListSink()
+        first = run_alerts([sink], conn=conn)
+        self.assertEqual(
+            sorted(a.rule_code for a in first),
+            ["DSTATE_ANY_TRANSITION", "DSTATE_DETERIORATION", "EVENT_FAILED_RECOVERY", "VALUATION_INTO_EXPENSIVE"]
+        )
+        self.assertEqual(len(sink.received), 4)
+
+        # Nothing new -> nothing delivered
+        self.assertEqual(run_alerts([sink], conn=conn), [])
+
+        # Same transition re-written for the same day (INSERT OR REPLACE => new id) is deduped
+        conn.execute("DELETE FROM drawdown_state_history WHERE trade_date = '2026-01-06'")
+        add_state("AAPL", "2026-01-06", "D1", "D2", 1)
+        conn.commit()
+        self.assertEqual(run_alerts([sink], conn=conn), [])
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM alert_log").fetchone()[0], 4)
+        conn.close()
+
+    def test_valuation_band_compares_with_stored_baseline(self):
+        conn = _memory_db()
+        _add_pe(conn, "s1", "AAPL", "2026-01-05", 0.50)
+        conn.commit()
+        self.assertEqual(run_alerts([_ListSink()], conn=conn), [])
+        self.assertEqual(
+            conn.execute("SELECT percentile FROM alert_valuation_state WHERE asset_id = 'AAPL'").fetchone()[0], 0.50
+        )
+
+        # 下一次运行只看到新行，上一档来自 alert_valuation_state
+        _add_pe(conn, "s2", "AAPL", "2026-01-06", 0.80)
+        conn.commit()
+        self.assertEqual([a.rule_code for a in run_alerts([_ListSink()], conn=conn)], ["VALUATION_INTO_EXPENSIVE"])
+        conn.close()
+
+    def test_failed_delivery_is_resent(self):
+        conn = _memory_db()
+        conn.execute("""
+            INSERT INTO risk_events (asset_id, event_type, event_start_date, state_from, state_to, severity_level)
+            VALUES ('TSLA', 'FAILED_RECOVERY', '2026-01-06', 'D5', 'D2', '极危险')
+        """)
+        conn.commit()
+
+        first = run_alerts([_FailingSink()], conn=conn)
+        self.assertEqual([a.rule_code for a in first], ["EVENT_FAILED_RECOVERY"])
+        self.assertIsNone(conn.execute("SELECT delivered_at FROM alert_log").fetchone()[0])
+
+        # 无新变更，但上次失败的告警被补发并标记为已投递
+        sink = _ListSink()
+        self.assertEqual(run_alerts([sink], conn=conn), [])
+        self.assertEqual([a.rule_code for a in sink.received], ["EVENT_FAILED_RECOVERY"])
+        self.assertEqual(sink.received[0].context, first[0].context)
+        self.assertIsNotNone(conn.execute("SELECT delivered_at FROM alert_log").fetchone()[0])
+
+        run_alerts([sink], conn=conn)
+        self.assertEqual(len(sink.received), 1)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
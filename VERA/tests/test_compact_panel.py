@@ -0,0 +1,87 @@
+import sqlite3
+import unittest
+import numpy as np
+import pandas as pd
+from data.compact_panel import CompactPanel, day_ordinal, estimate_nbytes, load_compact_panel
+from data.price_panel import build_aligned_panel
+
+US = "US:INDEX:SPX"
+HK = "HK:STOCK:00700"
+
+
+class TestCompactPanel(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript(open("db/schema.sql").read())
+        self.conn.execute("CREATE TABLE asset_symbol_map (canonical_id TEXT, symbol TEXT, priority INTEGER, is_active INTEGER)")
+
+        self.days = pd.bdate_range("2024-01-01", periods=30).strftime("%Y-%m-%d")
+        rng = np.random.default_rng(7)
+        self.us = 4000 * np.exp(np.cumsum(rng.normal(0, 0.01, 30)))
+        rows = [(US, d, float(c), 3_000_000_123 + i) for i, (d, c) in enumerate(zip(self.days, self.us))]
+        rows += [(HK, d, 300.0 + i, 1000) for i, d in enumerate(self.days) if i != 5]
+        rows[3] = (US, self.days[3] + " 00:00:00", rows[3][2], rows[3][3])   # 历史日期格式
+        rows.append((HK, "2024-01-06", 1.0, 1))                              # 周末脏数据
+        self.conn.executemany(
+            "INSERT INTO vera_price_cache (symbol, trade_date, close, volume) VALUES (?, ?, ?, ?)", rows
+        )
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_layout_and_precision(self):
+        panel = load_compact_panel(start_date=self.days[0], end_date=self.days[-1],
+                                   fields=("close", "volume"), conn=self.conn)
+
+        self.assertEqual(panel.asset_ids, [HK, US])
+        self.assertEqual(panel.shape, (30, 2))
+        self.assertEqual(panel.days.dtype, np.int32)
+        self.assertEqual(panel.days[0], day_ordinal("2024-01-01"))
+        self.assertEqual(panel.values("close").dtype, np.float32)
+        self.assertTrue(panel.values("close").flags["C_CONTIGUOUS"])
+        self.assertEqual(panel.values("volume").dtype, np.float64)          # 大整数成交量不丢精度
+        self.assertEqual(panel.col(US, "volume")[3], 3_000_000_126)
+
+        # float32 单值相对误差 ≤ 2^-24
+        rel = np.abs(panel.col(US).astype(np.float64) - self.us) / self.us
+        self.assertLessEqual(rel.max(), 2.0 ** -24)
+
+        hk = panel.col(HK)
+        self.assertTrue(np.isnan(hk[5]) and not panel.observed[5, panel.index_of(HK)])
+        self.assertEqual(int(panel.observed.sum()), 59)
+
+        long = panel.to_long()
+        self.assertEqual(len(long), 59)
+        self.assertIsInstance(long["asset_id"].dtype, pd.CategoricalDtype)
+        self.assertEqual(panel.to_frame().loc[pd.Timestamp(self.days[1]), US], np.float32(self.us[1]))
+
+        sub = panel.window(self.days[10], self.days[14])
+        self.assertEqual(sub.shape, (5, 2))
+        self.assertTrue(np.shares_memory(sub.values("close"), panel.values("close")))
+
+    def test_requested_columns_and_float64(self):
+        panel = load_compact_panel([US, HK, US], self.days[0], self.days[9], dtype=np.float64, conn=self.conn)
+        self.assertEqual(panel.asset_ids, [US, HK])
+        self.assertEqual(panel.shape, (10, 2))
+        np.testing.assert_array_equal(panel.col(US), self.us[:10])
+
+    def test_from_aligned_and_estimate(self):
+        dates = pd.to_datetime(self.days[:10])
+        aligned = build_aligned_panel(
+            {US: pd.Series(self.us[:10], index=dates), HK: pd.Series([1.0, 2.0], index=dates[[0, 4]])},
+            calendar="US", ffill_limit=2, markets={US: "US", HK: "HK"}, conn=self.conn,
+        )
+        compact = CompactPanel.from_aligned(aligned)
+        self.assertEqual(compact.shape, aligned.values.shape)
+        np.testing.assert_array_equal(compact.observed, aligned.observed)
+        np.testing.assert_array_equal(compact.col(HK)[:4], np.array([1.0, 1.0, 1.0, np.nan], dtype=np.float32))
+
+        # 10 年 × 5,000 资产：float32 单字段约 63 MB (含 observed)
+        self.assertLess(estimate_nbytes(2520, 5000), 64 * 2 ** 20)
+        self.assertLess(estimate_nbytes(2520, 5000, dtype=np.float32),
+                        estimate_nbytes(2520, 5000, dtype=np.float64))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import sqlite3
+import unittest
+import pandas as pd
+from analysis.fundamentals_derivation import (
+    annual_revenue_yoy, derive_fundamentals, run_fundamentals_derivation_job, load_or_derive,
+)
+from core.dividend_engine import dividend_facts_from_derived
+from core.earnings_state import compute_eps_yoy, earnings_inputs_from_derived
+from db.financial_derived import load_financial_derived
+
+
+def _history():
+    # A: 年报 2018-2023，2022 年末报告日偏移 3 天；B: 两期，无分红
+    return pd.DataFrame({
+        "asset_id": ["A"] * 6 + ["B"] * 2,
+        "report_date": ["2018-12-31", "2019-12-31", "2020-12-31", "2021-12-31", "2022-12-28", "2023-12-31",
+                        "2022-06-30", "2023-06-30"],
+        "eps_ttm": [1.0, 1.2, 0.6, 0.9, 1.8, 2.0, -0.5, 0.5],
+        "revenue_ttm": [100, 110, 90, 120, 130, 150, 10, 12],
+        "net_profit_ttm": [10, 12, 6, 9, 18, 20, -5, 5],
+        "dividend_amount": [4.0, 5.0, 2.0, None, 4.0, 6.0, None, None],
+    })
+
+
+class TestFundamentalsDerivation(unittest.TestCase):
+    def test_yoy_matches_loop_and_tolerates_date_offset(self):
+        derived = derive_fundamentals(_history())
+        a = derived[derived.asset_id == "A"].reset_index(drop=True)
+
+        self.assertTrue(pd.isna(a.loc[0, "eps_yoy"]))
+        self.assertAlmostEqual(a.loc[1, "eps_yoy"], 0.2)
+        # 2022-12-28 仍对齐到 2021-12-31
+        self.assertAlmostEqual(a.loc[4, "eps_yoy"], 1.0)
+        self.assertAlmostEqual(a.loc[5, "eps_yoy"], 2.0 / 1.8 - 1)
+
+        # 与逐期循环版本在标准日期上一致
+        loop = dict(compute_eps_yoy(list(zip(a.report_date, a.eps_ttm))))
+        for d, y in loop.items():
+            self.assertAlmostEqual(a.set_index("report_date").loc[d, "eps_yoy"], y)
+
+        b = derived[derived.asset_id == "B"].reset_index(drop=True)
+        self.assertAlmostEqual(b.loc[1, "eps_yoy"], 2.0)
+        self.assertTrue(b["dividends_ttm"].isna().all())
+
+    def test_dividend_stats(self):
+        derived = derive_fundamentals(_history())
+        latest = derived[derived.asset_id == "A"].iloc[-1]
+        divs = [4.0, 5.0, 2.0, 4.0, 6.0]
+
+        self.assertEqual(latest.dividends_ttm, 6.0)
+        self.assertAlmostEqual(latest.dps_5y_mean, sum(divs) / 5)
+        self.assertAlmostEqual(latest.dps_5y_std, pd.Series(divs).std(ddof=0))
+        self.assertEqual(latest.cut_years_10y, 1)
+        self.assertAlmostEqual(latest.dividend_recovery_progress, 1.0)
+        self.assertAlmostEqual(latest.payout_ratio, 0.3)
+
+        # 2021 无分红披露：沿用 2020 的分红与统计
+        row_2021 = derived[(derived.asset_id == "A") & (derived.report_date == "2021-12-31")].iloc[0]
+        self.assertEqual(row_2021.dividends_ttm, 2.0)
+        self.assertAlmostEqual(row_2021.dividend_recovery_progress, 0.4)
+
+        facts = dividend_facts_from_derived("A", latest.to_dict())
+        self.assertEqual(facts.cut_years_10y, 1)
+        self.assertIsNone(dividend_facts_from_derived("B", derived.iloc[-1].to_dict()))
+
+    def test_annual_revenue_yoy_one_value_per_year(self):
+        # 季报：每年 4 期 TTM 同比，只保留每年最后一期
+        quarters = [f"{y}-{md}" for y in range(2019, 2023) for md in ("03-31", "06-30", "09-30", "12-31")]
+        history = pd.DataFrame({
+            "asset_id": "Q", "report_date": quarters,
+            "eps_ttm": 1.0, "revenue_ttm": [100 + 10 * i for i in range(len(quarters))],
+            "net_profit_ttm": 1.0, "dividend_amount": None,
+        })
+        derived = derive_fundamentals(history)
+        yoy = annual_revenue_yoy(derived)["Q"]
+
+        by_date = derived.set_index("report_date")["revenue_yoy"]
+        self.assertEqual(yoy, [by_date["2020-12-31"], by_date["2021-12-31"], by_date["2022-12-31"]])
+        self.assertEqual(annual_revenue_yoy(derived.to_dict("records"))["Q"], yoy)
+
+    def test_job_roundtrip(self):
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        with open("db/schema.sql", "r") as f:
+            conn.executescript(f.read())
+        h = _history()
+        conn.executemany(
+            "INSERT INTO financial_history (asset_id, report_date, eps_ttm, revenue_ttm, net_profit_ttm, dividend_amount) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [tuple(None if pd.isna(v) else v for v in r) for r in h.itertuples(index=False)]
+        )
+
+        self.assertEqual(run_fundamentals_derivation_job(conn=conn), len(h))
+        rows = load_financial_derived("A", as_of_date="2022-12-31", conn=conn).to_dict("records")
+        self.assertEqual(len(rows), 5)
+
+        eps_series, yoy_series = earnings_inputs_from_derived(rows)
+        self.assertEqual(len(eps_series), 5)
+        self.assertEqual(len(yoy_series), 4)
+
+        # 按资产重算只替换该资产
+        self.assertEqual(run_fundamentals_derivation_job(["B"], conn=conn), 2)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM financial_derived").fetchone()[0], len(h))
+        conn.close()
+
+    def test_history_write_invalidates_and_rederives(self):
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        with open("db/schema.sql", "r") as f:
+            conn.executescript(f.read())
+        h = _history()
+        conn.executemany(
+            "INSERT INTO financial_history (asset_id, report_date, eps_ttm, revenue_ttm, net_profit_ttm, dividend_amount) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [tuple(None if pd.isna(v) else v for v in r) for r in h.itertuples(index=False)]
+        )
+        run_fundamentals_derivation_job(conn=conn)
+
+        # 新一期财报写入 (不经派生任务) -> 只作废 A 的衍生行
+        conn.execute(
+            "INSERT INTO financial_history (asset_id, report_date, eps_ttm, revenue_ttm, net_profit_ttm, dividend_amount) "
+            "VALUES ('A', '2024-12-31', 2.4, 160, 24, 7.0)"
+        )
+        self.assertTrue(load_financial_derived("A", conn=conn).empty)
+        self.assertEqual(len(load_financial_derived("B", conn=conn)), 2)
+
+        derived = load_or_derive("A", conn=conn)
+        self.assertEqual(derived["report_date"].iloc[-1], "2024-12-31")
+        self.assertAlmostEqual(derived["eps_yoy"].iloc[-1], 0.2)
+        self.assertEqual(len(load_financial_derived("A", conn=conn)), 7)
+
+        # 原地修正同样作废
+        conn.execute("UPDATE financial_history SET eps_ttm = 3.0 WHERE asset_id = 'A' AND report_date = '2024-12-31'")
+        self.assertAlmostEqual(load_or_derive("A", conn=conn)["eps_yoy"].iloc[-1], 0.5)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
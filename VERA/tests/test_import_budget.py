@@ -0,0 +1,69 @@
+import ast
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+
+# app.py 冷启动时不允许加载的重型子系统 (应在对应页面内延迟导入)
+HEAVY_MODULES = (
+    "pandas", "numpy", "scipy", "yaml", "PIL", "pytesseract", "requests",
+    "engine.snapshot_builder", "analysis.position_rs", "analysis.valuation",
+    "analysis.dashboard", "utils.ocr_engine", "utils.ocr_pipeline",
+)
+
+# 顶层项目模块合计导入耗时预算 (python -X importtime 累计微秒)
+IMPORT_BUDGET_US = 300_000
+
+
+def _app_top_level_imports():
+    """app.py 模块级 import (不含 TYPE_CHECKING 块与函数内导入)，排除 streamlit / __future__"""
+    tree = ast.parse(open(APP_PATH, encoding="utf-8").read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return [m for m in modules if m.split(".")[0] not in ("streamlit", "__future__")]
+
+
+def _importtime(modules):
+    """子进程 python -X importtime 导入 modules，返回 {module: cumulative_us}"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if cumulative.strip().isdigit():
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+
+class TestAppImportBudget(unittest.TestCase):
+    def test_no_heavy_module_at_top_level(self):
+        for module in _app_top_level_imports():
+            self.assertFalse(
+                module.startswith(HEAVY_MODULES),
+                f"app.py 顶层导入了重型模块 {module}，请移入使用它的页面函数",
+            )
+
+    def test_transitive_imports_within_budget(self):
+        modules = _app_top_level_imports()
+        timings = _importtime(modules)
+
+        loaded_heavy = sorted(m for m in timings if m.split(".")[0] in HEAVY_MODULES or m in HEAVY_MODULES)
+        self.assertEqual(loaded_heavy, [], f"冷启动链路间接加载了重型模块: {loaded_heavy}")
+
+        total_us = sum(timings.get(m, 0) for m in modules)
+        self.assertLess(total_us, IMPORT_BUDGET_US, f"app.py 顶层导入耗时 {total_us / 1000:.1f}ms 超出预算")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+import pandas as pd
+import db.connection
+from engine.incremental_updater import find_assets_with_new_rows, save_watermark, step_state_machine
+from tests.temp_db import use_temp_db
+
+
+class TestIncrementalUpdater(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self)
+
+        conn = db.connection.get_connection()
+        dates = pd.bdate_range("2024-01-01", periods=60).strftime("%Y-%m-%d")
+        closes = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, len(dates))))
+        conn.executemany(
+            "INSERT INTO vera_price_cache (symbol, trade_date, close) VALUES (?, ?, ?)",
+            [("AAA", d, float(c)) for d, c in zip(dates, closes)] +
+            [("BBB", d, 10.0) for d in dates[:30]]
+        )
+        conn.commit()
+        conn.close()
+        self.dates = dates
+        self.closes = pd.Series(closes, index=pd.to_datetime(dates))
+
+    def test_watermark_detection(self):
+        pending = {p["asset_id"]: p for p in find_assets_with_new_rows()}
+        self.assertEqual(set(pending), {"AAA", "BBB"})
+        self.assertIsNone(pending["AAA"]["prev_hwm"])
+        self.assertEqual(pending["AAA"]["new_hwm"], self.dates[-1])
+
+        save_watermark("AAA", self.dates[-1])
+        save_watermark("BBB", self.dates[10])
+        pending = {p["asset_id"]: p for p in find_assets_with_new_rows()}
+        self.assertEqual(set(pending), {"BBB"})
+        self.assertEqual(pending["BBB"]["prev_hwm"], self.dates[10])
+
+    def test_state_history_used_as_initial_watermark(self):
+        conn = db.connection.get_connection()
+        conn.execute(
+            "INSERT INTO drawdown_state_history (asset_id, trade_date, raw_state, confirmed_state) VALUES ('BBB', ?, 'D0', 'D0')",
+            (self.dates[29],)
+        )
+        conn.commit()
+        conn.close()
+        pending = {p["asset_id"]: p for p in find_assets_with_new_rows()}
+        self.assertNotIn("BBB", pending)
+
+    def test_step_only_new_dates(self):
+        save_watermark("AAA", self.dates[49])
+        conn = db.connection.get_connection()
+        conn.execute(
+            "INSERT INTO drawdown_state_history (asset_id, trade_date, raw_state, confirmed_state) VALUES ('AAA', ?, 'D0', 'D0')",
+            (self.dates[49],)
+        )
+        conn.commit()
+
+        raw_info, confirmed = step_state_machine("AAA", self.closes, self.dates[49])
+        stepped = [r[0] for r in conn.execute(
+            "SELECT trade_date FROM drawdown_state_history WHERE asset_id = 'AAA' ORDER BY trade_date"
+        ).fetchall()]
+        conn.close()
+
+        self.assertEqual(stepped, list(self.dates[49:]))
+        self.assertIn(confirmed["state"], {"D0", "D1", "D2", "D3", "D4", "D5", "D6"})
+
+
+if __name__ == '__main__':
+    unittest.main()
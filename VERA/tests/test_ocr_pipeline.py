@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from utils import ocr_pipeline
+from utils.ocr_pipeline import run_ocr_batch, list_images, load_cached_results, content_hash
+
+
+def fake_ocr(image_bytes):
+    text = image_bytes.decode()
+    if text.startswith("bad"):
+        return {"error": "unreadable"}
+    return {"symbol": text, "price": 1.0}
+
+
+def improved_ocr(image_bytes):
+    return {**fake_ocr(image_bytes), "price": 2.0}
+
+
+class TestOcrPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name, content in [("a.png", "00700.HK"), ("b.png", "AAPL"), ("c.jpg", "AAPL"),
+                              ("d.png", "bad-image"), ("notes.txt", "skip")]:
+            with open(os.path.join(self.tmp.name, name), "w") as f:
+                f.write(content)
+        self.conn = sqlite3.connect(":memory:")
+        with open("db/schema.sql", "r") as f:
+            self.conn.executescript(f.read())
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_batch_and_cache(self):
+        paths = list_images(self.tmp.name)
+        self.assertEqual([os.path.basename(p) for p in paths], ["a.png", "b.png", "c.jpg", "d.png"])
+
+        first = run_ocr_batch(paths, max_workers=2, ocr_fn=fake_ocr, conn=self.conn)
+        self.assertEqual([i["result"].get("symbol") for i in first], ["00700.HK", "AAPL", "AAPL", None])
+        self.assertFalse(any(i["cached"] for i in first))
+
+        # 相同内容只缓存一条；失败结果不缓存
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM ocr_result_cache").fetchone()[0], 2)
+        self.assertNotIn(content_hash(b"bad-image"), load_cached_results([content_hash(b"bad-image")], conn=self.conn))
+
+        second = run_ocr_batch(paths, max_workers=2, ocr_fn=fake_ocr, conn=self.conn)
+        self.assertEqual([i["cached"] for i in second], [True, True, True, False])
+        self.assertEqual(second[0]["result"], {"symbol": "00700.HK", "price": 1.0})
+
+    def test_parser_version_invalidates_cache(self):
+        paths = list_images(self.tmp.name)[:1]
+        run_ocr_batch(paths, max_workers=1, ocr_fn=fake_ocr, conn=self.conn)
+
+        with mock.patch.object(ocr_pipeline, "OCR_PARSER_VERSION", ocr_pipeline.OCR_PARSER_VERSION + 1):
+            rerun = run_ocr_batch(paths, max_workers=1, ocr_fn=improved_ocr, conn=self.conn)
+            self.assertFalse(rerun[0]["cached"])
+            self.assertEqual(rerun[0]["result"]["price"], 2.0)
+            again = run_ocr_batch(paths, max_workers=1, ocr_fn=improved_ocr, conn=self.conn)
+            self.assertTrue(again[0]["cached"])
+
+        # 旧行已被新版本覆盖，不会保留两份
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM ocr_result_cache").fetchone()[0], 1)
+
+
+class TestOcrJobEviction(unittest.TestCase):
+    def setUp(self):
+        ocr_pipeline._JOBS.clear()
+
+    def tearDown(self):
+        ocr_pipeline._JOBS.clear()
+
+    def _job(self, finished):
+        return {"content_hash": "h", "source_name": None, "future": None, "result": {},
+                "cached": True, "finished": finished}
+
+    def test_evicts_expired_and_overflow_but_keeps_pending(self):
+        jobs = ocr_pipeline._JOBS
+        jobs["pending"] = self._job(None)
+        jobs["old"] = self._job(0.0)
+        for i in range(3):
+            jobs[f"done{i}"] = self._job(5000.0 + i)
+
+        with mock.patch.object(ocr_pipeline, "OCR_MAX_JOBS", 2), \
+             mock.patch.object(ocr_pipeline.time, "monotonic", return_value=5000.0 + ocr_pipeline.OCR_JOB_TTL):
+            with ocr_pipeline._LOCK:
+                ocr_pipeline._evict_finished()
+
+        self.assertEqual(sorted(jobs), ["done1", "done2", "pending"])
+        self.assertEqual(ocr_pipeline.poll_ocr_job("old")["status"], "unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
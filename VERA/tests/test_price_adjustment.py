@@ -0,0 +1,124 @@
+import unittest
+import numpy as np
+import pandas as pd
+import db.connection
+from data.price_adjustment import (
+    compute_adjustment_factors, save_corporate_actions, refresh_adjustment_factors
+)
+from data.price_ingest import ingest_prices
+from data.price_cache import load_price_series
+from tests.temp_db import use_temp_db
+
+ASSET = "US:STOCK:TSLA"
+
+
+class TestPriceAdjustment(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self)
+
+        # 100 -> 1 拆 5 (day 10 起 20) -> 分红 1.0 (day 20 起除息)
+        self.dates = pd.bdate_range("2024-01-01", periods=30).strftime("%Y-%m-%d")
+        closes = [100.0] * 10 + [20.0] * 10 + [19.0] * 10
+        conn = db.connection.get_connection()
+        conn.executemany(
+            "INSERT INTO vera_price_cache (symbol, trade_date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(ASSET, d, c, c, c, c, 1000) for d, c in zip(self.dates, closes)]
+        )
+        conn.commit()
+        conn.close()
+
+    def test_factor_segments(self):
+        actions = pd.DataFrame({
+            "asset_id": ["A", "A", "B"],
+            "ex_date": ["2024-02-01", "2024-03-01", "2024-02-01"],
+            "split_factor": [2.0, None, None],
+            "cash_dividend": [None, 1.0, 0.5],
+        })
+        prev = pd.DataFrame({
+            "asset_id": ["A", "A", "B"],
+            "ex_date": ["2024-02-01", "2024-03-01", "2024-02-01"],
+            "prev_close": [50.0, 20.0, None],
+        })
+        f = compute_adjustment_factors(actions, prev)
+
+        a = f[f.asset_id == "A"].reset_index(drop=True)
+        self.assertEqual(list(a.valid_from), ["0000-01-01", "2024-02-01"])
+        self.assertEqual(list(a.valid_to), ["2024-02-01", "2024-03-01"])
+        self.assertAlmostEqual(a.cum_factor[1], 0.95)
+        self.assertAlmostEqual(a.cum_factor[0], 0.5 * 0.95)
+        self.assertEqual(list(a.cum_split), [2.0, 1.0])
+        self.assertEqual(list(a.dividend_pending), [0, 0])
+        # 缺少除权前收盘价：分红不调整，记为待补
+        self.assertAlmostEqual(f[f.asset_id == "B"].cum_factor.iloc[0], 1.0)
+        self.assertEqual(f[f.asset_id == "B"].dividend_pending.iloc[0], 1)
+
+    def test_adjusted_read_removes_split_drawdown(self):
+        raw = load_price_series(ASSET, self.dates[0], self.dates[-1])
+        save_corporate_actions([
+            {"asset_id": ASSET, "ex_date": self.dates[10], "split_factor": 5.0},
+            {"asset_id": ASSET, "ex_date": self.dates[20], "cash_dividend": 1.0},
+        ])
+        adj = load_price_series(ASSET, self.dates[0], self.dates[-1], adjusted=True)
+
+        self.assertEqual(len(adj), len(raw))
+        self.assertEqual(adj.close.iloc[-1], raw.close.iloc[-1])     # 尾端对齐
+        np.testing.assert_allclose(adj.close.iloc[:20], 19.0)         # 拆股与分红均被平滑
+        # 成交量只按拆股调整 (拆股前 ×5)，分红不影响
+        self.assertEqual(list(adj.volume), [5000] * 10 + [1000] * 20)
+        self.assertEqual(refresh_adjustment_factors(), [])
+
+    def test_invalidation_on_new_action(self):
+        save_corporate_actions([{"asset_id": ASSET, "ex_date": self.dates[10], "split_factor": 5.0}])
+        before = load_price_series(ASSET, self.dates[0], self.dates[0], adjusted=True).close.iloc[0]
+        self.assertAlmostEqual(before, 20.0)
+
+        # 同一事件修正 -> 因子随写入重算
+        save_corporate_actions([{"asset_id": ASSET, "ex_date": self.dates[10], "split_factor": 4.0}])
+        after = load_price_series(ASSET, self.dates[0], self.dates[0], adjusted=True).close.iloc[0]
+        self.assertAlmostEqual(after, 25.0)
+
+        # 直接删除公司行为后由 refresh 补算
+        conn = db.connection.get_connection()
+        conn.execute("DELETE FROM corporate_actions")
+        conn.commit()
+        conn.close()
+        self.assertEqual(refresh_adjustment_factors(), [ASSET])
+        self.assertAlmostEqual(load_price_series(ASSET, self.dates[0], self.dates[0], adjusted=True).close.iloc[0], 100.0)
+
+
+    def test_dividend_recomputed_when_prev_close_arrives(self):
+        ex_date = self.dates[20]
+        conn = db.connection.get_connection()
+        conn.execute("DELETE FROM vera_price_cache WHERE trade_date < ?", (ex_date,))
+        conn.commit()
+        conn.close()
+
+        save_corporate_actions([{"asset_id": ASSET, "ex_date": ex_date, "cash_dividend": 1.0}])
+        # 除权前无价格：暂不调整
+        self.assertEqual(refresh_adjustment_factors(), [])
+
+        # 除权前价格后补写入 -> 因子随写入重算
+        ingest_prices(
+            [{"symbol": ASSET, "trade_date": d, "close": 20.0, "volume": 1000} for d in self.dates[:20]],
+            source="test", resolve=False,
+        )
+        adj = load_price_series(ASSET, self.dates[19], self.dates[19], adjusted=True)
+        self.assertAlmostEqual(adj.close.iloc[0], 19.0)
+        self.assertEqual(refresh_adjustment_factors(), [])
+
+        # 绕过 ingest_prices 直接写库时由 refresh 补算
+        conn = db.connection.get_connection()
+        conn.execute("DELETE FROM vera_price_cache WHERE trade_date < ?", (ex_date,))
+        conn.commit()
+        save_corporate_actions([{"asset_id": ASSET, "ex_date": ex_date, "cash_dividend": 1.0}], conn=conn)
+        conn.execute(
+            "INSERT INTO vera_price_cache (symbol, trade_date, close, volume) VALUES (?, ?, 20.0, 1000)",
+            (ASSET, self.dates[19])
+        )
+        conn.commit()
+        self.assertEqual(refresh_adjustment_factors(conn=conn), [ASSET])
+        self.assertEqual(refresh_adjustment_factors(conn=conn), [])
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import sqlite3
+import unittest
+import db.connection
+from data.price_cache import load_price_series, save_daily_price
+from data.price_ingest import ingest_prices, merge_symbol_prices, check_price_cache_integrity, normalize_price_cache_dates
+from tests.temp_db import use_temp_db
+
+HSBC = "HK:STOCK:00005"
+
+
+class TestPriceIngest(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self, symbol_map=True)
+
+    def _rows(self, sql, params=()):
+        conn = db.connection.get_connection()
+        try:
+            return [tuple(r) for r in conn.execute(sql, params).fetchall()]
+        finally:
+            conn.close()
+
+    def test_aliases_collapse_to_canonical_key(self):
+        # raw / canonical 别名 + 不同日期格式 + 批内重复 -> 同一主键只写一行 (保留最后一行)
+        result = ingest_prices([
+            {"symbol": "00005.hk", "trade_date": "2024-01-03 00:00:00", "close": 60.0, "volume": 10},
+            {"symbol": HSBC, "trade_date": "2024-01-02", "close": 59.0},
+            {"symbol": "5.HK", "trade_date": "2024/01/03", "close": 61.0, "volume": None},
+            {"symbol": "00005.HK", "trade_date": None, "close": 1.0},
+        ], "unit_csv")
+
+        self.assertEqual(result["rows"], 2)
+        self.assertEqual(result["dropped"], 2)
+        self.assertEqual(result["symbols"], {HSBC: 2})
+        rows = self._rows("SELECT symbol, trade_date, close, volume, source FROM vera_price_cache ORDER BY trade_date")
+        self.assertEqual(rows, [
+            (HSBC, "2024-01-02", 59.0, 0, "unit_csv"),
+            (HSBC, "2024-01-03", 61.0, 0, "unit_csv|raw:5.HK"),
+        ])
+        self.assertEqual(self._rows("SELECT asset_id FROM assets"), [(HSBC,)])
+        self.assertEqual(
+            self._rows("SELECT source, n_input, n_rows, n_written, min_date, max_date FROM price_ingest_batch"),
+            [("unit_csv", 4, 2, 2, "2024-01-02", "2024-01-03")]
+        )
+
+    def test_modes_and_single_row_entry(self):
+        save_daily_price({"symbol": "00005.HK", "trade_date": "2024-01-02", "close": 59.0, "source": "OCR"})
+        ignored = ingest_prices([{"symbol": HSBC, "trade_date": "2024-01-02", "close": 1.0}], "x", mode="ignore")
+        self.assertEqual(ignored["written"], 0)
+        self.assertEqual(self._rows("SELECT close, source FROM vera_price_cache"), [(59.0, "OCR|raw:00005.HK")])
+
+        ingest_prices([{"symbol": HSBC, "trade_date": "2024-01-02", "close": 60.0}], "fix")
+        self.assertEqual(self._rows("SELECT close, source FROM vera_price_cache"), [(60.0, "fix")])
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            ingest_prices([{"symbol": HSBC, "trade_date": "2024-01-02", "close": 1.0}], "x", mode="fail")
+        with self.assertRaises(ValueError):
+            ingest_prices([{"symbol": "US:STOCK:NEW", "trade_date": "2024-01-02", "close": 1.0}], "x",
+                          auto_register_asset=False)
+
+    def test_merge_and_sorted_unique_reads(self):
+        conn = db.connection.get_connection()
+        conn.executemany(
+            "INSERT INTO vera_price_cache (symbol, trade_date, close) VALUES (?, ?, ?)",
+            [("00005.HK", "2024-01-04", 62.0), ("00005.HK", "2024-01-02", 58.0)]
+        )
+        conn.commit()
+        conn.close()
+        ingest_prices([{"symbol": HSBC, "trade_date": d, "close": c}
+                       for d, c in [("2024-01-03", 60.0), ("2024-01-02", 59.0)]], "csv")
+
+        self.assertEqual(merge_symbol_prices("00005.HK", HSBC), 2)
+        df = load_price_series("00005.HK", "2024-01-01", "2024-01-31")
+        self.assertEqual(list(df.trade_date), ["2024-01-02", "2024-01-03", "2024-01-04"])
+        self.assertEqual(list(df.close), [58.0, 60.0, 62.0])      # upsert：旧代码行覆盖
+        self.assertTrue(check_price_cache_integrity()["ok"])
+
+    def test_integrity_checker_on_legacy_table(self):
+        # 无主键的历史表：重复键 / 日期格式 / 非法价格 / raw 代码泄漏
+        conn = sqlite3.connect(":memory:")
+        conn.executescript("""
+            CREATE TABLE assets (asset_id TEXT PRIMARY KEY);
+            CREATE TABLE vera_price_cache (symbol TEXT, trade_date DATE, open REAL, high REAL, low REAL,
+                                           close REAL, volume INTEGER, source TEXT);
+            INSERT INTO assets VALUES ('HK:STOCK:00005');
+            INSERT INTO vera_price_cache (symbol, trade_date, high, low, close) VALUES
+                ('HK:STOCK:00005', '2024-01-02', 60, 58, 59),
+                ('HK:STOCK:00005', '2024-01-02 00:00:00', 60, 58, 59),
+                ('HK:STOCK:00005', '2024-01-03', 57, 58, 0),
+                ('00005.HK', '2024/01/04', NULL, NULL, 61);
+        """)
+        report = check_price_cache_integrity(conn)
+        conn.close()
+
+        self.assertFalse(report["ok"])
+        self.assertEqual(report["rows"], 4)
+        issues = report["issues"].set_index("symbol")
+        self.assertEqual(
+            issues.loc[HSBC, ["dup_dates", "bad_dates", "bad_close", "bad_range", "unknown_asset"]].tolist(),
+            [1, 1, 1, 1, 0]
+        )
+        self.assertEqual(issues.loc["00005.HK", ["bad_dates", "unknown_asset"]].tolist(), [1, 1])
+
+    def test_legacy_datetime_keys_migrated_once(self):
+        # ingest_prices 之前写入的 'YYYY-MM-DD HH:MM:SS' 与规范日期并存 -> init_db 迁移后每天一行
+        conn = db.connection.get_connection()
+        conn.executemany(
+            "INSERT INTO vera_price_cache (symbol, trade_date, close) VALUES (?, ?, ?)",
+            [(HSBC, "2024-01-02", 59.0), (HSBC, "2024-01-02 00:00:00", 1.0),
+             (HSBC, "2024-01-03 00:00:00", 60.0), (HSBC, "2024-01-04T00:00:00", 61.0)]
+        )
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+
+        db.connection.init_db()
+        df = load_price_series(HSBC, "2024-01-01", "2024-01-31")
+        self.assertEqual(list(df.trade_date), ["2024-01-02", "2024-01-03", "2024-01-04"])
+        self.assertEqual(list(df.close), [59.0, 60.0, 61.0])      # 规范日期行优先
+        self.assertEqual(self._rows("PRAGMA user_version"), [(len(db.connection.MIGRATIONS),)])
+        self.assertEqual(normalize_price_cache_dates(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
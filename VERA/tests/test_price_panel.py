@@ -0,0 +1,91 @@
+import sqlite3
+import unittest
+import numpy as np
+import pandas as pd
+from data.price_panel import build_aligned_panel, load_aligned_panel
+from utils.market_calendar import rebuild_trading_calendar, get_sessions, clear_calendar_cache, is_market_open
+
+US = "US:INDEX:SPX"
+US2 = "US:ETF:XLK"
+HK = "HK:STOCK:00700"
+
+
+class TestAlignedPanel(unittest.TestCase):
+    def setUp(self):
+        clear_calendar_cache()
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript(open("db/schema.sql").read())
+
+        days = pd.bdate_range("2024-01-01", periods=80)
+        self.days = days.strftime("%Y-%m-%d")
+        rng = np.random.default_rng(1)
+        self.us = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+        self.us2 = 50 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+        rows = [(US, d, float(c)) for d, c in zip(self.days, self.us)]
+        rows += [(US2, d, float(c)) for d, c in zip(self.days, self.us2)]
+        # HK: 缺 day 10 (港股假期)；US 缺 day 20 (美股假期，港股照常)
+        rows = [r for r in rows if not (r[0] == US and r[1] == self.days[20])]
+        rows += [(HK, d, 300.0 + i) for i, d in enumerate(self.days) if i != 10]
+        # 周末脏数据不进入日历
+        rows.append((US2, "2024-01-06", 1.0))
+        self.conn.executemany("INSERT INTO vera_price_cache (symbol, trade_date, close) VALUES (?, ?, ?)", rows)
+        self.conn.commit()
+
+    def tearDown(self):
+        clear_calendar_cache()
+        self.conn.close()
+
+    def test_calendar_rebuild(self):
+        summary = rebuild_trading_calendar(conn=self.conn)
+        self.assertEqual(summary["US"], 80)      # US2 覆盖 US 缺失的 day 20
+        self.assertEqual(summary["HK"], 79)
+        self.assertEqual(summary["CN"], 0)
+
+        us = get_sessions("US", self.days[5], self.days[9], conn=self.conn)
+        self.assertEqual(list(us.astype(str)), list(self.days[5:10]))
+        self.assertTrue(is_market_open("HK", self.days[11], conn=self.conn))
+        self.assertFalse(is_market_open("HK", self.days[10], conn=self.conn))
+        self.assertFalse(is_market_open("US", "2024-01-06", conn=self.conn))
+
+    def test_ffill_onto_base_calendar(self):
+        rebuild_trading_calendar(conn=self.conn)
+        panel = load_aligned_panel([US2, HK], self.days[0], self.days[-1], conn=self.conn)
+
+        self.assertEqual(panel.values.shape, (80, 2))
+        self.assertEqual(panel.dates[0], np.datetime64(self.days[0]))
+        # HK 假期按上一交易日填充，并标记为非真实 bar
+        j = panel.index_of(HK)
+        self.assertEqual(panel.values[10, j], 300.0 + 9)
+        self.assertFalse(panel.observed[10, j])
+        self.assertEqual(len(panel.series(HK)), 79)
+
+    def test_ffill_limit_and_leading_nan(self):
+        dates = pd.to_datetime(self.days[:12])
+        base = pd.Series(np.arange(12, dtype=float), index=dates)
+        sparse = pd.Series([1.0, 2.0], index=dates[[2, 4]])
+        panel = build_aligned_panel({US: base, US2: sparse}, calendar="US", ffill_limit=3, conn=self.conn)
+
+        col = panel.col(US2)
+        self.assertTrue(np.isnan(col[:2]).all())           # 首个有效值之前不填
+        self.assertEqual(list(col[2:8]), [1.0, 1.0, 2.0, 2.0, 2.0, 2.0])
+        self.assertTrue(np.isnan(col[8:]).all())           # 超过 3 个交易日不再沿用
+
+        unfilled = build_aligned_panel({US: base, US2: sparse}, ffill_limit=0, conn=self.conn)
+        self.assertEqual(int((~np.isnan(unfilled.col(US2))).sum()), 2)
+
+    def test_relative_strength_matches_inner_join(self):
+        rebuild_trading_calendar(conn=self.conn)
+        panel = load_aligned_panel([US, US2], self.days[0], self.days[-1], ffill_limit=0, conn=self.conn)
+
+        a = pd.Series(self.us2, index=pd.to_datetime(self.days))
+        b = pd.Series(self.us, index=pd.to_datetime(self.days)).drop(pd.Timestamp(self.days[20]))
+        x = pd.concat([a, b], axis=1).dropna()
+        ratio = x.iloc[:, 0] / x.iloc[:, 1]
+        expected = float(ratio.iloc[-1] / ratio.iloc[-20] - 1.0)
+
+        self.assertAlmostEqual(panel.relative_strength(US2, US, 20), expected)
+        self.assertIsNone(panel.relative_strength(US2, US, 200))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import random
+import sqlite3
+import unittest
+import pandas as pd
+from analysis.quality_assessment import build_quality_flags
+from analysis.quality_batch import build_quality_flags_frame
+from db.quality_snapshot import save_quality_snapshots_bulk
+
+
+def _random_fundamentals(rng, n):
+    def maybe(v, p=0.3):
+        return None if rng.random() < p else v
+
+    sectors = ["Utilities", "Energy", "Banks", "Technology", "Consumer Staples", "信息技术", "Other", "", None]
+    rows = []
+    for _ in range(n):
+        f = {
+            "revenue_ttm": maybe(rng.uniform(-10, 1000)),
+            "net_income_ttm": maybe(rng.uniform(-100, 300)),
+            "net_margin": maybe(rng.uniform(-0.2, 0.5), 0.6),
+            "roe": maybe(rng.uniform(-0.2, 0.5), 0.6),
+            "total_assets": maybe(rng.uniform(0, 2000)),
+            "total_liabilities": maybe(rng.uniform(0, 2000)),
+            "total_debt": maybe(rng.uniform(0, 1000)),
+            "net_debt": maybe(rng.uniform(-100, 500), 0.5),
+            "debt_to_equity": maybe(rng.uniform(0, 3), 0.5),
+            "current_ratio": maybe(rng.uniform(0, 3), 0.4),
+            "operating_cashflow_ttm": maybe(rng.uniform(-100, 300), 0.2),
+            "free_cashflow_ttm": maybe(rng.uniform(-100, 300), 0.2),
+            "interest_coverage": maybe(rng.uniform(0, 10), 0.4),
+            "dividend_yield": maybe(rng.choice([0, 0.005, 0.02])),
+            "buyback_ratio": maybe(rng.choice([0, 0.01, 0.05, -0.01]), 0.4),
+            "payout_ratio_3y": maybe(rng.uniform(0, 1), 0.6),
+            "no_dividend_history": rng.random() < 0.3,
+            "listing_years": maybe(rng.choice([0, 2, 8.5]), 0.4),
+            "shares_out_yoy_growth": maybe(rng.uniform(-0.05, 0.05), 0.5),
+            "sector": rng.choice(sectors),
+            "industry": rng.choice(sectors),
+        }
+        r = rng.random()
+        if r < 0.3:
+            f["revenue_yoy_history"] = [maybe(rng.uniform(-0.3, 0.4), 0.1) for _ in range(rng.randint(0, 6))]
+        elif r < 0.7:
+            f["revenue_history"] = [maybe(rng.uniform(50, 150), 0.1) for _ in range(rng.randint(0, 7))]
+        rows.append(f)
+    return rows
+
+
+class TestQualityBatch(unittest.TestCase):
+    def test_matches_per_asset_engine(self):
+        rows = _random_fundamentals(random.Random(7), 500)
+        frame = build_quality_flags_frame(pd.DataFrame(rows))
+
+        for i, f in enumerate(rows):
+            expected = build_quality_flags(f)
+            got = frame.iloc[i].to_dict()
+            for key, value in expected.items():
+                self.assertEqual(got[key], value, f"row {i} {key}")
+
+    def test_bulk_upsert(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("""
+            CREATE TABLE quality_snapshot (
+                snapshot_id TEXT PRIMARY KEY, asset_id TEXT,
+                revenue_stability_flag TEXT, cyclicality_flag TEXT, moat_proxy_flag TEXT,
+                balance_sheet_flag TEXT, cashflow_coverage_flag TEXT, leverage_risk_flag TEXT,
+                payout_consistency_flag TEXT, dilution_risk_flag TEXT, regulatory_dependence_flag TEXT,
+                quality_buffer_level TEXT, quality_summary TEXT, quality_notes TEXT
+            )
+        """)
+        frame = build_quality_flags_frame(pd.DataFrame(_random_fundamentals(random.Random(1), 20)))
+        records = [
+            {**r, "snapshot_id": f"S{i}", "asset_id": f"A{i}", "notes": {"details": r["quality_notes"]}}
+            for i, r in enumerate(frame.to_dict("records"))
+        ]
+
+        self.assertEqual(save_quality_snapshots_bulk(records, conn=conn), 20)
+        self.assertEqual(save_quality_snapshots_bulk(records, conn=conn), 20)  # upsert, no duplicates
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM quality_snapshot").fetchone()[0], 20)
+
+        records[0]["moat_proxy_flag"] = "GREAT"
+        with self.assertRaises(ValueError):
+            save_quality_snapshots_bulk(records, conn=conn)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
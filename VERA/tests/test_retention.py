@@ -0,0 +1,89 @@
+import json
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, timedelta
+import pandas as pd
+from db.retention import (
+    select_snapshots_to_prune, run_retention, load_archive, attach_archive, DEFAULT_POLICY
+)
+
+TODAY = date(2026, 6, 30)
+
+
+def _day(days_ago):
+    return (TODAY - timedelta(days=days_ago)).isoformat()
+
+
+class TestRetention(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.policy = {**DEFAULT_POLICY, "archive_dir": self.tmp.name}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_tiered_selection(self):
+        # 每天一条，覆盖 0~1200 天
+        snaps = pd.DataFrame({
+            "snapshot_id": [f"S{i}" for i in range(1200)],
+            "asset_id": "A",
+            "as_of_date": [_day(i) for i in range(1200)],
+            "created_at": None,
+            "has_decision": [1 if i == 1150 else 0 for i in range(1200)],
+        })
+        prune = select_snapshots_to_prune(snaps, TODAY, self.policy)
+        kept = snaps[~snaps.snapshot_id.isin(prune.snapshot_id)]
+        kept_dates = pd.to_datetime(kept.as_of_date)
+        age = (pd.Timestamp(TODAY) - kept_dates).dt.days
+
+        self.assertEqual((age <= 90).sum(), 91)
+        weekly = kept_dates[(age > 90) & (age <= 365)]
+        self.assertEqual(weekly.dt.to_period("W").value_counts().max(), 1)
+        monthly = kept_dates[(age > 365) & (age <= 1095)]
+        self.assertEqual(monthly.dt.to_period("M").value_counts().max(), 1)
+        # 超过归档阈值只剩 decision_log 引用的快照
+        self.assertEqual(list(kept[age > 1095].snapshot_id), ["S1150"])
+
+    def test_run_archives_and_compacts(self):
+        conn = sqlite3.connect(":memory:")
+        with open("db/schema.sql", "r") as f:
+            conn.executescript(f.read())
+        for i, days_ago in enumerate([1, 200, 201, 1500]):
+            sid = f"S{i}"
+            conn.execute("INSERT INTO analysis_snapshot (snapshot_id, asset_id, as_of_date) VALUES (?, 'A', ?)",
+                         (sid, _day(days_ago)))
+            conn.execute("INSERT INTO metric_details (snapshot_id, metric_key, value) VALUES (?, 'pe', 1.0)", (sid,))
+        raw = json.dumps({"peak_10y": 10.0, "trough_10y": 5.0, "current_dd": -0.2, "max_dd_cycle": -0.5, "recovery": 0.4})
+        conn.executemany(
+            "INSERT INTO drawdown_state_history (asset_id, trade_date, raw_state, raw_metrics_snapshot, confirmed_state) "
+            "VALUES ('A', ?, 'D3', ?, 'D3')",
+            [(_day(100), raw), (_day(1), raw)]
+        )
+        conn.commit()
+
+        dry = run_retention(TODAY, dry_run=True, policy=self.policy, conn=conn)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM analysis_snapshot").fetchone()[0], 4)
+        self.assertEqual(dry["state_history_compacted"], 1)
+
+        summary = run_retention(TODAY, policy=self.policy, conn=conn)
+        self.assertEqual(summary["archived_rows"]["analysis_snapshot"], 2)
+        remaining = {r[0] for r in conn.execute("SELECT snapshot_id FROM analysis_snapshot")}
+        self.assertEqual(remaining, {"S0", "S1"})  # S1/S2 同周保留较新的 S1，S3 超过归档阈值
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM metric_details").fetchone()[0], 2)
+
+        row = conn.execute(
+            "SELECT raw_metrics_snapshot, recovery, current_dd FROM drawdown_state_history WHERE trade_date = ?",
+            (_day(100),)
+        ).fetchone()
+        self.assertEqual(row, (None, 0.4, -0.2))
+
+        archived = load_archive("analysis_snapshot", archive_dir=self.tmp.name)
+        self.assertEqual(set(archived.snapshot_id), {"S2", "S3"})
+        self.assertEqual(attach_archive(conn, "metric_details", archive_dir=self.tmp.name), 2)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM archive_metric_details").fetchone()[0], 2)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
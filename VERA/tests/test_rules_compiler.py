@@ -0,0 +1,90 @@
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+from itertools import product
+from pathlib import Path
+from unittest import mock
+
+import core.config_loader as config_loader
+from core.behavior_engine import evaluate_behavior
+from core.config_loader import load_vera_rules
+from core.risk_quadrant import map_quadrant
+from core.rules_compiler import get_compiled_rules
+from core.valuation_engine import map_valuation_status_from_pctile
+
+
+def _naive_band(rules, pct):
+    for band in rules["valuation"]["bands"]:
+        lo, hi = band["range"]
+        if pct >= lo and (pct < hi or (hi == 100 and pct == 100)):
+            return band["key"]
+    return None
+
+
+def _naive_behavior(rules, d_state, quadrant, val_bucket, quality):
+    b = rules["behavior"]
+    d_group = next((g for g, states in b["d_state_groups"].items() if d_state in states), "UNKNOWN")
+    q = next((k for k, v in b["quality_buckets"].items() if quality and quality.upper() in v), "WEAK")
+    for rule in sorted(b["rules"], key=lambda x: x.get("priority", 0), reverse=True):
+        w = rule["when"]
+        if (d_group in w.get("d_state_group", []) and quadrant in w.get("quadrant", [])
+                and val_bucket in w.get("valuation_bucket", []) and q in w.get("quality_bucket", [])):
+            return rule["name"]
+    return "HardFallback"
+
+
+class TestRulesCompiler(unittest.TestCase):
+    def setUp(self):
+        self.rules = load_vera_rules()
+
+    def test_valuation_bisect_matches_linear_scan(self):
+        for pct in [x / 2 for x in range(0, 201)] + [9.999, 10.0, 89.99]:
+            self.assertEqual(map_valuation_status_from_pctile(pct).key, _naive_band(self.rules, pct), pct)
+        with self.assertRaises(ValueError):
+            map_valuation_status_from_pctile(100.5)
+        with self.assertRaises(ValueError):
+            map_valuation_status_from_pctile(float("nan"))
+
+    def test_behavior_matrix_matches_rule_walk(self):
+        states = ["D0", "D1", "D2", "D3", "D4", "D5", "D6", "DX"]
+        quads = ["Q1", "Q2", "Q3", "Q4", "UNKNOWN"]
+        buckets = ["CHEAP", "NEUTRAL", "EXPENSIVE"]
+        quality = ["HIGH", "mid", "LOW", "STRONG", "MODERATE", "WEAK", None, "??"]
+        for d, q, v, ql in product(states, quads, buckets, quality):
+            res = evaluate_behavior(d, q, v, ql)
+            self.assertEqual(res.triggered_rule_name, _naive_behavior(self.rules, d, q, v, ql), (d, q, v, ql))
+
+    def test_explicit_rules_and_quadrant(self):
+        custom = copy.deepcopy(self.rules)
+        custom["quadrant"]["matrix"] = custom["quadrant"]["matrix"][:1]
+        self.assertIs(get_compiled_rules(custom), get_compiled_rules(custom))
+        self.assertEqual(map_quadrant("HIGH", "STABLE", custom).quadrant, "Q1")
+        self.assertEqual(map_quadrant("LOW", "STABLE", custom).quadrant, "UNKNOWN")
+        self.assertEqual(map_quadrant("LOW", "STABLE").quadrant, "Q4")
+
+    def test_compiled_once_per_file_hash(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = Path(tmp) / "vera_rules.yaml"
+            shutil.copy(config_loader.vera_rules_path(), path)
+            with mock.patch.object(config_loader, "vera_rules_path", return_value=path):
+                first = get_compiled_rules()
+                self.assertIs(get_compiled_rules(), first)
+
+                os.utime(path, ns=(1, 1))                      # 仅 mtime 变化：内容哈希相同，复用
+                self.assertIs(get_compiled_rules(), first)
+
+                text = path.read_text(encoding="utf-8").replace("high_gte: 60", "high_gte: 70")
+                path.write_text(text, encoding="utf-8")
+                second = get_compiled_rules()
+                self.assertIsNot(second, first)
+                self.assertEqual(second.quadrant.high_gte, 70)
+                self.assertEqual(load_vera_rules()["quadrant"]["position_bin"]["high_gte"], 70)
+        finally:
+            shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+import pandas as pd
+from scipy.stats import percentileofscore
+import db.connection
+from analysis.sector_board import _position_pct, run_sector_board_job
+from analysis.sector_overlay import build_sector_context
+from db.sector_board import load_sector_board
+from utils.market_calendar import clear_calendar_cache
+from tests.temp_db import use_temp_db
+
+SPX = "US:INDEX:SPX"
+XLK = "US:ETF:XLK"
+XLF = "US:ETF:XLF"
+
+
+class TestSectorBoard(unittest.TestCase):
+    def setUp(self):
+        clear_calendar_cache()
+        use_temp_db(self)
+
+        conn = db.connection.get_connection()
+        conn.execute("""
+            CREATE TABLE sector_proxy_map (
+              scheme TEXT, sector_code TEXT, sector_name TEXT, proxy_etf_id TEXT,
+              market_index_id TEXT, priority INTEGER DEFAULT 50, is_active INTEGER DEFAULT 1, note TEXT
+            )
+        """)
+        # 默认市场指数 (resolve_market_index -> "SPX") 经 asset_symbol_map 解析为 canonical
+        conn.execute("CREATE TABLE asset_symbol_map (canonical_id TEXT, symbol TEXT, priority INTEGER, is_active INTEGER)")
+        conn.execute("INSERT INTO asset_symbol_map VALUES (?, 'SPX', 1, 1)", (SPX,))
+        conn.executemany(
+            "INSERT INTO sector_proxy_map (scheme, sector_code, sector_name, proxy_etf_id, market_index_id) VALUES (?, ?, ?, ?, ?)",
+            [("GICS", "45", "Technology", XLK, SPX), ("GICS", "40", "Financials", XLF, None)]
+        )
+        self.dates = pd.bdate_range("2024-01-01", periods=300).strftime("%Y-%m-%d")
+        rng = np.random.default_rng(7)
+        self.px = {
+            a: 100 * np.exp(np.cumsum(rng.normal(drift, 0.01, len(self.dates))))
+            for a, drift in [(SPX, 0.0), (XLK, 0.002), (XLF, -0.001)]
+        }
+        conn.executemany(
+            "INSERT INTO vera_price_cache (symbol, trade_date, close) VALUES (?, ?, ?)",
+            [(a, d, float(c)) for a, closes in self.px.items() for d, c in zip(self.dates, closes)]
+        )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        clear_calendar_cache()
+
+    def test_position_pct_matches_scipy(self):
+        rng = np.random.default_rng(0)
+        values = rng.integers(0, 20, size=(200, 3)).astype(float)
+        observed = rng.random((200, 3)) > 0.2
+        observed[-1, 1] = False
+        pct = _position_pct(values, observed)
+        for j in range(3):
+            col = values[observed[:, j], j]
+            self.assertAlmostEqual(pct[j], percentileofscore(col, col[-1], kind="rank") / 100.0)
+
+    def test_board_job_and_snapshot_reuse(self):
+        board = run_sector_board_job(self.dates[-1]).set_index("sector_etf_id")
+
+        ret = {a: c[-1] / c[-63] - 1 for a, c in self.px.items()}
+        self.assertAlmostEqual(board.loc[XLK, "rs_3m"], ret[XLK] - ret[SPX])
+        self.assertAlmostEqual(board.loc[XLF, "rs_3m"], ret[XLF] - ret[SPX])
+        self.assertEqual(board.loc[XLF, "market_index_id"], SPX)          # 默认市场指数
+        self.assertEqual(board.loc[XLK, "as_of_date"], self.dates[-1])
+        self.assertEqual(sorted(board["rank_rs_3m"]), [1, 2])
+        self.assertIsNotNone(board.loc[XLK, "dd_state"])
+
+        stored = load_sector_board(self.dates[-1])
+        self.assertEqual(list(stored["sector_etf_id"]), list(board.sort_values("rank_rs_3m").index))
+
+        ctx = build_sector_context(XLK, self.dates[-1], SPX)
+        self.assertAlmostEqual(ctx["sector_vs_market_rs_3m"], board.loc[XLK, "rs_3m"])
+        self.assertEqual(ctx["sector_dd_state"], board.loc[XLK, "dd_state"])
+        self.assertEqual(len(ctx["sector_close"]), len(self.dates))
+
+
+if __name__ == '__main__':
+    unittest.main()
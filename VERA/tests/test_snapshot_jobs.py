@@ -0,0 +1,98 @@
+import threading
+import unittest
+from unittest import mock
+
+import db.connection
+import engine.snapshot_builder as snapshot_builder
+import engine.snapshot_jobs as snapshot_jobs
+from engine.snapshot_builder import SnapshotResult
+from engine.snapshot_jobs import submit_snapshot_job, poll_snapshot_job, save_snapshot_job, wait_snapshot_job
+from tests.temp_db import use_temp_db
+
+HSBC = "HK:STOCK:00005"
+
+
+class TestSnapshotJobs(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self, symbol_map=True)
+
+        self.release = threading.Event()
+        self.calls = []
+        self.saved = []
+        patcher = mock.patch.object(snapshot_builder, "build_snapshot", side_effect=self._fake_build)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(snapshot_jobs._JOBS.clear)
+        self.addCleanup(snapshot_jobs._BY_KEY.clear)
+
+    def _fake_build(self, symbol, as_of_date=None, progress=None):
+        self.calls.append(symbol)
+        progress("prices", 0.15)
+        self.release.wait(5)
+        if symbol == "BOOM":
+            raise RuntimeError("no data source")
+        sid = f"snap-{as_of_date}"
+        return SnapshotResult(sid, symbol, "2024-01-02", {"symbol": symbol},
+                              [lambda: self.saved.append(sid)])
+
+    def _job_row(self, job_id):
+        conn = db.connection.get_connection()
+        try:
+            return dict(conn.execute("SELECT * FROM snapshot_job WHERE job_id = ?", (job_id,)).fetchone())
+        finally:
+            conn.close()
+
+    def test_dedupe_progress_and_single_save(self):
+        first = submit_snapshot_job("00005.HK", as_of_date="2024-01-02")
+        second = submit_snapshot_job(HSBC, as_of_date="2024-01-02")    # 别名 -> 同一 (asset, date)
+        self.assertEqual(first, second)
+        other_day = submit_snapshot_job(HSBC, as_of_date="2024-01-03")
+        self.assertNotEqual(other_day, first)
+
+        for _ in range(100):
+            if poll_snapshot_job(first)["stage"] == "prices":
+                break
+            threading.Event().wait(0.01)
+        status = poll_snapshot_job(first)
+        self.assertEqual((status["status"], status["stage"], status["progress"]), ("running", "prices", 0.15))
+        with self.assertRaises(ValueError):
+            save_snapshot_job(first)
+
+        self.release.set()
+        done = wait_snapshot_job(first, timeout=5)
+        wait_snapshot_job(other_day, timeout=5)
+        self.assertEqual(done["status"], "done")
+        self.assertEqual(done["data"], {"symbol": "00005.HK"})
+        self.assertEqual(len(self.calls), 2)
+
+        # 完成后再次请求复用结果；保存只执行一次落库
+        self.assertEqual(submit_snapshot_job("00005.HK", as_of_date="2024-01-02"), first)
+        self.assertEqual(save_snapshot_job(first), "snap-2024-01-02")
+        self.assertEqual(save_snapshot_job(first), "snap-2024-01-02")
+        self.assertEqual(self.saved, ["snap-2024-01-02"])
+        self.assertEqual(len(self.calls), 2)
+
+        row = self._job_row(first)
+        self.assertEqual((row["asset_id"], row["as_of_date"], row["status"], row["snapshot_id"]),
+                         (HSBC, "2024-01-02", "done", "snap-2024-01-02"))
+        self.assertIsNotNone(row["saved_at"])
+
+        # 超过复用期限重新计算
+        third = submit_snapshot_job(HSBC, as_of_date="2024-01-02", max_age=0)
+        self.assertNotEqual(third, first)
+        self.assertEqual(wait_snapshot_job(third, timeout=5)["status"], "done")
+        self.assertEqual(len(self.calls), 3)
+
+    def test_failed_job_is_not_reused(self):
+        self.release.set()
+        job_id = submit_snapshot_job("BOOM", as_of_date="2024-01-02")
+        status = wait_snapshot_job(job_id, timeout=5)
+        self.assertEqual((status["status"], status["error"]), ("error", "no data source"))
+        self.assertEqual(self._job_row(job_id)["status"], "error")
+        retry = submit_snapshot_job("BOOM", as_of_date="2024-01-02")
+        self.assertNotEqual(retry, job_id)
+        self.assertEqual(wait_snapshot_job(retry, timeout=5)["status"], "error")
+
+
+if __name__ == '__main__':
+    unittest.main()
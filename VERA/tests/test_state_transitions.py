@@ -0,0 +1,97 @@
+import sqlite3
+import unittest
+import pandas as pd
+from analysis.state_transitions import (
+    compute_transition_stats, compute_dwell_stats, compute_event_stats, run_state_transition_job
+)
+from db.state_transition_stats import get_transition_odds, get_dwell_stats
+
+
+def _history(asset_id, market, sector, states):
+    dates = pd.bdate_range("2024-01-01", periods=len(states)).strftime("%Y-%m-%d")
+    return pd.DataFrame({
+        "asset_id": asset_id,
+        "trade_date": dates,
+        "confirmed_state": states,
+        "market": market,
+        "sector_name": sector,
+    })
+
+
+class TestStateTransitions(unittest.TestCase):
+    def setUp(self):
+        # A: D4 x3 -> D5 x2 -> D6 x1 ; B: D4 x2 -> D3 x2
+        self.history = pd.concat([
+            _history("A", "US", "Tech", ["D4", "D4", "D4", "D5", "D5", "D6"]),
+            _history("B", "HK", "Bank", ["D4", "D4", "D3", "D3"]),
+        ], ignore_index=True)
+
+    def test_transition_probabilities(self):
+        stats = compute_transition_stats(self.history)
+        all_d4 = stats[(stats.group_type == "ALL") & (stats.from_state == "D4")].set_index("to_state")
+
+        # D4 steps: A: D4->D4 x2, D4->D5 ; B: D4->D4, D4->D3  => 5 steps
+        self.assertEqual(all_d4["sample_count"].sum(), 5)
+        self.assertAlmostEqual(all_d4.loc["D4", "probability"], 3 / 5)
+        self.assertAlmostEqual(all_d4.loc["D5", "exit_probability"], 0.5)
+        self.assertAlmostEqual(all_d4.loc["D3", "exit_probability"], 0.5)
+        self.assertTrue(pd.isna(all_d4.loc["D4", "exit_probability"]))
+
+        us_d4 = stats[(stats.group_type == "MARKET") & (stats.group_key == "US") & (stats.from_state == "D4")]
+        self.assertEqual(set(us_d4.to_state), {"D4", "D5"})
+
+    def test_dwell_excludes_open_spell(self):
+        stats = compute_dwell_stats(self.history)
+        all_stats = stats[stats.group_type == "ALL"].set_index("from_state")
+        # Completed D4 spells: A=3, B=2 ; D6 (A) and D3 (B) are still open
+        self.assertEqual(all_stats.loc["D4", "sample_count"], 2)
+        self.assertAlmostEqual(all_stats.loc["D4", "dwell_mean"], 2.5)
+        self.assertNotIn("D6", all_stats.index)
+        self.assertNotIn("D3", all_stats.index)
+
+    def test_event_rate(self):
+        events = pd.DataFrame({
+            "asset_id": ["B"], "event_type": ["SECONDARY_DRAWDOWN"],
+            "state_from": ["D4"], "state_to": ["D3"],
+        })
+        stats = compute_event_stats(events, self.history)
+        hk = stats[(stats.group_type == "MARKET") & (stats.group_key == "HK")].iloc[0]
+        self.assertEqual(hk.from_state, "SECONDARY_DRAWDOWN")
+        self.assertAlmostEqual(hk.probability, 1 / (4 / 252))
+        self.assertTrue(stats[(stats.group_key == "US")].empty)
+
+    def test_job_roundtrip(self):
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        with open("db/schema.sql", "r") as f:
+            conn.executescript(f.read())
+        conn.execute("ALTER TABLE assets ADD COLUMN asset_type TEXT")
+        conn.execute("""
+            CREATE TABLE asset_classification (
+                asset_id TEXT, scheme TEXT, sector_code TEXT, sector_name TEXT,
+                industry_code TEXT, industry_name TEXT, as_of_date TEXT, is_active INTEGER DEFAULT 1
+            )
+        """)
+        conn.executemany("INSERT INTO assets (asset_id, market) VALUES (?, ?)", [("A", "US"), ("B", "HK")])
+        conn.execute("INSERT INTO asset_classification VALUES ('A', 'GICS', '45', 'Tech', NULL, NULL, '2024-01-01', 1)")
+        conn.executemany(
+            "INSERT INTO drawdown_state_history (asset_id, trade_date, raw_state, confirmed_state) VALUES (?, ?, ?, ?)",
+            [(r.asset_id, r.trade_date, r.confirmed_state, r.confirmed_state) for r in self.history.itertuples()]
+        )
+
+        self.assertGreater(run_state_transition_job(conn), 0)
+
+        odds = get_transition_odds("D4", "D5", market="US", sector_name="Tech", conn=conn)
+        self.assertEqual(odds["group_type"], "SECTOR")
+        self.assertAlmostEqual(odds["exit_probability"], 1.0)
+
+        # Unknown sector falls back to market, then ALL
+        odds = get_transition_odds("D4", "D3", market="HK", sector_name="Energy", conn=conn)
+        self.assertEqual(odds["group_type"], "MARKET")
+        dwell = get_dwell_stats("D4", conn=conn)
+        self.assertEqual(dwell["group_type"], "ALL")
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
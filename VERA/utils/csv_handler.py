@@ -2,6 +2,7 @@ import pandas as pd
 import sqlite3
 from db.connection import get_connection
 from utils.canonical_resolver import resolve_canonical_symbol
+from data.price_ingest import ingest_prices
 
 def parse_and_import_csv(uploaded_file, fallback_id=None, fallback_name=None, mode="overwrite", start_date=None, end_date=None, target_assets=None):
     """
@@ -128,67 +129,33 @@ def parse_and_import_csv(uploaded_file, fallback_id=None, fallback_name=None, mo
             
             # 准备写入数据
             valid_data['symbol'] = valid_data['canonical_id']  # price_cache使用canonical作为symbol
-            valid_data['source'] = 'User_Upload_CSV'
             
-            # 动态选择列，确保新字段被包含
-            cols_to_save = ['symbol', 'trade_date', 'open', 'high', 'low', 'close', 'volume', 'source',
+            # 动态选择列，确保新字段被包含 (表中不存在的列由 ingest gateway 忽略)
+            cols_to_save = ['symbol', 'raw_symbol', 'trade_date', 'open', 'high', 'low', 'close', 'volume',
                             'pe', 'pe_ttm', 'pb', 'ps', 'eps', 'dividend_yield', 'turnover', 'market_cap', 
                             'pct_change', 'prev_close']
             # 只取 valid_data 中存在的列
             actual_cols = [c for c in cols_to_save if c in valid_data.columns]
             valid_data = valid_data[actual_cols]
             
-            # 4. 写入数据库（分批避免 SQL 变量超限）
-            BATCH_SIZE = 100  # 每批100行，避免超过SQLite 999变量限制
+            # 4. 写入数据库：经 ingest gateway 批量写入 (批内按主键去重，source 保留 raw 审计)
+            #    incremental: 跳过已有记录；overwrite: 更新已有记录
+            result = ingest_prices(
+                valid_data, 'User_Upload_CSV',
+                mode=("ignore" if mode == "incremental" else "upsert"),
+                resolve=False, conn=conn,
+            )
             
-            # 统计每个资产的新增和重复
-            asset_stats = {}  # {canonical_id: {'total': X, 'inserted': Y, 'duplicate': Z}}
-            
-            for canonical_id, group in valid_data.groupby('symbol'):
-                total_rows = len(group)
-                inserted = 0
-                duplicated = 0
-                
-                # 分批插入
-                for i in range(0, len(group), BATCH_SIZE):
-                    batch = group.iloc[i:i+BATCH_SIZE]
-                    
-                    # 使用 INSERT OR IGNORE 并检查实际插入行数 (动态构建 SQL 以适配新字段)
-                    cursor = conn.cursor()
-                    col_names = ", ".join(actual_cols)
-                    placeholders = ", ".join(["?"] * len(actual_cols))
-                    
-                    # Mode-dependent SQL logic
-                    if mode == "incremental":
-                        # Incremental: Skip existing records
-                        sql = f"""
-                            INSERT OR IGNORE INTO vera_price_cache ({col_names})
-                            VALUES ({placeholders})
-                        """
-                    else:
-                        # Overwrite: Update existing records
-                        update_clause = ", ".join([f"{c} = excluded.{c}" for c in actual_cols if c not in ['symbol', 'trade_date']])
-                        sql = f"""
-                            INSERT INTO vera_price_cache ({col_names})
-                            VALUES ({placeholders})
-                            ON CONFLICT(symbol, trade_date) DO UPDATE SET
-                            {update_clause}
-                        """
-                    
-                    cursor.executemany(sql, [tuple(row) for _, row in batch.iterrows()])
-                    
-                    actual_inserted = cursor.rowcount
-                    inserted += actual_inserted
-                    duplicated += (len(batch) - actual_inserted)
-                
+            # 统计每个资产的新增和重复 {canonical_id: {'total': X, 'inserted': Y, 'duplicate': Z}}
+            asset_stats = {}
+            for canonical_id, total_rows in valid_data.groupby('symbol').size().items():
+                inserted = result['symbols'].get(canonical_id, 0)
                 asset_stats[canonical_id] = {
-                    'total': total_rows,
+                    'total': int(total_rows),
                     'inserted': inserted,
-                    'duplicate': duplicated
+                    'duplicate': int(total_rows) - inserted
                 }
             
-            conn.commit()
-            
             # 5. 生成详细报告
             total_inserted = sum(s['inserted'] for s in asset_stats.values())
             total_duplicate = sum(s['duplicate'] for s in asset_stats.values())
@@ -1,7 +1,7 @@
 import pandas as pd
 import sqlite3
 import os
-from db.connection import get_connection
+from data.price_ingest import ingest_prices
 
 def import_csv_to_cache(file_path):
     print(f"Reading {file_path}...")
@@ -33,41 +33,12 @@ def import_csv_to_cache(file_path):
     # but here we assume CSV is relatively clean or let DB handle it)
     data_to_insert.dropna(subset=['symbol', 'trade_date', 'close'], inplace=True)
     
-    # Insert logic
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    rows = data_to_insert.to_dict('records')
-    inserted_count = 0
-    
-    print(f"Processing {len(rows)} rows...")
-    
-    # Using Transaction for speed
+    # 写库经 ingest gateway (canonical 解析 + 批内去重 + 批量 upsert)
     try:
-        cursor.execute("BEGIN TRANSACTION;")
-        for row in rows:
-            cursor.execute("""
-                INSERT OR REPLACE INTO vera_price_cache 
-                (symbol, trade_date, open, high, low, close, volume, source)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                row['symbol'],
-                row['trade_date'],
-                row['open'],
-                row['high'],
-                row['low'],
-                row['close'],
-                row['volume'],
-                row['source']
-            ))
-        conn.commit()
-        inserted_count = len(rows)
-        print(f"Successfully imported {inserted_count} records to vera_price_cache.")
+        result = ingest_prices(data_to_insert, "import_csv", mode="replace")
+        print(f"Successfully imported {result['written']} records to vera_price_cache.")
     except Exception as e:
-        conn.rollback()
         print(f"Error during database insertion: {e}")
-    finally:
-        conn.close()
 
 if __name__ == "__main__":
     # Auto-detect file in import/
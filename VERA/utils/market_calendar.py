@@ -1,2 +1,168 @@
-def is_market_open(market="US"):
-    return False
+"""
+Trading calendar service (HK / US / CN)
+- 各市场交易日历由 vera_price_cache 中该市场全部资产的工作日 bar 汇总得到，
+  预计算落表 market_trading_calendar (rebuild_trading_calendar)，进程内按市场缓存
+- 跨市场序列对齐统一走 data.price_panel.build_aligned_panel，不再依赖 pandas 隐式对齐
+"""
+import threading
+from datetime import date
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from db.connection import get_connection
+
+MARKETS = ("US", "HK", "CN")
+
+_SESSIONS: Dict[str, np.ndarray] = {}
+_LOCK = threading.Lock()
+
+
+def market_of_id(asset_id: str, market_hint: str = None) -> str:
+    """资产所属市场：优先 assets.market，缺失/Unknown 时按代码推断"""
+    if market_hint and market_hint.upper() in MARKETS:
+        return market_hint.upper()
+    from engine.asset_resolver import _infer_market
+    return _infer_market(asset_id or "")
+
+
+def asset_markets(asset_ids: Iterable[str], conn=None) -> Dict[str, str]:
+    """批量查询 asset_id -> market"""
+    asset_ids = list(dict.fromkeys(asset_ids))
+    if not asset_ids:
+        return {}
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        hints = {}
+        for i in range(0, len(asset_ids), 500):
+            chunk = asset_ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT asset_id, market FROM assets WHERE asset_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            hints.update({r[0]: r[1] for r in rows})
+        return {a: market_of_id(a, hints.get(a)) for a in asset_ids}
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def weekday_mask(dates: np.ndarray) -> np.ndarray:
+    # 1970-01-01 为周四：(days + 3) % 7 -> 周一=0
+    return (dates.astype("datetime64[D]").astype(np.int64) + 3) % 7 < 5
+
+
+# ---------------------------
+# Precompute (job)
+# ---------------------------
+
+def rebuild_trading_calendar(markets: Iterable[str] = None, conn=None) -> Dict[str, int]:
+    """
+    按市场汇总 vera_price_cache 的交易日 (工作日且至少 1 个资产有 bar)，全量重写 market_trading_calendar
+    Returns: {market: session 数}
+    """
+    markets = [m.upper() for m in (markets or MARKETS)]
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        symbols = [r[0] for r in conn.execute("SELECT DISTINCT symbol FROM vera_price_cache").fetchall()]
+        by_market: Dict[str, List[str]] = {m: [] for m in markets}
+        for symbol, market in asset_markets(symbols, conn=conn).items():
+            if market in by_market:
+                by_market[market].append(symbol)
+
+        counts: Dict[str, Dict[str, int]] = {}
+        for market, members in by_market.items():
+            day_counts: Dict[str, int] = {}
+            for i in range(0, len(members), 500):
+                chunk = members[i:i + 500]
+                for trade_date, n in conn.execute(
+                    f"SELECT trade_date, COUNT(*) FROM vera_price_cache "
+                    f"WHERE symbol IN ({','.join('?' * len(chunk))}) GROUP BY trade_date",
+                    chunk
+                ).fetchall():
+                    day_counts[trade_date] = day_counts.get(trade_date, 0) + n
+            counts[market] = day_counts
+
+        with conn:
+            conn.executemany("DELETE FROM market_trading_calendar WHERE market = ?", [(m,) for m in markets])
+            summary = {}
+            for market, day_counts in counts.items():
+                days = sorted(day_counts)
+                keep = weekday_mask(np.array(days, dtype="datetime64[D]")) if days else np.array([], dtype=bool)
+                rows = [(market, d, day_counts[d]) for d, k in zip(days, keep) if k]
+                conn.executemany(
+                    "INSERT INTO market_trading_calendar (market, trade_date, n_assets) VALUES (?, ?, ?)",
+                    rows
+                )
+                summary[market] = len(rows)
+    finally:
+        if own_conn:
+            conn.close()
+
+    clear_calendar_cache()
+    return summary
+
+
+# ---------------------------
+# Query
+# ---------------------------
+
+def clear_calendar_cache():
+    with _LOCK:
+        _SESSIONS.clear()
+
+
+def _load_sessions(market: str, conn) -> np.ndarray:
+    rows = conn.execute(
+        "SELECT trade_date FROM market_trading_calendar WHERE market = ? ORDER BY trade_date",
+        (market,)
+    ).fetchall()
+    return np.array([r[0] for r in rows], dtype="datetime64[D]")
+
+
+def get_sessions(market: str, start=None, end=None, conn=None) -> np.ndarray:
+    """
+    市场交易日 (datetime64[D] 升序)，按 [start, end] 截取
+    首次访问从 market_trading_calendar 读入并缓存；日历尚未构建时返回空数组
+    """
+    market = (market or "US").upper()
+    with _LOCK:
+        sessions = _SESSIONS.get(market)
+    if sessions is None:
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        try:
+            sessions = _load_sessions(market, conn)
+        finally:
+            if own_conn:
+                conn.close()
+        with _LOCK:
+            _SESSIONS[market] = sessions
+
+    lo = 0 if start is None else np.searchsorted(sessions, np.datetime64(str(start)[:10], "D"), side="left")
+    hi = len(sessions) if end is None else np.searchsorted(sessions, np.datetime64(str(end)[:10], "D"), side="right")
+    return sessions[lo:hi]
+
+
+def shared_sessions(markets: Iterable[str], start=None, end=None, how: str = "union", conn=None) -> np.ndarray:
+    """多市场共享日历：union (任一市场开市) / intersection (全部开市)"""
+    calendars = [get_sessions(m, start, end, conn=conn) for m in dict.fromkeys(markets)]
+    if not calendars:
+        return np.array([], dtype="datetime64[D]")
+    out = calendars[0]
+    for cal in calendars[1:]:
+        out = np.union1d(out, cal) if how == "union" else np.intersect1d(out, cal)
+    return out
+
+
+def is_market_open(market="US", on_date=None, conn=None) -> bool:
+    """on_date (默认今天) 是否为该市场交易日 (依据已构建的日历)"""
+    d = np.datetime64(str(on_date or date.today())[:10], "D")
+    sessions = get_sessions(market, conn=conn)
+    i = np.searchsorted(sessions, d)
+    return bool(i < len(sessions) and sessions[i] == d)
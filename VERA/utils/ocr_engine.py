@@ -21,9 +21,11 @@ def preprocess_image(image: Image.Image) -> Image.Image:
     # 这里简单采用固定阈值或自动处理
     return gray
 
-def extract_stock_data(image_bytes: bytes) -> dict:
+def extract_stock_data(image_bytes: bytes, verbose: bool = True) -> dict:
     """
     核心 OCR 识别函数
+    verbose=False 时不打印 OCR 原文 (批量/进程池模式)
+    修改预处理或字段解析后需递增 utils.ocr_pipeline.OCR_PARSER_VERSION，使结果缓存失效
     """
     image = Image.open(io.BytesIO(image_bytes))
     processed_img = preprocess_image(image)
@@ -35,9 +37,10 @@ def extract_stock_data(image_bytes: bytes) -> dict:
     except Exception as e:
         return {"error": f"OCR 引擎调用失败: {str(e)}"}
 
-    print("--- OCR RAW START ---")
-    print(text)
-    print("--- OCR RAW END ---")
+    if verbose:
+        print("--- OCR RAW START ---")
+        print(text)
+        print("--- OCR RAW END ---")
 
     data = {
         "symbol": None,
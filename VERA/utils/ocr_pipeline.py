@@ -0,0 +1,239 @@
+"""
+Batch OCR pipeline for broker screenshots
+- 进程池并行执行 预处理 + OCR (utils.ocr_engine.extract_stock_data)
+- 以图片内容 SHA-256 为键的结果缓存 (ocr_result_cache)，同一截图不会重复识别；
+  行上记录解析器版本，OCR_PARSER_VERSION 变化后旧结果不再命中，重新识别并覆盖
+- 新识别结果单事务批量写入
+- Streamlit 侧：submit_ocr_job() 入队后立即返回 job_id，poll_ocr_job() 轮询结果，不阻塞 UI 线程
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from db.connection import get_connection
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp")
+
+# Streamlit 后台 OCR 进程数 (tesseract 本身单线程，按核数并行)
+OCR_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+# 已完成任务在内存中保留的时间 (秒)；页面未清除的结果超时后淘汰 (识别结果已落库缓存，可重新提交秒回)
+OCR_JOB_TTL = 1800
+# 内存中最多保留的已完成任务数 (超出按完成时间淘汰)
+OCR_MAX_JOBS = 256
+# 页面轮询间隔 (秒)
+OCR_POLL_INTERVAL = 1.0
+# 解析器版本：修改 utils.ocr_engine.extract_stock_data 的预处理 / 字段解析时递增，使已缓存结果失效
+OCR_PARSER_VERSION = 1
+
+
+def content_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def ocr_image_bytes(image_bytes: bytes) -> dict:
+    """进程池 worker：预处理 + OCR，返回结构化结果 (失败时返回 {"error": ...})"""
+    from utils.ocr_engine import extract_stock_data
+    try:
+        return extract_stock_data(image_bytes, verbose=False)
+    except Exception as e:
+        return {"error": f"OCR 处理失败: {e}"}
+
+
+def list_images(directory: str) -> List[str]:
+    """目录下所有截图文件 (按文件名排序)"""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+# ---------------------------
+# Content-hash cache
+# ---------------------------
+
+def load_cached_results(hashes, conn=None) -> Dict[str, dict]:
+    """批量查询缓存：content_hash -> result dict (只取当前 OCR_PARSER_VERSION 写入的行)"""
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        cached = {}
+        # SQLite 参数上限，分块查询
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            rows = conn.execute(
+                f"SELECT content_hash, result_json FROM ocr_result_cache "
+                f"WHERE parser_version = ? AND content_hash IN ({','.join('?' * len(chunk))})",
+                [OCR_PARSER_VERSION, *chunk]
+            ).fetchall()
+            cached.update({r[0]: json.loads(r[1]) for r in rows})
+        return cached
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def save_ocr_results(items, conn=None) -> int:
+    """
+    单事务写入识别结果
+    items: iterable of (content_hash, source_name, result)；含 error 的结果不缓存，下次重新识别
+    旧版本解析器写入的同一 content_hash 行被覆盖
+    Returns: 写入行数
+    """
+    rows = [
+        (h, name, json.dumps(result, ensure_ascii=False), OCR_PARSER_VERSION)
+        for h, name, result in items
+        if result and "error" not in result
+    ]
+    if not rows:
+        return 0
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO ocr_result_cache (content_hash, source_name, result_json, parser_version) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+# ---------------------------
+# Batch mode (scripts)
+# ---------------------------
+
+def run_ocr_batch(paths, max_workers: Optional[int] = None, ocr_fn=ocr_image_bytes, conn=None) -> List[dict]:
+    """
+    批量识别一组截图：
+    1. 读取并计算内容哈希 (同批内相同内容只识别一次)
+    2. 命中缓存的直接返回
+    3. 未命中的交给进程池并行识别，结果单事务写入缓存
+
+    Returns: 按输入顺序的 [{"path", "content_hash", "cached", "result"}]
+    """
+    items = []
+    payloads = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            image_bytes = f.read()
+        h = content_hash(image_bytes)
+        items.append({"path": path, "content_hash": h})
+        payloads.setdefault(h, (os.path.basename(path), image_bytes))
+
+    cached = load_cached_results(payloads.keys(), conn=conn)
+    pending = [h for h in payloads if h not in cached]
+
+    fresh = {}
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(ocr_fn, [payloads[h][1] for h in pending])
+            fresh = dict(zip(pending, results))
+        save_ocr_results(((h, payloads[h][0], fresh[h]) for h in pending), conn=conn)
+
+    for item in items:
+        h = item["content_hash"]
+        item["cached"] = h in cached
+        item["result"] = cached[h] if h in cached else fresh[h]
+    return items
+
+
+# ---------------------------
+# Async job queue (Streamlit)
+# ---------------------------
+
+_EXECUTOR = None
+_JOBS: Dict[str, dict] = {}
+_LOCK = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ProcessPoolExecutor(max_workers=OCR_MAX_WORKERS)
+        return _EXECUTOR
+
+
+def _evict_finished():
+    """调用方持有 _LOCK：淘汰超过 OCR_JOB_TTL 或超出 OCR_MAX_JOBS 的已完成任务 (进行中的不淘汰)"""
+    now = time.monotonic()
+    finished = sorted(
+        ((job_id, j) for job_id, j in _JOBS.items() if j["finished"] is not None),
+        key=lambda item: item[1]["finished"]
+    )
+    overflow = max(0, len(finished) - OCR_MAX_JOBS)
+    for i, (job_id, job) in enumerate(finished):
+        if i < overflow or now - job["finished"] > OCR_JOB_TTL:
+            del _JOBS[job_id]
+
+
+def submit_ocr_job(image_bytes: bytes, source_name: str = None) -> str:
+    """
+    入队一张截图，立即返回 job_id
+    命中缓存时任务直接完成，不占用进程池
+    """
+    h = content_hash(image_bytes)
+    job = {"content_hash": h, "source_name": source_name, "future": None, "result": None, "cached": False,
+           "finished": None}
+
+    cached = load_cached_results([h])
+    if h in cached:
+        job.update(result=cached[h], cached=True, finished=time.monotonic())
+    else:
+        job["future"] = _get_executor().submit(ocr_image_bytes, image_bytes)
+
+    job_id = uuid.uuid4().hex
+    with _LOCK:
+        _evict_finished()
+        _JOBS[job_id] = job
+    return job_id
+
+
+def poll_ocr_job(job_id: str) -> dict:
+    """
+    查询任务状态 (非阻塞)
+    Returns: {"status": "pending" | "done" | "error" | "unknown", "result", "cached", "source_name"}
+    """
+    with _LOCK:
+        job = _JOBS.get(job_id)
+    if job is None:
+        return {"status": "unknown", "result": None, "cached": False, "source_name": None}
+
+    future = job["future"]
+    if job["result"] is None and future is not None:
+        if not future.done():
+            return {"status": "pending", "result": None, "cached": False, "source_name": job["source_name"]}
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"error": f"OCR 任务失败: {e}"}
+        job["result"] = result
+        job["finished"] = time.monotonic()
+        save_ocr_results([(job["content_hash"], job["source_name"], result)])
+
+    result = job["result"]
+    return {
+        "status": "error" if "error" in result else "done",
+        "result": result,
+        "cached": job["cached"],
+        "source_name": job["source_name"],
+    }
+
+
+def forget_ocr_job(job_id: str):
+    with _LOCK:
+        _JOBS.pop(job_id, None)